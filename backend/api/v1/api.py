@@ -2,13 +2,15 @@
 API v1 Router Aggregator.
 """
 from fastapi import APIRouter
-from api.v1.endpoints import entities, search, analytics, cases, documents, alerts, audit
+from api.v1.endpoints import entities, paths, search, analytics, cases, documents, alerts, audit, resolution
 
 api_router = APIRouter()
 
 api_router.include_router(entities.router, prefix="/entities", tags=["Entities"])
+api_router.include_router(paths.router, prefix="/paths", tags=["Paths"])
 api_router.include_router(search.router, prefix="/search", tags=["Search"])
 api_router.include_router(analytics.router, prefix="/analytics", tags=["Analytics"])
+api_router.include_router(resolution.router, prefix="/resolution", tags=["Entity Resolution"])
 api_router.include_router(cases.router, prefix="/cases", tags=["Investigation Cases"])
 api_router.include_router(documents.router, prefix="/documents", tags=["Documents"])
 api_router.include_router(alerts.router, prefix="/alerts", tags=["Persistent Alerts"])
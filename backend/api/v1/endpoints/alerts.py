@@ -1,8 +1,8 @@
 """
 Persistent queries and monitoring alerts.
 """
-from fastapi import APIRouter, Query
-from typing import List, Dict, Any
+from fastapi import APIRouter, HTTPException, Query
+from typing import List, Dict, Any, Optional
 from services.alert_service import alert_service
 
 router = APIRouter()
@@ -20,3 +20,21 @@ async def create_alert(alert_input: Dict[str, Any]):
 async def list_alerts(user_id: str):
     """List active alerts for a user."""
     return await alert_service.list_user_alerts(user_id)
+
+@router.post("/check")
+async def check_alerts():
+    """Evaluate active alerts now instead of waiting for the scheduler."""
+    try:
+        return await alert_service.check_alerts()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/status")
+async def get_alert_status():
+    """Summary of the last alert evaluation."""
+    return alert_service.last_run or {"alerts": None, "message": "No run yet"}
+
+@router.get("/{alert_id}/matches")
+async def list_alert_matches(alert_id: str, status: Optional[str] = None, limit: int = Query(100, ge=1, le=1000)):
+    """Stored matches of an alert, newest first."""
+    return await alert_service.list_matches(alert_id, status, limit)
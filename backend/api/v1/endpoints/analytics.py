@@ -1,42 +1,413 @@
 """
 Analytics endpoints for temporal, geospatial, and investigative analysis.
 """
-from fastapi import APIRouter, Query
-from typing import List, Dict, Any
+import asyncio
+from datetime import date, datetime
+from fastapi import APIRouter, Header, HTTPException, Query
+from typing import List, Dict, Any, Optional
 from services.temporal_service import temporal_service
 from services.geospatial_service import geospatial_service
+from services.heatmap import heatmaps
+from services.colocation_service import colocation_service
 from services.communications_service import communications_service
+from services.contact_matrix import contact_matrix
 from services.financial_service import financial_service
+from services.flow_rollups import flow_rollups
+from services.pattern_detection import pattern_detection
+from services.sequence_detection import sequence_detection
+from services.graph_projection import graph_projection
+from services.map_clusters import map_clusters
+from services.trajectories import trajectories
+from services.graph_analytics import graph_analytics
+from services.graph_encoding import graph_response
+from models.schemas import (
+    AccountFlowSummary, CoLocation, CommNetworkData, CommNetworkRequest, ContactSummary, FindingPattern, FindingStatus, FlowGraphData,
+    GeoEntity, GeoPolygonRequest, GeoPolygonResult, GraphData, Heatmap, MapCluster, MapClusterExpansion,
+    PairContacts, PatternFinding, SequenceQuery, SequenceResult, TimelineHistogram, TimelinePage, Trajectory
+)
 
 router = APIRouter()
 
 # --- Temporal ---
-@router.get("/timeline/{entity_type}/{entity_id}")
-async def get_timeline(entity_type: str, entity_id: str):
-    """Get chronological timeline for an entity."""
-    return await temporal_service.get_entity_timeline(entity_id, entity_type)
+@router.get("/timeline/{entity_type}/{entity_id}", response_model=TimelinePage)
+async def get_timeline(
+    entity_type: str,
+    entity_id: str,
+    collapse_clusters: bool = False,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    relationship_types: Optional[List[str]] = Query(None),
+    limit: int = Query(200, ge=1, le=2000),
+    cursor: Optional[str] = None
+):
+    """
+    Get one page of an entity's chronological timeline, optionally across its
+    resolved cluster; pass next_cursor back for the following page.
+    """
+    try:
+        return await temporal_service.get_entity_timeline(
+            entity_id, entity_type, collapse_clusters, start_time, end_time, relationship_types, limit, cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/timeline/{entity_type}/{entity_id}/histogram", response_model=TimelineHistogram)
+async def get_timeline_histogram(
+    entity_type: str,
+    entity_id: str,
+    collapse_clusters: bool = False,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    interval: Optional[str] = Query(None, description="minute, hour or day; chosen from the window if omitted")
+):
+    """Event counts per relationship type over time, for rendering a timeline before loading its events."""
+    try:
+        return await temporal_service.get_timeline_histogram(
+            entity_id, entity_type, collapse_clusters, start_time, end_time, interval
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 # --- Geospatial ---
-@router.get("/geo/area")
+@router.get("/geo/area", response_model=List[GeoEntity])
 async def get_area_entities(
-    min_lat: float, max_lat: float, min_lon: float, max_lon: float
+    min_lat: float = Query(..., ge=-90, le=90),
+    max_lat: float = Query(..., ge=-90, le=90),
+    min_lon: float = Query(..., ge=-180, le=180),
+    max_lon: float = Query(..., ge=-180, le=180),
+    limit: int = Query(5000, ge=1, le=50000)
 ):
     """Find entities in a specific geographic area."""
-    return await geospatial_service.get_entities_in_area(min_lat, max_lat, min_lon, max_lon)
+    return await geospatial_service.get_entities_in_area(min_lat, max_lat, min_lon, max_lon, limit)
+
+@router.get("/geo/radius", response_model=List[GeoEntity])
+async def get_radius_entities(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius_m: float = Query(..., gt=0),
+    limit: int = Query(5000, ge=1, le=50000)
+):
+    """Find entities within a distance of a point, nearest first."""
+    return await geospatial_service.get_entities_within(lat, lon, radius_m, limit)
+
+@router.post("/geo/polygon", response_model=GeoPolygonResult)
+async def get_polygon_entities(request: GeoPolygonRequest):
+    """Find entities inside a polygon."""
+    try:
+        return await geospatial_service.get_entities_in_polygon(request.polygon, request.limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/geo/sightings/{entity_type}/{entity_id}")
 async def get_sightings(entity_type: str, entity_id: str):
     """Get location history for an entity."""
-    return await geospatial_service.get_entity_sightings(entity_id, entity_type)
+    try:
+        return await geospatial_service.get_entity_sightings(entity_id, entity_type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/geo/trajectory/{entity_type}/{entity_id}", response_model=Trajectory)
+async def get_trajectory(
+    entity_type: str,
+    entity_id: str,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    tolerance_m: Optional[float] = Query(None, gt=0, description="Douglas-Peucker tolerance in meters")
+):
+    """An entity's movement path from its sightings, optionally windowed and simplified."""
+    return await trajectories.get_trajectory(entity_type, entity_id, start_time, end_time, tolerance_m)
+
+@router.post("/geo/trajectory/rebuild")
+async def rebuild_trajectories():
+    """Recompute every trajectory from the SIGHTED_AT relationships."""
+    try:
+        return {"points": await trajectories.rebuild()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/geo/colocation/run")
+async def run_colocation():
+    """Recompute entity pairs repeatedly seen at the same place and time, replacing the stored ranking."""
+    try:
+        return await colocation_service.run()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/geo/colocation", response_model=List[CoLocation])
+async def list_colocations(
+    entity_type: Optional[str] = None,
+    entity_id: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """Co-located entity pairs, highest score first, optionally involving one entity."""
+    return await colocation_service.list_colocations(entity_type, entity_id, limit)
+
+@router.get("/geo/heatmap", response_model=Heatmap)
+async def get_heatmap(
+    min_lat: float = Query(..., ge=-90, le=90),
+    max_lat: float = Query(..., ge=-90, le=90),
+    min_lon: float = Query(..., ge=-180, le=180),
+    max_lon: float = Query(..., ge=-180, le=180),
+    resolution: int = Query(128, ge=1, le=512, description="Cells across the longer side of the box"),
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    layers: Optional[List[str]] = Query(None, description="SIGHTED_AT, CALL and/or PERSON_ATTENDED_EVENT; all by default"),
+    by_layer: bool = False
+):
+    """Gridded counts of sightings, calls by cell and event attendances, optionally per layer."""
+    try:
+        return await asyncio.to_thread(
+            heatmaps.heatmap, min_lat, max_lat, min_lon, max_lon, resolution, start_time, end_time, layers, by_layer
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/geo/clusters", response_model=List[MapCluster])
+async def get_map_clusters(
+    min_lat: float = Query(..., ge=-90, le=90),
+    max_lat: float = Query(..., ge=-90, le=90),
+    min_lon: float = Query(..., ge=-180, le=180),
+    max_lon: float = Query(..., ge=-180, le=180),
+    zoom: int = Query(..., ge=0, le=24),
+    limit: int = Query(2000, ge=1, le=20000)
+):
+    """
+    Marker clusters of located entities and sightings in the viewport at a
+    map zoom, largest first; past the deepest level the points themselves.
+    """
+    try:
+        return await asyncio.to_thread(map_clusters.clusters, min_lat, max_lat, min_lon, max_lon, zoom, limit)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+@router.get("/geo/clusters/{cluster_id}/expand", response_model=MapClusterExpansion)
+async def expand_map_cluster(cluster_id: int, limit: int = Query(2000, ge=1, le=20000)):
+    """The children of a cluster at the zoom where it splits, and that zoom."""
+    try:
+        return await asyncio.to_thread(map_clusters.expand, cluster_id, limit)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.get("/geo/clusters/stats")
+async def get_map_cluster_stats():
+    """Size and freshness of the map cluster hierarchy."""
+    return map_clusters.stats()
+
+@router.post("/geo/clusters/refresh")
+async def refresh_map_clusters(full: bool = False):
+    """Merge newly ingested points into the map clusters (or rebuild them with full=true)."""
+    try:
+        if full:
+            await asyncio.to_thread(map_clusters.load)
+        else:
+            await asyncio.to_thread(map_clusters.refresh)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return map_clusters.stats()
 
 # --- Communications ---
-@router.get("/comms/frequent/{phone_id}")
-async def get_top_contacts(phone_id: str, limit: int = 5):
+@router.post("/comms/network", response_model=CommNetworkData)
+async def get_comm_network(request: CommNetworkRequest, accept: Optional[str] = Header(None)):
+    """
+    Page through a phone's communication network (up to 3 hops), one aggregated
+    edge per phone pair. Supports compact encodings through the Accept header.
+    """
+    try:
+        graph = await communications_service.get_comm_network(request)
+        return graph_response(graph, accept)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/comms/frequent/{phone_id}", response_model=List[ContactSummary])
+async def get_top_contacts(
+    phone_id: str,
+    limit: int = Query(5, ge=1, le=500),
+    rank_by: str = Query("total", description="total, calls, messages or duration")
+):
     """Get most frequent communication contacts."""
-    return await communications_service.get_frequent_contacts(phone_id, limit)
+    try:
+        return await communications_service.get_frequent_contacts(phone_id, limit, rank_by)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/comms/contacts/{phone_id}/{contact_id}", response_model=PairContacts)
+async def get_pair_contacts(
+    phone_id: str,
+    contact_id: str,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None
+):
+    """Call and message totals between two phones, with contact volume per day."""
+    return await contact_matrix.pair_contacts(phone_id, contact_id, start_date, end_date)
+
+@router.post("/comms/contacts/rebuild")
+async def rebuild_contact_matrix():
+    """Recompute the contact matrix from every CALL and MESSAGE relationship."""
+    try:
+        return {"rows": await contact_matrix.rebuild()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
 # --- Financial ---
-@router.get("/finance/trace/{account_id}")
-async def trace_money(account_id: str, depth: int = 3):
-    """Trace money flow from an account."""
-    return await financial_service.trace_money_flow(account_id, depth)
+@router.get("/finance/trace/{account_id}", response_model=FlowGraphData)
+async def trace_money(
+    account_id: str,
+    depth: int = Query(3, ge=1, le=10),
+    dwell_hours: Optional[float] = Query(None, gt=0),
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    amount: Optional[float] = Query(None, gt=0),
+    min_amount: Optional[float] = Query(None, ge=0),
+    max_branches: Optional[int] = Query(None, ge=1),
+    accept: Optional[str] = Header(None)
+):
+    """
+    Trace money flow from an account through time-ordered transfers.
+    Responds 504 if the trace does not finish within its time budget.
+    """
+    try:
+        graph = await financial_service.trace_money_flow(
+            account_id, depth, dwell_hours, start_time, end_time, amount, min_amount, max_branches
+        )
+        return graph_response(graph, accept)
+    except TimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+
+@router.get("/finance/flow/{account_a}/{account_b}", response_model=AccountFlowSummary)
+async def get_flow_between(
+    account_a: str,
+    account_b: str,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None
+):
+    """Totals moved between two accounts in each direction (dates inclusive), from the rollups."""
+    try:
+        return await flow_rollups.flow_between(account_a, account_b, start_date, end_date)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/finance/flow-graph", response_model=GraphData)
+async def get_flow_graph(
+    account_ids: List[str] = Query(...),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    min_total: float = Query(0.0, ge=0),
+    limit: int = Query(200, ge=1, le=2000),
+    accept: Optional[str] = Header(None)
+):
+    """Aggregated counterparty flows around accounts, one edge per pair, from the rollups."""
+    try:
+        graph = await flow_rollups.flow_graph(account_ids, start_date, end_date, min_total, limit)
+        return graph_response(graph, accept)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/finance/rollups/rebuild")
+async def rebuild_flow_rollups():
+    """Recompute the transfer rollups from every TRANSFER relationship."""
+    try:
+        return {"buckets": await flow_rollups.rebuild()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/finance/patterns/run")
+async def run_pattern_detection(since: Optional[datetime] = None):
+    """Scan transfers for cycles, fan-in / fan-out and layering and store new findings."""
+    try:
+        return await pattern_detection.run(since)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/finance/findings", response_model=List[PatternFinding])
+async def list_pattern_findings(
+    pattern: Optional[FindingPattern] = None,
+    account_id: Optional[List[str]] = Query(None),
+    status: Optional[FindingStatus] = None,
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """Stored pattern findings, largest first, optionally touching given accounts."""
+    return await pattern_detection.list_findings(
+        pattern.value if pattern else None, account_id, status.value if status else None, limit
+    )
+
+@router.post("/finance/findings/{finding_id}/status")
+async def update_finding_status(finding_id: str, status: FindingStatus):
+    """Confirm, dismiss or reopen a finding."""
+    updated = await pattern_detection.update_status(finding_id, status.value)
+    if not updated:
+        raise HTTPException(status_code=404, detail="Finding not found")
+    return updated[0]
+
+# --- Sequences ---
+@router.post("/sequences/query", response_model=SequenceResult)
+async def query_sequence(query: SequenceQuery):
+    """Find occurrences of an ordered event sequence, e.g. a call, then a sighting, then a transfer."""
+    try:
+        return await sequence_detection.query(query)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/sequences/scan")
+async def scan_sequence(query: SequenceQuery):
+    """Scan the whole dataset for a named sequence and store its matches."""
+    try:
+        return await sequence_detection.scan(query)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/sequences/matches")
+async def list_sequence_matches(
+    name: Optional[str] = None,
+    entity_id: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """Stored matches of scanned sequences, optionally of one sequence or involving one entity."""
+    return await sequence_detection.list_matches(name, entity_id, limit)
+
+# --- Graph projection ---
+@router.get("/projection")
+async def get_projection_stats():
+    """Size and freshness of the in-memory graph projection."""
+    return graph_projection.stats()
+
+@router.post("/projection/refresh")
+async def refresh_projection(full: bool = False):
+    """Pull newly ingested relationships into the projection (or reload it with full=true)."""
+    try:
+        if full:
+            await asyncio.to_thread(graph_projection.load)
+        else:
+            await asyncio.to_thread(graph_projection.refresh)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return graph_projection.stats()
+
+# --- Centrality & communities ---
+@router.post("/centrality/run")
+async def run_centrality(full: bool = False):
+    """Recompute PageRank, degree, betweenness, components and communities, writing scores to nodes."""
+    try:
+        return await asyncio.to_thread(graph_analytics.run, full)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/centrality/status")
+async def get_centrality_status():
+    """Summary of the last centrality run."""
+    return graph_analytics.last_run or {"skipped": None, "message": "No run yet"}
+
+@router.get("/centrality/top")
+async def get_top_central(
+    metric: str = "pagerank",
+    entity_type: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=500)
+):
+    """Entities ranked by network importance."""
+    try:
+        return graph_analytics.top_entities(metric, entity_type, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
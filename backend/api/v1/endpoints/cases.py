@@ -1,9 +1,11 @@
 """
 Case Management endpoints.
 """
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List, Dict, Any
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Depends, Query
+from typing import List, Dict, Any, Optional
 from services.case_service import case_service
+from models.schemas import TimelinePage
 
 router = APIRouter()
 
@@ -48,3 +50,23 @@ async def add_entity(case_id: str, entry: Dict[str, Any]):
 async def get_case_entities(case_id: str):
     """Get all entities linked to a case."""
     return await case_service.get_case_entities(case_id)
+
+@router.get("/{case_id}/findings")
+async def get_case_findings(case_id: str):
+    """Get financial pattern findings involving the case's accounts."""
+    return await case_service.get_case_findings(case_id)
+
+@router.get("/{case_id}/timeline", response_model=TimelinePage)
+async def get_case_timeline(
+    case_id: str,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    relationship_types: Optional[List[str]] = Query(None),
+    limit: int = Query(200, ge=1, le=5000),
+    cursor: Optional[str] = None
+):
+    """Get one page of the chronological timeline of all entities in a case."""
+    try:
+        return await case_service.get_case_timeline(case_id, start_time, end_time, relationship_types, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
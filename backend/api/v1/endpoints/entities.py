@@ -1,13 +1,81 @@
 """
 Entity and Graph exploration endpoints.
 """
-from fastapi import APIRouter, HTTPException, Query
+from datetime import datetime
+from fastapi import APIRouter, Header, HTTPException, Query
 from typing import List, Optional
 from services.entity_service import entity_service
-from models.schemas import GraphData
+from services.graph_encoding import graph_response
+from models.schemas import (
+    EntityBatchRequest, EntityBatchResponse, GraphData, GraphDelta, GraphExpandRequest, NeighborRanking
+)
 
 router = APIRouter()
 
+@router.post("/batch", response_model=EntityBatchResponse)
+async def get_entities_batch(request: EntityBatchRequest):
+    """Hydrate many entities, of mixed types, in one request."""
+    return await entity_service.get_entities(request.entities)
+
+@router.post("/expand", response_model=GraphDelta)
+async def expand_graph(request: GraphExpandRequest, accept: Optional[str] = Header(None)):
+    """
+    Expand the graph from an entity with relationship type and time filters.
+    Elements the client reports as already known are left out of the response.
+    Supports compact encodings through the Accept header (see graph_encoding).
+    """
+    try:
+        graph = await entity_service.expand_neighbors(
+            request.entity_id,
+            request.entity_type,
+            depth=request.depth,
+            relationship_types=request.relationship_types,
+            start_date=request.start_date,
+            end_date=request.end_date,
+            max_neighbors=request.max_neighbors,
+            rank_by=request.rank_by,
+            collapse_clusters=request.collapse_clusters
+        )
+        delta = entity_service.subtract_known(
+            graph,
+            known_node_ids=request.known_node_ids,
+            known_edge_ids=request.known_edge_ids,
+            known_filter=request.known_filter
+        )
+        return graph_response(delta, accept)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/nodes/{node_id}/neighbors", response_model=GraphData)
+async def page_neighbors(
+    node_id: int,
+    relationship_type: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=1000),
+    rank_by: NeighborRanking = NeighborRanking.RECENT,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    known_edge_ids: Optional[List[str]] = Query(None),
+    accept: Optional[str] = Header(None)
+):
+    """
+    Page in neighbors hidden behind an aggregate node of a supernode.
+    Pass the rank_by and time window of the expansion that produced the
+    aggregate; edges in known_edge_ids are not sent again.
+    """
+    try:
+        graph = await entity_service.page_neighbors(
+            node_id, relationship_type, offset, limit, rank_by,
+            start_date=start_date, end_date=end_date, known_edge_ids=known_edge_ids
+        )
+        return graph_response(graph, accept)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/{entity_type}/{entity_id}")
 async def get_entity_details(entity_type: str, entity_id: str):
     """Get full details for a specific entity."""
@@ -20,10 +88,17 @@ async def get_entity_details(entity_type: str, entity_id: str):
 async def expand_entity(
     entity_type: str, 
     entity_id: str, 
-    depth: int = Query(1, ge=1, le=3)
+    depth: int = Query(1, ge=1, le=3),
+    collapse_clusters: bool = False,
+    accept: Optional[str] = Header(None)
 ):
     """Expand the graph from a specific entity."""
     try:
-        return await entity_service.expand_neighbors(entity_id, entity_type, depth)
+        graph = await entity_service.expand_neighbors(
+            entity_id, entity_type, depth, collapse_clusters=collapse_clusters
+        )
+        return graph_response(graph, accept)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
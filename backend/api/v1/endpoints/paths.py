@@ -0,0 +1,54 @@
+"""
+Path finding endpoints: connect two entities through the graph.
+"""
+from fastapi import APIRouter, Header, HTTPException, Query
+from typing import List, Optional
+from services.path_service import path_service
+from services.graph_encoding import graph_response
+from models.schemas import EntityRef, PathGraphData, PathRequest, PathWeighting
+
+router = APIRouter()
+
+@router.post("", response_model=PathGraphData)
+async def find_paths(request: PathRequest, accept: Optional[str] = Header(None)):
+    """
+    Find the shortest (or k shortest) paths between two entities.
+    Responds 504 if the search does not finish within its time budget.
+    """
+    try:
+        graph = await path_service.find_paths(request)
+        return graph_response(graph, accept)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except TimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/{source_type}/{source_id}/to/{target_type}/{target_id}", response_model=PathGraphData)
+async def find_paths_between(
+    source_type: str,
+    source_id: str,
+    target_type: str,
+    target_id: str,
+    relationship_types: Optional[List[str]] = Query(None),
+    max_hops: Optional[int] = Query(None, ge=1, le=10),
+    k: int = Query(1, ge=1, le=10),
+    weight_by: PathWeighting = PathWeighting.HOPS,
+    directed: bool = False,
+    accept: Optional[str] = Header(None)
+):
+    """Shortest paths between two entities, with the options as query parameters."""
+    try:
+        request = PathRequest(
+            source=EntityRef(entity_type=source_type, entity_id=source_id),
+            target=EntityRef(entity_type=target_type, entity_id=target_id),
+            relationship_types=relationship_types,
+            max_hops=max_hops,
+            k=k,
+            weight_by=weight_by,
+            directed=directed
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return await find_paths(request, accept)
@@ -0,0 +1,76 @@
+"""
+Entity resolution endpoints: duplicate suggestions and merges.
+"""
+import asyncio
+from fastapi import APIRouter, HTTPException, Query
+from typing import List, Optional
+from services.entity_resolution import entity_resolution_service
+from models.schemas import MergeSuggestion, ResolveRequest, UnmergeRequest
+
+router = APIRouter()
+
+@router.get("/suggestions", response_model=List[MergeSuggestion])
+async def get_merge_suggestions(
+    entity_type: str = "Person",
+    entity_id: Optional[str] = Query(None, description="Only suggestions involving this entity key"),
+    min_confidence: Optional[float] = Query(None, ge=0.0, le=1.0),
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """Pending duplicate candidates for an entity type, most confident first."""
+    try:
+        return await entity_resolution_service.suggest_merges(entity_type, min_confidence, entity_id, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/suggestions/{suggestion_id}/reject")
+async def reject_suggestion(suggestion_id: str):
+    """Dismiss a merge suggestion."""
+    await entity_resolution_service.reject_suggestion(suggestion_id)
+    return {"status": "rejected", "id": suggestion_id}
+
+@router.post("/incremental")
+async def run_incremental_resolution(entity_type: Optional[str] = None):
+    """Match records ingested since the last run and queue new suggestions."""
+    try:
+        if entity_type:
+            return [await entity_resolution_service.resolve_incremental(entity_type)]
+        return await entity_resolution_service.resolve_new_records()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/resolve")
+async def resolve_entities(request: ResolveRequest):
+    """Link duplicates to a primary entity with SAME_AS."""
+    try:
+        await entity_resolution_service.resolve_entities(
+            request.primary_id, request.duplicate_ids, request.entity_type
+        )
+        return {"status": "resolved", "primary_id": request.primary_id, "duplicates": request.duplicate_ids}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/unmerge")
+async def unmerge_entities(request: UnmergeRequest):
+    """Remove SAME_AS links and split the cluster; returns the new canonical id per former member."""
+    try:
+        return await entity_resolution_service.unmerge_entities(
+            request.entity_type, request.entity_id, request.other_ids
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/clusters/rebuild")
+async def rebuild_clusters(entity_type: str = "Person"):
+    """Recompute every canonical id of a type from its SAME_AS links."""
+    try:
+        return await asyncio.to_thread(entity_resolution_service.rebuild_clusters, entity_type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/{entity_type}/{entity_id}/cluster", response_model=List[str])
+async def get_resolved_cluster(entity_type: str, entity_id: str):
+    """All entity keys resolved into the same cluster."""
+    try:
+        return await entity_resolution_service.get_resolved_cluster(entity_id, entity_type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
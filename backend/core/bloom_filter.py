@@ -0,0 +1,73 @@
+"""
+Bloom filter used by clients to describe the graph elements they already hold.
+
+The layout is deliberately simple so browser clients can build the same filter:
+- k bit positions per item from FNV-1a double hashing over the UTF-8 id:
+  h1 = fnv1a(id, 0x811C9DC5), h2 = fnv1a(id, 0x01000193) | 1,
+  position_i = (h1 + i * h2) mod num_bits
+- bit j lives in byte j >> 3 at mask 1 << (j & 7)
+- the bit array travels base64-encoded
+"""
+import base64
+import math
+from typing import Iterable
+
+_FNV_PRIME = 0x01000193
+_SEED_1 = 0x811C9DC5
+_SEED_2 = 0x01000193
+
+
+def _fnv1a(data: bytes, seed: int) -> int:
+    """32-bit FNV-1a hash with a configurable offset basis."""
+    h = seed
+    for byte in data:
+        h ^= byte
+        h = (h * _FNV_PRIME) & 0xFFFFFFFF
+    return h
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over string ids."""
+
+    def __init__(self, num_bits: int, num_hashes: int, bits: bytearray = None):
+        if num_bits <= 0 or num_hashes <= 0:
+            raise ValueError("num_bits and num_hashes must be positive")
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.bits = bits if bits is not None else bytearray((num_bits + 7) // 8)
+        if len(self.bits) * 8 < num_bits:
+            raise ValueError("Bit array is shorter than num_bits")
+
+    @classmethod
+    def for_capacity(cls, capacity: int, false_positive_rate: float = 0.01) -> "BloomFilter":
+        """Size a filter for an expected number of items and false positive rate."""
+        capacity = max(capacity, 1)
+        num_bits = math.ceil(-capacity * math.log(false_positive_rate) / (math.log(2) ** 2))
+        num_hashes = max(1, round(num_bits / capacity * math.log(2)))
+        return cls(num_bits, num_hashes)
+
+    @classmethod
+    def from_base64(cls, encoded: str, num_bits: int, num_hashes: int) -> "BloomFilter":
+        """Rebuild a filter sent by a client."""
+        try:
+            bits = bytearray(base64.b64decode(encoded, validate=True))
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"Invalid bloom filter encoding: {e}")
+        return cls(num_bits, num_hashes, bits)
+
+    def to_base64(self) -> str:
+        return base64.b64encode(bytes(self.bits)).decode("ascii")
+
+    def _positions(self, item: str) -> Iterable[int]:
+        data = item.encode("utf-8")
+        h1 = _fnv1a(data, _SEED_1)
+        h2 = _fnv1a(data, _SEED_2) | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, item: str):
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
@@ -2,8 +2,9 @@
 Configuration management for Mini Gotham backend.
 Loads environment variables and provides centralized config access.
 """
+from pathlib import Path
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import List, Optional
 
 
 class Settings(BaseSettings):
@@ -25,9 +26,104 @@ class Settings(BaseSettings):
     supabase_anon_key: str
     supabase_service_role_key: str
     
+    # Ontology used to resolve entity key fields at runtime
+    ontology_path: str = str(
+        Path(__file__).resolve().parents[2] / "Data" / "mini_gotham_sample_dataset" / "ontology.yaml"
+    )
+    
     # Optional Mapbox (for later phases)
     mapbox_access_token: Optional[str] = None
     
+    # Graph exploration
+    graph_expand_max_neighbors: int = 50  # Per node and relationship type, before aggregating
+    path_max_hops: int = 6
+    path_timeout_ms: int = 800
+    
+    # Money flow tracing
+    flow_max_hops: int = 6
+    flow_max_dwell_hours: int = 72  # How long money may sit in an account before moving on
+    flow_min_amount: float = 1.0  # Attributed shares below this are not followed
+    flow_max_branches: int = 500  # Transfers followed per hop, largest shares first
+    flow_timeout_ms: int = 5000
+    
+    # In-memory graph projection (None = all labels / relationship types)
+    graph_projection_enabled: bool = False
+    graph_projection_labels: Optional[List[str]] = None
+    graph_projection_relationship_types: Optional[List[str]] = None
+    graph_projection_refresh_seconds: int = 300
+    
+    # Batch centrality / community job
+    graph_analytics_labels: Optional[List[str]] = ["Person", "Phone", "Account"]
+    graph_analytics_relationship_types: Optional[List[str]] = [
+        "PERSON_OWNS_PHONE", "PERSON_HOLDS_ACCOUNT", "CALL", "MESSAGE", "TRANSFER"
+    ]
+    graph_analytics_betweenness_samples: int = 32
+    graph_analytics_betweenness_budget_seconds: int = 300
+    graph_analytics_high_risk_percentile: float = 0.99
+    graph_analytics_med_risk_percentile: float = 0.90
+    
+    # Financial pattern detection
+    pattern_min_amount: float = 1000.0  # Smaller transfers are ignored by the cycle and layering detectors
+    pattern_amount_tolerance: float = 0.2  # Relative amount change allowed between consecutive hops
+    pattern_cycle_window_hours: int = 72
+    pattern_cycle_max_length: int = 6
+    pattern_layering_min_hops: int = 4
+    pattern_layering_max_dwell_hours: int = 48
+    pattern_fan_window_hours: int = 24
+    pattern_fan_min_counterparties: int = 10
+    pattern_fan_min_total: float = 10000.0
+    pattern_max_recent_transfers: int = 64  # Incoming transfers kept per account in the windowed adjacency
+    pattern_max_expansions: int = 256  # DFS steps per transfer when looking for cycles
+    
+    # Entity timelines
+    timeline_page_size: int = 200
+    timeline_max_buckets: int = 500  # Finest histogram interval (minute, hour, day) staying under this
+    case_timeline_concurrency: int = 8  # Entity timelines of a case read at once
+    
+    # Communication networks
+    comm_network_max_nodes: int = 5000  # Phones per network, strongest ties first
+    comm_network_cache_seconds: int = 300  # How long a computed network serves its pages
+    comm_network_cache_entries: int = 32
+    
+    # Spatial queries
+    geo_max_results: int = 5000
+    geo_max_candidates: int = 100_000  # Bounding-box candidates of a polygon query tested exactly
+    map_clusters_enabled: bool = False
+    map_cluster_max_zoom: int = 16  # Clusters per zoom 0..16; beyond it markers are individual points
+    map_cluster_refresh_seconds: int = 120
+    map_cluster_max_results: int = 2000
+    heatmap_max_resolution: int = 512  # Cells across the longer side of a heatmap
+    heatmap_cache_seconds: int = 300
+    heatmap_cache_entries: int = 256
+    
+    # Co-location detection
+    colocation_window_minutes: int = 15  # Observations this close at the same location count as together
+    colocation_min_episodes: int = 2  # Separate visits together before a pair is reported
+    colocation_partition_size: int = 5_000_000  # Observations loaded at once, grouped by location
+    colocation_max_neighbors: int = 50  # Followers paired with each observation at crowded locations
+    colocation_max_results: int = 100_000
+    
+    # Sequence detection
+    sequence_event_types: List[str] = ["CALL", "MESSAGE", "TRANSFER", "SIGHTED_AT"]
+    sequence_default_within_minutes: int = 60  # Window of a step that sets no within_minutes
+    sequence_max_partials: int = 5_000_000  # Candidate events joined per step and slice; more are dropped
+    sequence_chunk_events: int = 1_000_000  # First-step events per slice
+    sequence_max_results: int = 100_000  # Matches stored by one batch scan
+    sequence_cache_seconds: int = 600  # How long loaded event streams serve queries
+    
+    # Alerts
+    alert_scheduler_enabled: bool = False  # Opt in per deployment
+    alert_interval_seconds: int = 300
+    alert_concurrency: int = 4  # Alert queries evaluated at once
+    alert_query_timeout_seconds: float = 30.0
+    alert_max_matches: int = 10_000  # Rows read per alert and run
+    
+    # Entity resolution
+    resolution_min_confidence: float = 0.75
+    resolution_max_block_size: int = 200  # Larger blocks (common names, shared DOBs) are skipped
+    resolution_minhash_permutations: int = 32
+    resolution_lsh_bands: int = 8  # 8 bands x 4 rows: pairs above ~0.6 n-gram Jaccard usually collide
+    
     # Security
     jwt_algorithm: str = "HS256"
     access_token_expire_minutes: int = 60 * 24  # 24 hours
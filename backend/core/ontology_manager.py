@@ -115,7 +115,7 @@ class OntologySchema(BaseModel):
         
         # Check that only defined properties are present (allow extra fields for provenance)
         allowed_fields = set(obj_type.properties + [obj_type.key])
-        provenance_fields = {'_source', '_ingested_at', '_hash'}
+        provenance_fields = {'_source', '_ingested_at', '_hash', '_record_hash'}
         
         for field in data.keys():
             if field not in allowed_fields and field not in provenance_fields:
@@ -156,6 +156,18 @@ class OntologyManager:
         if not obj_type:
             raise ValueError(f"Unknown entity type: {entity_type}")
         return obj_type.get_node_label()
+    
+    @property
+    def is_loaded(self) -> bool:
+        """Whether an ontology has been loaded."""
+        return self._schema is not None
+    
+    def get_key_field(self, entity_type: str) -> str:
+        """Get the primary key property for an entity type."""
+        obj_type = self.schema.get_object_type(entity_type)
+        if not obj_type:
+            raise ValueError(f"Unknown entity type: {entity_type}")
+        return obj_type.key
 
 
 # Global ontology manager instance
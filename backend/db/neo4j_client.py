@@ -1,13 +1,25 @@
 """
 Neo4j database client for graph operations.
 """
-from neo4j import GraphDatabase, Driver
-from typing import Optional, Dict, List, Any
+from neo4j import GraphDatabase, Driver, Query
+from neo4j.exceptions import ClientError
+from typing import Optional, Dict, List, Any, Iterator
 from core.config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Status codes of a transaction that ran past its timeout (the second is Neo4j 5's)
+_TIMED_OUT_CODES = (
+    "Neo.ClientError.Transaction.TransactionTimedOut",
+    "Neo.ClientError.Transaction.TransactionTimedOutClientConfiguration",
+)
+
+
+def is_timeout(error: ClientError) -> bool:
+    """Whether a driver error is a transaction timeout."""
+    return error.code in _TIMED_OUT_CODES
+
 
 class Neo4jClient:
     """Neo4j database client wrapper."""
@@ -35,23 +47,72 @@ class Neo4jClient:
             self._driver.close()
             logger.info("Neo4j connection closed")
     
-    def execute_query(self, query: str, parameters: Dict[str, Any] = None) -> List[Dict]:
+    def execute_query(
+        self, query: str, parameters: Dict[str, Any] = None, timeout: Optional[float] = None
+    ) -> List[Dict]:
         """
         Execute a Cypher query and return results.
         
         Args:
             query: Cypher query string
             parameters: Query parameters
+            timeout: Server-side transaction timeout in seconds
             
         Returns:
             List of result records as dictionaries
+            
+        Raises:
+            TimeoutError: If the transaction exceeded the timeout
         """
         if not self._driver:
             raise RuntimeError("Neo4j driver not connected. Call connect() first.")
         
         with self._driver.session() as session:
-            result = session.run(query, parameters or {})
-            return [dict(record) for record in result]
+            try:
+                result = session.run(Query(query, timeout=timeout), parameters or {})
+                return [dict(record) for record in result]
+            except ClientError as e:
+                if is_timeout(e):
+                    raise TimeoutError(f"Query exceeded {timeout}s timeout") from e
+                raise
+    
+    def stream_query(
+        self,
+        query: str,
+        parameters: Dict[str, Any] = None,
+        fetch_size: int = 10000,
+        timeout: Optional[float] = None
+    ) -> Iterator[Dict]:
+        """
+        Execute a Cypher query and yield records as they arrive.
+        
+        Unlike execute_query, results are never materialized as a whole, so this
+        is the method to use for bulk reads (projections, batch analytics).
+        Closing the iterator early discards the rest of the result.
+        
+        Args:
+            query: Cypher query string
+            parameters: Query parameters
+            fetch_size: Number of records pulled from the server per batch
+            timeout: Server-side transaction timeout in seconds
+            
+        Yields:
+            Result records as dictionaries
+            
+        Raises:
+            TimeoutError: If the transaction exceeded the timeout
+        """
+        if not self._driver:
+            raise RuntimeError("Neo4j driver not connected. Call connect() first.")
+        
+        with self._driver.session(fetch_size=fetch_size) as session:
+            try:
+                for record in session.run(Query(query, timeout=timeout), parameters or {}):
+                    yield dict(record)
+            except ClientError as e:
+                if is_timeout(e):
+                    raise TimeoutError(f"Query exceeded {timeout}s timeout") from e
+                raise
     
     def execute_write(self, query: str, parameters: Dict[str, Any] = None) -> List[Dict]:
         """
@@ -5,11 +5,16 @@ Direct REST API access to Supabase.
 import httpx
 from core.config import settings
 import logging
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterable, List
 
 logger = logging.getLogger(__name__)
 
 
+def in_list(values: Iterable[str]) -> str:
+    """PostgREST in.() operand with quoted values."""
+    return "(" + ",".join('"' + v.replace('"', '\\"') + '"' for v in values) + ")"
+
+
 class SupabaseClient:
     """Lightweight Supabase client using direct REST API calls."""
     
@@ -60,6 +65,52 @@ class SupabaseClient:
         response.raise_for_status()
         return response.json()
     
+    async def upsert(
+        self, table: str, rows: List[Dict[str, Any]], on_conflict: str, ignore_duplicates: bool = False
+    ) -> None:
+        """Insert rows, merging (or skipping) those that conflict on the given columns."""
+        if not self._http_client:
+            raise RuntimeError("Supabase client not connected. Call connect() first.")
+        
+        resolution = "ignore-duplicates" if ignore_duplicates else "merge-duplicates"
+        response = await self._http_client.post(
+            f"/{table}",
+            params={"on_conflict": on_conflict},
+            json=rows,
+            headers={"Prefer": f"resolution={resolution},return=minimal"}
+        )
+        response.raise_for_status()
+    
+    async def update(self, table: str, filters: Dict[str, Any], data: Dict[str, Any]) -> List[Dict]:
+        """Update rows matching PostgREST filters."""
+        if not self._http_client:
+            raise RuntimeError("Supabase client not connected. Call connect() first.")
+        
+        response = await self._http_client.patch(f"/{table}", params=filters, json=data)
+        response.raise_for_status()
+        return response.json()
+    
+    async def delete(self, table: str, filters: Dict[str, Any]) -> None:
+        """Delete rows matching PostgREST filters."""
+        if not self._http_client:
+            raise RuntimeError("Supabase client not connected. Call connect() first.")
+        if not filters:
+            raise ValueError("Refusing to delete without filters")
+        
+        response = await self._http_client.delete(
+            f"/{table}", params=filters, headers={"Prefer": "return=minimal"}
+        )
+        response.raise_for_status()
+    
+    async def rpc(self, function: str, params: Dict[str, Any]) -> Any:
+        """Call a Postgres function exposed by PostgREST."""
+        if not self._http_client:
+            raise RuntimeError("Supabase client not connected. Call connect() first.")
+        
+        response = await self._http_client.post(f"/rpc/{function}", json=params)
+        response.raise_for_status()
+        return response.json() if response.content else None
+    
     def health_check(self) -> bool:
         """Check if Supabase connection is healthy."""
         try:
@@ -5,13 +5,19 @@ Mini Gotham backend server.
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
 import logging
 from datetime import datetime
+from pathlib import Path
 
 from core.config import settings
+from core.ontology_manager import ontology_manager
 from db.neo4j_client import neo4j_client
 from db.supabase_client import supabase_client
 from models.schemas import HealthStatus
+from services.graph_projection import graph_projection, run_projection_refresh
+from services.map_clusters import map_clusters, run_map_cluster_refresh
+from services.alert_service import alert_service, run_alert_scheduler
 
 # Configure logging
 logging.basicConfig(
@@ -31,6 +37,9 @@ async def lifespan(app: FastAPI):
     logger.info("Starting Mini Gotham backend...")
     logger.info(f"Environment: {settings.environment}")
     
+    # Load ontology (entity key fields are resolved from it)
+    ontology_manager.load_ontology(Path(settings.ontology_path))
+    
     # Connect to databases
     try:
         neo4j_client.connect()
@@ -40,10 +49,35 @@ async def lifespan(app: FastAPI):
         logger.error(f"Failed to connect to databases: {e}")
         raise
     
+    # Load the in-memory graph projection in the background
+    projection_task = None
+    if settings.graph_projection_enabled:
+        projection_task = asyncio.create_task(
+            run_projection_refresh(graph_projection, settings.graph_projection_refresh_seconds)
+        )
+    
+    # Build the map marker clusters in the background
+    map_cluster_task = None
+    if settings.map_clusters_enabled:
+        map_cluster_task = asyncio.create_task(
+            run_map_cluster_refresh(map_clusters, settings.map_cluster_refresh_seconds)
+        )
+    
+    # Evaluate persistent alerts on a schedule
+    alert_task = None
+    if settings.alert_scheduler_enabled:
+        alert_task = asyncio.create_task(run_alert_scheduler(alert_service, settings.alert_interval_seconds))
+    
     yield
     
     # Shutdown
     logger.info("Shutting down Mini Gotham backend...")
+    if projection_task:
+        projection_task.cancel()
+    if map_cluster_task:
+        map_cluster_task.cancel()
+    if alert_task:
+        alert_task.cancel()
     neo4j_client.close()
     logger.info("Cleanup completed")
 
@@ -3,7 +3,7 @@ Pydantic models for API requests and responses.
 """
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
-from datetime import datetime
+from datetime import date, datetime
 from enum import Enum
 
 
@@ -29,6 +29,18 @@ class RiskLevel(str, Enum):
     UNKNOWN = "UNKNOWN"
 
 
+class NeighborRanking(str, Enum):
+    """Ordering used to pick which neighbors of a high-degree node are returned."""
+    RECENT = "recent"
+    VOLUME = "volume"
+
+
+class PathWeighting(str, Enum):
+    """Edge cost used when searching for paths between entities."""
+    HOPS = "hops"      # Every relationship costs 1
+    VOLUME = "volume"  # Call duration / transfer amount make cheaper links
+
+
 class DataClassification(str, Enum):
     """Data classification levels."""
     PUBLIC = "PUBLIC"
@@ -59,6 +71,23 @@ class Entity(EntityBase):
     hash: Optional[str] = None
 
 
+class EntityRef(BaseModel):
+    """Reference to a single entity by type and business key."""
+    entity_type: str
+    entity_id: str
+
+
+class EntityBatchRequest(BaseModel):
+    """Request to hydrate several entities, possibly of mixed types, at once."""
+    entities: List[EntityRef] = Field(..., min_length=1, max_length=1000)
+
+
+class EntityBatchResponse(BaseModel):
+    """Hydrated entities keyed by id, plus the references that were not found."""
+    entities: Dict[str, Dict[str, Any]] = Field(default_factory=dict)
+    missing: List[EntityRef] = Field(default_factory=list)
+
+
 class Relationship(BaseModel):
     """Relationship between entities."""
     relationship_id: Optional[str] = None
@@ -97,6 +126,7 @@ class GraphNode(BaseModel):
     type: str
     properties: Dict[str, Any] = Field(default_factory=dict)
     risk_level: Optional[RiskLevel] = None
+    degrees: Optional[Dict[str, int]] = None  # Precomputed relationship counts per type
 
 
 class GraphEdge(BaseModel):
@@ -115,6 +145,19 @@ class GraphData(BaseModel):
     edges: List[GraphEdge]
 
 
+class GraphDelta(GraphData):
+    """Graph elements the client does not hold yet, plus how many were withheld."""
+    skipped_nodes: int = 0
+    skipped_edges: int = 0
+
+
+class KnownElementsFilter(BaseModel):
+    """Bloom filter over node and edge ids already held by the client."""
+    bits: str = Field(..., description="Base64-encoded bit array")
+    num_bits: int = Field(..., gt=0)
+    num_hashes: int = Field(..., gt=0, le=32)
+
+
 class GraphExpandRequest(BaseModel):
     """Request to expand graph from entity."""
     entity_id: str
@@ -123,6 +166,388 @@ class GraphExpandRequest(BaseModel):
     depth: int = Field(default=1, ge=1, le=3)
     start_date: Optional[datetime] = None
     end_date: Optional[datetime] = None
+    max_neighbors: Optional[int] = Field(default=None, ge=1, le=1000)
+    rank_by: NeighborRanking = NeighborRanking.RECENT
+    collapse_clusters: bool = False  # Show each resolved cluster as its canonical node
+    known_node_ids: List[str] = Field(default_factory=list)
+    known_edge_ids: List[str] = Field(default_factory=list)
+    known_filter: Optional[KnownElementsFilter] = None
+
+
+class PathRequest(BaseModel):
+    """Request for the shortest (or k shortest) paths between two entities."""
+    source: EntityRef
+    target: EntityRef
+    relationship_types: Optional[List[str]] = None
+    max_hops: Optional[int] = Field(default=None, ge=1, le=10)
+    k: int = Field(default=1, ge=1, le=10)
+    weight_by: PathWeighting = PathWeighting.HOPS
+    directed: bool = False
+    timeout_ms: Optional[int] = Field(default=None, ge=10, le=30000)
+
+
+class GraphPath(BaseModel):
+    """One path, as ordered GraphNode / GraphEdge ids."""
+    node_ids: List[str]
+    edge_ids: List[str]
+    cost: float
+    hops: int
+
+
+class PathGraphData(GraphData):
+    """Union of the elements of all found paths, plus each path in order."""
+    paths: List[GraphPath] = Field(default_factory=list)
+
+
+class FlowAccount(BaseModel):
+    """Money attributed to one account while tracing a flow."""
+    id: str  # GraphNode id
+    account_id: Optional[str] = None
+    hop: int  # Hop at which traced money first reached the account
+    received: float
+    forwarded: float
+    retained: float
+
+
+class FlowTransfer(BaseModel):
+    """Share of one transfer attributed to the traced money."""
+    id: str  # GraphEdge id
+    source: str
+    target: str
+    hop: int
+    amount: float
+    traced_amount: float
+
+
+class FlowGraphData(GraphData):
+    """Subgraph reached by a money flow trace, with per-account and per-transfer attribution."""
+    source: Optional[str] = None
+    traced_total: float = 0.0
+    accounts: List[FlowAccount] = Field(default_factory=list)
+    transfers: List[FlowTransfer] = Field(default_factory=list)
+    truncated: int = 0  # Transfers dropped by the per-hop branch limit
+
+
+class PairFlow(BaseModel):
+    """Transfer totals from one account to another over a date range."""
+    from_account: str
+    to_account: str
+    transfer_count: int
+    total_usd: float
+    min_usd: Optional[float] = None
+    max_usd: Optional[float] = None
+    first_at: Optional[datetime] = None
+    last_at: Optional[datetime] = None
+
+
+class AccountFlowSummary(BaseModel):
+    """Money moved between two accounts, in each direction."""
+    account_a: str
+    account_b: str
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    a_to_b: Optional[PairFlow] = None
+    b_to_a: Optional[PairFlow] = None
+    net_usd: float = 0.0  # a_to_b minus b_to_a
+
+
+class FindingPattern(str, Enum):
+    """Financial patterns reported by the detectors."""
+    CYCLE = "CYCLE"
+    FAN_IN = "FAN_IN"
+    FAN_OUT = "FAN_OUT"
+    LAYERING = "LAYERING"
+
+
+class FindingStatus(str, Enum):
+    """Review state of a pattern finding."""
+    OPEN = "OPEN"
+    CONFIRMED = "CONFIRMED"
+    DISMISSED = "DISMISSED"
+
+
+class PatternFinding(BaseModel):
+    """A detected financial pattern and the transfers it consists of."""
+    id: Optional[str] = None
+    pattern: FindingPattern
+    account_ids: List[str]
+    transaction_ids: List[str]
+    start_at: datetime
+    end_at: datetime
+    transfer_count: int
+    total_usd: float
+    details: Dict[str, Any] = Field(default_factory=dict)
+    status: FindingStatus = FindingStatus.OPEN
+    created_at: Optional[datetime] = None
+
+
+class TimelineEvent(BaseModel):
+    """A dated relationship of an entity, or its link to a dated entity."""
+    timestamp: datetime
+    type: str  # Relationship type
+    rel_id: str
+    record_id: Optional[str] = None  # Record of the cluster the event belongs to
+    other_id: str
+    other_type: Optional[str] = None
+    description: str
+    details: Dict[str, Any] = Field(default_factory=dict)
+
+
+class TimelinePage(BaseModel):
+    """Events of an entity timeline in time order, one page at a time."""
+    events: List[TimelineEvent] = Field(default_factory=list)
+    next_cursor: Optional[str] = None
+
+
+class TimelineBucket(BaseModel):
+    """Events per relationship type in one histogram bucket."""
+    start: datetime
+    counts: Dict[str, int] = Field(default_factory=dict)
+    total: int = 0
+
+
+class TimelineHistogram(BaseModel):
+    """Event counts of an entity timeline per time bucket; empty buckets are omitted."""
+    interval: str  # minute, hour or day
+    bucket_seconds: int = 86400
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
+    buckets: List[TimelineBucket] = Field(default_factory=list)
+    total: int = 0
+
+
+class ContactSummary(BaseModel):
+    """Communication volume between a phone and one of its contacts."""
+    phone_id: str
+    contact_id: str
+    msisdn: Optional[str] = None  # Of the contact
+    calls_out: int = 0
+    calls_in: int = 0
+    messages_out: int = 0
+    messages_in: int = 0
+    calls: int = 0
+    messages: int = 0
+    total: int = 0
+    call_seconds: float = 0.0
+    first_at: Optional[datetime] = None
+    last_at: Optional[datetime] = None
+    hour_histogram: List[int] = Field(default_factory=list)  # Contacts per hour of day
+    weekday_histogram: List[int] = Field(default_factory=list)  # Contacts per weekday, Monday first
+
+
+class DailyContacts(BaseModel):
+    """Calls and messages between a phone pair on one UTC day."""
+    day: date
+    calls: int = 0
+    messages: int = 0
+    call_seconds: float = 0.0
+
+
+class PairContacts(BaseModel):
+    """Totals between two phones plus their contact volume per day."""
+    summary: Optional[ContactSummary] = None
+    daily: List[DailyContacts] = Field(default_factory=list)
+
+
+class CommHopFilter(BaseModel):
+    """Which contacts one hop of a communication network adds."""
+    min_volume: int = Field(default=1, ge=1)  # Calls + messages with the previous hop's phones
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
+
+
+class CommNetworkRequest(BaseModel):
+    """A phone's communication network, one filter per hop, fetched page by page."""
+    phone_id: str
+    hops: List[CommHopFilter] = Field(default_factory=lambda: [CommHopFilter()], min_length=1, max_length=3)
+    page_size: int = Field(default=200, ge=1, le=2000)
+    cursor: Optional[str] = None  # next_cursor of the previous page
+
+
+class CommNetworkData(GraphData):
+    """One page of a communication network; edges aggregate all traffic of a phone pair."""
+    hops: Dict[str, int] = Field(default_factory=dict)  # Hop of each node on this page
+    total_nodes: int = 0
+    total_edges: int = 0
+    truncated: int = 0  # Contacts left out by comm_network_max_nodes
+    next_cursor: Optional[str] = None
+
+
+class GeoEntity(BaseModel):
+    """A located entity returned by an area, radius or polygon query."""
+    id: str
+    type: str
+    lat: float
+    lon: float
+    distance_m: Optional[float] = None  # From the center of a radius query
+    properties: Dict[str, Any] = Field(default_factory=dict)
+
+
+class TrajectoryPoint(BaseModel):
+    """One sighting on an entity's movement path."""
+    timestamp: datetime
+    lat: float
+    lon: float
+    sighting_id: str
+    location_id: Optional[str] = None
+    source: Optional[str] = None  # ANPR, CCTV, ...
+
+
+class Trajectory(BaseModel):
+    """An entity's sightings in time order, optionally simplified."""
+    entity_type: str
+    entity_id: str
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
+    tolerance_m: Optional[float] = None  # Douglas-Peucker tolerance; None when unsimplified
+    total_points: int  # Sightings in the window before simplification
+    points: List[TrajectoryPoint] = Field(default_factory=list)
+
+
+class Heatmap(BaseModel):
+    """Observation counts on a grid over a box, row 0 along its northern edge."""
+    min_lat: float
+    max_lat: float
+    min_lon: float
+    max_lon: float
+    rows: int
+    cols: int
+    cell_lat: float  # Cell size in degrees
+    cell_lon: float
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
+    total: int
+    max_count: int
+    counts: List[List[int]]  # rows x cols, summed over layers
+    layers: Dict[str, List[List[int]]] = Field(default_factory=dict)  # Per relationship type, when requested
+
+
+class GeoPolygonRequest(BaseModel):
+    """A polygon as [lat, lon] vertices, closed implicitly."""
+    polygon: List[List[float]] = Field(min_length=3)
+    limit: int = Field(default=5000, ge=1, le=50000)
+
+
+class GeoPolygonResult(BaseModel):
+    """Entities inside a polygon."""
+    entities: List[GeoEntity] = Field(default_factory=list)
+    truncated: bool = False  # More may exist (limit or geo_max_candidates reached)
+
+
+class MapCluster(BaseModel):
+    """A map marker: a cluster of points, or a single located entity or sighting."""
+    id: Optional[int] = None  # Cluster id for expansion; None for points listed individually
+    lat: float
+    lon: float
+    count: int
+    entities: int = 0  # Located entities among the points
+    sightings: int = 0
+    kind: Optional[str] = None  # Single points: entity or sighting
+    entity_type: Optional[str] = None  # Single points: the located or sighted entity
+    entity_id: Optional[str] = None
+    rel_id: Optional[str] = None  # Single sightings: the SIGHTED_AT relationship
+
+
+class MapClusterExpansion(BaseModel):
+    """The children of a cluster at the first zoom where it splits."""
+    zoom: int
+    clusters: List[MapCluster] = Field(default_factory=list)
+
+
+class CoLocation(BaseModel):
+    """Two entities repeatedly observed at the same place at the same time."""
+    entity_a_type: str
+    entity_a_id: str
+    entity_b_type: str
+    entity_b_id: str
+    episodes: int  # Separate visits together
+    locations: int  # Distinct locations of those visits
+    score: float  # Visits weighted by location rarity
+    first_at: datetime
+    last_at: datetime
+    top_location_id: Optional[str] = None  # Where they were together most often
+
+
+class SequenceStep(BaseModel):
+    """One event of a sequence pattern; variables name the parties taking part."""
+    event: str  # CALL, MESSAGE, TRANSFER or SIGHTED_AT
+    source: Optional[str] = None  # Variable for the party the event comes from
+    target: Optional[str] = None  # Variable for the party it goes to (the location of a sighting)
+    undirected: bool = False  # Source and target may match either way round ("call between A and B")
+    source_type: Optional[str] = None  # Label of the source entity itself, e.g. Vehicle
+    within_minutes: Optional[int] = Field(default=None, ge=1)  # After the previous step
+    near_km: Optional[float] = Field(default=None, gt=0)  # Target location this close to the one bound to `target`
+    min_amount: Optional[float] = None  # TRANSFER amount_usd
+
+
+class SequenceEntity(BaseModel):
+    """An entity bound to a sequence variable."""
+    entity_type: str
+    entity_id: str
+
+
+class SequenceQuery(BaseModel):
+    """A sequence pattern: steps in time order, each within its window of the previous one."""
+    name: Optional[str] = None  # Required for batch scans; stored with the matches
+    steps: List[SequenceStep] = Field(min_length=1, max_length=8)
+    bindings: Dict[str, SequenceEntity] = Field(default_factory=dict)  # Variables fixed in advance
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
+    limit: int = Field(default=100, ge=1, le=10000)
+
+
+class SequenceMatchEvent(BaseModel):
+    """The event matched by one step."""
+    step: int
+    type: str
+    rel_id: str
+    timestamp: datetime
+    source_type: Optional[str] = None
+    source_id: Optional[str] = None
+    target_type: Optional[str] = None
+    target_id: Optional[str] = None
+    amount: Optional[float] = None
+
+
+class SequenceMatch(BaseModel):
+    """One occurrence of a sequence pattern."""
+    bindings: Dict[str, SequenceEntity] = Field(default_factory=dict)
+    events: List[SequenceMatchEvent] = Field(default_factory=list)
+    start_at: datetime
+    end_at: datetime
+
+
+class SequenceResult(BaseModel):
+    """Matches of an ad-hoc sequence query in order of their first event."""
+    matches: List[SequenceMatch] = Field(default_factory=list)
+    truncated: bool = False  # More matches may exist (limit or sequence_max_partials reached)
+
+
+# ===== Entity Resolution Models =====
+
+class MergeSuggestion(BaseModel):
+    """Candidate duplicate pair with its match confidence."""
+    id: Optional[str] = None
+    type: str
+    entities: List[str]
+    confidence: float = Field(ge=0.0, le=1.0)
+    reason: str
+    scores: Dict[str, float] = Field(default_factory=dict)
+    preview: str
+
+
+class ResolveRequest(BaseModel):
+    """Link duplicates to a primary entity."""
+    entity_type: str
+    primary_id: str
+    duplicate_ids: List[str] = Field(..., min_length=1)
+
+
+class UnmergeRequest(BaseModel):
+    """Split an entity out of its resolved cluster (or only away from other_ids)."""
+    entity_type: str
+    entity_id: str
+    other_ids: Optional[List[str]] = None
 
 
 # ===== Case Management Models =====
@@ -0,0 +1,130 @@
+"""
+Benchmark for GraphData response encodings.
+Compares payload size and encode time of the response_model JSON path against
+direct serialization, columnar JSON and MessagePack on a synthetic graph.
+Every case includes building the GraphNode/GraphEdge objects.
+
+Usage: python scripts/bench_graph_encoding.py [num_nodes]
+"""
+import sys
+import os
+import json
+import random
+import time
+import logging
+
+# Add backend to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.dirname(current_dir)
+sys.path.append(backend_dir)
+
+from pydantic import TypeAdapter
+
+from models.schemas import GraphData, GraphNode, GraphEdge
+from services import graph_encoding
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+NODE_TYPES = ["Person", "Phone", "Account", "Location", "Vehicle"]
+EDGE_TYPES = ["CALL", "MESSAGE", "TRANSFER", "PERSON_OWNS_PHONE"]
+
+
+def synthetic_records(num_nodes: int, edges_per_node: int = 3):
+    """Raw node/edge dicts shaped like the records EntityService converts."""
+    rng = random.Random(42)
+    nodes = []
+    for i in range(num_nodes):
+        node_type = NODE_TYPES[i % len(NODE_TYPES)]
+        nodes.append({
+            "id": str(i),
+            "label": f"{node_type} {i}",
+            "type": node_type,
+            "properties": {
+                f"{node_type.lower()}_id": f"{node_type[:2].upper()}{i:06d}",
+                "country": rng.choice(["SO", "KE", "ET"]),
+                "_source": f"{node_type.lower()}s.csv",
+                "_hash": "9f2c0e4b7d1a3c5e8f6b2d4a1c3e5f7b9d2c4e6a8b0d1f3e5c7a9b2d4f6e8a0c",
+                "_ingested_at": "2025-10-21T09:00:00",
+                "_degree": 3,
+            },
+            "degrees": {"CALL": 2, "MESSAGE": 1},
+        })
+    edges = []
+    for i in range(num_nodes * edges_per_node):
+        edges.append({
+            "id": str(num_nodes + i),
+            "source": str(rng.randrange(num_nodes)),
+            "target": str(rng.randrange(num_nodes)),
+            "type": rng.choice(EDGE_TYPES),
+            "properties": {
+                "timestamp": "2025-10-21T09:05:12+03:00",
+                "duration_sec": str(rng.randrange(600)),
+                "cell_location_id": f"L{rng.randrange(100):03d}",
+            },
+        })
+    return nodes, edges
+
+
+def timed(fn, repeat: int = 5):
+    """Best-of-N wall time in milliseconds, plus the last result."""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def main():
+    num_nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    nodes, edges = synthetic_records(num_nodes)
+    logger.info(f"Synthetic graph: {len(nodes)} nodes, {len(edges)} edges\n")
+
+    adapter = TypeAdapter(GraphData)
+
+    def constructed():
+        return GraphData(
+            nodes=[GraphNode(**n) for n in nodes],
+            edges=[GraphEdge(**e) for e in edges]
+        )
+
+    def response_model_json():
+        # Previous path: FastAPI re-validates against response_model, then jsonable-encodes
+        checked = adapter.validate_python(constructed())
+        return json.dumps(adapter.dump_python(checked, mode="json")).encode()
+
+    def direct_json():
+        return graph_encoding.graph_response(constructed()).body
+
+    def columnar_json():
+        return graph_encoding.graph_response(constructed(), graph_encoding.COLUMNAR_MEDIA_TYPE).body
+
+    def msgpack_columnar():
+        return graph_encoding.graph_response(constructed(), graph_encoding.MSGPACK_MEDIA_TYPE).body
+
+    cases = [
+        ("response_model JSON (prev)", response_model_json),
+        ("direct JSON", direct_json),
+        ("columnar JSON", columnar_json),
+    ]
+    if graph_encoding.msgpack is not None:
+        cases.append(("columnar MessagePack", msgpack_columnar))
+    else:
+        logger.info("msgpack not installed, skipping MessagePack\n")
+
+    baseline_ms = baseline_bytes = None
+    logger.info(f"{'encoding':<28}{'bytes':>12}{'ms':>10}{'size':>8}{'time':>8}")
+    for name, fn in cases:
+        ms, body = timed(fn)
+        if baseline_ms is None:
+            baseline_ms, baseline_bytes = ms, len(body)
+        logger.info(
+            f"{name:<28}{len(body):>12,}{ms:>10.1f}"
+            f"{len(body) / baseline_bytes:>8.2f}{ms / baseline_ms:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
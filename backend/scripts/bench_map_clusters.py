@@ -0,0 +1,101 @@
+"""
+Benchmark for the map cluster hierarchy.
+Generates synthetic located points (dense city clusters over a uniform
+background), builds the hierarchy without Neo4j, times viewport queries of
+a 1024x768 map at several zooms and an incremental merge of new points.
+
+Usage: python scripts/bench_map_clusters.py [num_points] [num_cities] [added_points]
+"""
+import sys
+import os
+import time
+import logging
+
+# Add backend to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.dirname(current_dir)
+sys.path.append(backend_dir)
+
+import numpy as np
+
+from core.config import settings
+from services.map_clusters import ClusterIndex, project, unproject
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+VIEW_WIDTH, VIEW_HEIGHT, TILE = 1024, 768, 256
+QUERIES = 200
+
+
+def build(num_points: int, num_cities: int, rng: np.random.Generator, first_item: int = 0):
+    """Four fifths of the points around power-law sized cities, the rest uniform; a third are entities."""
+    city_lat = rng.uniform(-55, 65, num_cities)
+    city_lon = rng.uniform(-180, 180, num_cities)
+    weight = 1.0 / np.arange(1, num_cities + 1)
+    in_city = num_points * 4 // 5
+    city = rng.choice(num_cities, in_city, p=weight / weight.sum())
+    lat = np.r_[city_lat[city] + rng.normal(0, 0.05, in_city), rng.uniform(-80, 80, num_points - in_city)]
+    lon = np.r_[city_lon[city] + rng.normal(0, 0.05, in_city), rng.uniform(-180, 180, num_points - in_city)]
+    lon = (lon + 180) % 360 - 180
+    kind = (rng.random(num_points) < 2 / 3).astype(np.uint8)
+    node = rng.integers(0, max(num_points // 10, 1), num_points)
+    item = np.arange(first_item, first_item + num_points)
+    return lat, lon, kind, node, item
+
+
+def viewports(zoom: int, lat: np.ndarray, lon: np.ndarray, rng: np.random.Generator):
+    """Screen-sized viewports centred on random points, as a user panning over the data would see."""
+    world = TILE * 2 ** zoom
+    half_w, half_h = min(VIEW_WIDTH / world, 1.0) / 2, min(VIEW_HEIGHT / world, 1.0) / 2
+    centres = rng.integers(0, len(lat), QUERIES)
+    x, y = project(lat[centres], lon[centres])
+    top, left = unproject(x - half_w, np.clip(y - half_h, 0, 1))
+    bottom, right = unproject(x + half_w, np.clip(y + half_h, 0, 1))
+    left, right = (left + 180) % 360 - 180, (right + 180) % 360 - 180
+    if half_w >= 0.5:
+        left, right = np.full(QUERIES, -180.0), np.full(QUERIES, 180.0)
+    return zip(bottom.tolist(), top.tolist(), left.tolist(), right.tolist())
+
+
+def main():
+    num_points = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000_000
+    num_cities = int(sys.argv[2]) if len(sys.argv) > 2 else 2_000
+    added = int(sys.argv[3]) if len(sys.argv) > 3 else 50_000
+    max_zoom = settings.map_cluster_max_zoom
+    rng = np.random.default_rng(7)
+
+    lat, lon, kind, node, item = build(num_points, num_cities, rng)
+    start_time = time.perf_counter()
+    index = ClusterIndex.build(max_zoom, lat, lon, kind, node, item)
+    elapsed = time.perf_counter() - start_time
+    clusters = sum(len(level.keys) for level in index.levels)
+    logger.info(f"Built {max_zoom + 1} levels ({clusters:,} clusters) over {num_points:,} points in {elapsed:.2f}s")
+
+    for zoom in (0, 3, 6, 9, 12, max_zoom, max_zoom + 2):
+        level_zoom = min(zoom, max_zoom)
+        level = index.levels[level_zoom]
+        timings, returned = [], []
+        for box in viewports(zoom, lat, lon, rng):
+            start_time = time.perf_counter()
+            pos = index.cells_in_view(level_zoom, *box)
+            if zoom > max_zoom:
+                start, end = index.point_range(level_zoom, level.keys[pos])
+                returned.append(int((end - start).sum()))
+            else:
+                pos = pos[np.argsort(-level.count[pos], kind="stable")][:settings.map_cluster_max_results]
+                returned.append(len(pos))
+            timings.append(time.perf_counter() - start_time)
+        timings = np.array(timings) * 1000
+        logger.info(f"zoom {zoom:2d}: {np.median(returned):8,.0f} clusters/points per view, "
+                    f"p50 {np.percentile(timings, 50):.2f}ms, p99 {np.percentile(timings, 99):.2f}ms")
+
+    columns = build(added, num_cities, rng, first_item=num_points)
+    start_time = time.perf_counter()
+    index = index.add(*columns)
+    elapsed = time.perf_counter() - start_time
+    logger.info(f"Merged {added:,} new points in {elapsed:.2f}s ({len(index):,} points in the index)")
+
+
+if __name__ == "__main__":
+    main()
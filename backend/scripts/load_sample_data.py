@@ -3,6 +3,7 @@ Script to load the sample data into the Mini Gotham graph.
 """
 import sys
 import os
+import asyncio
 from pathlib import Path
 import logging
 
@@ -12,12 +13,29 @@ parent_dir = os.path.dirname(current_dir)
 sys.path.append(parent_dir)
 
 from services.data_ingestion import run_ingestion
+from services.entity_resolution import entity_resolution_service
+from services.contact_matrix import contact_matrix
+from services.flow_rollups import flow_rollups
+from services.trajectories import trajectories
 from db.neo4j_client import neo4j_client
+from db.supabase_client import supabase_client
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+async def update_derived_data(ingestor):
+    """Bring Supabase-side aggregates and indexes up to date with what was just ingested."""
+    # Add the transfers, calls and messages created by this run to the aggregates
+    await flow_rollups.apply(ingestor.transfer_rollups)
+    await contact_matrix.apply(ingestor.contact_deltas)
+    
+    # Merge the sightings written by this run into the entity trajectories
+    await trajectories.apply(ingestor.sighting_tracks)
+    
+    # Match new and changed records against the entity resolution index
+    await entity_resolution_service.resolve_new_records()
+
 def main():
     # Set up paths
     data_path = Path(parent_dir).parent / "Data" / "mini_gotham_sample_dataset"
@@ -31,7 +49,10 @@ def main():
         neo4j_client.connect()
         
         # Run ingestion
-        run_ingestion(str(data_path))
+        ingestor = run_ingestion(str(data_path))
+        
+        supabase_client.connect()
+        asyncio.run(update_derived_data(ingestor))
         
     except Exception as e:
         logger.error(f"An error occurred during loading: {e}")
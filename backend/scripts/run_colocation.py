@@ -0,0 +1,41 @@
+"""
+Script to recompute co-located entity pairs (phones, vehicles and persons
+repeatedly observed at the same place and time) and store the ranking in
+Supabase.
+
+Usage: python scripts/run_colocation.py
+"""
+import sys
+import os
+import asyncio
+import logging
+
+# Add the current directory to sys.path to import local modules
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from services.colocation_service import colocation_service
+from db.neo4j_client import neo4j_client
+from db.supabase_client import supabase_client
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def main():
+    try:
+        neo4j_client.connect()
+        supabase_client.connect()
+        summary = asyncio.run(colocation_service.run())
+        logger.info(
+            f"{summary['pairs']:,} co-located pairs in "
+            f"{summary['detect_seconds'] + summary['store_seconds']:.1f}s"
+        )
+    except Exception as e:
+        logger.error(f"Co-location run failed: {e}")
+    finally:
+        neo4j_client.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""
+Script to run the centrality and community detection job against Neo4j.
+
+Usage: python scripts/run_graph_analytics.py [--full]
+"""
+import sys
+import os
+import logging
+
+# Add the current directory to sys.path to import local modules
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from services.graph_analytics import graph_analytics
+from db.neo4j_client import neo4j_client
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def main():
+    try:
+        neo4j_client.connect()
+        summary = graph_analytics.run(full="--full" in sys.argv)
+        logger.info(
+            f"{summary['nodes']:,} nodes, {summary['edges']:,} edges, "
+            f"{summary['components']:,} components, {summary['communities']:,} communities, "
+            f"{summary['nodes_written']:,} nodes written in {summary['duration_seconds']:.1f}s"
+        )
+    except Exception as e:
+        logger.error(f"Graph analytics run failed: {e}")
+    finally:
+        neo4j_client.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Script to scan TRANSFER relationships for financial patterns (cycles,
+fan-in / fan-out, layering) and store new findings in Supabase.
+
+Usage: python scripts/run_pattern_detection.py [since ISO timestamp]
+"""
+import sys
+import os
+import asyncio
+import logging
+from datetime import datetime
+
+# Add the current directory to sys.path to import local modules
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from services.pattern_detection import pattern_detection
+from db.neo4j_client import neo4j_client
+from db.supabase_client import supabase_client
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def main():
+    since = datetime.fromisoformat(sys.argv[1]) if len(sys.argv) > 1 else None
+    try:
+        neo4j_client.connect()
+        supabase_client.connect()
+        summary = asyncio.run(pattern_detection.run(since))
+        logger.info(
+            f"{summary['transfers']:,} transfers over {summary['accounts']:,} accounts: "
+            f"{summary['findings']} in {summary['load_seconds'] + summary['detect_seconds']:.1f}s"
+        )
+    except Exception as e:
+        logger.error(f"Pattern detection run failed: {e}")
+    finally:
+        neo4j_client.close()
+
+if __name__ == "__main__":
+    main()
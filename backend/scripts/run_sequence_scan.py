@@ -0,0 +1,57 @@
+"""
+Script to scan the whole dataset for a named event sequence and store its
+matches in Supabase. The sequence is a JSON file holding a SequenceQuery,
+for example:
+
+    {
+      "name": "call-sighting-transfer",
+      "steps": [
+        {"event": "CALL", "source": "A", "target": "B", "undirected": true},
+        {"event": "SIGHTED_AT", "source": "A", "target": "L", "source_type": "Vehicle",
+         "near_km": 1.0, "within_minutes": 30},
+        {"event": "TRANSFER", "source": "A", "within_minutes": 120}
+      ],
+      "bindings": {"L": {"entity_type": "Location", "entity_id": "LOC_001"}}
+    }
+
+Usage: python scripts/run_sequence_scan.py <sequence.json>
+"""
+import sys
+import os
+import json
+import asyncio
+import logging
+
+# Add the current directory to sys.path to import local modules
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from models.schemas import SequenceQuery
+from services.sequence_detection import sequence_detection
+from db.neo4j_client import neo4j_client
+from db.supabase_client import supabase_client
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def main():
+    if len(sys.argv) < 2:
+        logger.error("Usage: python scripts/run_sequence_scan.py <sequence.json>")
+        sys.exit(1)
+    with open(sys.argv[1]) as f:
+        query = SequenceQuery(**json.load(f))
+    try:
+        neo4j_client.connect()
+        supabase_client.connect()
+        summary = asyncio.run(sequence_detection.scan(query))
+        logger.info(f"Stored {summary['matches']:,} matches of '{summary['name']}' in {summary['seconds']:.1f}s"
+                    + (" (truncated)" if summary["truncated"] else ""))
+    except Exception as e:
+        logger.error(f"Sequence scan failed: {e}")
+    finally:
+        neo4j_client.close()
+
+if __name__ == "__main__":
+    main()
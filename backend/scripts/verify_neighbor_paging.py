@@ -0,0 +1,101 @@
+"""
+Verification script for supernode paging.
+Checks that the neighbors a capped expansion keeps for a hub, followed by
+the pages of its aggregate node, give exactly the hub's ranked neighbor
+list: nothing duplicated, nothing skipped. Hubs are checked as the start
+node (hop 1) and as reached from a neighbor (hop 2), through Neo4j and
+then through the graph projection.
+
+Usage: python scripts/verify_neighbor_paging.py [max_neighbors] [hubs]
+"""
+import sys
+import os
+import asyncio
+import logging
+from pathlib import Path
+
+# Add backend to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.dirname(current_dir)
+sys.path.append(backend_dir)
+
+from core.config import settings
+from core.ontology_manager import ontology_manager
+from db.neo4j_client import neo4j_client
+from models.schemas import NeighborRanking
+from services.entity_service import entity_service
+from services.graph_projection import graph_projection
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+
+async def check_hub(hub_id: int, start_type: str, start_id: str, depth: int, cap: int, rank_by: NeighborRanking) -> int:
+    """Compare one expansion's cut plus its pages with the full ranking; returns the number of mismatches."""
+    graph = await entity_service.expand_neighbors(start_id, start_type, depth=depth, max_neighbors=cap, rank_by=rank_by)
+    known = [e.id for e in graph.edges if not e.id.startswith("agg:")]
+    failures = 0
+    for agg in (n for n in graph.nodes if n.type == "Aggregate" and n.properties["parent_id"] == str(hub_id)):
+        rel_type = agg.properties["relationship_type"]
+        full = await entity_service.page_neighbors(hub_id, rel_type, 0, limit=1_000_000, rank_by=rank_by)
+        ranked = [e.id for e in full.edges if not e.id.startswith("agg:")]
+        kept = {e.id for e in graph.edges if e.type == rel_type and str(hub_id) in (e.source, e.target)}
+
+        paged, offset = [], agg.properties["next_offset"]
+        while offset is not None:
+            page = await entity_service.page_neighbors(
+                hub_id, rel_type, offset, limit=cap, rank_by=rank_by, known_edge_ids=known
+            )
+            paged += [e.id for e in page.edges if not e.id.startswith("agg:")]
+            following = next((n for n in page.nodes if n.type == "Aggregate"), None)
+            offset = following.properties["next_offset"] if following else None
+
+        expected = [e for e in ranked[cap:] if e not in kept]
+        if not set(ranked[:cap]) <= kept or paged != expected:
+            failures += 1
+            logger.error(f"Hub {hub_id} {rel_type} (hop {depth}): kept {len(kept)}, paged {len(paged)}, "
+                         f"expected {len(expected)} after the first {cap} of {len(ranked)}")
+        else:
+            logger.info(f"Hub {hub_id} {rel_type} (hop {depth}): {len(kept)} kept + {len(paged)} paged match the ranking")
+    return failures
+
+
+async def verify(cap: int, num_hubs: int):
+    failures = 0
+    try:
+        neo4j_client.connect()
+        ontology_manager.load_ontology(Path(settings.ontology_path))
+        hubs = neo4j_client.execute_query("""
+        MATCH (h) WHERE h._degree > $cap
+        MATCH (h)--(n) WHERE n._degree <= $cap
+        WITH h, head(collect(n)) AS n
+        RETURN id(h) AS hub, labels(h)[0] AS hub_type, h AS hub_node, labels(n)[0] AS via_type, n AS via_node
+        LIMIT $hubs
+        """, {"cap": cap, "hubs": num_hubs})
+        if not hubs:
+            logger.warning(f"No node has more than {cap} relationships; try a smaller max_neighbors")
+            return
+
+        for source in ("Neo4j", "projection"):
+            if source == "projection":
+                graph_projection.load()
+            logger.info(f"--- Paging through {source} expansion ---")
+            for hub in hubs:
+                hub_key = hub["hub_node"][ontology_manager.get_key_field(hub["hub_type"])]
+                via_key = hub["via_node"][ontology_manager.get_key_field(hub["via_type"])]
+                for rank_by in NeighborRanking:
+                    failures += await check_hub(hub["hub"], hub["hub_type"], hub_key, 1, cap, rank_by)
+                    failures += await check_hub(hub["hub"], hub["via_type"], via_key, 2, cap, rank_by)
+
+        if failures:
+            logger.error(f"\nVerification failed: {failures} mismatching pagings")
+        else:
+            logger.info("\nNeighbor paging verification successful!")
+    finally:
+        neo4j_client.close()
+
+
+if __name__ == "__main__":
+    max_neighbors = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    num_hubs = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    asyncio.run(verify(max_neighbors, num_hubs))
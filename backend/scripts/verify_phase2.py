@@ -45,10 +45,10 @@ async def verify():
 
         # 4. Test Entity Resolution
         logger.info("\n--- 4. Testing Entity Resolution Suggestions ---")
-        suggestions = await entity_resolution_service.suggest_merges()
-        logger.info(f"Found {len(suggestions)} merge suggestions")
-        for s in suggestions:
-            logger.info(f"Suggestion: {s['reason']} for {s['entities']} ({s['preview']})")
+        duplicates = await entity_resolution_service.find_duplicates("Person")
+        logger.info(f"Found {len(duplicates)} duplicate candidates")
+        for d in duplicates:
+            logger.info(f"Candidate: {d['reason']} for {[d['id1'], d['id2']]} ({d['name1']} / {d['name2']}, {d['confidence']})")
             
         # 5. Check Document Mentions
         logger.info("\n--- 5. Checking Document Mentions ---")
@@ -1,20 +1,138 @@
 """
 Alert Service - Manages persistent queries and entity alerts.
+
+Active alerts are evaluated on a schedule (run_alert_scheduler, started
+from the application lifespan), several at once with a per-query timeout.
+Each alert keeps an `_ingested_at` watermark: its query gets it as `$since`
+to restrict itself to data ingested since the previous run, and queries
+that do not use it only report rows touching a node or relationship
+ingested since then. Matches are fingerprinted and checked against the
+hashes already stored in `alert_matches` before new hits are inserted in
+bulk, so re-reading overlapping data never repeats a hit.
+
+Results are streamed and at most alert_max_matches new hits are stored per
+run. A run that finds more keeps its watermark, so the next run reads the
+same data again and stores the hits left over.
 """
+import asyncio
+import hashlib
+import itertools
+import json
 import logging
 from datetime import datetime
-from typing import List, Dict, Any, Optional
-from db.supabase_client import supabase_client
+from typing import List, Dict, Any, Optional, Tuple
+
+from neo4j.graph import Node, Path, Relationship
+
+from core.config import settings
+from core.ontology_manager import ontology_manager
+from db.supabase_client import in_list, supabase_client
 from db.neo4j_client import neo4j_client
 
 logger = logging.getLogger(__name__)
 
+_HASH_LOOKUP_BATCH_SIZE = 200  # Hashes per existence check (they go in the URL)
+_INSERT_BATCH_SIZE = 1_000
+_READ_CHUNK_SIZE = 1_000  # Result rows pulled from Neo4j between existence checks
+
+
+def _plain(value: Any) -> Any:
+    """JSON-ready form of a Cypher result value."""
+    if isinstance(value, Node):
+        return {"id": value.element_id, "labels": sorted(value.labels), "properties": _plain(dict(value))}
+    if isinstance(value, Relationship):
+        return {
+            "id": value.element_id,
+            "type": value.type,
+            "start": value.start_node.element_id if value.start_node is not None else None,
+            "end": value.end_node.element_id if value.end_node is not None else None,
+            "properties": _plain(dict(value)),
+        }
+    if isinstance(value, Path):
+        return {"nodes": [_plain(n) for n in value.nodes], "relationships": [_plain(r) for r in value.relationships]}
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    if hasattr(value, "iso_format"):
+        return value.iso_format()
+    return value
+
+
+def _identity(value: Any) -> Any:
+    """What makes a result value the same hit: element ids for graph elements, the value otherwise."""
+    if isinstance(value, (Node, Relationship)):
+        return value.element_id
+    if isinstance(value, Path):
+        return [_identity(r) for r in value.relationships] or [_identity(n) for n in value.nodes]
+    if isinstance(value, dict):
+        return {k: _identity(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_identity(v) for v in value]
+    return _plain(value)
+
+
+def _ingested(value: Any) -> List[str]:
+    """_ingested_at of every node and relationship in a result value."""
+    if isinstance(value, (Node, Relationship)):
+        return [value["_ingested_at"]] if value.get("_ingested_at") else []
+    if isinstance(value, Path):
+        return [t for element in (*value.nodes, *value.relationships) for t in _ingested(element)]
+    if isinstance(value, dict):
+        return [t for v in value.values() for t in _ingested(v)]
+    if isinstance(value, (list, tuple)):
+        return [t for v in value for t in _ingested(v)]
+    return []
+
+
+def match_hash(record: Dict[str, Any]) -> str:
+    """Fingerprint of a result row, stable across runs."""
+    payload = json.dumps(_identity(record), sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def is_new(record: Dict[str, Any], since: Optional[str]) -> bool:
+    """
+    Whether a row may be a hit since the watermark: it touches something
+    ingested since then, or holds no graph elements to tell.
+    """
+    if since is None:
+        return True
+    ingested = _ingested(record)
+    return not ingested or max(ingested) >= since
+
+
+def latest_ingested_at() -> Optional[str]:
+    """The newest _ingested_at in the graph, read through the per-type indexes."""
+    queries = [
+        f"MATCH (n:{label}) WHERE n._ingested_at IS NOT NULL "
+        f"RETURN n._ingested_at AS t ORDER BY t DESC LIMIT 1"
+        for label in ontology_manager.schema.objects
+    ] + [
+        f"MATCH ()-[r:{rel}]->() WHERE r._ingested_at IS NOT NULL "
+        f"RETURN r._ingested_at AS t ORDER BY t DESC LIMIT 1"
+        for rel in ontology_manager.schema.relationships
+    ]
+    latest = None
+    for query in queries:
+        for record in neo4j_client.execute_query(query):
+            if latest is None or record["t"] > latest:
+                latest = record["t"]
+    return latest
+
 
 class AlertService:
     """Service for managing persistent search queries and alerts."""
-    
+
+    def __init__(self):
+        self.last_run: Optional[Dict[str, Any]] = None
+
     async def create_alert(self, user_id: str, name: str, query: str, entity_type: str = "Person"):
-        """Save a persistent query to be monitored."""
+        """
+        Save a persistent query to be monitored. The query may filter on
+        `$since`, the _ingested_at watermark of its previous run ("" on the
+        first), e.g. `WHERE p._ingested_at >= $since`.
+        """
         alert_data = {
             "user_id": user_id,
             "name": name,
@@ -25,28 +143,156 @@ class AlertService:
         }
         return await supabase_client.insert("alerts", alert_data)
 
-    async def check_alerts(self):
+    async def check_alerts(self) -> Dict[str, Any]:
         """
-        Scan active alerts and find new matches in Neo4j.
-        In a real system, this would run on a schedule.
+        Evaluate every active alert against data ingested since its last
+        run, alert_concurrency at a time, and store new matches.
+
+        Returns:
+            Summary of the run, with one entry per alert
         """
-        active_alerts = await supabase_client.query("alerts", {"status": "eq.ACTIVE"})
-        
-        for alert in active_alerts:
-            # Simple demo logic: execute the query in Neo4j
-            # Note: This requires careful query sanitization in production
-            matches = neo4j_client.execute_query(alert["query_string"])
-            
-            if matches:
-                logger.info(f"Alert '{alert['name']}' matched {len(matches)} entities.")
-                # Record alert matches in Supabase
-                for match in matches:
-                    # Logic to check if match is new...
-                    pass
+        started = datetime.utcnow()
+        active_alerts = await supabase_client.query("alerts", filters={"status": "eq.ACTIVE"})
+        # Taken before the queries run, so data ingested meanwhile is read again next time
+        watermark = await asyncio.to_thread(latest_ingested_at) if active_alerts else None
+        semaphore = asyncio.Semaphore(settings.alert_concurrency)
+        outcomes = await asyncio.gather(
+            *(self._check(alert, watermark, semaphore) for alert in active_alerts), return_exceptions=True
+        )
+        results = []
+        for alert, outcome in zip(active_alerts, outcomes):
+            if isinstance(outcome, BaseException):
+                # _check reports its own failures; this is a last resort so one alert never aborts the run
+                logger.error(f"Alert '{alert.get('name')}' check crashed: {outcome}")
+                outcome = {"alert_id": alert.get("id"), "name": alert.get("name"), "since": alert.get("watermark"),
+                           "new_matches": 0, "truncated": False, "error": str(outcome)}
+            results.append(outcome)
+        self.last_run = {
+            "started_at": started,
+            "finished_at": datetime.utcnow(),
+            "watermark": watermark,
+            "alerts": len(results),
+            "new_matches": sum(r["new_matches"] for r in results),
+            "failed": sum(1 for r in results if r["error"]),
+            "truncated": sum(1 for r in results if r["truncated"]),
+            "results": results,
+        }
+        return self.last_run
+
+    async def _check(self, alert: Dict[str, Any], watermark: Optional[str], semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+        """Run one alert and record its new matches; failures are reported, not raised."""
+        since = alert.get("watermark")
+        result = {
+            "alert_id": alert["id"], "name": alert["name"], "since": since,
+            "new_matches": 0, "truncated": False, "error": None,
+        }
+        try:
+            async with semaphore:
+                matches = await self._unstored_matches(alert, since)
+            if len(matches) > settings.alert_max_matches:
+                # The rest are stored by the next runs, which read from the same watermark
+                logger.warning(f"Alert '{alert['name']}' has over {settings.alert_max_matches} new matches; "
+                               f"storing the first {settings.alert_max_matches}")
+                result["truncated"] = True
+                matches = dict(itertools.islice(matches.items(), settings.alert_max_matches))
+            result["new_matches"] = await self._insert_matches(alert["id"], matches)
+            if result["new_matches"]:
+                logger.info(f"Alert '{alert['name']}' has {result['new_matches']} new matches")
+            await supabase_client.update("alerts", {"id": f"eq.{alert['id']}"}, {
+                "watermark": since if result["truncated"] else watermark or since,
+                "last_run_at": datetime.utcnow().isoformat(),
+                "last_error": None,
+            })
+        except Exception as e:
+            # The watermark stays put, so the next run covers this one's data
+            logger.error(f"Alert '{alert['name']}' failed: {e}")
+            result["error"] = str(e)
+            try:
+                await supabase_client.update("alerts", {"id": f"eq.{alert['id']}"}, {
+                    "last_run_at": datetime.utcnow().isoformat(),
+                    "last_error": str(e)[:1000],
+                })
+            except Exception as update_error:
+                logger.error(f"Could not record the failure of alert '{alert['name']}': {update_error}")
+        return result
+
+    async def _unstored_matches(self, alert: Dict[str, Any], since: Optional[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Rows of the alert's query that may be new since the watermark and are
+        not stored yet, by hash. The result is read in chunks and reading
+        stops once more than alert_max_matches are found, so memory stays
+        bounded however many rows the query returns.
+        """
+        rows = neo4j_client.stream_query(
+            alert["query_string"], {"since": since or ""}, fetch_size=_READ_CHUNK_SIZE,
+            timeout=settings.alert_query_timeout_seconds
+        )
+        filter_new = "$since" not in alert["query_string"]
+        matches: Dict[str, Dict[str, Any]] = {}
+        try:
+            while len(matches) <= settings.alert_max_matches:
+                chunk = await asyncio.to_thread(lambda: list(itertools.islice(rows, _READ_CHUNK_SIZE)))
+                if not chunk:
+                    break
+                candidates: Dict[str, Dict[str, Any]] = {}
+                for record in chunk:
+                    if not filter_new or is_new(record, since):
+                        candidates.setdefault(match_hash(record), _plain(record))
+                for h in await self._stored_hashes(alert["id"], [h for h in candidates if h not in matches]):
+                    candidates.pop(h, None)
+                for h, match in candidates.items():
+                    matches.setdefault(h, match)
+        finally:
+            await asyncio.to_thread(rows.close)
+        return matches
+
+    async def _stored_hashes(self, alert_id: str, hashes: List[str]) -> List[str]:
+        """Those of the hashes the alert has already stored."""
+        stored = []
+        for i in range(0, len(hashes), _HASH_LOOKUP_BATCH_SIZE):
+            rows = await supabase_client.query("alert_matches", select="match_hash", filters={
+                "alert_id": f"eq.{alert_id}",
+                "match_hash": f"in.{in_list(hashes[i:i + _HASH_LOOKUP_BATCH_SIZE])}",
+            })
+            stored.extend(row["match_hash"] for row in rows)
+        return stored
+
+    async def _insert_matches(self, alert_id: str, rows: Dict[str, Dict[str, Any]]) -> int:
+        """Insert matches by hash; returns how many."""
+        new_rows = [
+            {"alert_id": alert_id, "match_hash": h, "match": json.loads(json.dumps(match, default=str))}
+            for h, match in rows.items()
+        ]
+        for i in range(0, len(new_rows), _INSERT_BATCH_SIZE):
+            # A concurrent manual run may have stored some meanwhile
+            await supabase_client.upsert(
+                "alert_matches", new_rows[i:i + _INSERT_BATCH_SIZE], on_conflict="alert_id,match_hash", ignore_duplicates=True
+            )
+        return len(new_rows)
 
     async def list_user_alerts(self, user_id: str) -> List[Dict[str, Any]]:
         """List alerts for a specific user."""
-        return await supabase_client.query("alerts", {"user_id": f"eq.{user_id}"})
+        return await supabase_client.query("alerts", filters={"user_id": f"eq.{user_id}"})
+
+    async def list_matches(self, alert_id: str, status: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """Stored matches of an alert, newest first."""
+        filters = {"alert_id": f"eq.{alert_id}", "order": "matched_at.desc", "limit": str(limit)}
+        if status:
+            filters["status"] = f"eq.{status}"
+        return await supabase_client.query("alert_matches", filters=filters)
+
+
+async def run_alert_scheduler(service: "AlertService", interval_seconds: int):
+    """Evaluate active alerts every interval_seconds."""
+    while True:
+        try:
+            summary = await service.check_alerts()
+            if summary["alerts"]:
+                logger.info(f"Checked {summary['alerts']} alerts: {summary['new_matches']} new matches, "
+                            f"{summary['failed']} failed")
+        except Exception as e:
+            logger.error(f"Alert check failed: {e}")
+        await asyncio.sleep(interval_seconds)
 
 
 # Global instance
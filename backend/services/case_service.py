@@ -5,6 +5,9 @@ import logging
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 from db.supabase_client import supabase_client
+from models.schemas import TimelinePage
+from services.pattern_detection import pattern_detection
+from services.temporal_service import temporal_service
 
 logger = logging.getLogger(__name__)
 
@@ -26,12 +29,12 @@ class CaseService:
 
     async def get_case(self, case_id: str) -> Optional[Dict[str, Any]]:
         """Retrieve case details."""
-        results = await supabase_client.query("cases", {"id": f"eq.{case_id}"})
+        results = await supabase_client.query("cases", filters={"id": f"eq.{case_id}"})
         return results[0] if results else None
 
     async def list_cases(self) -> List[Dict[str, Any]]:
         """List all cases."""
-        return await supabase_client.query("cases", {"order": "updated_at.desc"})
+        return await supabase_client.query("cases", filters={"order": "updated_at.desc"})
 
     async def add_entity_to_case(self, case_id: str, entity_id: str, entity_type: str, notes: str = ""):
         """Link an entity to a case."""
@@ -46,7 +49,32 @@ class CaseService:
 
     async def get_case_entities(self, case_id: str) -> List[Dict[str, Any]]:
         """Get all entities linked to a case."""
-        return await supabase_client.query("case_entities", {"case_id": f"eq.{case_id}"})
+        return await supabase_client.query("case_entities", filters={"case_id": f"eq.{case_id}"})
+
+    async def get_case_findings(self, case_id: str) -> List[Dict[str, Any]]:
+        """Pattern findings touching any account linked to a case."""
+        accounts = [e["entity_id"] for e in await self.get_case_entities(case_id) if e["entity_type"] == "Account"]
+        if not accounts:
+            return []
+        return await pattern_detection.list_findings(account_ids=accounts)
+
+    async def get_case_timeline(
+        self,
+        case_id: str,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        relationship_types: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None
+    ) -> TimelinePage:
+        """One page of the merged timeline of every entity linked to a case."""
+        entities = [(e["entity_type"], e["entity_id"]) for e in await self.get_case_entities(case_id)]
+        if not entities:
+            return TimelinePage()
+        return await temporal_service.get_case_timeline(
+            entities, start_time=start_time, end_time=end_time, relationship_types=relationship_types,
+            limit=limit, cursor=cursor
+        )
 
     async def add_case_note(self, case_id: str, user_id: str, content: str):
         """Add an investigator note to a case."""
@@ -0,0 +1,431 @@
+"""
+Co-location Service - Entities repeatedly at the same place at the same time.
+
+Location observations come from three sources:
+- SIGHTED_AT relationships (sightings.csv: ANPR, CCTV, ... of any entity)
+- CALL relationships, placing the calling phone at `cell_location_id`
+- PERSON_ATTENDED_EVENT, placing a person at the event's location for
+  the event's [start_time, end_time]
+
+Observations are sorted by (location, time) and swept once: every
+observation is paired with the following observations at the same
+location that start within `colocation_window_minutes` of its end.
+Pair hits of the same two entities at the same location that are within
+the window of each other merge into one episode (one visit), so a long
+shared stay counts once. Each episode is weighted by the rarity of its
+location, log((N + 1) / n), with N the number of observed entities and n
+the number seen at that location: meeting at a quiet address says more
+than passing through the central station. A pair's score is the sum over
+its episodes.
+
+Locations are packed into partitions of at most
+`colocation_partition_size` observations and processed one partition at
+a time; only the per-pair totals are carried between partitions, so
+memory is bounded by the partition size and the number of co-present
+pairs rather than by the number of observations. Ranked pairs go to the
+Supabase `colocations` table.
+"""
+import logging
+import math
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from core.config import settings
+from core.ontology_manager import ontology_manager
+from db.neo4j_client import neo4j_client
+from db.supabase_client import supabase_client
+from models.schemas import CoLocation
+from services.graph_projection import graph_projection, unique_sorted
+
+logger = logging.getLogger(__name__)
+
+_MAX_HITS = 4_000_000  # Pair hits expanded at once within a partition
+_COMPACT_ROWS = 5_000_000  # Pending pair rows before they are folded together
+_FETCH_BATCH_SIZE = 10_000
+_UPSERT_BATCH_SIZE = 1_000
+
+# Observation counts per location, one query per source
+_COUNT_QUERIES = [
+    """
+    MATCH ()-[r:SIGHTED_AT]->(l:Location)
+    WHERE r.timestamp IS NOT NULL
+    RETURN l.location_id AS location, count(r) AS n
+    """,
+    """
+    MATCH (:Phone)-[r:CALL]->(:Phone)
+    WHERE r.cell_location_id IS NOT NULL AND r.timestamp IS NOT NULL
+    RETURN r.cell_location_id AS location, count(r) AS n
+    """,
+    """
+    MATCH (:Person)-[:PERSON_ATTENDED_EVENT]->(e:Event)
+    WHERE e.location_id IS NOT NULL AND e.start_time IS NOT NULL
+    RETURN e.location_id AS location, count(*) AS n
+    """,
+]
+
+# Observations at a list of locations: entity, location, start and end (epoch seconds)
+_OBSERVATION_QUERIES = [
+    """
+    UNWIND $locations AS loc
+    MATCH (n)-[r:SIGHTED_AT]->(:Location {location_id: loc})
+    WHERE r.timestamp IS NOT NULL
+    WITH n, loc, datetime(r.timestamp).epochSeconds AS t
+    RETURN id(n) AS entity, loc AS location, t AS start, t AS end
+    """,
+    """
+    MATCH (p:Phone)-[r:CALL]->(:Phone)
+    WHERE r.cell_location_id IN $locations AND r.timestamp IS NOT NULL
+    WITH p, r, datetime(r.timestamp).epochSeconds AS t
+    RETURN id(p) AS entity, r.cell_location_id AS location, t AS start,
+           t + coalesce(toInteger(r.duration_sec), 0) AS end
+    """,
+    """
+    MATCH (e:Event)
+    WHERE e.location_id IN $locations AND e.start_time IS NOT NULL
+    MATCH (p:Person)-[:PERSON_ATTENDED_EVENT]->(e)
+    WITH p, e, datetime(e.start_time).epochSeconds AS t
+    RETURN id(p) AS entity, e.location_id AS location, t AS start,
+           coalesce(datetime(e.end_time).epochSeconds, t) AS end
+    """,
+]
+
+
+class Observations:
+    """Columnar (entity, location, start, end) observations, locations coded as ints."""
+
+    def __init__(self, entity: np.ndarray, location: np.ndarray, start: np.ndarray, end: np.ndarray):
+        self.entity = entity
+        self.location = location
+        self.start = start
+        self.end = np.maximum(end, start)
+
+    def __len__(self) -> int:
+        return len(self.entity)
+
+    @classmethod
+    def load(cls, locations: List[str]) -> "Observations":
+        """Stream every observation at the given locations (coded by their position in the list)."""
+        codes = {loc: i for i, loc in enumerate(locations)}
+        columns: Dict[str, list] = {k: [] for k in ("entity", "location", "start", "end")}
+        for query in _OBSERVATION_QUERIES:
+            for record in neo4j_client.stream_query(query, {"locations": locations}):
+                columns["entity"].append(record["entity"])
+                columns["location"].append(codes[record["location"]])
+                columns["start"].append(record["start"])
+                columns["end"].append(record["end"])
+        return cls(*(np.array(columns[k], dtype=np.int64) for k in ("entity", "location", "start", "end")))
+
+
+def plan_partitions(counts: Dict[str, int], partition_size: int) -> List[List[str]]:
+    """
+    Pack locations into partitions of at most `partition_size` observations.
+
+    A location busier than the partition size gets a partition of its own.
+    """
+    partitions: List[List[str]] = []
+    current: List[str] = []
+    load = 0
+    for location in sorted(counts):
+        n = counts[location]
+        if current and load + n > partition_size:
+            partitions.append(current)
+            current, load = [], 0
+        current.append(location)
+        load += n
+    if current:
+        partitions.append(current)
+    return partitions
+
+
+def pair_keys(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """One int64 per unordered entity pair (node ids must be below 2**31)."""
+    return (np.minimum(a, b) << 32) | np.maximum(a, b)
+
+
+def split_pair_keys(keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    return keys >> 32, keys & 0xFFFFFFFF
+
+
+def co_presence(
+    obs: Observations, window: int, max_neighbors: int, max_hits: int = _MAX_HITS
+) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Sweep observations in (location, time) order for pairs of entities present together.
+
+    Observation j follows i at the same location when it starts no later
+    than `window` seconds after i ends; each observation is paired with at
+    most `max_neighbors` followers (the earliest), which bounds the work
+    at crowded locations. Yields (pair key, location, time) hits in
+    (location, time) order, time being when the earlier of the two
+    arrived, in chunks of about `max_hits` that never split a location, so
+    chunks can be reduced independently.
+    """
+    n = len(obs)
+    if n == 0:
+        return
+    t_min = int(obs.start.min())
+    span = int(obs.end.max()) - t_min + window + 2
+    keys = obs.location * span + (obs.start - t_min)
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    entity, location, start, end = (x[order] for x in (obs.entity, obs.location, obs.start, obs.end))
+    reach = location * span + (end - t_min + window)
+    rows = np.arange(n)
+    counts = np.minimum(np.searchsorted(keys, reach, side="right") - rows - 1, max_neighbors)
+
+    row_start = 0
+    cum = np.cumsum(counts)
+    while row_start < n:
+        done = int(cum[row_start - 1]) if row_start else 0
+        row_end = max(int(np.searchsorted(cum, done + max_hits, side="right")), row_start + 1)
+        row_end = int(np.searchsorted(location, location[row_end - 1], side="right"))
+        c = counts[row_start:row_end]
+        total = int(c.sum())
+        if total:
+            row = np.repeat(rows[row_start:row_end], c)
+            other = row + 1 + (np.arange(total) - np.repeat(np.cumsum(c) - c, c))
+            keep = entity[row] != entity[other]
+            row, other = row[keep], other[keep]
+            yield pair_keys(entity[row], entity[other]), location[row], start[row]
+        row_start = row_end
+
+
+def merge_episodes(
+    pair: np.ndarray, location: np.ndarray, times: np.ndarray, window: int
+) -> Tuple[np.ndarray, ...]:
+    """
+    Merge hits of the same pair at the same location that lie within
+    `window` of the previous one into episodes (visits together).
+
+    Hits must be in (location, time) order, as co_presence yields them.
+    Returns (pair, location, first, last) sorted by pair, location and time.
+    """
+    if len(pair) == 0:
+        return pair, location, times, times
+    order = np.argsort(pair, kind="stable")
+    pair, location, times = pair[order], location[order], times[order]
+    new_group = np.r_[True, (pair[1:] != pair[:-1]) | (location[1:] != location[:-1])]
+    starts = new_group.copy()
+    starts[1:] |= times[1:] - times[:-1] > window
+    idx = np.flatnonzero(starts)
+    return pair[idx], location[idx], times[idx], np.maximum.reduceat(times, idx)
+
+
+class PairScores:
+    """Per-pair co-location totals accumulated over partitions."""
+
+    _FIELDS = ("pair", "episodes", "locations", "log_crowd", "first", "last", "top")
+
+    def __init__(self):
+        self.pending: Dict[str, List[np.ndarray]] = {k: [] for k in self._FIELDS}
+        self.rows = 0
+        self.compact_at = _COMPACT_ROWS
+        self.locations: List[str] = []
+
+    def add_locations(self, locations: List[str]) -> int:
+        """Register a partition's locations; returns the offset of its location codes."""
+        offset = len(self.locations)
+        self.locations.extend(locations)
+        return offset
+
+    def add(self, episodes: Tuple[np.ndarray, ...], crowd: np.ndarray, loc_offset: int):
+        """
+        Add every episode at some locations, sorted as merge_episodes returns them.
+
+        `crowd` is the number of distinct entities seen at each of the
+        partition's locations (indexed by location code).
+        """
+        pair, loc, first, last = episodes
+        if len(pair) == 0:
+            return
+
+        # Per (pair, location): episode count and time range
+        pl = np.flatnonzero(np.r_[True, (pair[1:] != pair[:-1]) | (loc[1:] != loc[:-1])])
+        pl_count = np.diff(np.r_[pl, len(pair)])
+        pl_pair, pl_loc = pair[pl], loc[pl]
+
+        # Per pair; `top` packs (episodes, location) so its max is the location they met at most
+        p = np.flatnonzero(np.r_[True, pl_pair[1:] != pl_pair[:-1]])
+        self._append(
+            pair=pl_pair[p],
+            episodes=np.add.reduceat(pl_count, p).astype(np.int32),
+            locations=np.diff(np.r_[p, len(pl_pair)]).astype(np.int32),
+            log_crowd=np.add.reduceat(pl_count * np.log(crowd[pl_loc]), p),
+            first=np.minimum.reduceat(first, pl[p]),
+            last=np.maximum.reduceat(last, pl[p]),
+            top=np.maximum.reduceat((pl_count << 32) | (pl_loc + loc_offset), p),
+        )
+        if self.rows > self.compact_at:
+            self.compact()
+            # Most pairs meet once; grow the threshold so compaction stays amortized
+            self.compact_at = max(_COMPACT_ROWS, 2 * self.rows)
+
+    def _append(self, **columns: np.ndarray):
+        for key, values in columns.items():
+            self.pending[key].append(values)
+        self.rows += len(columns["pair"])
+
+    def compact(self):
+        """Fold rows of the same pair from different partitions into one."""
+        if len(self.pending["pair"]) <= 1:
+            return
+        c = {k: np.concatenate(v) for k, v in self.pending.items()}
+        order = np.argsort(c["pair"], kind="stable")
+        c = {k: v[order] for k, v in c.items()}
+        p = np.flatnonzero(np.r_[True, c["pair"][1:] != c["pair"][:-1]])
+        self.pending = {k: [] for k in self._FIELDS}
+        self.rows = 0
+        self._append(
+            pair=c["pair"][p],
+            episodes=np.add.reduceat(c["episodes"], p),
+            locations=np.add.reduceat(c["locations"], p),
+            log_crowd=np.add.reduceat(c["log_crowd"], p),
+            first=np.minimum.reduceat(c["first"], p),
+            last=np.maximum.reduceat(c["last"], p),
+            top=np.maximum.reduceat(c["top"], p),
+        )
+
+    def ranked(self, num_entities: int, min_episodes: int, limit: int) -> List[Dict[str, Any]]:
+        """Pairs with at least `min_episodes` episodes, highest score first."""
+        self.compact()
+        if not self.pending["pair"]:
+            return []
+        c = {k: v[0] for k, v in self.pending.items()}
+        # Sum over episodes of log((N + 1) / crowd)
+        score = c["episodes"] * math.log(num_entities + 1) - c["log_crowd"]
+        keep = np.flatnonzero(c["episodes"] >= min_episodes)
+        if len(keep) > limit:
+            keep = keep[np.argpartition(-score[keep], limit - 1)[:limit]]
+        keep = keep[np.argsort(-score[keep], kind="stable")]
+        a, b = split_pair_keys(c["pair"][keep])
+        return [
+            {
+                "a": int(a[n]),
+                "b": int(b[n]),
+                "episodes": int(c["episodes"][i]),
+                "locations": int(c["locations"][i]),
+                "score": round(float(score[i]), 4),
+                "first_at": _iso(int(c["first"][i])),
+                "last_at": _iso(int(c["last"][i])),
+                "top_location_id": self.locations[int(c["top"][i] & 0xFFFFFFFF)],
+            }
+            for n, i in enumerate(keep.tolist())
+        ]
+
+
+def _iso(epoch: int) -> str:
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).isoformat()
+
+
+class ColocationService:
+    """Service for detecting co-located entities and querying the results."""
+
+    def detect(self, partitions: Iterator[Tuple[List[str], Observations]]) -> List[Dict[str, Any]]:
+        """
+        Score co-present pairs over partitions of (locations, their observations).
+
+        Returns ranked pairs keyed by internal node id.
+        """
+        window = settings.colocation_window_minutes * 60
+        scores = PairScores()
+        entities = np.empty(0, dtype=np.int64)
+        for locations, obs in partitions:
+            if len(obs) == 0:
+                continue
+            # Distinct entities per location, for rarity, and overall
+            present = unique_sorted(obs.location * (int(obs.entity.max()) + 1) + obs.entity)
+            crowd = np.maximum(np.bincount(present // (int(obs.entity.max()) + 1), minlength=len(locations)), 1)
+            entities = unique_sorted(np.concatenate([entities, obs.entity]))
+
+            if int(obs.entity.max()) >= 2 ** 31:
+                raise ValueError("Node ids beyond 2**31 cannot be packed into pair keys")
+
+            offset = scores.add_locations(locations)
+            for pair, loc, t in co_presence(obs, window, settings.colocation_max_neighbors):
+                scores.add(merge_episodes(pair, loc, t, window), crowd, offset)
+        return scores.ranked(len(entities), settings.colocation_min_episodes, settings.colocation_max_results)
+
+    def partitions(self) -> Iterator[Tuple[List[str], Observations]]:
+        """Load observations from Neo4j one location partition at a time."""
+        counts: Counter = Counter()
+        for query in _COUNT_QUERIES:
+            for record in neo4j_client.stream_query(query):
+                counts[record["location"]] += record["n"]
+        plan = plan_partitions(counts, settings.colocation_partition_size)
+        logger.info(f"Co-location: {sum(counts.values())} observations at {len(counts)} locations, "
+                    f"{len(plan)} partitions")
+        for locations in plan:
+            yield locations, Observations.load(locations)
+
+    async def run(self) -> Dict[str, Any]:
+        """Recompute co-located pairs from every observation and replace the stored ranking."""
+        started = time.monotonic()
+        pairs = self.detect(self.partitions())
+        detected = time.monotonic()
+        rows = self._resolve(pairs)
+        await supabase_client.delete("colocations", {"episodes": "gte.0"})
+        for i in range(0, len(rows), _UPSERT_BATCH_SIZE):
+            await supabase_client.upsert(
+                "colocations", rows[i:i + _UPSERT_BATCH_SIZE],
+                on_conflict="entity_a_type,entity_a_id,entity_b_type,entity_b_id"
+            )
+        summary = {
+            "pairs": len(rows),
+            "detect_seconds": round(detected - started, 2),
+            "store_seconds": round(time.monotonic() - detected, 2),
+        }
+        logger.info(f"Co-location: {summary}")
+        return summary
+
+    @staticmethod
+    def _resolve(pairs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Replace internal node ids with entity types and keys."""
+        ids = sorted({p["a"] for p in pairs} | {p["b"] for p in pairs})
+        entities: Dict[int, Tuple[str, str]] = {}
+        for i in range(0, len(ids), _FETCH_BATCH_SIZE):
+            for node_id, node in graph_projection.fetch_nodes(ids[i:i + _FETCH_BATCH_SIZE]).items():
+                label = next(iter(node.labels), None)
+                if label is None or ontology_manager.schema.get_object_type(label) is None:
+                    continue
+                key = node.get(ontology_manager.get_key_field(label))
+                if key is not None:
+                    entities[node_id] = (label, str(key))
+        rows = []
+        for p in pairs:
+            if p["a"] not in entities or p["b"] not in entities:
+                continue
+            # Store each pair in a canonical order so it has one row
+            (a_type, a_id), (b_type, b_id) = sorted((entities[p["a"]], entities[p["b"]]))
+            rows.append({
+                "entity_a_type": a_type, "entity_a_id": a_id,
+                "entity_b_type": b_type, "entity_b_id": b_id,
+                **{k: p[k] for k in ("episodes", "locations", "score", "first_at", "last_at", "top_location_id")},
+            })
+        return rows
+
+    async def list_colocations(
+        self,
+        entity_type: Optional[str] = None,
+        entity_id: Optional[str] = None,
+        limit: int = 100
+    ) -> List[CoLocation]:
+        """Stored co-located pairs, highest score first, optionally involving one entity."""
+        filters = {"order": "score.desc", "limit": str(limit)}
+        if entity_id:
+            sides = []
+            for side in ("a", "b"):
+                conditions = [f"entity_{side}_id.eq.{entity_id}"]
+                if entity_type:
+                    conditions.append(f"entity_{side}_type.eq.{entity_type}")
+                sides.append(f"and({','.join(conditions)})")
+            filters["or"] = f"({','.join(sides)})"
+        rows = await supabase_client.query("colocations", filters=filters)
+        return [CoLocation(**row) for row in rows]
+
+
+# Global instance
+colocation_service = ColocationService()
@@ -1,36 +1,299 @@
 """
 Communications Service - Analysis of calls and messages.
 """
+import base64
+import binascii
+import hashlib
+import json
 import logging
-from typing import List, Dict, Any
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from core.config import settings
 from db.neo4j_client import neo4j_client
+from models.schemas import CommHopFilter, CommNetworkData, CommNetworkRequest, ContactSummary, GraphEdge
+from services.contact_matrix import contact_matrix
+from services.entity_service import entity_service
+from services.graph_projection import NO_TIME_LO, ProjectionState, graph_projection, to_epoch
 
 logger = logging.getLogger(__name__)
 
+_COMM_TYPES = ["CALL", "MESSAGE"]
+
+# fetch(phones, start, end) -> directed pair totals (src, dst, calls, messages, seconds,
+# first, last) over every CALL / MESSAGE touching `phones` in [start, end]
+PairFetcher = Callable[[np.ndarray, Optional[int], Optional[int]], Dict[str, np.ndarray]]
+
+
+class CommNetwork:
+    """A computed ego network: phones in page order and one aggregated edge per pair."""
+
+    def __init__(self):
+        self.order: List[int] = []  # Node ids: source, then by hop and strongest tie
+        self.hops: Dict[int, int] = {}
+        self.edges: Dict[Tuple[int, int], Dict[str, Any]] = {}
+        self.truncated = 0
+
+
+def _undirected(pairs: Dict[str, np.ndarray]) -> Dict[Tuple[int, int], Dict[str, Any]]:
+    """Fold directed pair totals into one entry per unordered pair (a < b)."""
+    totals: Dict[Tuple[int, int], Dict[str, Any]] = {}
+    columns = [pairs[k].tolist() for k in ("src", "dst", "calls", "messages", "seconds", "first", "last")]
+    for src, dst, calls, messages, seconds, first, last in zip(*columns):
+        key = (min(src, dst), max(src, dst))
+        total = totals.get(key)
+        if total is None:
+            total = totals[key] = {
+                "calls": 0, "messages": 0, "call_seconds": 0.0,
+                "a_to_b": 0, "b_to_a": 0, "first": first, "last": last,
+            }
+        total["calls"] += calls
+        total["messages"] += messages
+        total["call_seconds"] += seconds
+        total["a_to_b" if src == key[0] else "b_to_a"] += calls + messages
+        total["first"] = min(total["first"], first)
+        total["last"] = max(total["last"], last)
+    return totals
+
+
+def build_network(fetch: PairFetcher, source: int, hops: List[CommHopFilter], max_nodes: int) -> CommNetwork:
+    """
+    Expand a phone's communication network hop by hop.
+
+    Hop k adds the contacts of the phones added at hop k - 1 whose traffic
+    with them in hop k's time window reaches hop k's `min_volume` (calls
+    plus messages). New contacts are admitted strongest tie first until
+    `max_nodes` phones are in the network; the rest are counted as
+    truncated. A last pass adds the ties among the outermost phones.
+    """
+    network = CommNetwork()
+    network.order.append(source)
+    network.hops[source] = 0
+    frontier = [source]
+
+    for hop, hop_filter in enumerate(hops + [hops[-1]], start=1):
+        closing = hop > len(hops)
+        if not frontier:
+            break
+        totals = _undirected(fetch(
+            np.array(frontier, dtype=np.int64), to_epoch(hop_filter.start_time), to_epoch(hop_filter.end_time)
+        ))
+        strength: Dict[int, int] = {}
+        kept = []
+        for key, total in totals.items():
+            volume = total["calls"] + total["messages"]
+            if key in network.edges or volume < hop_filter.min_volume:
+                continue
+            kept.append((key, total))
+            for phone in key:
+                if phone not in network.hops:
+                    strength[phone] = max(strength.get(phone, 0), volume)
+
+        if not closing:
+            ranked = sorted(strength, key=lambda phone: (-strength[phone], phone))
+            room = max(max_nodes - len(network.order), 0)
+            network.truncated += max(len(ranked) - room, 0)
+            frontier = ranked[:room]
+            for phone in frontier:
+                network.hops[phone] = hop
+            network.order.extend(frontier)
+        for key, total in kept:
+            if key[0] in network.hops and key[1] in network.hops:
+                network.edges[key] = total
+    return network
+
+
+def projection_pairs(state: ProjectionState) -> PairFetcher:
+    """Fetcher over the CALL / MESSAGE edges of a projection snapshot (node indexes)."""
+    codes = state.type_codes(_COMM_TYPES)
+    call_code = state.type_codes(["CALL"])
+
+    def fetch(phones, start, end):
+        pos, _, _ = state.neighbors(phones, "both", codes, start, end)
+        # An edge between two frontier phones is gathered from both ends
+        pos = np.unique(pos)
+        pos = pos[state.time_lo[pos] != NO_TIME_LO]
+        src, dst = state.src[pos].astype(np.int64), state.dst[pos].astype(np.int64)
+        is_call = np.isin(state.edge_type[pos], call_code)
+        seconds = np.where(is_call, np.nan_to_num(state.weight[pos].astype(np.float64), nan=0.0), 0.0)
+        t = state.time_lo[pos]
+
+        order = np.lexsort((dst, src))
+        src, dst, is_call, seconds, t = src[order], dst[order], is_call[order], seconds[order], t[order]
+        if len(src) == 0:
+            return {k: np.empty(0) for k in ("src", "dst", "calls", "messages", "seconds", "first", "last")}
+        starts = np.flatnonzero(np.r_[True, (src[1:] != src[:-1]) | (dst[1:] != dst[:-1])])
+        calls = np.add.reduceat(is_call.astype(np.int64), starts)
+        return {
+            "src": src[starts],
+            "dst": dst[starts],
+            "calls": calls,
+            "messages": np.diff(np.r_[starts, len(src)]) - calls,
+            "seconds": np.add.reduceat(seconds, starts),
+            "first": np.minimum.reduceat(t, starts),
+            "last": np.maximum.reduceat(t, starts),
+        }
+
+    return fetch
+
+
+def cypher_pairs(phones, start, end) -> Dict[str, np.ndarray]:
+    """Fetcher aggregating CALL / MESSAGE relationships per directed pair in Cypher (node ids)."""
+    conditions = ["r.timestamp IS NOT NULL"]
+    if start is not None:
+        conditions.append("datetime(r.timestamp).epochSeconds >= $start")
+    if end is not None:
+        conditions.append("datetime(r.timestamp).epochSeconds <= $end")
+    query = f"""
+    UNWIND $phones AS phone_id
+    MATCH (a:Phone)-[r:CALL|MESSAGE]-(:Phone)
+    WHERE id(a) = phone_id AND {' AND '.join(conditions)}
+    WITH DISTINCT r
+    WITH id(startNode(r)) AS src, id(endNode(r)) AS dst, r, datetime(r.timestamp).epochSeconds AS t
+    RETURN src, dst,
+           sum(CASE type(r) WHEN 'CALL' THEN 1 ELSE 0 END) AS calls,
+           sum(CASE type(r) WHEN 'MESSAGE' THEN 1 ELSE 0 END) AS messages,
+           sum(CASE type(r) WHEN 'CALL' THEN coalesce(toFloat(r.duration_sec), 0.0) ELSE 0.0 END) AS seconds,
+           min(t) AS first, max(t) AS last
+    """
+    records = neo4j_client.execute_query(query, {"phones": phones.tolist(), "start": start, "end": end})
+    return {
+        key: np.array([r[key] for r in records], dtype=np.float64 if key == "seconds" else np.int64)
+        for key in ("src", "dst", "calls", "messages", "seconds", "first", "last")
+    }
+
+
+def _iso(epoch: int) -> str:
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).isoformat()
+
 
 class CommunicationsService:
     """Service for CDR (Call Detail Record) and messaging analysis."""
-    
-    async def get_comm_network(self, phone_id: str) -> Dict[str, Any]:
-        """Get the communication network (1-hop) for a phone."""
-        query = """
-        MATCH (p:Phone {phone_id: $id})
-        MATCH (p)-[r:CALL|MESSAGE]-(neighbor:Phone)
-        RETURN p, r, neighbor
+
+    def __init__(self):
+        # Computed networks by request fingerprint, so paging does not recompute them
+        self._networks: "OrderedDict[str, Tuple[float, CommNetwork]]" = OrderedDict()
+
+    async def get_comm_network(self, request: CommNetworkRequest) -> CommNetworkData:
         """
-        results = neo4j_client.execute_query(query, {"id": phone_id})
-        # Logic to format as network graph (similar to expand_neighbors)
-        return results
-
-    async def get_frequent_contacts(self, phone_id: str, limit: int = 5) -> List[Dict[str, Any]]:
-        """Identify top contacts by volume of communications."""
-        query = """
-        MATCH (p:Phone {phone_id: $id})-[r:CALL|MESSAGE]-(neighbor:Phone)
-        RETURN neighbor.msisdn as msisdn, count(r) as volume
-        ORDER BY volume DESC
-        LIMIT $limit
+        One page of a phone's communication network, with all CALL / MESSAGE
+        traffic between each pair of phones aggregated into one edge.
+
+        Pages list phones by hop, strongest tie first. Each edge is returned
+        with the page holding the later of its two phones, so every edge on a
+        page connects phones the client already has. Pass `next_cursor` back
+        to get the following page.
+
+        Raises:
+            ValueError: If the cursor is malformed or belongs to another request
         """
-        return neo4j_client.execute_query(query, {"id": phone_id, "limit": limit})
+        fingerprint = self._fingerprint(request)
+        offset = self._decode_cursor(request.cursor, fingerprint) if request.cursor else 0
+        network = self._network(request, fingerprint)
+        if network is None:
+            return CommNetworkData(nodes=[], edges=[])
+
+        page = network.order[offset:offset + request.page_size]
+        rank = {phone: i for i, phone in enumerate(network.order)}
+        page_end = offset + len(page)
+        edges = [
+            (key, total) for key, total in network.edges.items()
+            if offset <= max(rank[key[0]], rank[key[1]]) < page_end
+        ]
+        nodes = graph_projection.fetch_nodes(page)
+        graph = entity_service.to_graph([nodes[phone] for phone in page if phone in nodes], [])
+        graph.edges = [
+            GraphEdge(
+                id=f"comm:{a}:{b}",
+                source=str(a),
+                target=str(b),
+                type="COMMUNICATED",
+                properties={
+                    "calls": total["calls"],
+                    "messages": total["messages"],
+                    "volume": total["calls"] + total["messages"],
+                    "call_seconds": round(total["call_seconds"], 1),
+                    "a_to_b": total["a_to_b"],
+                    "b_to_a": total["b_to_a"],
+                    "first_at": _iso(total["first"]),
+                    "last_at": _iso(total["last"]),
+                },
+                timestamp=datetime.fromtimestamp(total["last"], tz=timezone.utc)
+            )
+            for (a, b), total in edges
+        ]
+        return CommNetworkData(
+            nodes=graph.nodes,
+            edges=graph.edges,
+            hops={str(phone): network.hops[phone] for phone in page},
+            total_nodes=len(network.order),
+            total_edges=len(network.edges),
+            truncated=network.truncated,
+            next_cursor=self._encode_cursor(page_end, fingerprint) if page_end < len(network.order) else None
+        )
+
+    def _network(self, request: CommNetworkRequest, fingerprint: str) -> Optional[CommNetwork]:
+        """The request's network, from the cache while it is fresh."""
+        now = time.monotonic()
+        cached = self._networks.get(fingerprint)
+        if cached is not None and now - cached[0] < settings.comm_network_cache_seconds:
+            self._networks.move_to_end(fingerprint)
+            return cached[1]
+
+        start = entity_service.find_node(request.phone_id, "Phone")
+        if start is None:
+            return None
+        network = None
+        if graph_projection.covers(_COMM_TYPES, ["Phone"]):
+            state = graph_projection.snapshot()
+            source = int(state.lookup([start.id])[0])
+            if source >= 0:
+                network = build_network(projection_pairs(state), source, request.hops, settings.comm_network_max_nodes)
+                network.order = [int(state.node_ids[i]) for i in network.order]
+                network.hops = {int(state.node_ids[i]): hop for i, hop in network.hops.items()}
+                network.edges = {
+                    tuple(sorted((int(state.node_ids[a]), int(state.node_ids[b])))): total
+                    for (a, b), total in network.edges.items()
+                }
+        if network is None:
+            network = build_network(cypher_pairs, start.id, request.hops, settings.comm_network_max_nodes)
+
+        self._networks[fingerprint] = (now, network)
+        while len(self._networks) > settings.comm_network_cache_entries:
+            self._networks.popitem(last=False)
+        return network
+
+    @staticmethod
+    def _fingerprint(request: CommNetworkRequest) -> str:
+        """Identifies the network a request describes (not the page)."""
+        payload = json.dumps(
+            {"phone_id": request.phone_id, "hops": [h.model_dump(mode="json") for h in request.hops]},
+            sort_keys=True
+        )
+        return hashlib.blake2b(payload.encode(), digest_size=8).hexdigest()
+
+    @staticmethod
+    def _encode_cursor(offset: int, fingerprint: str) -> str:
+        return base64.urlsafe_b64encode(f"{fingerprint}:{offset}".encode()).decode()
+
+    @staticmethod
+    def _decode_cursor(cursor: str, fingerprint: str) -> int:
+        try:
+            owner, offset = base64.urlsafe_b64decode(cursor.encode()).decode().split(":")
+            offset = int(offset)
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise ValueError("Malformed cursor")
+        if owner != fingerprint or offset < 0:
+            raise ValueError("Cursor does not belong to this network request")
+        return offset
+
+    async def get_frequent_contacts(self, phone_id: str, limit: int = 5, rank_by: str = "total") -> List[ContactSummary]:
+        """Identify top contacts by volume of communications, from the contact matrix."""
+        return await contact_matrix.top_contacts(phone_id, limit, rank_by)
 
 
 # Global instance
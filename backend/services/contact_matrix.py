@@ -0,0 +1,178 @@
+"""
+Contact Matrix - Pre-aggregated call and message volume per phone pair.
+
+Every CALL and MESSAGE relationship (one per CDR / message record, keyed
+by cdr_id / msg_id at ingestion) is counted into two Supabase tables:
+
+- contact_summaries: one row per (phone_id, contact_id), stored for both
+  directions of a pair, with inbound / outbound call and message counts,
+  total call seconds, first / last contact and hour-of-day and weekday
+  histograms (wall-clock time of the record). Ranked by the generated
+  `total` column, top contacts are one indexed range read.
+- contact_daily: one row per unordered pair and UTC day with call and
+  message counts and call seconds, for contact frequency over time.
+
+Ingestion collects the events it creates in a ContactDeltas and applies
+them with the `apply_contact_deltas` function, which adds to existing
+rows, so the matrix is maintained incrementally.
+"""
+import logging
+from datetime import date, datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from db.neo4j_client import neo4j_client
+from db.supabase_client import supabase_client
+from models.schemas import ContactSummary, DailyContacts, PairContacts
+from services.flow_rollups import parse_timestamp
+
+logger = logging.getLogger(__name__)
+
+_APPLY_BATCH_SIZE = 5_000
+
+# Columns a contact_summaries row can be ranked by
+CONTACT_RANKINGS = {
+    "total": "total",
+    "calls": "calls",
+    "messages": "messages",
+    "duration": "call_seconds",
+}
+
+
+class ContactDeltas:
+    """In-memory contact matrix increments, combined per row before they are applied."""
+
+    def __init__(self):
+        self.summaries: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self.daily: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self.summaries) + len(self.daily)
+
+    def add(self, event_type: str, from_phone: str, to_phone: str, timestamp: datetime, duration: float = 0.0):
+        """Count one CALL or MESSAGE from from_phone to to_phone."""
+        kind = "calls" if event_type == "CALL" else "messages"
+        seconds = duration if kind == "calls" else 0.0
+        for phone, contact, direction in ((from_phone, to_phone, "out"), (to_phone, from_phone, "in")):
+            row = self.summaries.get((phone, contact))
+            if row is None:
+                row = self.summaries[(phone, contact)] = {
+                    "phone_id": phone,
+                    "contact_id": contact,
+                    "calls_out": 0, "calls_in": 0, "messages_out": 0, "messages_in": 0,
+                    "call_seconds": 0.0,
+                    "first_at": timestamp,
+                    "last_at": timestamp,
+                    "hour_histogram": [0] * 24,
+                    "weekday_histogram": [0] * 7,
+                }
+            row[f"{kind}_{direction}"] += 1
+            row["call_seconds"] += seconds
+            row["first_at"] = min(row["first_at"], timestamp)
+            row["last_at"] = max(row["last_at"], timestamp)
+            row["hour_histogram"][timestamp.hour] += 1
+            row["weekday_histogram"][timestamp.weekday()] += 1
+
+        phone_a, phone_b = sorted((from_phone, to_phone))
+        day = timestamp.astimezone(timezone.utc).date().isoformat()
+        row = self.daily.get((phone_a, phone_b, day))
+        if row is None:
+            row = self.daily[(phone_a, phone_b, day)] = {
+                "phone_a": phone_a, "phone_b": phone_b, "day": day,
+                "calls": 0, "messages": 0, "call_seconds": 0.0,
+            }
+        row[kind] += 1
+        row["call_seconds"] += seconds
+
+    def to_rows(self) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """JSON-ready (summary, daily) rows."""
+        summaries = [
+            {**row, "first_at": row["first_at"].isoformat(), "last_at": row["last_at"].isoformat()}
+            for row in self.summaries.values()
+        ]
+        return summaries, list(self.daily.values())
+
+
+class ContactMatrixService:
+    """Service for maintaining and querying the contact matrix."""
+
+    async def apply(self, deltas: ContactDeltas):
+        """Add collected increments to the contact tables."""
+        summaries, daily = deltas.to_rows()
+        for i in range(0, max(len(summaries), len(daily)), _APPLY_BATCH_SIZE):
+            await supabase_client.rpc("apply_contact_deltas", {
+                "summaries": summaries[i:i + _APPLY_BATCH_SIZE],
+                "daily": daily[i:i + _APPLY_BATCH_SIZE],
+            })
+        if summaries:
+            logger.info(f"Applied {len(summaries)} contact summary and {len(daily)} daily increments")
+
+    async def rebuild(self) -> int:
+        """
+        Recompute the contact matrix from the CALL and MESSAGE relationships in Neo4j.
+
+        Ingestion only counts events when they are first created; run this
+        after correcting existing records.
+        """
+        deltas = ContactDeltas()
+        query = """
+        MATCH (a:Phone)-[r:CALL|MESSAGE]->(b:Phone)
+        WHERE r.timestamp IS NOT NULL
+        RETURN type(r) AS type, a.phone_id AS from_phone, b.phone_id AS to_phone,
+               r.timestamp AS timestamp, coalesce(toFloat(r.duration_sec), 0.0) AS duration
+        """
+        for record in neo4j_client.stream_query(query):
+            deltas.add(
+                record["type"], record["from_phone"], record["to_phone"],
+                parse_timestamp(str(record["timestamp"])), record["duration"]
+            )
+        await supabase_client.delete("contact_summaries", {"total": "gte.0"})
+        await supabase_client.delete("contact_daily", {"calls": "gte.0"})
+        await self.apply(deltas)
+        return len(deltas)
+
+    async def top_contacts(self, phone_id: str, limit: int = 5, rank_by: str = "total") -> List[ContactSummary]:
+        """A phone's contacts, most frequent first, with the contacts' msisdn."""
+        if rank_by not in CONTACT_RANKINGS:
+            raise ValueError(f"Unknown ranking '{rank_by}', expected one of {sorted(CONTACT_RANKINGS)}")
+        rows = await supabase_client.query("contact_summaries", filters={
+            "phone_id": f"eq.{phone_id}",
+            "order": f"{CONTACT_RANKINGS[rank_by]}.desc",
+            "limit": str(limit),
+        })
+        msisdns = {
+            r["phone_id"]: r["msisdn"] for r in neo4j_client.execute_query(
+                "UNWIND $ids AS id MATCH (p:Phone {phone_id: id}) RETURN p.phone_id AS phone_id, p.msisdn AS msisdn",
+                {"ids": [row["contact_id"] for row in rows]}
+            )
+        } if rows else {}
+        return [ContactSummary(**row, msisdn=msisdns.get(row["contact_id"])) for row in rows]
+
+    async def pair_contacts(
+        self,
+        phone_id: str,
+        contact_id: str,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None
+    ) -> PairContacts:
+        """Totals between two phones and their contact volume per day."""
+        summary = await supabase_client.query("contact_summaries", filters={
+            "phone_id": f"eq.{phone_id}", "contact_id": f"eq.{contact_id}"
+        })
+        phone_a, phone_b = sorted((phone_id, contact_id))
+        day_filters = {"phone_a": f"eq.{phone_a}", "phone_b": f"eq.{phone_b}", "order": "day.asc"}
+        bounds = []
+        if start_date is not None:
+            bounds.append(f"day.gte.{start_date.isoformat()}")
+        if end_date is not None:
+            bounds.append(f"day.lte.{end_date.isoformat()}")
+        if bounds:
+            day_filters["and"] = f"({','.join(bounds)})"
+        days = await supabase_client.query("contact_daily", filters=day_filters)
+        return PairContacts(
+            summary=ContactSummary(**summary[0]) if summary else None,
+            daily=[DailyContacts(**row) for row in days]
+        )
+
+
+# Global instance
+contact_matrix = ContactMatrixService()
@@ -7,20 +7,43 @@ import hashlib
 import json
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 import logging
 
 from core.ontology_manager import ontology_manager
 from db.neo4j_client import neo4j_client
+from services.contact_matrix import ContactDeltas
+from services.flow_rollups import RollupDeltas, parse_timestamp
+from services.trajectories import TrackDeltas
 
 logger = logging.getLogger(__name__)
 
+# Relationship ingested in batches by ingest_sightings rather than row by row
+SIGHTING_REL = "SIGHTED_AT"
+_SIGHTING_BATCH_SIZE = 5_000
+
+# Relationships recorded once per event, with the column holding the event's
+# own id. Their MERGE is keyed on it so repeated events between the same pair
+# stay separate relationships; every other relationship is one per pair.
+EVENT_ID_COLUMNS = {
+    "TRANSFER": "txn_id",
+    "CALL": "cdr_id",
+    "MESSAGE": "msg_id",
+    SIGHTING_REL: "sighting_id",
+}
+
 
 class DataIngestor:
     """Service for ingesting structured data into the Mini Gotham graph."""
     
     def __init__(self, data_dir: Path):
         self.data_dir = data_dir
+        # Aggregate increments for events created by this run; applied by
+        # FlowRollupService.apply / ContactMatrixService.apply
+        self.transfer_rollups = RollupDeltas()
+        self.contact_deltas = ContactDeltas()
+        # Sightings written by this run; applied by TrajectoryService.apply
+        self.sighting_tracks = TrackDeltas()
     
     @property
     def ontology(self):
@@ -35,6 +58,52 @@ class DataIngestor:
                 sha256_hash.update(byte_block)
         return sha256_hash.hexdigest()
 
+    def create_indexes(self):
+        """
+        Create lookup indexes on the primary key and resolved-cluster id of every
+        ontology object type, on the ingestion watermark and native
+        timestamp (_ts) of every object and relationship type, and point
+        indexes on the native location (_location) of located object types.
+        """
+        for obj_name, obj_type in self.ontology.objects.items():
+            index_name = f"{obj_name.lower()}_{obj_type.key}_idx"
+            neo4j_client.execute_write(
+                f"CREATE INDEX {index_name} IF NOT EXISTS FOR (n:{obj_name}) ON (n.{obj_type.key})"
+            )
+            neo4j_client.execute_write(
+                f"CREATE INDEX {obj_name.lower()}_ingested_at_idx IF NOT EXISTS "
+                f"FOR (n:{obj_name}) ON (n._ingested_at)"
+            )
+            neo4j_client.execute_write(
+                f"CREATE INDEX {obj_name.lower()}_canonical_id_idx IF NOT EXISTS "
+                f"FOR (n:{obj_name}) ON (n._canonical_id)"
+            )
+            neo4j_client.execute_write(
+                f"CREATE RANGE INDEX {obj_name.lower()}_ts_idx IF NOT EXISTS FOR (n:{obj_name}) ON (n._ts)"
+            )
+            if {"lat", "lon"} <= set(obj_type.properties):
+                # Area, radius and polygon queries seek the native point
+                neo4j_client.execute_write(
+                    f"CREATE POINT INDEX {obj_name.lower()}_location_idx IF NOT EXISTS "
+                    f"FOR (n:{obj_name}) ON (n._location)"
+                )
+        for rel_name in self.ontology.relationships:
+            index_name = f"rel_{rel_name.lower()}_ingested_at_idx"
+            neo4j_client.execute_write(
+                f"CREATE INDEX {index_name} IF NOT EXISTS FOR ()-[r:{rel_name}]-() ON (r._ingested_at)"
+            )
+            # Timelines seek relationships by their native timestamp
+            neo4j_client.execute_write(
+                f"CREATE RANGE INDEX rel_{rel_name.lower()}_ts_idx IF NOT EXISTS FOR ()-[r:{rel_name}]-() ON (r._ts)"
+            )
+        # Co-location reads calls by cell and events by location
+        neo4j_client.execute_write(
+            "CREATE INDEX rel_call_cell_location_idx IF NOT EXISTS FOR ()-[r:CALL]-() ON (r.cell_location_id)"
+        )
+        neo4j_client.execute_write(
+            "CREATE INDEX event_location_id_idx IF NOT EXISTS FOR (n:Event) ON (n.location_id)"
+        )
+
     def ingest_objects(self):
         """Ingest all primary objects defined in the ontology."""
         for obj_name, obj_type in self.ontology.objects.items():
@@ -57,14 +126,20 @@ class DataIngestor:
                     self._create_node(obj_name, obj_type, row, file_name, file_hash, ingested_at)
 
     def _create_node(self, label: str, obj_type: Any, properties: Dict[str, Any], source: str, file_hash: str, ingested_at: str):
-        """Create a single node in Neo4j with provenance."""
+        """
+        Create a single node in Neo4j with provenance.
+        
+        _record_hash fingerprints the row itself; _ingested_at only moves when it
+        changes, so consumers (incremental entity resolution) can pick up new
+        and changed records through the _ingested_at index.
+        """
         # Clean up empty strings and ensure correct keys
         cleaned_props = {k: v for k, v in properties.items() if v != ""}
+        record_hash = hashlib.sha256(json.dumps(cleaned_props, sort_keys=True).encode()).hexdigest()
         
         # Add provenance
         cleaned_props["_source"] = source
         cleaned_props["_hash"] = file_hash
-        cleaned_props["_ingested_at"] = ingested_at
         
         # Build Cypher query
         key_field = obj_type.key
@@ -78,19 +153,27 @@ class DataIngestor:
         # We use UNWIND/Map approach for cleaner code but for simple ingestion MERGE is fine
         query = f"""
         MERGE (n:{label} {{{key_field}: $key_value}})
-        SET n += $props
+        WITH n, coalesce(n._record_hash = $record_hash, false) AS unchanged
+        SET n += $props,
+            n._record_hash = $record_hash,
+            n._ingested_at = CASE WHEN unchanged THEN n._ingested_at ELSE $ingested_at END,
+            n._ts = datetime(coalesce(n.timestamp, n.start_time)),
+            n._location = CASE WHEN n.lat IS NOT NULL AND n.lon IS NOT NULL
+                THEN point({latitude: toFloat(n.lat), longitude: toFloat(n.lon)}) END
         RETURN n
         """
         
         neo4j_client.execute_write(query, {
             "key_value": key_value,
-            "props": cleaned_props
+            "props": cleaned_props,
+            "record_hash": record_hash,
+            "ingested_at": ingested_at
         })
 
     def ingest_relationships(self):
         """Ingest all relationships defined in the ontology."""
         for rel_name, rel_def in self.ontology.relationships.items():
-            if not rel_def.dataset:
+            if not rel_def.dataset or rel_name == SIGHTING_REL:
                 continue
                 
             file_path = self.data_dir / rel_def.dataset
@@ -99,23 +182,124 @@ class DataIngestor:
                 continue
                 
             logger.info(f"Ingesting relationship {rel_name} from {rel_def.dataset}")
+            ingested_at = datetime.utcnow().isoformat()
             
             with open(file_path, 'r', encoding='utf-8') as f:
                 reader = csv.DictReader(f)
+                event_id = EVENT_ID_COLUMNS.get(rel_name)
+                if event_id and event_id not in (reader.fieldnames or []):
+                    raise ValueError(f"{rel_def.dataset} has no {event_id} column to key {rel_name} events on")
                 for row in reader:
-                    self._create_relationship(rel_name, rel_def, row)
+                    if self._create_relationship(rel_name, rel_def, row, ingested_at):
+                        self._count_event(rel_name, row)
 
-    def _create_relationship(self, rel_type: str, rel_def: Any, row: Dict[str, Any]):
-        """Create a single relationship between two nodes."""
+    def ingest_sightings(self):
+        """
+        Ingest sightings (ANPR / CCTV / border hits of any entity at a
+        location) in batches: one UNWIND per entity type and batch, MERGEd on
+        sighting_id. Every sighting written is added to sighting_tracks with
+        its own coordinates, or its location's when the row has none.
+        """
+        rel_def = self.ontology.relationships.get(SIGHTING_REL)
+        if rel_def is None or not rel_def.dataset:
+            return
+        file_path = self.data_dir / rel_def.dataset
+        if not file_path.exists():
+            logger.warning(f"Dataset for relationship {SIGHTING_REL} not found: {file_path}")
+            return
+
+        logger.info(f"Ingesting relationship {SIGHTING_REL} from {rel_def.dataset} in batches")
+        ingested_at = datetime.utcnow().isoformat()
+        batches: Dict[str, List[Dict[str, Any]]] = {}
+        written = 0
+        with open(file_path, 'r', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                label = row.get("entity_type")
+                if label not in self.ontology.objects or not row.get("entity_id") or not row.get("sighting_id"):
+                    logger.debug(f"Skipping malformed {SIGHTING_REL} row {row}")
+                    continue
+                batch = batches.setdefault(label, [])
+                batch.append(row)
+                if len(batch) >= _SIGHTING_BATCH_SIZE:
+                    written += self._write_sightings(label, rel_def.to_type, batch, ingested_at)
+                    batches[label] = []
+        for label, batch in batches.items():
+            if batch:
+                written += self._write_sightings(label, rel_def.to_type, batch, ingested_at)
+        logger.info(f"Wrote {written} sightings")
+
+    def _write_sightings(self, label: str, to_type: str, rows: List[Dict[str, Any]], ingested_at: str) -> int:
+        """MERGE one batch of sightings of a single entity type; returns how many matched both ends."""
+        from_key = self.ontology.objects[label].key
+        to_key = self.ontology.objects[to_type].key
+        query = f"""
+        UNWIND $rows AS row
+        MATCH (a:{label} {{{from_key}: row.entity_id}})
+        MATCH (l:{to_type} {{{to_key}: row.to_id}})
+        MERGE (a)-[r:{SIGHTING_REL} {{sighting_id: row.props.sighting_id}}]->(l)
+        SET r += row.props, r._ts = datetime(r.timestamp)
+        RETURN row.entity_id AS entity_id, r.sighting_id AS sighting_id, r._ts.epochSeconds AS t,
+               coalesce(toFloat(r.lat), l._location.latitude) AS lat,
+               coalesce(toFloat(r.lon), l._location.longitude) AS lon,
+               l.{to_key} AS location_id, r.source AS source
+        """
+        params = [
+            {
+                "entity_id": row["entity_id"],
+                "to_id": row.get(to_key),
+                "props": {
+                    **{k: v for k, v in row.items() if v != "" and k not in ("entity_id", "entity_type")},
+                    "_ingested_at": ingested_at,
+                },
+            }
+            for row in rows
+        ]
+        records = neo4j_client.execute_write(query, {"rows": params})
+        for record in records:
+            if record["t"] is not None and record["lat"] is not None and record["lon"] is not None:
+                self.sighting_tracks.add(
+                    label, record["entity_id"], record["sighting_id"], record["t"],
+                    record["lat"], record["lon"], record["location_id"], record["source"]
+                )
+        return len(records)
+
+    def _count_event(self, rel_type: str, row: Dict[str, Any]):
+        """Add a newly created transfer, call or message to the aggregate increments."""
+        if rel_type not in ("TRANSFER", "CALL", "MESSAGE"):
+            return
+        try:
+            timestamp = parse_timestamp(row["timestamp"])
+            if rel_type == "TRANSFER":
+                self.transfer_rollups.add(
+                    row["from_account"], row["to_account"], timestamp, float(row["amount_usd"])
+                )
+            else:
+                self.contact_deltas.add(
+                    rel_type, row["from_phone"], row["to_phone"], timestamp, float(row.get("duration_sec") or 0)
+                )
+        except (KeyError, ValueError):
+            logger.debug(f"Skipping {rel_type} aggregates for malformed row {row}")
+
+    def _create_relationship(self, rel_type: str, rel_def: Any, row: Dict[str, Any], ingested_at: str) -> bool:
+        """Create or update a single relationship between two nodes; True if it was created."""
         from_type = rel_def.from_type
         to_type = rel_def.to_type
         
+        # Handle generic '*' from_type (sightings of any entity at a location)
+        if from_type == "*":
+            from_label = row.get("entity_type")
+            from_val = row.get("entity_id")
+            to_val = row.get(self.ontology.objects[to_type].key) if to_type in self.ontology.objects else None
+            if from_label and from_val and to_val:
+                return self._create_generic_rel(from_val, from_label, to_val, to_type, rel_type, row, ingested_at)
+            return False
+
         # Determine from_key
         try:
             from_key = self.ontology.objects[from_type].key
         except KeyError:
             logger.error(f"From type {from_type} not found in ontology for {rel_type}")
-            return
+            return False
 
         # Handle generic '*' to_type
         if to_type == "*":
@@ -123,14 +307,14 @@ class DataIngestor:
             to_val = row.get("entity_id")
             from_val = row.get("doc_id") # Specifically for DOC_MENTIONS_ENTITY
             if to_label and to_val and from_val:
-                self._create_generic_rel(from_val, from_type, to_val, to_label, rel_type, row)
-            return
+                return self._create_generic_rel(from_val, from_type, to_val, to_label, rel_type, row, ingested_at)
+            return False
 
         try:
             to_key = self.ontology.objects[to_type].key
         except KeyError:
             logger.error(f"To type {to_type} not found in ontology for {rel_type}")
-            return
+            return False
         
         # Determine which columns in the CSV map to the from/to keys
         # This is a bit heuristic for this dataset
@@ -145,6 +329,7 @@ class DataIngestor:
         if "from_phone" in row and from_type == "Phone": from_val = row["from_phone"]
         if "to_phone" in row and to_type == "Phone": to_val = row["to_phone"]
         if "person_id" in row and from_type == "Person": from_val = row["person_id"]
+        if "holder_person_id" in row and from_type == "Person": from_val = row["holder_person_id"]
         if "phone_id" in row and to_type == "Phone": to_val = row["phone_id"]
         if "device_id" in row and to_type == "Device": to_val = row["device_id"]
         if "vehicle_id" in row and to_type == "Vehicle": to_val = row["vehicle_id"]
@@ -172,59 +357,170 @@ class DataIngestor:
                 to_label = row.get("entity_type")
                 to_val = row.get("entity_id")
                 if from_val and to_val and to_label:
-                    self._create_generic_rel(from_val, "Document", to_val, to_label, rel_type, row)
-                    return
+                    self._create_generic_rel(from_val, "Document", to_val, to_label, rel_type, row, ingested_at)
+                    return False
 
         if not from_val or not to_val:
             # logger.debug(f"Could not find IDs for {rel_type} in row {row}")
-            return
+            return False
 
+        rel_key, merge_key = self._event_key(rel_type, row)
         query = f"""
         MATCH (a:{from_type} {{{from_key}: $from_val}})
         MATCH (b:{to_type} {{{to_key}: $to_val}})
-        MERGE (a)-[r:{rel_type}]->(b)
-        SET r += $props
+        MERGE (a)-[r:{rel_type}{merge_key}]->(b)
+        WITH r, r._ingested_at IS NULL AS created
+        SET r += $props, r._ts = datetime(r.timestamp)
+        RETURN created
         """
         
         props = {k: v for k, v in row.items() if v != "" and k not in [from_key, to_key, 'from_phone', 'to_phone', 'from_account', 'to_account']}
+        props["_ingested_at"] = ingested_at
         
-        neo4j_client.execute_write(query, {
+        result = neo4j_client.execute_write(query, {
             "from_val": from_val,
             "to_val": to_val,
+            "rel_key_val": row.get(rel_key) if rel_key else None,
             "props": props
         })
+        return bool(result) and result[0]["created"]
+
+    @staticmethod
+    def _event_key(rel_type: str, row: Dict[str, Any]) -> Tuple[Optional[str], str]:
+        """
+        The EVENT_ID_COLUMNS column keying the MERGE of an event relationship,
+        so repeated events between the same pair do not overwrite each other.
+
+        Returns (key column or None, MERGE property map fragment).
 
-    def _create_generic_rel(self, from_val, from_label, to_val, to_label, rel_type, props):
+        Raises:
+            ValueError: If an event row has no id
+        """
+        rel_key = EVENT_ID_COLUMNS.get(rel_type)
+        if rel_key is None:
+            return None, ""
+        if not row.get(rel_key):
+            raise ValueError(f"{rel_type} row has no {rel_key}: {row}")
+        return rel_key, f" {{{rel_key}: $rel_key_val}}"
+
+    def _create_generic_rel(self, from_val, from_label, to_val, to_label, rel_type, props, ingested_at) -> bool:
+        if from_label not in self.ontology.objects or to_label not in self.ontology.objects:
+            logger.debug(f"Unknown label in {rel_type} row: {from_label} -> {to_label}")
+            return False
         from_key = self.ontology.objects[from_label].key
         to_key = self.ontology.objects[to_label].key
+        rel_key, merge_key = self._event_key(rel_type, props)
         
         query = f"""
         MATCH (a:{from_label} {{{from_key}: $from_val}})
         MATCH (b:{to_label} {{{to_key}: $to_val}})
-        MERGE (a)-[r:{rel_type}]->(b)
-        SET r += $props
+        MERGE (a)-[r:{rel_type}{merge_key}]->(b)
+        WITH r, r._ingested_at IS NULL AS created
+        SET r += $props, r._ts = datetime(r.timestamp)
+        RETURN created
         """
         
-        clean_props = {k: v for k, v in props.items() if k not in ['doc_id', 'entity_id', 'entity_type']}
+        clean_props = {k: v for k, v in props.items() if v != "" and k not in ['doc_id', 'entity_id', 'entity_type']}
+        clean_props["_ingested_at"] = ingested_at
         
-        neo4j_client.execute_write(query, {
+        result = neo4j_client.execute_write(query, {
             "from_val": from_val,
             "to_val": to_val,
+            "rel_key_val": props.get(rel_key) if rel_key else None,
             "props": clean_props
         })
+        return bool(result) and result[0]["created"]
+
+
+    def backfill_native_timestamps(self):
+        """
+        Set _ts, the native DateTime of the `timestamp` (or event `start_time`)
+        string, on nodes and relationships ingested before it was stored, so
+        range indexes and timeline windows cover them.
+        """
+        logger.info("Backfilling native timestamps")
+        # CALL ... IN TRANSACTIONS needs an auto-commit transaction, hence execute_query
+        neo4j_client.execute_query("""
+        MATCH ()-[r]->()
+        WHERE r.timestamp IS NOT NULL AND r._ts IS NULL
+        CALL {
+            WITH r
+            SET r._ts = datetime(r.timestamp)
+        } IN TRANSACTIONS OF 10000 ROWS
+        """)
+        neo4j_client.execute_query("""
+        MATCH (n)
+        WHERE coalesce(n.timestamp, n.start_time) IS NOT NULL AND n._ts IS NULL
+        CALL {
+            WITH n
+            SET n._ts = datetime(coalesce(n.timestamp, n.start_time))
+        } IN TRANSACTIONS OF 10000 ROWS
+        """)
+
+    def backfill_points(self):
+        """
+        Set _location, the native point of the lat / lon strings, on nodes
+        ingested before it was stored, so point indexes cover them.
+        """
+        logger.info("Backfilling native points")
+        neo4j_client.execute_query("""
+        MATCH (n)
+        WHERE n.lat IS NOT NULL AND n.lon IS NOT NULL AND n._location IS NULL
+        CALL {
+            WITH n
+            SET n._location = point({latitude: toFloat(n.lat), longitude: toFloat(n.lon)})
+        } IN TRANSACTIONS OF 10000 ROWS
+        """)
+
+    def update_degree_counts(self):
+        """
+        Precompute per-relationship-type degree counts on every node.
+        
+        Stored as parallel lists (_degree_types / _degree_counts) plus the total
+        (_degree) so graph expansion can spot supernodes before touching their edges.
+        """
+        logger.info("Updating node degree counts")
+        # CALL ... IN TRANSACTIONS needs an auto-commit transaction, hence execute_query
+        query = """
+        MATCH (n)
+        CALL {
+            WITH n
+            OPTIONAL MATCH (n)-[r]-()
+            WITH n, type(r) AS rel_type, count(r) AS rel_count
+            WITH n,
+                 collect(CASE WHEN rel_type IS NOT NULL THEN rel_type END) AS types,
+                 collect(CASE WHEN rel_type IS NOT NULL THEN rel_count END) AS counts
+            SET n._degree_types = types,
+                n._degree_counts = counts,
+                n._degree = reduce(total = 0, c IN counts | total + c)
+        } IN TRANSACTIONS OF 10000 ROWS
+        """
+        neo4j_client.execute_query(query)
 
 
-def run_ingestion(data_path: str):
-    """Convenience function to run the full ingestion."""
+def run_ingestion(data_path: str) -> DataIngestor:
+    """Convenience function to run the full ingestion; returns the ingestor with its aggregate increments."""
     ingestor = DataIngestor(Path(data_path))
     
     # Load ontology first
     ontology_manager.load_ontology(Path(data_path) / "ontology.yaml")
     
+    # Key indexes make the MERGEs below (and key lookups in the API) index seeks
+    ingestor.create_indexes()
+    
     # Ingest objects
     ingestor.ingest_objects()
     
     # Ingest relationships
     ingestor.ingest_relationships()
+    ingestor.ingest_sightings()
+    
+    # Records ingested before native timestamps and points were stored
+    ingestor.backfill_native_timestamps()
+    ingestor.backfill_points()
+    
+    # Degree counts depend on the final set of relationships
+    ingestor.update_degree_counts()
     
     logger.info("Ingestion complete!")
+    return ingestor
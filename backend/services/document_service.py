@@ -4,6 +4,7 @@ Document Service - Handles file storage, retrieval, and entity mentions.
 import logging
 from typing import List, Dict, Any, Optional
 from db.neo4j_client import neo4j_client
+from services.entity_service import plain_properties
 
 logger = logging.getLogger(__name__)
 
@@ -16,7 +17,7 @@ class DocumentService:
         query = "MATCH (d:Document {doc_id: $id}) RETURN d"
         result = neo4j_client.execute_query(query, {"id": doc_id})
         if result:
-             return dict(result[0]["n"])
+             return plain_properties(result[0]["d"])
         return None
 
     async def get_mentions(self, doc_id: str) -> List[Dict[str, Any]]:
@@ -31,7 +32,7 @@ class DocumentService:
                 "id": str(r["e"].id),
                 "type": r["type"],
                 "mention": r["mention"],
-                "properties": dict(r["e"])
+                "properties": plain_properties(r["e"])
             } 
             for r in results
         ]
@@ -44,7 +45,7 @@ class DocumentService:
         RETURN d
         """
         results = neo4j_client.execute_query(query, {"q": text_query})
-        return [dict(r["d"]) for r in results]
+        return [plain_properties(r["d"]) for r in results]
 
 
 # Global instance
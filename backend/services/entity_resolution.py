@@ -1,85 +1,964 @@
 """
 Entity Resolution Service - Identifies potential duplicate entities and manages merges.
+
+Candidates come from blocking rather than comparing every pair: each record
+emits a handful of blocking keys (exact DOB, phonetic codes of name tokens,
+normalized plates / numbers, MinHash LSH bands over character n-grams), and
+only records sharing a key are compared. Candidate pairs are then scored
+field by field with vectorized similarity functions and combined into a
+weighted confidence per resolution profile.
+
+After the initial run, resolution is incremental: blocking keys live in the
+resolution_blocks table, each run compares only records whose _ingested_at
+moved past the per-type watermark against the members of their blocks, and
+matches are queued in merge_suggestions for suggest_merges to serve.
+
+Resolved clusters are materialized: every member of a SAME_AS cluster
+carries the indexed _canonical_id of the cluster, maintained with a
+union-find on merge, unmerge and rebuild, so cluster lookups are an
+equality match instead of a variable-length traversal.
 """
+import hashlib
 import logging
-from typing import List, Dict, Any
+import re
+import unicodedata
+import zlib
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from core.config import settings
 from db.neo4j_client import neo4j_client
-from models.schemas import Entity
+from db.supabase_client import in_list, supabase_client
+from services.graph_projection import unique_sorted
 
 logger = logging.getLogger(__name__)
 
+# Bits per record in the n-gram and phonetic token bloom filters
+_TEXT_BITS = 512
+_TOKEN_BITS = 64
+_MINHASH_PRIME = (1 << 31) - 1
+_SCORE_BATCH_SIZE = 250_000
+# Rows per Supabase write, and keys per in.() filter
+_INDEX_BATCH_SIZE = 1000
+_LOOKUP_BATCH_SIZE = 300
+_CANONICAL_BATCH_SIZE = 10_000
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+_SOUNDEX_CODES = {
+    **dict.fromkeys("bfpv", "1"), **dict.fromkeys("cgjkqsxz", "2"),
+    **dict.fromkeys("dt", "3"), "l": "4", **dict.fromkeys("mn", "5"), "r": "6",
+}
+
+
+# --- Normalization ---
+def normalize_text(value: Any) -> str:
+    """Lowercase, strip accents and punctuation, collapse whitespace."""
+    if value is None:
+        return ""
+    text = str(value)
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text)
+        text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(_NON_ALNUM.sub(" ", text.lower()).split())
+
+
+def normalize_compact(value: Any) -> str:
+    """normalize_text without spaces, for plates and identifiers."""
+    return normalize_text(value).replace(" ", "")
+
+
+def normalize_digits(value: Any) -> str:
+    """Digits only, for phone numbers."""
+    return re.sub(r"\D", "", str(value)) if value is not None else ""
+
+
+@lru_cache(maxsize=100_000)
+def soundex(token: str) -> str:
+    """American Soundex code of a normalized token ('' for tokens without letters)."""
+    letters = [c for c in token if c.isalpha()]
+    if not letters:
+        return ""
+    code = letters[0].upper()
+    previous = _SOUNDEX_CODES.get(letters[0], "")
+    for c in letters[1:]:
+        digit = _SOUNDEX_CODES.get(c, "")
+        if digit and digit != previous:
+            code += digit
+            if len(code) == 4:
+                break
+        if c not in "hw":
+            previous = digit
+    return code.ljust(4, "0")
+
+
+def phonetic_tokens(value: Any) -> List[str]:
+    """Distinct Soundex codes of the name tokens, in order; initials are dropped."""
+    codes = []
+    for token in normalize_text(value).split():
+        code = soundex(token) if len(token) > 1 else ""
+        if code and code not in codes:
+            codes.append(code)
+    return codes
+
+
+def ngrams(text: str, n: int) -> List[str]:
+    """Character n-grams of a padded string."""
+    if not text:
+        return []
+    padded = f" {text} "
+    return [padded[i:i + n] for i in range(max(len(padded) - n + 1, 1))]
+
+
+def stable_hash(value: str) -> int:
+    """Process-independent signed 64-bit hash of a string."""
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "little", signed=True)
+
+
+# --- Blocking ---
+def minhash_signatures(shingles: List[List[str]], num_perm: int, seed: int = 1) -> np.ndarray:
+    """
+    MinHash signatures (records x num_perm) of shingle sets.
+
+    Records without shingles get an all-max signature, which never matches a
+    real one.
+    """
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, _MINHASH_PRIME, num_perm, dtype=np.uint64)
+    b = rng.integers(0, _MINHASH_PRIME, num_perm, dtype=np.uint64)
+    signatures = np.full((len(shingles), num_perm), _MINHASH_PRIME, dtype=np.uint64)
+
+    # Chunk by record so the (shingles x num_perm) matrix stays small
+    chunk = max(1, 2_000_000 // num_perm // 16)
+    for start in range(0, len(shingles), chunk):
+        block = shingles[start:start + chunk]
+        counts = np.fromiter((len(s) for s in block), dtype=np.int64, count=len(block))
+        present = np.flatnonzero(counts)
+        if len(present) == 0:
+            continue
+        values = np.fromiter(
+            (zlib.crc32(g.encode()) for s in block for g in s), dtype=np.uint64, count=int(counts.sum())
+        )
+        hashed = (values[:, None] * a + b) % _MINHASH_PRIME
+        offsets = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        signatures[start + present] = np.minimum.reduceat(hashed, offsets[present], axis=0)
+    return signatures
+
+
+def lsh_band_keys(signatures: np.ndarray, bands: int) -> np.ndarray:
+    """One int64 blocking key per (record, band): records x bands."""
+    rows = signatures.shape[1] // bands
+    keys = np.empty((signatures.shape[0], bands), dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for band in range(bands):
+            h = np.full(signatures.shape[0], 0x9E3779B97F4A7C15 ^ band, dtype=np.uint64)
+            for column in signatures[:, band * rows:(band + 1) * rows].T:
+                h = (h ^ column) * np.uint64(0x100000001B3)
+            keys[:, band] = h
+    return keys.view(np.int64)
+
+
+def candidate_pairs(keys: np.ndarray, owners: np.ndarray, max_block_size: int) -> Tuple[np.ndarray, np.ndarray, int]:
+    """
+    All pairs of records sharing a blocking key.
+
+    Args:
+        keys: Blocking key per entry (a record emits each of its keys once)
+        owners: Record index per entry
+        max_block_size: Blocks larger than this are skipped as uninformative
+
+    Returns:
+        (left, right, skipped_blocks) with left < right, deduplicated
+    """
+    if len(keys) == 0:
+        return np.empty(0, np.int64), np.empty(0, np.int64), 0
+    order = np.argsort(keys, kind="stable")
+    keys, owners = keys[order], owners[order].astype(np.int64)
+
+    starts = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]]))
+    sizes = np.diff(np.append(starts, len(keys)))
+    usable = (sizes >= 2) & (sizes <= max_block_size)
+    skipped = int(np.count_nonzero(sizes > max_block_size))
+
+    in_usable = np.repeat(usable, sizes)
+    members = np.flatnonzero(in_usable)
+    block_end = np.repeat(starts + sizes, sizes)[in_usable]
+    # Member at position p of its block pairs with the members after it
+    later = block_end - members - 1
+    left = np.repeat(members, later)
+    run_start = np.repeat(np.cumsum(later) - later, later)
+    right = left + 1 + (np.arange(len(left)) - run_start)
+
+    a, b = owners[left], owners[right]
+    lo, hi = np.minimum(a, b), np.maximum(a, b)
+    n = int(owners.max()) + 1
+    codes = unique_sorted((lo * n + hi)[lo != hi])
+    return codes // n, codes % n, skipped
+
+
+# --- Field encoders and similarities ---
+def _bloom(items: List[List[str]], bits: int) -> np.ndarray:
+    """Bloom-style bit sets (records x bits/64 words) of string items."""
+    packed = np.zeros((len(items), bits // 8), dtype=np.uint8)
+    chunk = 100_000
+    for start in range(0, len(items), chunk):
+        block = items[start:start + chunk]
+        counts = np.fromiter((len(i) for i in block), dtype=np.int64, count=len(block))
+        owners = np.repeat(np.arange(len(block)), counts)
+        positions = np.fromiter(
+            (zlib.crc32(x.encode()) % bits for i in block for x in i), dtype=np.int64, count=int(counts.sum())
+        )
+        flat = np.zeros(len(block) * bits, dtype=bool)
+        flat[owners * bits + positions] = True
+        packed[start:start + len(block)] = np.packbits(flat.reshape(len(block), bits), axis=1)
+    return packed.view(np.uint64)
+
+
+def _popcount(words: np.ndarray) -> np.ndarray:
+    """Set bits per row of a uint64 matrix."""
+    if hasattr(np, "bitwise_count"):  # NumPy >= 2.0
+        return np.bitwise_count(words).sum(axis=1, dtype=np.int32)
+    return _POPCOUNT[words.view(np.uint8)].sum(axis=1, dtype=np.int32)
+
+
+def _encode_text(values: List[Any], normalize: Callable[[Any], str] = normalize_text, n: int = 3):
+    texts = [normalize(v) for v in values]
+    return _bloom([ngrams(t, n) for t in texts], _TEXT_BITS), np.array([bool(t) for t in texts])
+
+
+def _text_similarity(encoded, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Jaccard similarity of character n-gram sets."""
+    bits, _ = encoded
+    union = _popcount(bits[a] | bits[b])
+    return np.divide(_popcount(bits[a] & bits[b]), union, out=np.zeros(len(a)), where=union > 0)
+
+
+def _encode_phonetic(values: List[Any]):
+    tokens = [phonetic_tokens(v) for v in values]
+    return _bloom(tokens, _TOKEN_BITS), np.array([bool(t) for t in tokens])
+
+
+def _phonetic_similarity(encoded, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Overlap coefficient of phonetic name tokens, so extra middle names cost little."""
+    bits, _ = encoded
+    smaller = np.minimum(_popcount(bits[a]), _popcount(bits[b]))
+    return np.divide(_popcount(bits[a] & bits[b]), smaller, out=np.zeros(len(a)), where=smaller > 0)
+
+
+def _encode_exact(values: List[Any]):
+    codes: Dict[str, int] = {}
+    normalized = [normalize_compact(v) for v in values]
+    encoded = np.array([codes.setdefault(v, len(codes)) if v else -1 for v in normalized], dtype=np.int64)
+    return encoded, encoded >= 0
+
+
+def _exact_similarity(encoded, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    codes, _ = encoded
+    return (codes[a] == codes[b]).astype(np.float64)
+
+
+def _encode_date(values: List[Any]):
+    parts = np.full((len(values), 3), -1, dtype=np.int64)
+    for i, value in enumerate(values):
+        match = re.match(r"^(\d{4})-(\d{1,2})-(\d{1,2})", str(value or ""))
+        if match:
+            parts[i] = [int(g) for g in match.groups()]
+    return parts, parts[:, 0] >= 0
+
+
+def _date_similarity(encoded, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """1 for equal dates, partial credit for swapped day/month or one differing component."""
+    parts, _ = encoded
+    pa, pb = parts[a], parts[b]
+    equal = (pa == pb).sum(axis=1)
+    swapped = (pa[:, 0] == pb[:, 0]) & (pa[:, 1] == pb[:, 2]) & (pa[:, 2] == pb[:, 1])
+    return np.select([equal == 3, swapped, equal == 2], [1.0, 0.8, 0.5], 0.0)
+
+
+def _encode_phone(values: List[Any]):
+    digits = [normalize_digits(v) for v in values]
+    national = np.array([int(d[-9:]) if d else -1 for d in digits], dtype=np.int64)
+    return national, _encode_text(digits, normalize=lambda d: d, n=2)[0], national >= 0
+
+
+def _phone_similarity(encoded, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """1 when the national numbers (last 9 digits) match, digit-bigram Jaccard otherwise."""
+    national, bits, present = encoded
+    fuzzy = _text_similarity((bits, present), a, b)
+    return np.where(national[a] == national[b], 1.0, fuzzy)
+
+
+COMPARATORS = {
+    "text": (_encode_text, _text_similarity),
+    "compact": (lambda v: _encode_text(v, normalize=normalize_compact, n=2), _text_similarity),
+    "phonetic": (_encode_phonetic, _phonetic_similarity),
+    "exact": (_encode_exact, _exact_similarity),
+    "date": (_encode_date, _date_similarity),
+    "phone": (_encode_phone, _phone_similarity),
+}
+
+
+# --- Resolution profiles ---
+def _person_blocks(record: Dict[str, Any]) -> List[str]:
+    dob = str(record.get("dob") or "")
+    codes = phonetic_tokens(record.get("full_name"))
+    keys = [f"dob:{dob}"] if dob else []
+    if len(codes) >= 2:
+        keys.append(f"first_last:{':'.join(sorted([codes[0], codes[-1]]))}")
+    elif codes:
+        keys.append(f"name:{codes[0]}:{dob[:4]}")
+    return keys
+
+
+def _phone_blocks(record: Dict[str, Any]) -> List[str]:
+    digits = normalize_digits(record.get("msisdn"))
+    return [f"national:{digits[-9:]}", f"local:{digits[-7:]}"] if digits else []
+
+
+def _vehicle_blocks(record: Dict[str, Any]) -> List[str]:
+    plate = normalize_compact(record.get("plate"))
+    keys = [f"plate:{plate}"] if plate else []
+    digits = normalize_digits(plate)
+    if digits:
+        keys.append(f"plate_digits:{digits}:{normalize_compact(record.get('registered_country'))}")
+    return keys
+
+
+def _account_blocks(record: Dict[str, Any]) -> List[str]:
+    holder = record.get("holder_person_id") or record.get("holder_org_id")
+    if not holder:
+        return []
+    return [
+        f"holder_provider:{holder}:{normalize_compact(record.get('provider'))}",
+        f"holder_type:{holder}:{normalize_compact(record.get('account_type'))}",
+    ]
+
+
+# Per entity type: key property, scored fields (property, comparator, weight;
+# weights sum to 1), blocking keys and the field MinHash LSH runs over.
+RESOLUTION_PROFILES: Dict[str, Dict[str, Any]] = {
+    "Person": {
+        "key": "person_id",
+        "display": "full_name",
+        "fields": [
+            ("full_name", "text", 0.35),
+            ("full_name", "phonetic", 0.20),
+            ("dob", "date", 0.30),
+            ("nationality", "exact", 0.10),
+            ("sex", "exact", 0.05),
+        ],
+        "blocks": _person_blocks,
+        "lsh": ("full_name", normalize_text, 3),
+    },
+    "Phone": {
+        "key": "phone_id",
+        "display": "msisdn",
+        "fields": [
+            ("msisdn", "phone", 0.70),
+            ("country", "exact", 0.15),
+            ("carrier", "exact", 0.15),
+        ],
+        "blocks": _phone_blocks,
+        "lsh": None,
+    },
+    "Vehicle": {
+        "key": "vehicle_id",
+        "display": "plate",
+        "fields": [
+            ("plate", "compact", 0.55),
+            ("make", "exact", 0.15),
+            ("model", "exact", 0.10),
+            ("colour", "exact", 0.05),
+            ("registered_country", "exact", 0.15),
+        ],
+        "blocks": _vehicle_blocks,
+        "lsh": ("plate", normalize_compact, 2),
+    },
+    "Account": {
+        "key": "account_id",
+        "display": "provider",
+        "fields": [
+            ("holder_person_id", "exact", 0.30),
+            ("holder_org_id", "exact", 0.20),
+            ("provider", "exact", 0.30),
+            ("account_type", "exact", 0.10),
+            ("country", "exact", 0.10),
+        ],
+        "blocks": _account_blocks,
+        "lsh": None,
+    },
+}
+
+
+def get_profile(entity_type: str) -> Dict[str, Any]:
+    """Resolution profile of an entity type; ValueError for unsupported types."""
+    if entity_type not in RESOLUTION_PROFILES:
+        raise ValueError(
+            f"Entity resolution is not supported for '{entity_type}'. "
+            f"Use one of {sorted(RESOLUTION_PROFILES)}"
+        )
+    return RESOLUTION_PROFILES[entity_type]
+
+
+def block_keys(profile: Dict[str, Any], records: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Blocking keys of all records as (keys, owners) int64 arrays."""
+    keys: List[int] = []
+    owners: List[int] = []
+    for i, record in enumerate(records):
+        for key in profile["blocks"](record):
+            keys.append(stable_hash(key))
+            owners.append(i)
+    keys_arr = np.array(keys, dtype=np.int64)
+    owners_arr = np.array(owners, dtype=np.int64)
+
+    if profile["lsh"] is not None:
+        prop, normalize, n = profile["lsh"]
+        shingles = [ngrams(normalize(r.get(prop)), n) for r in records]
+        signatures = minhash_signatures(shingles, settings.resolution_minhash_permutations)
+        bands = lsh_band_keys(signatures, settings.resolution_lsh_bands)
+        has_shingles = np.array([bool(s) for s in shingles])
+        bands = bands[has_shingles]
+        keys_arr = np.concatenate([keys_arr, bands.ravel()])
+        owners_arr = np.concatenate([
+            owners_arr, np.repeat(np.flatnonzero(has_shingles), bands.shape[1])
+        ])
+    return keys_arr, owners_arr
+
+
+class FieldEncoding:
+    """Per-field encodings of a record set, reused to score any pair of its records."""
+
+    def __init__(self, profile: Dict[str, Any], records: List[Dict[str, Any]]):
+        self.profile = profile
+        self.encoded = []
+        for prop, comparator, _ in profile["fields"]:
+            encode, _ = COMPARATORS[comparator]
+            self.encoded.append(encode([r.get(prop) for r in records]))
+
+    def score(self, a: np.ndarray, b: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Confidence of each pair and the per-field similarities (pairs x fields).
+
+        A field missing on either side contributes a neutral 0.5, so sparse
+        records neither gain nor lose confidence from absent evidence.
+        """
+        similarities = np.empty((len(a), len(self.profile["fields"])))
+        for j, ((_, comparator, _), encoded) in enumerate(zip(self.profile["fields"], self.encoded)):
+            _, similarity = COMPARATORS[comparator]
+            present = encoded[-1]
+            both = present[a] & present[b]
+            similarities[:, j] = np.where(both, similarity(encoded, a, b), np.nan)
+        weights = np.array([w for _, _, w in self.profile["fields"]])
+        confidence = np.where(np.isnan(similarities), 0.5, similarities) @ weights
+        return confidence, similarities
+
+
+def describe_match(profile: Dict[str, Any], similarities: np.ndarray) -> str:
+    """Human-readable reason from one pair's field similarities."""
+    parts = []
+    for (prop, comparator, _), similarity in zip(profile["fields"], similarities):
+        if np.isnan(similarity) or similarity < 0.5:
+            continue
+        label = prop.replace("_", " ")
+        if comparator == "phonetic":
+            label += " (phonetic)"
+        parts.append(f"{'Same' if similarity >= 0.999 else 'Similar'} {label}"
+                     + ("" if similarity >= 0.999 else f" ({similarity:.2f})"))
+    return ", ".join(parts) or "Weak match"
+
+
+def _batches(items: List[Any], size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class DisjointSet:
+    """Union-find with path halving and union by size over hashable items."""
+
+    def __init__(self, items: Optional[List[Any]] = None):
+        self.parent: Dict[Any, Any] = {}
+        self.size: Dict[Any, int] = {}
+        for item in items or []:
+            self.find(item)
+
+    def find(self, item: Any) -> Any:
+        if item not in self.parent:
+            self.parent[item] = item
+            self.size[item] = 1
+            return item
+        while self.parent[item] != item:
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+
+    def union(self, a: Any, b: Any) -> Any:
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return root_a
+        if self.size[root_a] < self.size[root_b]:
+            root_a, root_b = root_b, root_a
+        self.parent[root_b] = root_a
+        self.size[root_a] += self.size[root_b]
+        return root_a
+
+    def groups(self) -> List[List[Any]]:
+        members: Dict[Any, List[Any]] = {}
+        for item in self.parent:
+            members.setdefault(self.find(item), []).append(item)
+        return list(members.values())
+
 
 class EntityResolutionService:
     """Service for finding and resolving duplicate entities in the graph."""
-    
-    async def find_duplicates(self, entity_type: str = "Person") -> List[Dict[str, Any]]:
-        """
-        Find potential duplicates based on simple heuristics.
-        Example: Persons with same name and DOB.
-        """
-        if entity_type == "Person":
-            # Heuristic: Same DOB and high name similarity (sharing first and last names)
-            query = """
-            MATCH (p1:Person), (p2:Person)
-            WHERE p1.person_id < p2.person_id
-              AND p1.dob = p2.dob
-              AND (
-                  p1.full_name CONTAINS split(p2.full_name, ' ')[0] 
-                  OR p2.full_name CONTAINS split(p1.full_name, ' ')[0]
-              )
-            RETURN p1.person_id as id1, p2.person_id as id2, p1.full_name as name1, p2.full_name as name2,
-                   'Same DOB and similar Name' as reason
-            """
-            return neo4j_client.execute_query(query)
-        
-        # Add more heuristics for other types if needed
-        return []
 
-    async def suggest_merges(self) -> List[Dict[str, Any]]:
-        """Get a list of merge suggestions for the UI."""
-        duplicates = await self.find_duplicates("Person")
-        suggestions = []
-        for dup in duplicates:
-            suggestions.append({
-                "type": "Person",
-                "entities": [dup["id1"], dup["id2"]],
-                "confidence": 0.9,
-                "reason": dup["reason"],
-                "preview": f"{dup['name1']} / {dup['name2']}"
+    def load_records(
+        self,
+        entity_type: str,
+        keys: Optional[List[str]] = None,
+        since: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Key and scored properties of entities of a type.
+
+        Args:
+            keys: Only these entity keys
+            since: Only entities with _ingested_at after this watermark
+        """
+        profile = get_profile(entity_type)
+        props = sorted({prop for prop, _, _ in profile["fields"]} | {profile["display"]})
+        returns = ", ".join(f"n.{prop} AS {prop}" for prop in props)
+        if keys is not None:
+            match = f"UNWIND $keys AS k MATCH (n:{entity_type} {{{profile['key']}: k}})"
+        elif since is not None:
+            match = f"MATCH (n:{entity_type}) WHERE n._ingested_at > $since"
+        else:
+            match = f"MATCH (n:{entity_type})"
+        query = f"{match} RETURN n.{profile['key']} AS key, n._ingested_at AS ingested_at, {returns}"
+        params = {"keys": keys, "since": since}
+        return [r for r in neo4j_client.stream_query(query, params) if r["key"] is not None]
+
+    def resolved_pairs(self, entity_type: str, keys: Optional[List[str]] = None) -> set:
+        """Key pairs already linked by SAME_AS, optionally only those involving the given keys."""
+        key = get_profile(entity_type)["key"]
+        involving = f"AND (a.{key} IN $keys OR b.{key} IN $keys)" if keys is not None else ""
+        query = f"""
+        MATCH (a:{entity_type})-[:SAME_AS]-(b:{entity_type})
+        WHERE a.{key} < b.{key} {involving}
+        RETURN a.{key} AS a, b.{key} AS b
+        """
+        return {(r["a"], r["b"]) for r in neo4j_client.execute_query(query, {"keys": keys})}
+
+    def score_candidates(
+        self,
+        entity_type: str,
+        records: List[Dict[str, Any]],
+        left: np.ndarray,
+        right: np.ndarray,
+        min_confidence: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """Score candidate pairs (record indexes) and rank those above min_confidence."""
+        profile = get_profile(entity_type)
+        threshold = settings.resolution_min_confidence if min_confidence is None else min_confidence
+        encoding = FieldEncoding(profile, records)
+        matches = []
+        for start in range(0, len(left), _SCORE_BATCH_SIZE):
+            a, b = left[start:start + _SCORE_BATCH_SIZE], right[start:start + _SCORE_BATCH_SIZE]
+            confidence, similarities = encoding.score(a, b)
+            for i in np.flatnonzero(confidence >= threshold):
+                r1, r2 = records[a[i]], records[b[i]]
+                if str(r1["key"]) > str(r2["key"]):
+                    r1, r2 = r2, r1
+                matches.append({
+                    "id1": r1["key"],
+                    "id2": r2["key"],
+                    "name1": r1.get(profile["display"]),
+                    "name2": r2.get(profile["display"]),
+                    "confidence": round(float(confidence[i]), 4),
+                    "scores": {
+                        f"{prop}:{comparator}": round(float(s), 4)
+                        for (prop, comparator, _), s in zip(profile["fields"], similarities[i])
+                        if not np.isnan(s)
+                    },
+                    "reason": describe_match(profile, similarities[i]),
+                })
+        matches.sort(key=lambda m: (-m["confidence"], str(m["id1"]), str(m["id2"])))
+        return matches
+
+    def match(
+        self,
+        entity_type: str,
+        records: List[Dict[str, Any]],
+        min_confidence: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Block, score and rank duplicate candidates within a set of records.
+
+        Returns:
+            Candidate pairs above min_confidence, most confident first
+        """
+        keys, owners = block_keys(get_profile(entity_type), records)
+        left, right, skipped = candidate_pairs(keys, owners, settings.resolution_max_block_size)
+        if skipped:
+            logger.info(f"Skipped {skipped} {entity_type} blocks above {settings.resolution_max_block_size} records")
+        matches = self.score_candidates(entity_type, records, left, right, min_confidence)
+        logger.info(
+            f"{entity_type} resolution: {len(records)} records, {len(keys)} block keys, "
+            f"{len(left)} candidate pairs, {len(matches)} matches"
+        )
+        return matches
+
+    async def resolve_incremental(self, entity_type: str = "Person") -> Dict[str, Any]:
+        """
+        Match records ingested since the last run against the persistent blocking index.
+
+        New and changed records (those whose _ingested_at moved past the
+        watermark) are compared with each other and with the indexed members of
+        their blocks only; the index is then updated with their keys and the
+        matches are queued as PENDING merge suggestions. The first run indexes
+        the whole population.
+
+        Returns:
+            Summary of the run (delta size, candidates, suggestions queued)
+        """
+        profile = get_profile(entity_type)
+        state = await supabase_client.query(
+            "resolution_state", filters={"entity_type": f"eq.{entity_type}"}
+        )
+        watermark = state[0]["watermark"] if state else None
+        delta = self.load_records(entity_type, since=watermark)
+        summary = {"entity_type": entity_type, "watermark": watermark, "records": len(delta)}
+        if not delta:
+            return {**summary, "candidates": 0, "queued": 0}
+
+        delta_ids = [str(r["key"]) for r in delta]
+        keys, owners = block_keys(profile, delta)
+        # Changed records may have moved blocks; their old index rows and pending suggestions go
+        for batch in _batches(delta_ids, _LOOKUP_BATCH_SIZE):
+            id_list = in_list(batch)
+            await supabase_client.delete("resolution_blocks", {
+                "entity_type": f"eq.{entity_type}", "entity_id": f"in.{id_list}"
             })
-        return suggestions
+            await supabase_client.delete("merge_suggestions", {
+                "entity_type": f"eq.{entity_type}", "status": "eq.PENDING",
+                "or": f"(entity_id_1.in.{id_list},entity_id_2.in.{id_list})"
+            })
+
+        member_keys, member_ids = await self._block_members(entity_type, unique_sorted(keys).tolist())
+        delta_set = set(delta_ids)
+        existing = self.load_records(entity_type, keys=sorted(set(member_ids) - delta_set))
+        records = delta + existing
+        index = {str(r["key"]): i for i, r in enumerate(records)}
+        known = [i for i, entity_id in enumerate(member_ids) if entity_id in index]
+        all_keys = np.concatenate([keys, np.array([member_keys[i] for i in known], dtype=np.int64)])
+        all_owners = np.concatenate([owners, np.array([index[member_ids[i]] for i in known], dtype=np.int64)])
+
+        left, right, _ = candidate_pairs(all_keys, all_owners, settings.resolution_max_block_size)
+        # Pairs between two indexed records were compared when the later one arrived
+        involves_delta = np.minimum(left, right) < len(delta)
+        left, right = left[involves_delta], right[involves_delta]
+        matches = self.score_candidates(entity_type, records, left, right)
+        resolved = self.resolved_pairs(entity_type, delta_ids)
+        queued = [m for m in matches if (m["id1"], m["id2"]) not in resolved]
+
+        for batch in _batches(queued, _INDEX_BATCH_SIZE):
+            await supabase_client.upsert("merge_suggestions", [
+                {
+                    "entity_type": entity_type,
+                    "entity_id_1": str(m["id1"]),
+                    "entity_id_2": str(m["id2"]),
+                    "confidence": m["confidence"],
+                    "reason": m["reason"],
+                    "scores": m["scores"],
+                    "preview": f"{m['name1']} / {m['name2']}",
+                }
+                for m in batch
+            ], on_conflict="entity_type,entity_id_1,entity_id_2", ignore_duplicates=True)
+
+        rows = [
+            {"entity_type": entity_type, "block_key": int(k), "entity_id": delta_ids[o]}
+            for k, o in zip(keys.tolist(), owners.tolist())
+        ]
+        for batch in _batches(rows, _INDEX_BATCH_SIZE):
+            await supabase_client.upsert(
+                "resolution_blocks", batch, on_conflict="entity_type,block_key,entity_id", ignore_duplicates=True
+            )
+
+        new_watermark = max(str(r["ingested_at"]) for r in delta if r["ingested_at"] is not None) \
+            if any(r["ingested_at"] is not None for r in delta) else watermark
+        await supabase_client.upsert("resolution_state", [{
+            "entity_type": entity_type,
+            "watermark": new_watermark,
+            "updated_at": datetime.utcnow().isoformat(),
+        }], on_conflict="entity_type")
+
+        summary = {
+            **summary,
+            "compared_with": len(existing),
+            "candidates": int(len(left)),
+            "queued": len(queued),
+            "new_watermark": new_watermark,
+        }
+        logger.info(f"Incremental {entity_type} resolution: {summary}")
+        return summary
+
+    async def resolve_new_records(self) -> List[Dict[str, Any]]:
+        """Incremental resolution for every entity type with a profile; run after each ingestion."""
+        summaries = []
+        for entity_type in RESOLUTION_PROFILES:
+            try:
+                summaries.append(await self.resolve_incremental(entity_type))
+            except Exception as e:
+                logger.error(f"Incremental resolution failed for {entity_type}: {e}")
+                summaries.append({"entity_type": entity_type, "error": str(e)})
+        return summaries
+
+    async def _block_members(self, entity_type: str, keys: List[int]) -> Tuple[List[int], List[str]]:
+        """Indexed (block key, entity id) rows of the given blocks, leaving out oversized blocks."""
+        member_keys: List[int] = []
+        member_ids: List[str] = []
+        for batch in _batches(keys, _LOOKUP_BATCH_SIZE):
+            sizes = await supabase_client.query("resolution_block_sizes", filters={
+                "entity_type": f"eq.{entity_type}",
+                "block_key": f"in.({','.join(str(k) for k in batch)})",
+                "size": f"lte.{settings.resolution_max_block_size}",
+            })
+            usable = [row["block_key"] for row in sizes]
+            if not usable:
+                continue
+            rows = await supabase_client.query("resolution_blocks", select="block_key,entity_id", filters={
+                "entity_type": f"eq.{entity_type}",
+                "block_key": f"in.({','.join(str(k) for k in usable)})",
+            })
+            member_keys.extend(row["block_key"] for row in rows)
+            member_ids.extend(row["entity_id"] for row in rows)
+        return member_keys, member_ids
+
+    async def find_duplicates(
+        self,
+        entity_type: str = "Person",
+        min_confidence: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Find potential duplicates of an entity type, skipping pairs already resolved.
+
+        Raises:
+            ValueError: If the entity type has no resolution profile
+        """
+        records = self.load_records(entity_type)
+        resolved = self.resolved_pairs(entity_type)
+        return [
+            m for m in self.match(entity_type, records, min_confidence)
+            if (m["id1"], m["id2"]) not in resolved
+        ]
+
+    async def suggest_merges(
+        self,
+        entity_type: str = "Person",
+        min_confidence: Optional[float] = None,
+        entity_id: Optional[str] = None,
+        limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """
+        Get a ranked list of pending merge suggestions for the UI, optionally involving one entity.
+
+        Suggestions are read from the queue filled by resolve_incremental, so
+        this never rescans the population.
+        """
+        get_profile(entity_type)
+        filters = {
+            "entity_type": f"eq.{entity_type}",
+            "status": "eq.PENDING",
+            "order": "confidence.desc",
+            "limit": str(limit),
+        }
+        if min_confidence is not None:
+            filters["confidence"] = f"gte.{min_confidence}"
+        if entity_id is not None:
+            id_list = in_list([entity_id])
+            filters["or"] = f"(entity_id_1.in.{id_list},entity_id_2.in.{id_list})"
+        rows = await supabase_client.query("merge_suggestions", filters=filters)
+        return [
+            {
+                "id": row["id"],
+                "type": entity_type,
+                "entities": [row["entity_id_1"], row["entity_id_2"]],
+                "confidence": row["confidence"],
+                "reason": row["reason"],
+                "scores": row["scores"] or {},
+                "preview": row["preview"]
+            }
+            for row in rows
+        ]
+
+    async def reject_suggestion(self, suggestion_id: str) -> None:
+        """Dismiss a suggestion; incremental runs will not queue the pair again."""
+        await supabase_client.update(
+            "merge_suggestions", {"id": f"eq.{suggestion_id}"}, {"status": "REJECTED"}
+        )
 
     async def resolve_entities(self, primary_id: str, duplicate_ids: List[str], entity_type: str):
         """
-        Mark entities as resolved. 
+        Mark entities as resolved.
         In Palantir, this usually creates a 'canonical' entity or links them via SAME_AS.
-        For Mini Gotham, we'll use a SAME_AS relationship.
+        For Mini Gotham, we use SAME_AS relationships plus a materialized
+        _canonical_id: the clusters of all given entities are unioned under the
+        primary's canonical id, relabelled in bulk.
         """
+        key = get_profile(entity_type)["key"]
+        neo4j_client.execute_write(f"""
+        MATCH (a:{entity_type} {{{key}: $primary_id}})
+        UNWIND $duplicate_ids AS dup_id
+        MATCH (b:{entity_type} {{{key}: dup_id}})
+        MERGE (a)-[r:SAME_AS]->(b)
+        SET r.resolved_at = datetime(), r.status = 'RESOLVED'
+        """, {"primary_id": primary_id, "duplicate_ids": duplicate_ids})
+
+        canonical = self._canonical_ids(entity_type, [primary_id] + duplicate_ids)
+        if primary_id in canonical:
+            merged = sorted(set(canonical.values()))
+            neo4j_client.execute_write(f"""
+            MATCH (n:{entity_type}) WHERE n._canonical_id IN $merged
+            SET n._canonical_id = $canonical
+            WITH count(*) AS relabelled
+            UNWIND $keys AS k
+            MATCH (n:{entity_type} {{{key}: k}})
+            SET n._canonical_id = $canonical
+            """, {"merged": merged, "canonical": canonical[primary_id], "keys": list(canonical)})
+
         for dup_id in duplicate_ids:
-            query = f"""
-            MATCH (a:{entity_type} {{{entity_type.lower()}_id: $primary_id}})
-            MATCH (b:{entity_type} {{{entity_type.lower()}_id: $dup_id}})
-            MERGE (a)-[r:SAME_AS]->(b)
-            SET r.resolved_at = datetime(), r.status = 'RESOLVED'
-            """
-            neo4j_client.execute_write(query, {
-                "primary_id": primary_id,
-                "dup_id": dup_id
-            })
-        
+            pair = sorted([primary_id, dup_id])
+            await supabase_client.update("merge_suggestions", {
+                "entity_type": f"eq.{entity_type}",
+                "entity_id_1": f"eq.{pair[0]}",
+                "entity_id_2": f"eq.{pair[1]}",
+            }, {"status": "RESOLVED"})
+
         logger.info(f"Resolved {len(duplicate_ids)} entities into {primary_id}")
 
+    async def unmerge_entities(
+        self,
+        entity_type: str,
+        entity_id: str,
+        other_ids: Optional[List[str]] = None
+    ) -> Dict[str, Optional[str]]:
+        """
+        Remove SAME_AS links of an entity (to other_ids, or all of them) and
+        split its cluster accordingly.
+
+        Returns:
+            New canonical id per member of the former cluster (None for singletons)
+        """
+        key = get_profile(entity_type)["key"]
+        canonical = self._canonical_ids(entity_type, [entity_id]).get(entity_id)
+        other_filter = f"AND b.{key} IN $other_ids" if other_ids is not None else ""
+        neo4j_client.execute_write(f"""
+        MATCH (a:{entity_type} {{{key}: $entity_id}})-[r:SAME_AS]-(b:{entity_type})
+        WHERE true {other_filter}
+        DELETE r
+        """, {"entity_id": entity_id, "other_ids": other_ids})
+        if canonical is None:
+            return {entity_id: None}
+        return self._recluster(entity_type, canonical)
+
+    def _canonical_ids(self, entity_type: str, keys: List[str]) -> Dict[str, str]:
+        """Canonical id of each existing entity (its own key when unresolved)."""
+        key = get_profile(entity_type)["key"]
+        results = neo4j_client.execute_query(f"""
+        UNWIND $keys AS k
+        MATCH (n:{entity_type} {{{key}: k}})
+        RETURN k AS key, coalesce(n._canonical_id, k) AS canonical
+        """, {"keys": keys})
+        return {r["key"]: r["canonical"] for r in results}
+
+    def _recluster(self, entity_type: str, canonical: str) -> Dict[str, Optional[str]]:
+        """
+        Recompute one cluster from its remaining SAME_AS links.
+
+        The part still containing the old canonical entity keeps its id, other
+        parts are named after their smallest key, and singletons lose
+        _canonical_id.
+        """
+        key = get_profile(entity_type)["key"]
+        members = [r["key"] for r in neo4j_client.execute_query(
+            f"MATCH (n:{entity_type} {{_canonical_id: $canonical}}) RETURN n.{key} AS key",
+            {"canonical": canonical}
+        )]
+        links = neo4j_client.execute_query(f"""
+        MATCH (a:{entity_type} {{_canonical_id: $canonical}})-[:SAME_AS]->(b:{entity_type} {{_canonical_id: $canonical}})
+        RETURN a.{key} AS a, b.{key} AS b
+        """, {"canonical": canonical})
+
+        clusters = DisjointSet(members)
+        for link in links:
+            clusters.union(link["a"], link["b"])
+        assignment = {}
+        for group in clusters.groups():
+            name = canonical if canonical in group else min(group)
+            for member in group:
+                assignment[member] = name if len(group) > 1 else None
+        self._write_canonical_ids(entity_type, assignment)
+        return assignment
+
+    def rebuild_clusters(self, entity_type: str) -> Dict[str, int]:
+        """
+        Rebuild every _canonical_id of a type from its SAME_AS links.
+
+        For migrating existing links or repairing drift; a cluster keeps the
+        canonical id most of its members already carry when that id is one of
+        its keys, otherwise it is named after its smallest key.
+        """
+        key = get_profile(entity_type)["key"]
+        clusters = DisjointSet()
+        current: Dict[str, Optional[str]] = {}
+        for link in neo4j_client.stream_query(f"""
+        MATCH (a:{entity_type})-[:SAME_AS]->(b:{entity_type})
+        RETURN a.{key} AS a, b.{key} AS b, a._canonical_id AS ca, b._canonical_id AS cb
+        """):
+            clusters.union(link["a"], link["b"])
+            current[link["a"]], current[link["b"]] = link["ca"], link["cb"]
+
+        assignment: Dict[str, Optional[str]] = {}
+        groups = clusters.groups()
+        for group in groups:
+            votes = [current[m] for m in group if current.get(m) in group]
+            name = max(set(votes), key=votes.count) if votes else min(group)
+            assignment.update(dict.fromkeys(group, name))
+        stale = [r["key"] for r in neo4j_client.stream_query(
+            f"MATCH (n:{entity_type}) WHERE n._canonical_id IS NOT NULL RETURN n.{key} AS key"
+        ) if r["key"] not in assignment]
+        assignment.update(dict.fromkeys(stale))
+        self._write_canonical_ids(entity_type, assignment)
+        return {"clusters": len(groups), "members": len(assignment) - len(stale), "cleared": len(stale)}
+
+    def _write_canonical_ids(self, entity_type: str, assignment: Dict[str, Optional[str]]):
+        """Bulk-write _canonical_id (None removes it) with batched UNWIND updates."""
+        key = get_profile(entity_type)["key"]
+        rows = [{"key": k, "canonical": c} for k, c in assignment.items()]
+        for batch in _batches(rows, _CANONICAL_BATCH_SIZE):
+            neo4j_client.execute_write(f"""
+            UNWIND $rows AS row
+            MATCH (n:{entity_type} {{{key}: row.key}})
+            SET n._canonical_id = row.canonical
+            """, {"rows": batch})
+
+    def cluster_keys(self, entity_id: str, entity_type: str) -> List[str]:
+        """Keys of all entities resolved into the same cluster, by indexed _canonical_id."""
+        key = get_profile(entity_type)["key"]
+        results = neo4j_client.execute_query(f"""
+        MATCH (e:{entity_type} {{{key}: $entity_id}})
+        OPTIONAL MATCH (m:{entity_type} {{_canonical_id: e._canonical_id}})
+        RETURN e.{key} AS key, collect(m.{key}) AS members
+        """, {"entity_id": entity_id})
+        if not results:
+            return []
+        return sorted(results[0]["members"]) or [results[0]["key"]]
+
     async def get_resolved_cluster(self, entity_id: str, entity_type: str) -> List[str]:
         """Get all IDs that are part of the same resolved cluster."""
-        query = f"""
-        MATCH (e:{entity_type} {{{entity_type.lower()}_id: $entity_id}})
-        MATCH (e)-[:SAME_AS*]-(related)
-        RETURN DISTINCT related.{entity_type.lower()}_id as id
-        UNION
-        RETURN $entity_id as id
-        """
-        results = neo4j_client.execute_query(query, {"entity_id": entity_id})
-        return [r["id"] for r in results]
+        return self.cluster_keys(entity_id, entity_type)
 
 
 # Global instance
@@ -2,68 +2,556 @@
 Entity Service - Core logic for entity management and graph expansion.
 """
 import logging
+import re
+from datetime import datetime
 from typing import List, Dict, Any, Optional
+from core.bloom_filter import BloomFilter
+from core.config import settings
+from core.ontology_manager import ontology_manager
 from db.neo4j_client import neo4j_client
-from models.schemas import Entity, GraphData, GraphNode, GraphEdge
+from neo4j.spatial import Point
+from models.schemas import (
+    Entity, EntityBatchResponse, EntityRef, GraphData, GraphDelta, GraphNode, GraphEdge,
+    KnownElementsFilter, NeighborRanking
+)
+from services.graph_projection import graph_projection, to_epoch
 
 logger = logging.getLogger(__name__)
 
+# Relationship types are interpolated into Cypher patterns, so only plain identifiers are accepted
+_REL_TYPE_PATTERN = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def _plain_value(value: Any) -> Any:
+    """JSON-ready form of a property value: native temporals as ISO strings, points as coordinates."""
+    if isinstance(value, Point):
+        if hasattr(value, "latitude"):
+            return {"latitude": value.latitude, "longitude": value.longitude}
+        return list(value)
+    if hasattr(value, "iso_format"):
+        return value.iso_format()
+    if isinstance(value, list):
+        return [_plain_value(v) for v in value]
+    return value
+
+
+def plain_properties(element: Any) -> Dict[str, Any]:
+    """Properties of a node or relationship, including internal ones, with native values made JSON-ready."""
+    return {k: _plain_value(v) for k, v in dict(element).items()}
+
 
 class EntityService:
     """Service for entity-specific operations and graph navigation."""
-    
+
     async def get_entity(self, entity_id: str, entity_type: str) -> Optional[Dict[str, Any]]:
         """Get full details for a specific entity."""
-        id_field = f"{entity_type.lower()}_id"
+        node = self.find_node(entity_id, entity_type)
+        if node is not None:
+            return plain_properties(node)
+        return None
+
+    def find_node(self, entity_id: str, entity_type: str) -> Optional[Any]:
+        """Look up the Neo4j node for an entity by its business key."""
+        id_field = self._key_field(entity_type)
         query = f"MATCH (n:{entity_type} {{{id_field}: $id}}) RETURN n"
         result = neo4j_client.execute_query(query, {"id": entity_id})
-        if result:
-            node = result[0]["n"]
-            return dict(node)
-        return None
+        return result[0]["n"] if result else None
+
+    def to_graph(self, nodes: List[Any], relationships: List[Any]) -> GraphData:
+        """Convert Neo4j nodes and relationships into visualization graph data."""
+        graph_nodes = {str(n.id): self._to_graph_node(n) for n in nodes}
+        graph_edges = {str(r.id): self._to_graph_edge(r) for r in relationships}
+        return GraphData(nodes=list(graph_nodes.values()), edges=list(graph_edges.values()))
+
+    async def get_entities(self, refs: List[EntityRef]) -> EntityBatchResponse:
+        """
+        Hydrate a batch of entities in a single round trip.
+
+        References are grouped by label and each group is resolved with an
+        UNWIND over its ontology key field; the groups are joined with
+        UNION ALL so the whole batch is one query.
+        """
+        groups: Dict[str, List[str]] = {}
+        missing: List[EntityRef] = []
+        for ref in refs:
+            if ontology_manager.schema.get_object_type(ref.entity_type) is None:
+                missing.append(ref)
+                continue
+            groups.setdefault(ref.entity_type, []).append(ref.entity_id)
+
+        found: Dict[str, Dict[str, Any]] = {}
+        if groups:
+            parts = []
+            params = {}
+            for i, (label, ids) in enumerate(groups.items()):
+                key_field = ontology_manager.get_key_field(label)
+                params[f"ids_{i}"] = list(dict.fromkeys(ids))
+                parts.append(f"""
+                UNWIND $ids_{i} AS key
+                MATCH (n:{label} {{{key_field}: key}})
+                RETURN '{label}' AS type, key, n
+                """)
+            results = neo4j_client.execute_query(" UNION ALL ".join(parts), params)
+            found_keys = set()
+            for record in results:
+                found_keys.add((record["type"], record["key"]))
+                found[record["key"]] = plain_properties(record["n"])
+            missing.extend(
+                ref for ref in refs
+                if ref.entity_type in groups and (ref.entity_type, ref.entity_id) not in found_keys
+            )
+
+        return EntityBatchResponse(entities=found, missing=missing)
+
+    async def expand_neighbors(
+        self,
+        entity_id: str,
+        entity_type: str,
+        depth: int = 1,
+        relationship_types: Optional[List[str]] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        max_neighbors: Optional[int] = None,
+        rank_by: NeighborRanking = NeighborRanking.RECENT,
+        collapse_clusters: bool = False
+    ) -> GraphData:
+        """
+        Expand neighbors for a given entity with a frontier-based BFS.
+
+        Each hop fetches only the relationships incident to the current frontier
+        that have not been seen yet, so every edge is returned once no matter how
+        many paths reach it. Nodes whose precomputed degree exceeds max_neighbors
+        only contribute their top-ranked neighbors per relationship type; the
+        remainder is summarised by an aggregate placeholder node.
+
+        When the in-memory graph projection covers the requested relationship
+        types, the traversal runs there and only the resulting elements are
+        loaded from Neo4j.
+
+        With collapse_clusters, the expansion starts from every record resolved
+        into the entity's cluster and each cluster in the result is shown as
+        its canonical node (see collapse_clusters).
+
+        Raises:
+            ValueError: If the entity type or a relationship type is malformed
+        """
+        if not _REL_TYPE_PATTERN.match(entity_type):
+            raise ValueError(f"Invalid entity type '{entity_type}'")
+        cap = max_neighbors or settings.graph_expand_max_neighbors
+        id_field = self._key_field(entity_type)
+        result = neo4j_client.execute_query(
+            f"MATCH (start:{entity_type} {{{id_field}: $id}}) RETURN start",
+            {"id": entity_id}
+        )
+        if not result:
+            return GraphData(nodes=[], edges=[])
+
+        start_nodes = [result[0]["start"]]
+        canonical_id = start_nodes[0].get("_canonical_id")
+        if collapse_clusters and canonical_id is not None:
+            members = neo4j_client.execute_query(
+                f"MATCH (n:{entity_type} {{_canonical_id: $canonical}}) RETURN n",
+                {"canonical": canonical_id}
+            )
+            start_nodes += [r["n"] for r in members if r["n"].id != start_nodes[0].id]
+
+        if graph_projection.covers(relationship_types):
+            projected = self._expand_from_projection(
+                start_nodes, depth, relationship_types, start_date, end_date, cap, rank_by
+            )
+            if projected is not None:
+                return self.collapse_clusters(projected) if collapse_clusters else projected
+
+        nodes: Dict[str, GraphNode] = {str(n.id): self._to_graph_node(n) for n in start_nodes}
+        edges: Dict[str, GraphEdge] = {}
+        degrees = {n.id: n.get("_degree") for n in start_nodes}
+        frontier = [n.id for n in start_nodes]
+
+        rel_pattern = self._build_rel_pattern(relationship_types)
+        conditions = self._build_conditions(start_date, end_date)
+        params = {
+            "start_date": start_date.isoformat() if start_date else None,
+            "end_date": end_date.isoformat() if end_date else None,
+            "max_neighbors": cap,
+        }
+
+        for _ in range(depth):
+            if not frontier:
+                break
+            # Nodes without a precomputed degree are treated as potential supernodes
+            small = [n for n in frontier if degrees.get(n) is not None and degrees[n] <= cap]
+            hubs = [n for n in frontier if n not in small]
+            seen_edges = [int(e) for e in edges.keys() if not e.startswith("agg:")]
+
+            records = []
+            if small:
+                records.extend(neo4j_client.execute_query(
+                    self._build_hop_query(rel_pattern, conditions),
+                    {**params, "frontier": small, "seen_edges": seen_edges}
+                ))
+            if hubs:
+                hub_query = self._build_capped_hop_query(rel_pattern, conditions, rank_by)
+                for record in neo4j_client.execute_query(hub_query, {**params, "frontier": hubs}):
+                    records.extend(record["kept"])
+                    hidden = record["total"] - len(record["kept"])
+                    if hidden > 0:
+                        self._add_aggregate(
+                            nodes, edges, record["node_id"], record["rel_type"],
+                            hidden, offset=len(record["kept"])
+                        )
+
+            next_frontier = []
+            for record in records:
+                rel = record["rel"]
+                neighbor = record["neighbor"]
+                edges.setdefault(str(rel.id), self._to_graph_edge(rel))
+                if neighbor.id not in degrees:
+                    degrees[neighbor.id] = neighbor.get("_degree")
+                    nodes[str(neighbor.id)] = self._to_graph_node(neighbor)
+                    next_frontier.append(neighbor.id)
+            frontier = next_frontier
+
+        graph = GraphData(nodes=list(nodes.values()), edges=list(edges.values()))
+        return self.collapse_clusters(graph) if collapse_clusters else graph
+
+    def _expand_from_projection(
+        self,
+        start_nodes: List[Any],
+        depth: int,
+        relationship_types: Optional[List[str]],
+        start_date: Optional[datetime],
+        end_date: Optional[datetime],
+        cap: int,
+        rank_by: NeighborRanking
+    ) -> Optional[GraphData]:
+        """Run expansion on the graph projection; None if a start node is not projected."""
+        state = graph_projection.snapshot()
+        start_indexes = state.lookup([n.id for n in start_nodes])
+        if (start_indexes < 0).any():
+            return None
+        result = graph_projection.expand(
+            [int(i) for i in start_indexes], depth, relationship_types,
+            start=to_epoch(start_date), end=to_epoch(end_date),
+            max_neighbors=cap, rank_by=rank_by
+        )
+        node_records = graph_projection.fetch_nodes(graph_projection.node_ids(result.nodes))
+        rel_records = graph_projection.fetch_relationships(graph_projection.relationship_ids(result.edges))
+
+        nodes: Dict[str, GraphNode] = {str(n.id): self._to_graph_node(n) for n in start_nodes}
+        for node in node_records.values():
+            nodes.setdefault(str(node.id), self._to_graph_node(node))
+        edges: Dict[str, GraphEdge] = {str(rel.id): self._to_graph_edge(rel) for rel in rel_records.values()}
+        for node_index, type_code, hidden, kept in result.truncated:
+            self._add_aggregate(
+                nodes, edges, int(state.node_ids[node_index]), state.type_names[type_code],
+                hidden, offset=kept
+            )
+        return GraphData(nodes=list(nodes.values()), edges=list(edges.values()))
+
+    async def page_neighbors(
+        self,
+        node_id: int,
+        relationship_type: str,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        rank_by: NeighborRanking = NeighborRanking.RECENT,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        known_edge_ids: Optional[List[str]] = None
+    ) -> GraphData:
+        """
+        Page through the neighbors of a node behind an aggregate placeholder.
 
-    async def expand_neighbors(self, entity_id: str, entity_type: str, depth: int = 1) -> GraphData:
-        """Expand neighbors for a given entity."""
-        id_field = f"{entity_type.lower()}_id"
-        # Cypher query to get nodes and relationships up to N hops
+        Ranks all of the node's edges of the type in the time window, as
+        capped expansion does, so offset N continues exactly where the
+        aggregate was cut. Edges the client already holds are skipped rather
+        than re-sent; they still count towards offsets. If neighbors remain
+        after this page, the returned graph carries an updated aggregate node
+        with the same id.
+        """
+        limit = limit or settings.graph_expand_max_neighbors
+        rel_pattern = self._build_rel_pattern([relationship_type])
+        conditions = ["id(n) = $node_id", *self._build_conditions(start_date, end_date)]
+        # Known edges are skipped after ranking, not filtered before it, so
+        # positions match the offsets handed out by expansion
         query = f"""
-        MATCH (start:{entity_type} {{{id_field}: $id}})
-        MATCH (start)-[r*1..{depth}]-(neighbor)
-        UNWIND r as rel
-        RETURN start, rel, neighbor
+        MATCH (n)-[{rel_pattern}]-(neighbor)
+        WHERE {' AND '.join(conditions)}
+        WITH r, neighbor
+        ORDER BY {self._rank_expression(rank_by)} DESC, id(r) ASC
+        WITH collect({{rel: r, neighbor: neighbor}}) AS matches
+        WITH matches, [i IN range($offset, size(matches) - 1)
+                       WHERE NOT id(matches[i].rel) IN $known_edges][..$limit] AS positions
+        WITH matches, positions,
+             CASE WHEN size(positions) < $limit THEN size(matches) ELSE positions[-1] + 1 END AS next_offset
+        RETURN [i IN positions | matches[i]] AS page, next_offset,
+               size([m IN matches[next_offset..] WHERE NOT id(m.rel) IN $known_edges]) AS hidden
         """
-        results = neo4j_client.execute_query(query, {"id": entity_id})
-        
-        nodes = {}
-        edges = []
-        
-        for record in results:
-            start_node = record["start"]
-            neighbor_node = record["neighbor"]
+        result = neo4j_client.execute_query(query, {
+            "node_id": node_id,
+            "offset": offset,
+            "limit": limit,
+            "known_edges": [int(e) for e in known_edge_ids or [] if not e.startswith("agg:")],
+            "start_date": start_date.isoformat() if start_date else None,
+            "end_date": end_date.isoformat() if end_date else None,
+        })
+
+        nodes: Dict[str, GraphNode] = {}
+        edges: Dict[str, GraphEdge] = {}
+        if not result:
+            return GraphData(nodes=[], edges=[])
+
+        for record in result[0]["page"]:
             rel = record["rel"]
-            
-            # Add nodes
-            for node in [start_node, neighbor_node]:
-                n_id = str(node.id)
-                if n_id not in nodes:
-                    n_type = list(node.labels)[0]
-                    nodes[n_id] = GraphNode(
-                        id=n_id,
-                        label=self._get_label_for_node(node, n_type),
-                        type=n_type,
-                        properties=dict(node)
-                    )
-            
-            # Add edge
-            edges.append(GraphEdge(
-                id=str(rel.id),
-                source=str(rel.start_node.id),
-                target=str(rel.end_node.id),
-                type=rel.type,
-                properties=dict(rel)
-            ))
-            
-        return GraphData(nodes=list(nodes.values()), edges=edges)
+            neighbor = record["neighbor"]
+            edges.setdefault(str(rel.id), self._to_graph_edge(rel))
+            nodes.setdefault(str(neighbor.id), self._to_graph_node(neighbor))
+
+        next_offset = result[0]["next_offset"]
+        hidden = result[0]["hidden"]
+        if hidden > 0:
+            self._add_aggregate(nodes, edges, node_id, relationship_type, hidden, offset=next_offset)
+
+        return GraphData(nodes=list(nodes.values()), edges=list(edges.values()))
+
+    def subtract_known(
+        self,
+        graph: GraphData,
+        known_node_ids: Optional[List[str]] = None,
+        known_edge_ids: Optional[List[str]] = None,
+        known_filter: Optional[KnownElementsFilter] = None
+    ) -> GraphDelta:
+        """
+        Drop the nodes and edges the client already holds from an expansion.
+
+        Known elements can be sent as explicit id lists, as a Bloom filter, or
+        both. A Bloom false positive withholds an element the client does not
+        have, so clients should size the filter for a low false positive rate.
+        Aggregate placeholders are always returned since their counts change.
+        """
+        node_ids = set(known_node_ids or [])
+        edge_ids = set(known_edge_ids or [])
+        bloom = None
+        if known_filter:
+            bloom = BloomFilter.from_base64(
+                known_filter.bits, known_filter.num_bits, known_filter.num_hashes
+            )
+
+        def is_known(element_id: str, explicit: set) -> bool:
+            if element_id.startswith("agg:"):
+                return False
+            return element_id in explicit or (bloom is not None and element_id in bloom)
+
+        nodes = [n for n in graph.nodes if not is_known(n.id, node_ids)]
+        edges = [e for e in graph.edges if not is_known(e.id, edge_ids)]
+        return GraphDelta(
+            nodes=nodes,
+            edges=edges,
+            skipped_nodes=len(graph.nodes) - len(nodes),
+            skipped_edges=len(graph.edges) - len(edges)
+        )
+
+    def collapse_clusters(self, graph: GraphData) -> GraphData:
+        """
+        Merge the records of each resolved cluster into one canonical node.
+
+        Nodes sharing a _canonical_id are replaced by the canonical record
+        (loaded if it is not in the graph), whose properties gain
+        _cluster_members. Edges are re-pointed at it; SAME_AS links and
+        self-loops created by the merge are dropped.
+        """
+        clusters: Dict[tuple, List[GraphNode]] = {}
+        for node in graph.nodes:
+            canonical = node.properties.get("_canonical_id")
+            if canonical is not None:
+                clusters.setdefault((node.type, canonical), []).append(node)
+        if not clusters:
+            return graph
+
+        missing: Dict[str, List[str]] = {}
+        for (node_type, canonical), members in clusters.items():
+            key_field = self._key_field(node_type)
+            if not any(m.properties.get(key_field) == canonical for m in members):
+                missing.setdefault(node_type, []).append(canonical)
+        loaded: Dict[tuple, GraphNode] = {}
+        for node_type, canonicals in missing.items():
+            key_field = self._key_field(node_type)
+            for record in neo4j_client.execute_query(
+                f"UNWIND $ids AS k MATCH (n:{node_type} {{{key_field}: k}}) RETURN k, n", {"ids": canonicals}
+            ):
+                loaded[(node_type, record["k"])] = self._to_graph_node(record["n"])
+
+        remap: Dict[str, str] = {}
+        canonical_nodes: Dict[str, GraphNode] = {}
+        for (node_type, canonical), members in clusters.items():
+            key_field = self._key_field(node_type)
+            representative = next(
+                (m for m in members if m.properties.get(key_field) == canonical),
+                loaded.get((node_type, canonical), members[0])
+            )
+            merged = representative.model_copy(deep=True)
+            merged.properties["_cluster_members"] = sorted(
+                str(m.properties.get(key_field)) for m in members
+            )
+            canonical_nodes[merged.id] = merged
+            for member in members:
+                remap[member.id] = merged.id
+
+        nodes = [n for n in graph.nodes if n.id not in remap] + list(canonical_nodes.values())
+        edges = []
+        for edge in graph.edges:
+            source, target = remap.get(edge.source, edge.source), remap.get(edge.target, edge.target)
+            if source == target and (edge.type == "SAME_AS" or edge.source != edge.target):
+                continue
+            if source != edge.source or target != edge.target:
+                edge = edge.model_copy(update={"source": source, "target": target})
+            edges.append(edge)
+        return GraphData(nodes=nodes, edges=edges)
+
+    def _key_field(self, entity_type: str) -> str:
+        """Resolve the key property of an entity type, preferring the ontology."""
+        if ontology_manager.is_loaded and ontology_manager.schema.get_object_type(entity_type):
+            return ontology_manager.get_key_field(entity_type)
+        return f"{entity_type.lower()}_id"
+
+    def _build_rel_pattern(self, relationship_types: Optional[List[str]]) -> str:
+        """Build the relationship part of a MATCH pattern, bound to `r`."""
+        if not relationship_types:
+            return "r"
+        invalid = [t for t in relationship_types if not _REL_TYPE_PATTERN.match(t)]
+        if invalid:
+            raise ValueError(f"Invalid relationship types: {invalid}")
+        return "r:" + "|".join(relationship_types)
+
+    def _build_conditions(
+        self,
+        start_date: Optional[datetime],
+        end_date: Optional[datetime]
+    ) -> List[str]:
+        """Build WHERE conditions for relationships inside the time window."""
+        conditions = []
+        # Point-in-time relationships (CALL, TRANSFER...) carry a timestamp, while
+        # ownership-style relationships carry a start_date/end_date validity interval.
+        # Relationships with neither are structural and are never filtered out.
+        if start_date:
+            conditions.append("""(
+                CASE
+                    WHEN r.timestamp IS NOT NULL THEN datetime(r.timestamp) >= datetime($start_date)
+                    WHEN r.end_date IS NOT NULL THEN datetime(r.end_date) >= datetime($start_date)
+                    ELSE true
+                END
+            )""")
+        if end_date:
+            conditions.append("""(
+                CASE
+                    WHEN r.timestamp IS NOT NULL THEN datetime(r.timestamp) <= datetime($end_date)
+                    WHEN r.start_date IS NOT NULL THEN datetime(r.start_date) <= datetime($end_date)
+                    ELSE true
+                END
+            )""")
+        return conditions
+
+    def _rank_expression(self, rank_by: NeighborRanking) -> str:
+        """Cypher expression used to rank the relationships of a supernode."""
+        if rank_by == NeighborRanking.VOLUME:
+            return "coalesce(toFloat(r.amount_usd), toFloat(r.duration_sec), 0.0)"
+        return "coalesce(r.timestamp, r.start_date, '')"
+
+    def _build_hop_query(self, rel_pattern: str, conditions: List[str]) -> str:
+        """Build the Cypher for a single BFS hop from low-degree frontier nodes."""
+        return f"""
+        UNWIND $frontier AS node_id
+        MATCH (n)-[{rel_pattern}]-(neighbor)
+        WHERE {' AND '.join(["id(n) = node_id", "NOT id(r) IN $seen_edges", *conditions])}
+        RETURN DISTINCT r AS rel, neighbor
+        """
+
+    def _build_capped_hop_query(
+        self,
+        rel_pattern: str,
+        conditions: List[str],
+        rank_by: NeighborRanking
+    ) -> str:
+        """
+        Build the Cypher for a BFS hop that keeps the top-ranked neighbors per type.
+
+        Edges seen at earlier hops are ranked too (and deduplicated by the
+        caller), so the cut falls where page_neighbors continues from.
+        """
+        return f"""
+        UNWIND $frontier AS node_id
+        MATCH (n) WHERE id(n) = node_id
+        CALL {{
+            WITH n
+            MATCH (n)-[{rel_pattern}]-(neighbor)
+            WHERE {' AND '.join(conditions) or 'true'}
+            WITH r, neighbor
+            ORDER BY {self._rank_expression(rank_by)} DESC, id(r) ASC
+            WITH type(r) AS rel_type, collect({{rel: r, neighbor: neighbor}}) AS matches
+            RETURN rel_type, matches[..$max_neighbors] AS kept, size(matches) AS total
+        }}
+        RETURN id(n) AS node_id, rel_type, kept, total
+        """
+
+    def _add_aggregate(
+        self,
+        nodes: Dict[str, GraphNode],
+        edges: Dict[str, GraphEdge],
+        parent_id: int,
+        rel_type: str,
+        hidden: int,
+        offset: int
+    ):
+        """Add a placeholder standing in for neighbors that were not returned."""
+        agg_id = f"agg:{parent_id}:{rel_type}"
+        nodes[agg_id] = GraphNode(
+            id=agg_id,
+            label=f"+{hidden:,} {rel_type} contacts",
+            type="Aggregate",
+            properties={
+                "parent_id": str(parent_id),
+                "relationship_type": rel_type,
+                "hidden_count": hidden,
+                "next_offset": offset,
+            }
+        )
+        edges[agg_id] = GraphEdge(
+            id=agg_id,
+            source=str(parent_id),
+            target=agg_id,
+            type=rel_type,
+            properties={"aggregate": True, "hidden_count": hidden}
+        )
+
+    def _to_graph_node(self, node: Any) -> GraphNode:
+        """Convert a Neo4j node into a visualization node."""
+        n_type = list(node.labels)[0]
+        return GraphNode(
+            id=str(node.id),
+            label=self._get_label_for_node(node, n_type),
+            type=n_type,
+            properties=plain_properties(node),
+            risk_level=node.get("_risk_level"),
+            degrees=self._get_degrees(node)
+        )
+
+    def _to_graph_edge(self, rel: Any) -> GraphEdge:
+        """Convert a Neo4j relationship into a visualization edge."""
+        return GraphEdge(
+            id=str(rel.id),
+            source=str(rel.start_node.id),
+            target=str(rel.end_node.id),
+            type=rel.type,
+            properties=plain_properties(rel)
+        )
+
+    def _get_degrees(self, node: Any) -> Optional[Dict[str, int]]:
+        """Read the precomputed per-type degree counts written at ingestion."""
+        types = node.get("_degree_types")
+        counts = node.get("_degree_counts")
+        if types is None or counts is None:
+            return None
+        return dict(zip(types, counts))
 
     def _get_label_for_node(self, node: Any, node_type: str) -> str:
         props = dict(node)
@@ -2,24 +2,295 @@
 Financial Service - Money flow and transaction tracing.
 """
 import logging
-from typing import List, Dict, Any
+import time
+from datetime import datetime
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from core.config import settings
 from db.neo4j_client import neo4j_client
+from models.schemas import FlowAccount, FlowGraphData, FlowTransfer
+from services.entity_service import entity_service
+from services.graph_projection import NO_TIME_LO, ProjectionState, graph_projection, to_epoch, unique_sorted
 
 logger = logging.getLogger(__name__)
 
+# Open time bounds; far enough from the int64 limits to subtract epoch seconds safely
+_EARLIEST = -(2 ** 62)
+_LATEST = 2 ** 62
+
+# fetch(accounts, after, until) -> (src, dst, time, amount, edge) for every outgoing
+# transfer of accounts[i] with after[i] < time <= until[i]
+TransferFetcher = Callable[
+    [np.ndarray, np.ndarray, np.ndarray],
+    Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+]
+
+
+class FlowTrace:
+    """Per-transfer and per-account attribution produced by propagate_flow."""
+
+    def __init__(self):
+        self.transfers: Dict[int, Dict] = {}  # edge -> src, dst, time, amount, traced, hop
+        self.received: Dict[int, float] = {}
+        self.forwarded: Dict[int, float] = {}
+        self.hops: Dict[int, int] = {}
+        self.traced_total = 0.0
+        self.truncated = 0
+
+    def record(self, hop: int, src: int, dst: int, t: int, amount: float, edge: int, flow: float):
+        transfer = self.transfers.get(edge)
+        if transfer is None:
+            self.transfers[edge] = {
+                "src": src, "dst": dst, "time": t, "amount": amount, "traced": flow, "hop": hop
+            }
+        else:
+            transfer["traced"] += flow
+        self.forwarded[src] = self.forwarded.get(src, 0.0) + flow
+        self.received[dst] = self.received.get(dst, 0.0) + flow
+        self.hops.setdefault(src, hop - 1)
+        self.hops.setdefault(dst, hop)
+
+
+def propagate_flow(
+    fetch: TransferFetcher,
+    source: int,
+    max_hops: int,
+    dwell: int,
+    start: Optional[int] = None,
+    end: Optional[int] = None,
+    amount: Optional[float] = None,
+    min_amount: float = 0.0,
+    max_branches: Optional[int] = None,
+    deadline: Optional[float] = None
+) -> FlowTrace:
+    """
+    Follow money forward from an account through time-ordered transfers.
+
+    Money is tracked as chunks of (account, arrival time, amount). A chunk can
+    only leave through transfers made after it arrived and within `dwell`
+    seconds; when those outflows exceed the chunk, each takes a share
+    proportional to its amount. Shares landing on the same transfer are
+    summed and capped at what the transfer has not already carried, so no
+    transfer moves more money than it did. Shares below `min_amount` are
+    dropped, and only the `max_branches` largest are followed per hop.
+
+    The source chunk holds `amount`, or every outflow in [start, end] when
+    no amount is given. Times are epoch seconds.
+    """
+    trace = FlowTrace()
+    end = _LATEST if end is None else end
+    chunk_account = np.array([source], dtype=np.int64)
+    chunk_after = np.array([_EARLIEST if start is None else start - 1], dtype=np.int64)
+    chunk_until = np.array([end], dtype=np.int64)
+    chunk_amount = np.array([np.inf if amount is None else amount])
+    carried: Dict[int, float] = {}
+
+    for hop in range(1, max_hops + 1):
+        if len(chunk_account) == 0:
+            break
+        if deadline is not None and time.monotonic() > deadline:
+            raise TimeoutError("Money flow trace exceeded its time budget")
+
+        # One fetch per distinct account, covering the union of its chunks' windows
+        accounts = unique_sorted(chunk_account)
+        rank = np.searchsorted(accounts, chunk_account)
+        after = np.full(len(accounts), _LATEST, dtype=np.int64)
+        until = np.full(len(accounts), _EARLIEST, dtype=np.int64)
+        np.minimum.at(after, rank, chunk_after)
+        np.maximum.at(until, rank, chunk_until)
+        src, dst, t, amt, edge = fetch(accounts, after, until)
+        if len(edge) == 0:
+            break
+
+        # Sort transfers by (account, time) and cut each chunk's window out of its account's run
+        t_min = int(t.min())
+        span = int(t.max()) - t_min + 2
+        keys = np.searchsorted(accounts, src) * span + (t - t_min + 1)
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        base = rank * span
+        lo = np.searchsorted(keys, base + np.clip(chunk_after - t_min + 1, 0, span - 1), side="right")
+        hi = np.searchsorted(keys, base + np.clip(chunk_until - t_min + 1, 0, span - 1), side="right")
+        counts = np.maximum(hi - lo, 0)
+        total = int(counts.sum())
+        if total == 0:
+            break
+        row = np.repeat(np.arange(len(counts)), counts)
+        pair = order[np.arange(total) - (np.cumsum(counts) - counts)[row] + lo[row]]
+
+        # Proportional attribution of each chunk over its eligible outflows
+        eligible = np.bincount(row, weights=amt[pair], minlength=len(counts))
+        scale = np.minimum(1.0, chunk_amount / np.maximum(eligible, 1e-12))
+        flow = np.bincount(pair, weights=amt[pair] * scale[row], minlength=len(edge))
+        candidates = np.flatnonzero(flow > 0)
+        already = np.array([carried.get(int(e), 0.0) for e in edge[candidates]])
+        flow = np.minimum(flow[candidates], amt[candidates] - already)
+        keep = flow >= max(min_amount, 1e-9)
+        candidates, flow = candidates[keep], flow[keep]
+        if max_branches is not None and len(candidates) > max_branches:
+            top = np.argpartition(-flow, max_branches - 1)[:max_branches]
+            trace.truncated += len(candidates) - max_branches
+            candidates, flow = candidates[top], flow[top]
+
+        for i, f in zip(candidates.tolist(), flow.tolist()):
+            e = int(edge[i])
+            carried[e] = carried.get(e, 0.0) + f
+            trace.record(hop, int(src[i]), int(dst[i]), int(t[i]), float(amt[i]), e, f)
+        if hop == 1:
+            trace.traced_total = float(flow.sum())
+
+        chunk_account = dst[candidates].astype(np.int64)
+        chunk_after = t[candidates].astype(np.int64)
+        chunk_until = np.minimum(chunk_after + dwell, end)
+        chunk_amount = flow
+
+    # Money entering the trace at the source, so retained amounts sum to it
+    trace.received[source] = trace.received.get(source, 0.0) + (
+        trace.traced_total if amount is None else amount
+    )
+    trace.hops[source] = 0
+    return trace
+
+
+def projection_transfers(state: ProjectionState) -> TransferFetcher:
+    """Fetcher over the outgoing TRANSFER edges of a projection snapshot."""
+    codes = state.type_codes(["TRANSFER"])
+
+    def fetch(accounts, after, until):
+        pos, owner, nbr = state.neighbors(accounts, "out", codes)
+        row = np.searchsorted(accounts, owner)
+        t = state.time_lo[pos]
+        amount = state.weight[pos].astype(np.float64)
+        mask = (t != NO_TIME_LO) & (t > after[row]) & (t <= until[row]) & ~np.isnan(amount)
+        return owner[mask], nbr[mask], t[mask], amount[mask], pos[mask]
+
+    return fetch
+
 
 class FinancialService:
     """Service for transaction tracing and financial flow analysis."""
-    
-    async def trace_money_flow(self, account_id: str, depth: int = 3) -> List[Dict[str, Any]]:
-        """Trace how money flows through accounts (multi-hop)."""
-        query = f"""
-        MATCH path = (start:Account {{account_id: $id}})-[:TRANSFER*1..{depth}]->(end:Account)
-        RETURN [n in nodes(path) | n.account_id] as chain, 
-               [r in relationships(path) | r.amount_usd] as amounts,
-               [r in relationships(path) | r.timestamp] as times
+
+    async def trace_money_flow(
+        self,
+        account_id: str,
+        depth: Optional[int] = None,
+        dwell_hours: Optional[float] = None,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        amount: Optional[float] = None,
+        min_amount: Optional[float] = None,
+        max_branches: Optional[int] = None
+    ) -> FlowGraphData:
+        """
+        Trace where money leaving an account went.
+
+        Only transfers that happen after the money arrived, and within the
+        dwell window, are followed; amounts are attributed proportionally at
+        each hop (see propagate_flow). Runs on the graph projection when it
+        covers TRANSFER between accounts, else hop by hop in Cypher.
+
+        Raises:
+            TimeoutError: If the trace exceeded its time budget
         """
-        return neo4j_client.execute_query(query, {"id": account_id})
+        start = entity_service.find_node(account_id, "Account")
+        if start is None:
+            return FlowGraphData(nodes=[], edges=[])
+
+        max_hops = depth or settings.flow_max_hops
+        dwell = int((dwell_hours if dwell_hours is not None else settings.flow_max_dwell_hours) * 3600)
+        options = {
+            "start": to_epoch(start_time),
+            "end": to_epoch(end_time),
+            "amount": amount,
+            "min_amount": settings.flow_min_amount if min_amount is None else min_amount,
+            "max_branches": max_branches or settings.flow_max_branches,
+            "deadline": time.monotonic() + settings.flow_timeout_ms / 1000,
+        }
+
+        trace = None
+        if graph_projection.covers(["TRANSFER"], ["Account"]):
+            state = graph_projection.snapshot()
+            source = int(state.lookup([start.id])[0])
+            if source >= 0:
+                trace = propagate_flow(projection_transfers(state), source, max_hops, dwell, **options)
+                node_ids = {i: int(state.node_ids[i]) for i in trace.hops}
+                rel_ids = {e: int(state.rel_ids[e]) for e in trace.transfers}
+        if trace is None:
+            trace = propagate_flow(self._cypher_fetcher(options["deadline"]), start.id, max_hops, dwell, **options)
+            node_ids = {i: i for i in trace.hops}
+            rel_ids = {e: e for e in trace.transfers}
+        return self._to_flow_graph(trace, node_ids, rel_ids)
+
+    def _cypher_fetcher(self, deadline: float) -> TransferFetcher:
+        """Outgoing TRANSFER relationships of a frontier, one query per hop."""
+        query = """
+        UNWIND $frontier AS f
+        MATCH (a:Account) WHERE id(a) = f.account
+        MATCH (a)-[r:TRANSFER]->(b:Account)
+        WITH a, r, b, f, datetime(r.timestamp).epochSeconds AS t
+        WHERE t > f.after AND t <= f.until AND r.amount_usd IS NOT NULL
+        RETURN id(a) AS src, id(b) AS dst, t, toFloat(r.amount_usd) AS amount, id(r) AS rel_id
+        """
+
+        def fetch(accounts, after, until):
+            frontier = [
+                {"account": a, "after": lo, "until": hi}
+                for a, lo, hi in zip(accounts.tolist(), after.tolist(), until.tolist())
+            ]
+            timeout = max(deadline - time.monotonic(), 0.001)
+            records = neo4j_client.execute_query(query, {"frontier": frontier}, timeout=timeout)
+            return (
+                np.array([r["src"] for r in records], dtype=np.int64),
+                np.array([r["dst"] for r in records], dtype=np.int64),
+                np.array([r["t"] for r in records], dtype=np.int64),
+                np.array([r["amount"] for r in records], dtype=np.float64),
+                np.array([r["rel_id"] for r in records], dtype=np.int64),
+            )
+
+        return fetch
+
+    def _to_flow_graph(self, trace: FlowTrace, node_ids: Dict[int, int], rel_ids: Dict[int, int]) -> FlowGraphData:
+        """Load the traced accounts and transfers and attach their attribution."""
+        nodes = graph_projection.fetch_nodes(sorted(node_ids.values()))
+        rels = graph_projection.fetch_relationships(sorted(rel_ids.values()))
+        graph = entity_service.to_graph(list(nodes.values()), list(rels.values()))
+
+        accounts = []
+        for account, hop in sorted(trace.hops.items(), key=lambda item: item[1]):
+            received = trace.received.get(account, 0.0)
+            forwarded = trace.forwarded.get(account, 0.0)
+            node = nodes.get(node_ids[account])
+            accounts.append(FlowAccount(
+                id=str(node_ids[account]),
+                account_id=node.get("account_id") if node is not None else None,
+                hop=hop,
+                received=round(received, 2),
+                forwarded=round(forwarded, 2),
+                retained=round(received - forwarded, 2)
+            ))
+        transfers = [
+            FlowTransfer(
+                id=str(rel_ids[edge]),
+                source=str(node_ids[t["src"]]),
+                target=str(node_ids[t["dst"]]),
+                hop=t["hop"],
+                amount=round(t["amount"], 2),
+                traced_amount=round(t["traced"], 2)
+            )
+            for edge, t in sorted(trace.transfers.items(), key=lambda item: (item[1]["hop"], item[1]["time"]))
+        ]
+        source = next((a.id for a in accounts if a.hop == 0), None)
+        return FlowGraphData(
+            nodes=graph.nodes,
+            edges=graph.edges,
+            source=source,
+            traced_total=round(trace.traced_total, 2),
+            accounts=accounts,
+            transfers=transfers,
+            truncated=trace.truncated
+        )
 
 
 # Global instance
@@ -0,0 +1,253 @@
+"""
+Flow Rollups - Materialized account-to-account transfer totals per day and week.
+
+Every TRANSFER contributes to one day bucket and one ISO week bucket
+(Monday, UTC) of its (from_account, to_account) pair in the Supabase
+`transfer_rollups` table: count, sum, min/max amount and first/last
+timestamp. Ingestion collects the transfers it creates in a RollupDeltas
+and applies them with the `apply_transfer_rollups` function, which adds
+to existing buckets in place, so rollups are maintained incrementally.
+
+Range queries read full weeks from week buckets and only the partial
+weeks at either end from day buckets, so answering "how much moved
+between A and B last month" reads at most ~17 rows per pair, regardless
+of how many transfers there were.
+"""
+import logging
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from db.neo4j_client import neo4j_client
+from db.supabase_client import in_list, supabase_client
+from models.schemas import AccountFlowSummary, GraphData, GraphEdge, PairFlow
+from services.entity_service import entity_service
+
+logger = logging.getLogger(__name__)
+
+_APPLY_BATCH_SIZE = 5_000
+
+RollupKey = Tuple[str, str, str, str]  # from_account, to_account, granularity, bucket
+
+
+def parse_timestamp(value: str) -> datetime:
+    """Timezone-aware datetime for a transfer timestamp; naive values are UTC, as in Cypher."""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def rollup_buckets(timestamp: datetime) -> List[Tuple[str, date]]:
+    """The day and ISO week (Monday) buckets a UTC timestamp falls into."""
+    day = timestamp.astimezone(timezone.utc).date()
+    return [("day", day), ("week", day - timedelta(days=day.weekday()))]
+
+
+def cover_range(start: Optional[date], end: Optional[date]) -> List[Tuple[str, Optional[date], Optional[date]]]:
+    """
+    Bucket ranges that exactly cover [start, end] (inclusive, open when None).
+
+    Returns (granularity, first bucket, last bucket) triples: whole weeks
+    from week buckets, the partial weeks at either end from day buckets.
+    """
+    week_start = None if start is None else start + timedelta(days=-start.weekday() % 7)
+    after_end = None if end is None else end + timedelta(days=1)
+    week_end = None if after_end is None else after_end - timedelta(days=after_end.weekday())
+    if week_start is not None and week_end is not None and week_start >= week_end:
+        return [("day", start, end)]
+
+    ranges = []
+    if start is not None and start < week_start:
+        ranges.append(("day", start, week_start - timedelta(days=1)))
+    ranges.append(("week", week_start, None if week_end is None else week_end - timedelta(days=7)))
+    if end is not None and week_end <= end:
+        ranges.append(("day", week_end, end))
+    return ranges
+
+
+def _range_terms(start: Optional[date], end: Optional[date]) -> str:
+    """PostgREST conditions, one per bucket range of cover_range(start, end), to be OR-ed."""
+    terms = []
+    for granularity, first, last in cover_range(start, end):
+        conditions = [f"granularity.eq.{granularity}"]
+        if first is not None:
+            conditions.append(f"bucket.gte.{first.isoformat()}")
+        if last is not None:
+            conditions.append(f"bucket.lte.{last.isoformat()}")
+        terms.append(f"and({','.join(conditions)})")
+    return ",".join(terms)
+
+
+class RollupDeltas:
+    """In-memory rollup increments, combined per (pair, bucket) before they are applied."""
+
+    def __init__(self):
+        self.rows: Dict[RollupKey, Dict[str, Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def add(self, from_account: str, to_account: str, timestamp: datetime, amount: float):
+        """Count one transfer into its day and week buckets."""
+        for granularity, bucket in rollup_buckets(timestamp):
+            key = (from_account, to_account, granularity, bucket.isoformat())
+            row = self.rows.get(key)
+            if row is None:
+                self.rows[key] = {
+                    "from_account": from_account,
+                    "to_account": to_account,
+                    "granularity": granularity,
+                    "bucket": key[3],
+                    "transfer_count": 1,
+                    "total_usd": amount,
+                    "min_usd": amount,
+                    "max_usd": amount,
+                    "first_at": timestamp,
+                    "last_at": timestamp,
+                }
+                continue
+            row["transfer_count"] += 1
+            row["total_usd"] += amount
+            row["min_usd"] = min(row["min_usd"], amount)
+            row["max_usd"] = max(row["max_usd"], amount)
+            row["first_at"] = min(row["first_at"], timestamp)
+            row["last_at"] = max(row["last_at"], timestamp)
+
+    def to_rows(self) -> List[Dict[str, Any]]:
+        """JSON-ready rows for the rollup table."""
+        return [
+            {**row, "first_at": row["first_at"].isoformat(), "last_at": row["last_at"].isoformat()}
+            for row in self.rows.values()
+        ]
+
+
+def _combine(rows: List[Dict[str, Any]]) -> Dict[Tuple[str, str], Dict[str, Any]]:
+    """Fold rollup rows into one total per (from_account, to_account)."""
+    pairs: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for row in rows:
+        key = (row["from_account"], row["to_account"])
+        total = pairs.get(key)
+        if total is None:
+            pairs[key] = {
+                k: row[k] for k in (
+                    "from_account", "to_account", "transfer_count", "total_usd",
+                    "min_usd", "max_usd", "first_at", "last_at"
+                )
+            }
+            continue
+        total["transfer_count"] += row["transfer_count"]
+        total["total_usd"] += row["total_usd"]
+        total["min_usd"] = min(total["min_usd"], row["min_usd"])
+        total["max_usd"] = max(total["max_usd"], row["max_usd"])
+        total["first_at"] = min(total["first_at"], row["first_at"], key=parse_timestamp)
+        total["last_at"] = max(total["last_at"], row["last_at"], key=parse_timestamp)
+    return pairs
+
+
+class FlowRollupService:
+    """Service for maintaining and querying transfer rollups."""
+
+    async def apply(self, deltas: RollupDeltas):
+        """Add collected increments to the rollup table."""
+        rows = deltas.to_rows()
+        for i in range(0, len(rows), _APPLY_BATCH_SIZE):
+            await supabase_client.rpc("apply_transfer_rollups", {"deltas": rows[i:i + _APPLY_BATCH_SIZE]})
+        if rows:
+            logger.info(f"Applied {len(rows)} transfer rollup increments")
+
+    async def rebuild(self) -> int:
+        """
+        Recompute every rollup from the TRANSFER relationships in Neo4j.
+
+        Ingestion only counts transfers when they are first created; run this
+        after correcting amounts or timestamps of existing transfers.
+        """
+        deltas = RollupDeltas()
+        query = """
+        MATCH (a:Account)-[r:TRANSFER]->(b:Account)
+        WHERE r.timestamp IS NOT NULL AND r.amount_usd IS NOT NULL
+        RETURN a.account_id AS from_account, b.account_id AS to_account,
+               r.timestamp AS timestamp, toFloat(r.amount_usd) AS amount
+        """
+        for record in neo4j_client.stream_query(query):
+            deltas.add(
+                record["from_account"], record["to_account"],
+                parse_timestamp(str(record["timestamp"])), record["amount"]
+            )
+        await supabase_client.delete("transfer_rollups", {"granularity": "in.(day,week)"})
+        await self.apply(deltas)
+        return len(deltas)
+
+    async def flow_between(
+        self,
+        account_a: str,
+        account_b: str,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None
+    ) -> AccountFlowSummary:
+        """Totals moved from A to B and from B to A between two dates (inclusive)."""
+        rows = await supabase_client.query("transfer_rollups", filters={
+            "from_account": f"in.{in_list([account_a, account_b])}",
+            "to_account": f"in.{in_list([account_a, account_b])}",
+            "or": f"({_range_terms(start_date, end_date)})",
+        })
+        pairs = _combine(rows)
+        a_to_b = pairs.get((account_a, account_b))
+        b_to_a = pairs.get((account_b, account_a))
+        return AccountFlowSummary(
+            account_a=account_a,
+            account_b=account_b,
+            start_date=start_date,
+            end_date=end_date,
+            a_to_b=PairFlow(**a_to_b) if a_to_b else None,
+            b_to_a=PairFlow(**b_to_a) if b_to_a else None,
+            net_usd=round((a_to_b or {}).get("total_usd", 0.0) - (b_to_a or {}).get("total_usd", 0.0), 2)
+        )
+
+    async def flow_graph(
+        self,
+        account_ids: List[str],
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        min_total: float = 0.0,
+        limit: int = 200
+    ) -> GraphData:
+        """
+        Aggregated flow graph around accounts: one TRANSFER_ROLLUP edge per
+        counterparty pair carrying the pair's totals for the date range,
+        largest first.
+        """
+        accounts = in_list(account_ids)
+        rows = await supabase_client.query("transfer_rollups", filters={
+            "and": f"(or(from_account.in.{accounts},to_account.in.{accounts}),or({_range_terms(start_date, end_date)}))",
+        })
+        pairs = sorted(
+            (p for p in _combine(rows).values() if p["total_usd"] >= min_total),
+            key=lambda p: p["total_usd"], reverse=True
+        )[:limit]
+        if not pairs:
+            return GraphData(nodes=[], edges=[])
+
+        keys = sorted({p["from_account"] for p in pairs} | {p["to_account"] for p in pairs})
+        records = neo4j_client.execute_query(
+            "UNWIND $ids AS id MATCH (n:Account {account_id: id}) RETURN n", {"ids": keys}
+        )
+        graph = entity_service.to_graph([r["n"] for r in records], [])
+        node_ids = {n.properties.get("account_id"): n.id for n in graph.nodes}
+        graph.edges = [
+            GraphEdge(
+                id=f"rollup:{p['from_account']}:{p['to_account']}",
+                source=node_ids[p["from_account"]],
+                target=node_ids[p["to_account"]],
+                type="TRANSFER_ROLLUP",
+                properties=p,
+                timestamp=parse_timestamp(p["last_at"])
+            )
+            for p in pairs
+            if p["from_account"] in node_ids and p["to_account"] in node_ids
+        ]
+        return graph
+
+
+# Global instance
+flow_rollups = FlowRollupService()
@@ -1,34 +1,144 @@
 """
 Geospatial Analysis Service - Location-based queries.
+
+Located entities (object types with lat / lon properties) carry a native
+WGS-84 point in `_location`, set at ingestion and covered by a point index
+per label, so bounding-box and radius queries are index seeks rather than
+scans over every node. Polygons are narrowed to their bounding box through
+the same index and then tested exactly.
 """
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+from core.config import settings
+from core.ontology_manager import ontology_manager
 from db.neo4j_client import neo4j_client
+from models.schemas import GeoEntity, GeoPolygonResult
 
 logger = logging.getLogger(__name__)
 
 
+def located_labels() -> List[str]:
+    """Object types with coordinates, i.e. those with a point index."""
+    if not ontology_manager.is_loaded:
+        return ["Location"]
+    return [name for name, obj in ontology_manager.schema.objects.items() if {"lat", "lon"} <= set(obj.properties)]
+
+
+def points_in_polygon(lat: np.ndarray, lon: np.ndarray, polygon: List[List[float]]) -> np.ndarray:
+    """Even-odd ray casting of many points against one polygon given as [lat, lon] vertices."""
+    inside = np.zeros(len(lat), dtype=bool)
+    vertices = np.asarray(polygon, dtype=np.float64)
+    y1, x1 = vertices[:, 0], vertices[:, 1]
+    y2, x2 = np.roll(y1, -1), np.roll(x1, -1)
+    for a_lat, a_lon, b_lat, b_lon in zip(y1, x1, y2, x2):
+        crosses = (a_lat > lat) != (b_lat > lat)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            at_lon = a_lon + (lat - a_lat) * (b_lon - a_lon) / (b_lat - a_lat)
+        inside ^= crosses & (lon < at_lon)
+    return inside
+
+
 class GeospatialService:
     """Service for spatial investigation."""
-    
-    async def get_entities_in_area(self, min_lat: float, max_lat: float, min_lon: float, max_lon: float) -> List[Dict[str, Any]]:
-        """Find entities located within a bounding box."""
-        query = """
-        MATCH (n)
-        WHERE n.lat IS NOT NULL AND n.lon IS NOT NULL
-          AND n.lat >= $min_lat AND n.lat <= $max_lat
-          AND n.lon >= $min_lon AND n.lon <= $max_lon
-        RETURN n, labels(n)[0] as type
+
+    async def get_entities_in_area(
+        self, min_lat: float, max_lat: float, min_lon: float, max_lon: float, limit: Optional[int] = None
+    ) -> List[GeoEntity]:
         """
-        results = neo4j_client.execute_query(query, {
-            "min_lat": min_lat, "max_lat": max_lat,
-            "min_lon": min_lon, "max_lon": max_lon
-        })
-        return [{"id": str(r["n"].id), "type": r["type"], "properties": dict(r["n"])} for r in results]
+        Find entities located within a bounding box. A box with
+        min_lon > max_lon crosses the antimeridian.
+        """
+        return self._query(
+            "point.withinBBox(n._location, point({latitude: $min_lat, longitude: $min_lon}), "
+            "point({latitude: $max_lat, longitude: $max_lon}))",
+            {"min_lat": min_lat, "max_lat": max_lat, "min_lon": min_lon, "max_lon": max_lon},
+            limit or settings.geo_max_results
+        )
+
+    async def get_entities_within(
+        self, lat: float, lon: float, radius_m: float, limit: Optional[int] = None
+    ) -> List[GeoEntity]:
+        """Find entities within radius_m meters of a point, nearest first."""
+        return self._query(
+            "point.distance(n._location, point({latitude: $lat, longitude: $lon})) <= $radius_m",
+            {"lat": lat, "lon": lon, "radius_m": radius_m},
+            limit or settings.geo_max_results,
+            distance=True
+        )
+
+    async def get_entities_in_polygon(self, polygon: List[List[float]], limit: Optional[int] = None) -> GeoPolygonResult:
+        """
+        Find entities inside a polygon of [lat, lon] vertices (not crossing
+        the antimeridian). Candidates come from the polygon's bounding box,
+        at most geo_max_candidates of them; the result is flagged truncated
+        when that cap or the limit cut it short.
+
+        Raises:
+            ValueError: If the polygon has fewer than 3 vertices
+        """
+        if len(polygon) < 3:
+            raise ValueError("A polygon needs at least 3 vertices")
+        limit = limit or settings.geo_max_results
+        lats = [p[0] for p in polygon]
+        lons = [p[1] for p in polygon]
+        candidates = self._query(
+            "point.withinBBox(n._location, point({latitude: $min_lat, longitude: $min_lon}), "
+            "point({latitude: $max_lat, longitude: $max_lon}))",
+            {"min_lat": min(lats), "max_lat": max(lats), "min_lon": min(lons), "max_lon": max(lons)},
+            settings.geo_max_candidates + 1
+        )
+        capped = len(candidates) > settings.geo_max_candidates
+        if capped:
+            logger.warning(f"Polygon bounding box holds over {settings.geo_max_candidates} entities; result truncated")
+            candidates = candidates[:settings.geo_max_candidates]
+        if not candidates:
+            return GeoPolygonResult()
+        inside = points_in_polygon(
+            np.array([c.lat for c in candidates]), np.array([c.lon for c in candidates]), polygon
+        )
+        hits = [c for c, hit in zip(candidates, inside.tolist()) if hit]
+        return GeoPolygonResult(entities=hits[:limit], truncated=capped or len(hits) > limit)
+
+    def _query(self, predicate: str, params: Dict[str, Any], limit: int, distance: bool = False) -> List[GeoEntity]:
+        """Located entities of every located label matching an indexed _location predicate."""
+        found: List[GeoEntity] = []
+        if distance:
+            ranking = "point.distance(n._location, point({latitude: $lat, longitude: $lon})) AS distance_m ORDER BY distance_m"
+        else:
+            ranking = "null AS distance_m"
+        for label in located_labels():
+            # Nearest-first needs every label's nearest `limit`; otherwise labels fill the limit in turn
+            records = neo4j_client.execute_query(f"""
+            MATCH (n:{label})
+            WHERE {predicate}
+            WITH n, {ranking}
+            LIMIT $limit
+            RETURN id(n) AS id, n._location.latitude AS lat, n._location.longitude AS lon,
+                   distance_m, properties(n) AS props
+            """, {**params, "limit": limit if distance else limit - len(found)})
+            found.extend(
+                GeoEntity(
+                    id=str(r["id"]),
+                    type=label,
+                    lat=r["lat"],
+                    lon=r["lon"],
+                    distance_m=r["distance_m"],
+                    properties={k: v for k, v in r["props"].items() if not k.startswith("_")},
+                )
+                for r in records
+            )
+            if not distance and len(found) >= limit:
+                break
+        if distance:
+            found.sort(key=lambda e: e.distance_m)
+        return found[:limit]
 
     async def get_entity_sightings(self, entity_id: str, entity_type: str) -> List[Dict[str, Any]]:
         """Get history of sightings for an entity (especially vehicles/persons)."""
-        id_field = f"{entity_type.lower()}_id"
+        id_field = ontology_manager.get_key_field(entity_type)
         query = f"""
         MATCH (n:{entity_type} {{{id_field}: $id}})
         MATCH (n)-[r:SIGHTED_AT|LOCATED_AT]-(l:Location)
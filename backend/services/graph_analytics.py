@@ -0,0 +1,416 @@
+"""
+Graph Analytics - Batch centrality and community detection over a graph projection.
+
+The job computes, per projected node:
+- degree: number of incident relationships
+- PageRank on the undirected graph (power iteration, one sparse
+  matrix-vector product per iteration via np.bincount)
+- approximate betweenness: Brandes' algorithm from a sample of pivot
+  nodes, each BFS and dependency pass vectorized per level, scaled by n / k
+- connected components: min-label hooking with pointer jumping
+- communities: label propagation with semi-synchronous updates
+
+Percentile ranks of PageRank and betweenness become RiskLevel values.
+Scores are written back in bulk as underscore node properties (_pagerank,
+_degree_centrality, _betweenness, _component, _community, _risk_level),
+which EntityService and SearchService return with every node.
+
+Reruns are incremental: the projection only pulls newly ingested
+relationships, PageRank and label propagation start from the previous
+result, and only nodes whose scores changed are written.
+"""
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from core.config import settings
+from db.neo4j_client import neo4j_client
+from models.schemas import RiskLevel
+from services.entity_service import plain_properties
+from services.graph_projection import GraphProjection, ProjectionState, unique_sorted
+
+logger = logging.getLogger(__name__)
+
+_WRITE_BATCH_SIZE = 10_000
+
+# Scores that can be ranked through the API, by node property
+SCORE_PROPERTIES = {
+    "pagerank": "_pagerank",
+    "degree": "_degree_centrality",
+    "betweenness": "_betweenness",
+}
+
+
+def _undirected(state: ProjectionState) -> Tuple[np.ndarray, np.ndarray]:
+    """Both directions of every edge, as (node, neighbor) index arrays."""
+    src = state.src.astype(np.int64)
+    dst = state.dst.astype(np.int64)
+    return np.concatenate([src, dst]), np.concatenate([dst, src])
+
+
+def pagerank(
+    nodes: np.ndarray,
+    neighbors: np.ndarray,
+    num_nodes: int,
+    damping: float = 0.85,
+    tolerance: float = 1e-8,
+    max_iterations: int = 100,
+    initial: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, int]:
+    """
+    PageRank by power iteration over (node, neighbor) pairs.
+
+    Returns:
+        (scores summing to 1, iterations used)
+    """
+    if num_nodes == 0:
+        return np.zeros(0), 0
+    degree = np.bincount(nodes, minlength=num_nodes).astype(np.float64)
+    dangling = degree == 0
+    inv_degree = np.divide(1.0, degree, out=np.zeros(num_nodes), where=~dangling)
+    if initial is not None and len(initial) == num_nodes and initial.sum() > 0:
+        rank = initial / initial.sum()
+    else:
+        rank = np.full(num_nodes, 1.0 / num_nodes)
+
+    for iteration in range(1, max_iterations + 1):
+        spread = rank * inv_degree
+        updated = np.bincount(neighbors, weights=spread[nodes], minlength=num_nodes)
+        updated = damping * (updated + rank[dangling].sum() / num_nodes) + (1.0 - damping) / num_nodes
+        delta = np.abs(updated - rank).sum()
+        rank = updated
+        if delta < tolerance:
+            break
+    return rank, iteration
+
+
+def approximate_betweenness(
+    state: ProjectionState,
+    samples: int,
+    seed: int = 0,
+    deadline: Optional[float] = None
+) -> np.ndarray:
+    """
+    Betweenness estimated from `samples` BFS pivots (Brandes), scaled by n / k.
+
+    Each pivot runs one level-synchronous BFS that counts shortest paths
+    (sigma) and records the DAG edges of each level, then accumulates
+    dependencies level by level in reverse.
+    """
+    n = state.num_nodes
+    betweenness = np.zeros(n)
+    if n == 0:
+        return betweenness
+    rng = np.random.default_rng(seed)
+    pivots = rng.choice(n, size=min(samples, n), replace=False)
+    # Scratch arrays, reset over the visited nodes after every pivot
+    dist = np.full(n, -1, dtype=np.int32)
+    sigma = np.zeros(n)
+    delta = np.zeros(n)
+
+    for pivot in pivots:
+        if deadline is not None and time.monotonic() > deadline:
+            logger.warning("Betweenness sampling stopped at its time budget")
+            break
+        sigma[pivot] = 1.0
+        dist[pivot] = 0
+        frontier = np.array([pivot], dtype=np.int64)
+        levels: List[Tuple[np.ndarray, np.ndarray]] = []
+        visited = [frontier]
+        depth = 0
+        while len(frontier):
+            _, owner, nbr = state.neighbors(frontier, "both")
+            reached = unique_sorted(nbr[dist[nbr] == -1])
+            dist[reached] = depth + 1
+            on_dag = dist[nbr] == depth + 1
+            owner, nbr = owner[on_dag], nbr[on_dag]
+            np.add.at(sigma, nbr, sigma[owner])
+            levels.append((owner, nbr))
+            visited.append(reached)
+            frontier = reached
+            depth += 1
+
+        for owner, nbr in reversed(levels):
+            np.add.at(delta, owner, sigma[owner] / sigma[nbr] * (1.0 + delta[nbr]))
+        delta[pivot] = 0.0
+        for nodes in visited:
+            betweenness[nodes] += delta[nodes]
+            dist[nodes] = -1
+            sigma[nodes] = 0.0
+            delta[nodes] = 0.0
+
+    # Undirected pairs are counted from both ends
+    return betweenness * (n / max(len(pivots), 1)) / 2.0
+
+
+def connected_components(nodes: np.ndarray, neighbors: np.ndarray, num_nodes: int) -> np.ndarray:
+    """Smallest node index of each node's component (min-label hooking + pointer jumping)."""
+    labels = np.arange(num_nodes, dtype=np.int64)
+    while True:
+        previous = labels.copy()
+        np.minimum.at(labels, labels[nodes], labels[neighbors])
+        while True:
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+        if np.array_equal(labels, previous):
+            return labels
+
+
+def label_propagation(
+    nodes: np.ndarray,
+    neighbors: np.ndarray,
+    num_nodes: int,
+    max_iterations: int = 20,
+    seed: int = 0,
+    initial: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, int]:
+    """
+    Communities by label propagation.
+
+    Each round, a random half of the nodes adopts the most frequent label
+    among its neighbors (keeping its own label on ties, else the smallest).
+    Updating half the nodes at a time avoids the label oscillation of fully
+    synchronous updates on bipartite structures such as person-phone links.
+
+    Returns:
+        (label per node, rounds used)
+    """
+    labels = np.arange(num_nodes, dtype=np.int64)
+    if initial is not None:
+        labels[:len(initial)] = initial[:num_nodes]
+    if len(nodes) == 0:
+        return labels, 0
+    rng = np.random.default_rng(seed)
+    rounds = 0
+    for rounds in range(1, max_iterations + 1):
+        keys = np.sort(nodes * num_nodes + labels[neighbors])
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        counts = np.diff(np.r_[starts, len(keys)])
+        pair_node, pair_label = np.divmod(keys[starts], num_nodes)
+
+        node_starts = np.flatnonzero(np.r_[True, pair_node[1:] != pair_node[:-1]])
+        node_sizes = np.diff(np.r_[node_starts, len(pair_node)])
+        is_max = counts == np.repeat(np.maximum.reduceat(counts, node_starts), node_sizes)
+        # Prefer the current label among the most frequent ones, then the smallest
+        preference = is_max * 2 + (is_max & (pair_label == labels[pair_node]))
+        best = preference == np.repeat(np.maximum.reduceat(preference, node_starts), node_sizes)
+        chosen = np.flatnonzero(best)
+        chosen = chosen[np.r_[True, pair_node[chosen][1:] != pair_node[chosen][:-1]]]
+
+        targets, values = pair_node[chosen], pair_label[chosen]
+        unstable = labels[targets] != values
+        if unstable.sum() <= num_nodes * 1e-4:
+            break
+        update = unstable & (rng.random(len(chosen)) < 0.5)
+        labels[targets[update]] = values[update]
+    return labels, rounds
+
+
+def risk_levels(*scores: np.ndarray) -> np.ndarray:
+    """RiskLevel per node from the highest percentile rank across the given scores."""
+    n = len(scores[0])
+    percentile = np.zeros(n)
+    for score in scores:
+        ranks = np.empty(n)
+        ranks[np.argsort(score, kind="stable")] = np.arange(n) / max(n - 1, 1)
+        percentile = np.maximum(percentile, ranks)
+    return np.where(
+        percentile >= settings.graph_analytics_high_risk_percentile, RiskLevel.HIGH.value,
+        np.where(percentile >= settings.graph_analytics_med_risk_percentile, RiskLevel.MED.value, RiskLevel.LOW.value)
+    )
+
+
+class GraphAnalytics:
+    """Runs the centrality and community job and writes scores back to Neo4j."""
+
+    def __init__(self, labels: Optional[List[str]] = None, relationship_types: Optional[List[str]] = None):
+        self.projection = GraphProjection(labels=labels, relationship_types=relationship_types)
+        self.scores: Optional[Dict[str, np.ndarray]] = None
+        self.last_run: Optional[Dict[str, Any]] = None
+
+    def compute(self, state: ProjectionState, previous: Optional[Dict[str, np.ndarray]] = None) -> Dict[str, Any]:
+        """Compute every score for a projection state; previous scores warm-start the iterative ones."""
+        n = state.num_nodes
+        timings: Dict[str, float] = {}
+        started = time.monotonic()
+        nodes, neighbors = _undirected(state)
+
+        degree = np.bincount(nodes, minlength=n)
+        timings["degree"] = time.monotonic() - started
+
+        step = time.monotonic()
+        rank, pagerank_iterations = pagerank(
+            nodes, neighbors, n, initial=self._extend(previous, "pagerank", n, 1.0 / max(n, 1))
+        )
+        timings["pagerank"] = time.monotonic() - step
+
+        step = time.monotonic()
+        betweenness = approximate_betweenness(
+            state, settings.graph_analytics_betweenness_samples,
+            deadline=step + settings.graph_analytics_betweenness_budget_seconds
+        )
+        timings["betweenness"] = time.monotonic() - step
+
+        step = time.monotonic()
+        component = connected_components(nodes, neighbors, n)
+        timings["components"] = time.monotonic() - step
+
+        step = time.monotonic()
+        community, lpa_rounds = label_propagation(
+            nodes, neighbors, n, initial=previous["community_index"] if previous else None
+        )
+        timings["communities"] = time.monotonic() - step
+
+        return {
+            "pagerank": rank,
+            "degree": degree,
+            "betweenness": betweenness,
+            "component_index": component,
+            "community_index": community,
+            # Neo4j ids of the representative nodes are stable across reloads
+            "component": state.node_ids[component],
+            "community": state.node_ids[community],
+            "risk_level": risk_levels(rank, betweenness),
+            "pagerank_iterations": pagerank_iterations,
+            "lpa_rounds": lpa_rounds,
+            "timings": timings,
+        }
+
+    @staticmethod
+    def _extend(previous: Optional[Dict[str, np.ndarray]], key: str, n: int, fill: float) -> Optional[np.ndarray]:
+        """Previous per-node scores padded for nodes added since (their indexes come last)."""
+        if previous is None:
+            return None
+        values = previous[key]
+        if len(values) >= n:
+            return values[:n]
+        return np.concatenate([values, np.full(n - len(values), fill)])
+
+    def run(self, full: bool = False) -> Dict[str, Any]:
+        """
+        Run the job.
+
+        Args:
+            full: Reload the projection and recompute everything from scratch
+
+        Returns:
+            Summary of the run (sizes, iterations, timings, rows written)
+        """
+        started = time.monotonic()
+        if full or not self.projection.is_loaded:
+            self.projection.load()
+            previous = None
+        else:
+            if self.projection.refresh() == 0 and self.scores is not None:
+                self.last_run = {**self.last_run, "skipped": True, "checked_at": datetime.utcnow()}
+                return self.last_run
+            previous = self.scores
+
+        state = self.projection.snapshot()
+        result = self.compute(state, previous)
+        written = self._write_back(state, result, previous)
+        self.scores = result
+        self.last_run = {
+            "skipped": False,
+            "incremental": previous is not None,
+            "nodes": state.num_nodes,
+            "edges": state.num_edges,
+            "components": int(len(unique_sorted(result["component_index"]))),
+            "communities": int(len(unique_sorted(result["community_index"]))),
+            "pagerank_iterations": result["pagerank_iterations"],
+            "lpa_rounds": result["lpa_rounds"],
+            "nodes_written": written,
+            "timings": result["timings"],
+            "duration_seconds": time.monotonic() - started,
+            "finished_at": datetime.utcnow(),
+        }
+        logger.info(f"Graph analytics run finished: {self.last_run}")
+        return self.last_run
+
+    def _write_back(self, state: ProjectionState, result: Dict[str, Any], previous: Optional[Dict[str, Any]]) -> int:
+        """Write scores of changed nodes with batched UNWIND updates."""
+        n = state.num_nodes
+        changed = np.ones(n, dtype=bool)
+        if previous is not None:
+            old_n = min(len(previous["pagerank"]), n)
+            same = np.zeros(n, dtype=bool)
+            same[:old_n] = (
+                np.isclose(result["pagerank"][:old_n], previous["pagerank"][:old_n], rtol=1e-3, atol=0)
+                & np.isclose(result["betweenness"][:old_n], previous["betweenness"][:old_n], rtol=1e-2, atol=1e-9)
+                & (result["degree"][:old_n] == previous["degree"][:old_n])
+                & (result["component"][:old_n] == previous["component"][:old_n])
+                & (result["community"][:old_n] == previous["community"][:old_n])
+                & (result["risk_level"][:old_n] == previous["risk_level"][:old_n])
+            )
+            changed = ~same
+
+        indexes = np.flatnonzero(changed)
+        run_at = datetime.utcnow().isoformat()
+        query = """
+        UNWIND $rows AS row
+        MATCH (n) WHERE id(n) = row.id
+        SET n._pagerank = row.pagerank,
+            n._degree_centrality = row.degree,
+            n._betweenness = row.betweenness,
+            n._component = row.component,
+            n._community = row.community,
+            n._risk_level = row.risk_level,
+            n._analytics_at = $run_at
+        """
+        for start in range(0, len(indexes), _WRITE_BATCH_SIZE):
+            batch = indexes[start:start + _WRITE_BATCH_SIZE]
+            rows = [
+                {
+                    "id": node_id, "pagerank": pr, "degree": degree, "betweenness": bc,
+                    "component": component, "community": community, "risk_level": risk,
+                }
+                for node_id, pr, degree, bc, component, community, risk in zip(
+                    state.node_ids[batch].tolist(),
+                    result["pagerank"][batch].tolist(),
+                    result["degree"][batch].tolist(),
+                    result["betweenness"][batch].tolist(),
+                    result["component"][batch].tolist(),
+                    result["community"][batch].tolist(),
+                    result["risk_level"][batch].tolist()
+                )
+            ]
+            neo4j_client.execute_write(query, {"rows": rows, "run_at": run_at})
+        return len(indexes)
+
+    def top_entities(self, metric: str, entity_type: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """Entities ranked by a written-back score."""
+        if metric not in SCORE_PROPERTIES:
+            raise ValueError(f"Unknown metric '{metric}'. Use one of {sorted(SCORE_PROPERTIES)}")
+        if entity_type and not entity_type.isidentifier():
+            raise ValueError(f"Invalid entity type '{entity_type}'")
+        prop = SCORE_PROPERTIES[metric]
+        label = f":{entity_type}" if entity_type else ""
+        query = f"""
+        MATCH (n{label}) WHERE n.{prop} IS NOT NULL
+        RETURN n, labels(n)[0] AS type
+        ORDER BY n.{prop} DESC
+        LIMIT $limit
+        """
+        return [
+            {
+                "id": str(r["n"].id),
+                "type": r["type"],
+                "score": r["n"].get(prop),
+                "risk_level": r["n"].get("_risk_level"),
+                "community": r["n"].get("_community"),
+                "properties": plain_properties(r["n"]),
+            }
+            for r in neo4j_client.execute_query(query, {"limit": limit})
+        ]
+
+
+# Global instance
+graph_analytics = GraphAnalytics(
+    labels=settings.graph_analytics_labels,
+    relationship_types=settings.graph_analytics_relationship_types
+)
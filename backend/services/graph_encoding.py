@@ -0,0 +1,137 @@
+"""
+Graph Encoding - Compact wire formats for GraphData responses.
+
+Graph endpoints negotiate the response encoding from the Accept header:
+- application/json (default): the plain GraphData document
+- application/vnd.minigotham.graph+json: columnar JSON
+- application/x-msgpack: the columnar document packed with MessagePack
+
+The columnar document stores one array per field instead of one object per
+node/edge. Node/edge types and property keys are replaced by indexes into a
+shared string table. Every distinct set of property keys is stored once as a
+"shape" (a list of key indexes), so a property map travels as
+[shape_index, value_1, value_2, ...].
+"""
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+from fastapi import Response
+
+from models.schemas import GraphData
+
+try:
+    import msgpack
+except ImportError:  # MessagePack is optional; columnar JSON is served instead
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+JSON_MEDIA_TYPE = "application/json"
+COLUMNAR_MEDIA_TYPE = "application/vnd.minigotham.graph+json"
+MSGPACK_MEDIA_TYPE = "application/x-msgpack"
+
+COLUMNAR_FORMAT = "columnar/1"
+
+
+class _StringTable:
+    """Interns repeated strings (types, property keys) and property key sets."""
+
+    def __init__(self):
+        self.strings: List[str] = []
+        self.shapes: List[List[int]] = []
+        self._index: Dict[str, int] = {}
+        self._shape_index: Dict[tuple, int] = {}
+
+    def __call__(self, value: str) -> int:
+        idx = self._index.get(value)
+        if idx is None:
+            idx = len(self.strings)
+            self._index[value] = idx
+            self.strings.append(value)
+        return idx
+
+    def row(self, mapping: Optional[Dict[str, Any]]) -> Optional[List[Any]]:
+        """Encode a property map as [shape_index, *values]."""
+        if mapping is None:
+            return None
+        keys = tuple(mapping)
+        idx = self._shape_index.get(keys)
+        if idx is None:
+            idx = len(self.shapes)
+            self._shape_index[keys] = idx
+            self.shapes.append([self(k) for k in keys])
+        return [idx, *mapping.values()]
+
+
+def _plain(value: Any) -> Any:
+    """Encoder fallback for values JSON and MessagePack cannot carry natively."""
+    if isinstance(value, tuple):
+        return list(value)
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if hasattr(value, "iso_format"):
+        return value.iso_format()
+    return str(value)
+
+
+def to_columnar(graph: GraphData) -> Dict[str, Any]:
+    """Convert a graph into the columnar document described in the module docstring."""
+    table = _StringTable()
+    nodes = graph.nodes
+    edges = graph.edges
+
+    document = {
+        "format": COLUMNAR_FORMAT,
+        "nodes": {
+            "id": [n.id for n in nodes],
+            "label": [n.label for n in nodes],
+            "type": [table(n.type) for n in nodes],
+            "risk_level": [n.risk_level.value if n.risk_level else None for n in nodes],
+            "degrees": [table.row(n.degrees) for n in nodes],
+            "properties": [table.row(n.properties) for n in nodes],
+        },
+        "edges": {
+            "id": [e.id for e in edges],
+            "source": [e.source for e in edges],
+            "target": [e.target for e in edges],
+            "type": [table(e.type) for e in edges],
+            "timestamp": [e.timestamp for e in edges],
+            "properties": [table.row(e.properties) for e in edges],
+        },
+    }
+    # Any extra top-level fields (e.g. GraphDelta counters) travel unchanged
+    document.update(graph.model_dump(exclude={"nodes", "edges"}))
+    document["strings"] = table.strings
+    document["shapes"] = table.shapes
+    return document
+
+
+def negotiate(accept: Optional[str]) -> str:
+    """Pick the response media type for an Accept header."""
+    if not accept:
+        return JSON_MEDIA_TYPE
+    accepted = [part.split(";")[0].strip().lower() for part in accept.split(",")]
+    if MSGPACK_MEDIA_TYPE in accepted and msgpack is not None:
+        return MSGPACK_MEDIA_TYPE
+    if COLUMNAR_MEDIA_TYPE in accepted or MSGPACK_MEDIA_TYPE in accepted:
+        return COLUMNAR_MEDIA_TYPE
+    return JSON_MEDIA_TYPE
+
+
+def graph_response(graph: GraphData, accept: Optional[str] = None) -> Response:
+    """
+    Serialize a graph in the negotiated encoding.
+
+    Returning a Response directly bypasses FastAPI's response_model
+    re-validation, which is the expensive part for large graphs built from
+    trusted internal data.
+    """
+    media_type = negotiate(accept)
+    if media_type == MSGPACK_MEDIA_TYPE:
+        body = msgpack.packb(to_columnar(graph), use_bin_type=True, default=_plain)
+    elif media_type == COLUMNAR_MEDIA_TYPE:
+        body = json.dumps(to_columnar(graph), separators=(",", ":"), default=_plain)
+    else:
+        body = graph.model_dump_json()
+    return Response(content=body, media_type=media_type, headers={"Vary": "Accept"})
@@ -0,0 +1,937 @@
+"""
+Graph Projection - Read-only in-memory CSR adjacency for analytics traversals.
+
+A projection loads the relationships of chosen types (between nodes of chosen
+labels) from Neo4j into flat NumPy arrays. Nodes are addressed by a dense
+index; edges by their position in the edge columns. Out- and in-adjacency are
+kept in CSR form (indptr + edge positions), so a hop over any frontier is a
+handful of vectorized gathers instead of a Cypher traversal.
+
+Memory per edge (bytes):
+    src, dst                int32 x 2     8
+    relationship type code  uint8         1
+    time_lo, time_hi        int64 x 2    16
+    weight                  float32       4
+    Neo4j relationship id   int64         8
+    out/in CSR positions    int32 x 2     8
+                                         --
+                                         45
+Memory per node (bytes):
+    Neo4j node id           int64         8
+    label code              uint8         1
+    id lookup (sorted ids + order)       12
+    out/in indptr           int64 x 2    16
+                                         --
+                                         37
+scripts/bench_graph_projection.py measures both on synthetic graphs.
+
+Edge time columns follow the same rules as expansion filters: point-in-time
+relationships store their timestamp in both columns, validity intervals store
+start_date/end_date, and missing bounds are open (int64 min / max).
+"""
+import asyncio
+import heapq
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from core.config import settings
+from db.neo4j_client import neo4j_client
+from models.schemas import NeighborRanking
+
+logger = logging.getLogger(__name__)
+
+NO_TIME_LO = np.iinfo(np.int64).min
+NO_TIME_HI = np.iinfo(np.int64).max
+
+_CHUNK_ROWS = 200_000
+
+
+def _csr(keys: np.ndarray, num_nodes: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Build CSR (indptr, edge positions) grouping edge positions by key node."""
+    order = np.argsort(keys, kind="stable").astype(np.int32)
+    indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=num_nodes), out=indptr[1:])
+    return indptr, order
+
+
+def _gather(frontier: np.ndarray, indptr: np.ndarray, order: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Edge positions adjacent to every frontier entry, with the frontier row of each."""
+    starts = indptr[frontier]
+    counts = indptr[frontier + 1] - starts
+    total = int(counts.sum())
+    if total == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+    row = np.repeat(np.arange(len(frontier)), counts)
+    offsets = np.arange(total) - (np.cumsum(counts) - counts)[row] + starts[row]
+    return order[offsets].astype(np.int64), row
+
+
+def to_epoch(value: Optional[datetime]) -> Optional[int]:
+    """Epoch seconds for a filter bound; naive datetimes are UTC, as in Cypher."""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+
+def _edge_costs(state: "ProjectionState", positions: np.ndarray, weighted: bool) -> np.ndarray:
+    """Traversal cost per edge: 1 per hop, or 1 / (1 + weight) when weighted."""
+    if not weighted:
+        return np.ones(len(positions))
+    weight = np.nan_to_num(state.weight[positions].astype(np.float64), nan=0.0)
+    return 1.0 / (1.0 + np.maximum(weight, 0.0))
+
+
+def unique_sorted(values: np.ndarray) -> np.ndarray:
+    """Sorted distinct values; sorting beats np.unique's hashing on large int arrays."""
+    values = np.sort(values)
+    if len(values) == 0:
+        return values
+    return values[np.r_[True, values[1:] != values[:-1]]]
+
+
+def _check_deadline(deadline: Optional[float]):
+    """Raise once a time.monotonic() deadline has passed."""
+    if deadline is not None and time.monotonic() > deadline:
+        raise TimeoutError("Graph search exceeded its time budget")
+
+
+class ProjectionState:
+    """
+    Immutable snapshot of a projection.
+
+    Refreshes build a new state and swap it in, so readers holding a snapshot
+    never observe half-updated arrays.
+    """
+
+    def __init__(
+        self,
+        node_ids: np.ndarray,
+        node_labels: np.ndarray,
+        label_names: List[str],
+        src: np.ndarray,
+        dst: np.ndarray,
+        edge_type: np.ndarray,
+        type_names: List[str],
+        time_lo: np.ndarray,
+        time_hi: np.ndarray,
+        weight: np.ndarray,
+        rel_ids: np.ndarray
+    ):
+        self.node_ids = node_ids
+        self.node_labels = node_labels
+        self.label_names = label_names
+        self.src = src
+        self.dst = dst
+        self.edge_type = edge_type
+        self.type_names = type_names
+        self.time_lo = time_lo
+        self.time_hi = time_hi
+        self.weight = weight
+        self.rel_ids = rel_ids
+
+        self.sorted_order = np.argsort(node_ids, kind="stable").astype(np.int32)
+        self.sorted_ids = node_ids[self.sorted_order]
+        self.out_indptr, self.out_edges = _csr(src, len(node_ids))
+        self.in_indptr, self.in_edges = _csr(dst, len(node_ids))
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.src)
+
+    def lookup(self, neo4j_ids: Sequence[int]) -> np.ndarray:
+        """Map Neo4j node ids to projection indexes (-1 when not projected)."""
+        ids = np.asarray(neo4j_ids, dtype=np.int64)
+        if self.num_nodes == 0:
+            return np.full(len(ids), -1, dtype=np.int64)
+        pos = np.searchsorted(self.sorted_ids, ids)
+        pos = np.minimum(pos, self.num_nodes - 1)
+        found = self.sorted_ids[pos] == ids
+        return np.where(found, self.sorted_order[pos], -1).astype(np.int64)
+
+    def type_codes(self, names: Optional[Sequence[str]]) -> Optional[np.ndarray]:
+        """Codes for relationship type names; None means every type."""
+        if not names:
+            return None
+        return np.array([self.type_names.index(n) for n in names if n in self.type_names], dtype=np.uint8)
+
+    def neighbors(
+        self,
+        frontier: np.ndarray,
+        direction: str = "both",
+        type_codes: Optional[np.ndarray] = None,
+        start: Optional[int] = None,
+        end: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        One vectorized hop.
+
+        Returns (edge positions, owner index, neighbor index) for every edge
+        incident to the frontier in the given direction ("out", "in", "both")
+        that passes the type and time filters. Times are epoch seconds.
+        """
+        frontier = np.asarray(frontier, dtype=np.int64)
+        parts = []
+        if direction in ("out", "both"):
+            pos, row = _gather(frontier, self.out_indptr, self.out_edges)
+            parts.append((pos, frontier[row], self.dst[pos]))
+        if direction in ("in", "both"):
+            pos, row = _gather(frontier, self.in_indptr, self.in_edges)
+            if direction == "both":
+                # Self-loops were already gathered as outgoing edges
+                loops = self.src[pos] == self.dst[pos]
+                pos, row = pos[~loops], row[~loops]
+            parts.append((pos, frontier[row], self.src[pos]))
+        pos = np.concatenate([p[0] for p in parts])
+        owner = np.concatenate([p[1] for p in parts])
+        nbr = np.concatenate([p[2] for p in parts]).astype(np.int64)
+
+        mask = np.ones(len(pos), dtype=bool)
+        if type_codes is not None:
+            mask &= np.isin(self.edge_type[pos], type_codes)
+        if start is not None:
+            mask &= self.time_hi[pos] >= start
+        if end is not None:
+            mask &= self.time_lo[pos] <= end
+        return pos[mask], owner[mask], nbr[mask]
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Bytes held by node and edge arrays."""
+        node_bytes = sum(a.nbytes for a in (
+            self.node_ids, self.node_labels, self.sorted_order, self.sorted_ids,
+            self.out_indptr, self.in_indptr
+        ))
+        edge_bytes = sum(a.nbytes for a in (
+            self.src, self.dst, self.edge_type, self.time_lo, self.time_hi,
+            self.weight, self.rel_ids, self.out_edges, self.in_edges
+        ))
+        return {"node_bytes": node_bytes, "edge_bytes": edge_bytes, "total_bytes": node_bytes + edge_bytes}
+
+
+class _CheapestPathSearch:
+    """
+    Hop-bounded cheapest paths by bidirectional frontier Bellman-Ford.
+
+    Each side keeps its own distances. A round of one side relaxes the edges
+    of the nodes it improved in its previous round, reading distances as they
+    stood before the round, so after r rounds that side holds the cheapest
+    cost over paths of at most r hops from its root. With a forward and b
+    backward rounds, a + b = max_hops, every path within the hop budget
+    splits at a node both sides reached within theirs, so the cheapest
+    meeting (forward + backward cost at one node) is the cheapest path.
+
+    Every round expands the side whose frontier has the smaller total degree,
+    so a hub in the middle of a path is reached from both sides instead of
+    having all its edges scanned. Candidates no cheaper than the best meeting
+    are pruned. Scratch arrays are shared by all runs (Yen's spur searches)
+    and reset entry by entry.
+    """
+
+    def __init__(
+        self,
+        state: ProjectionState,
+        type_codes: Optional[np.ndarray],
+        directed: bool,
+        weighted: bool,
+        deadline: Optional[float]
+    ):
+        self.state = state
+        self.type_codes = type_codes
+        self.directions = ("out", "in") if directed else ("both", "both")
+        self.weighted = weighted
+        self.deadline = deadline
+        self.dist = (np.full(state.num_nodes, np.inf), np.full(state.num_nodes, np.inf))
+        self.best = np.full(state.num_nodes, np.inf)
+        self.pick = np.zeros(state.num_nodes, dtype=np.int64)
+
+    def _degree_sum(self, nodes: np.ndarray, direction: str) -> int:
+        """Number of edge slots a gather over these nodes would read."""
+        total = 0
+        if direction in ("out", "both"):
+            total += int((self.state.out_indptr[nodes + 1] - self.state.out_indptr[nodes]).sum())
+        if direction in ("in", "both"):
+            total += int((self.state.in_indptr[nodes + 1] - self.state.in_indptr[nodes]).sum())
+        return total
+
+    def run(
+        self,
+        source: int,
+        target: int,
+        max_hops: int,
+        banned_nodes: Optional[np.ndarray] = None,
+        banned_edges: Optional[np.ndarray] = None
+    ) -> Optional[Tuple[float, List[int], List[int]]]:
+        """Cheapest path with at most max_hops, avoiding banned elements."""
+        state, best, pick = self.state, self.best, self.pick
+        roots = (source, target)
+        frontiers = [np.array([source], dtype=np.int64), np.array([target], dtype=np.int64)]
+        touched: Tuple[List[np.ndarray], List[np.ndarray]] = ([frontiers[0]], [frontiers[1]])
+        # Per side and round: improved nodes (sorted), the edge and the node
+        # one step closer to the side's root for each
+        histories: Tuple[List[Tuple[np.ndarray, np.ndarray, np.ndarray]], ...] = ([], [])
+        self.dist[0][source] = 0.0
+        self.dist[1][target] = 0.0
+        best_cost = np.inf
+        meeting: Optional[Tuple[int, int, int]] = None
+        try:
+            for _ in range(max_hops):
+                _check_deadline(self.deadline)
+                open_sides = [i for i in (0, 1) if len(frontiers[i])]
+                if not open_sides:
+                    break
+                side = min(open_sides, key=lambda i: self._degree_sum(frontiers[i], self.directions[i]))
+                own, other = self.dist[side], self.dist[1 - side]
+
+                pos, owner, nbr = state.neighbors(frontiers[side], self.directions[side], self.type_codes)
+                keep = np.ones(len(pos), dtype=bool)
+                if banned_edges is not None and len(banned_edges):
+                    keep &= ~np.isin(pos, banned_edges)
+                if banned_nodes is not None and len(banned_nodes):
+                    keep &= ~np.isin(nbr, banned_nodes)
+                pos, owner, nbr = pos[keep], owner[keep], nbr[keep]
+                cand = own[owner] + _edge_costs(state, pos, self.weighted)
+                keep = (cand < own[nbr]) & (cand < best_cost)
+                pos, owner, nbr, cand = pos[keep], owner[keep], nbr[keep], cand[keep]
+
+                # Cheapest candidate per node; among ties the last one wins
+                np.minimum.at(best, nbr, cand)
+                winners = np.flatnonzero(cand == best[nbr])
+                best[nbr] = np.inf
+                nodes = unique_sorted(nbr[winners])
+                pick[nbr[winners]] = winners
+                winners = pick[nodes]
+                own[nodes] = cand[winners]
+                touched[side].append(nodes)
+                histories[side].append((nodes, pos[winners], owner[winners]))
+
+                if len(nodes):
+                    totals = own[nodes] + other[nodes]
+                    i = int(np.argmin(totals))
+                    if totals[i] < best_cost:
+                        best_cost = float(totals[i])
+                        meeting = (int(nodes[i]), len(histories[0]), len(histories[1]))
+                frontiers[side] = nodes[nodes != roots[1 - side]]
+
+            if meeting is None:
+                return None
+            node, forward_rounds, backward_rounds = meeting
+            head_nodes, head_edges = self._walk(histories[0], node, source, forward_rounds)
+            tail_nodes, tail_edges = self._walk(histories[1], node, target, backward_rounds)
+            return best_cost, head_nodes[::-1] + tail_nodes[1:], head_edges[::-1] + tail_edges
+        finally:
+            for side in (0, 1):
+                for nodes in touched[side]:
+                    self.dist[side][nodes] = np.inf
+
+    @staticmethod
+    def _walk(
+        history: List[Tuple[np.ndarray, np.ndarray, np.ndarray]],
+        node: int,
+        root: int,
+        rounds: int
+    ) -> Tuple[List[int], List[int]]:
+        """Follow one side's improvements (within its first rounds) from a node to its root."""
+        nodes, edges = [node], []
+        r = rounds - 1
+        while node != root:
+            while True:
+                round_nodes, round_edges, round_owners = history[r]
+                i = np.searchsorted(round_nodes, node)
+                if i < len(round_nodes) and round_nodes[i] == node:
+                    break
+                r -= 1
+            edges.append(int(round_edges[i]))
+            node = int(round_owners[i])
+            nodes.append(node)
+            r -= 1
+        return nodes, edges
+
+
+class ExpansionResult:
+    """Outcome of a projection BFS, in projection indexes."""
+
+    def __init__(self, nodes: np.ndarray, edges: np.ndarray, truncated: List[Tuple[int, int, int, int]]):
+        self.nodes = nodes
+        self.edges = edges
+        # (node index, type code, hidden count, kept count) per capped node/type
+        self.truncated = truncated
+
+
+def merge_edges(old: Optional[ProjectionState], batches: List[Dict[str, Any]]) -> ProjectionState:
+    """
+    A new state holding old's edges plus the given batches of relationships
+    (Neo4j ids, one relationship type per batch), built with a single sort.
+    Relationships already in old are updated in place.
+    """
+    label_names = list(old.label_names) if old else []
+    type_names = list(old.type_names) if old else []
+    node_ids = old.node_ids if old else np.empty(0, dtype=np.int64)
+    node_labels = old.node_labels if old else np.empty(0, dtype=np.uint8)
+    type_codes = []
+    for batch in batches:
+        rel_type = batch["rel_type"]
+        if rel_type is not None and rel_type not in type_names:
+            type_names.append(rel_type)
+        code = type_names.index(rel_type) if rel_type is not None else 0
+        type_codes.append(np.full(len(batch["rel_ids"]), code, dtype=np.uint8))
+
+    def joined(key: str, dtype) -> np.ndarray:
+        return np.concatenate([np.asarray(b[key], dtype=dtype) for b in batches] or [np.empty(0, dtype=dtype)])
+
+    rel_ids = joined("rel_ids", np.int64)
+    src_ids = joined("src_ids", np.int64)
+    dst_ids = joined("dst_ids", np.int64)
+    src_labels = [label for b in batches for label in b["src_labels"]]
+    dst_labels = [label for b in batches for label in b["dst_labels"]]
+
+    # Assign dense indexes to nodes seen for the first time
+    endpoint_ids = np.concatenate([src_ids, dst_ids])
+    endpoint_labels = src_labels + dst_labels
+    known = old.lookup(endpoint_ids) if old else np.full(len(endpoint_ids), -1, dtype=np.int64)
+    new_ids, first = np.unique(endpoint_ids[known < 0], return_index=True)
+    if len(new_ids):
+        unknown_positions = np.flatnonzero(known < 0)
+        new_labels = []
+        for p in unknown_positions[first]:
+            label = endpoint_labels[p]
+            if label not in label_names:
+                label_names.append(label)
+            new_labels.append(label_names.index(label))
+        node_ids = np.concatenate([node_ids, new_ids])
+        node_labels = np.concatenate([node_labels, np.array(new_labels, dtype=np.uint8)])
+
+    lookup_ids = np.sort(node_ids)
+    lookup_order = np.argsort(node_ids, kind="stable")
+
+    def to_index(ids: np.ndarray) -> np.ndarray:
+        return lookup_order[np.searchsorted(lookup_ids, ids)].astype(np.int32)
+
+    columns = {
+        "src": to_index(src_ids), "dst": to_index(dst_ids),
+        "edge_type": np.concatenate(type_codes or [np.empty(0, dtype=np.uint8)]),
+        "time_lo": joined("time_lo", np.int64), "time_hi": joined("time_hi", np.int64),
+        "weight": joined("weight", np.float32), "rel_ids": rel_ids
+    }
+    if old is not None and old.num_edges:
+        # Relationships re-read after re-ingestion are updated in place
+        old_order = np.argsort(old.rel_ids)
+        pos = np.minimum(np.searchsorted(old.rel_ids, rel_ids, sorter=old_order), old.num_edges - 1)
+        existing = old.rel_ids[old_order[pos]] == rel_ids
+        merged = {}
+        for key, new_values in columns.items():
+            values = getattr(old, key).copy()
+            values[old_order[pos[existing]]] = new_values[existing]
+            merged[key] = np.concatenate([values, new_values[~existing]])
+        columns = merged
+    elif old is not None:
+        columns = {key: np.concatenate([getattr(old, key), values]) for key, values in columns.items()}
+
+    return ProjectionState(
+        node_ids=node_ids,
+        node_labels=node_labels,
+        label_names=label_names,
+        type_names=type_names,
+        **columns
+    )
+
+
+class GraphProjection:
+    """In-memory CSR projection of the graph, refreshed incrementally from Neo4j."""
+
+    def __init__(self, labels: Optional[List[str]] = None, relationship_types: Optional[List[str]] = None):
+        self.labels = labels
+        self.relationship_types = relationship_types
+        self.watermark: Optional[str] = None
+        self.loaded_at: Optional[datetime] = None
+        self._state: Optional[ProjectionState] = None
+        self._refresh_lock = threading.Lock()
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._state is not None
+
+    def snapshot(self) -> ProjectionState:
+        """Current immutable state; raises if the projection was never loaded."""
+        if self._state is None:
+            raise RuntimeError("Graph projection not loaded. Call load() first.")
+        return self._state
+
+    def covers(self, relationship_types: Optional[Sequence[str]] = None, labels: Optional[Sequence[str]] = None) -> bool:
+        """Whether traversals over these types/labels can be answered exactly from memory."""
+        if not self.is_loaded:
+            return False
+        if self.relationship_types is not None:
+            if not relationship_types or not set(relationship_types) <= set(self.relationship_types):
+                return False
+        if self.labels is not None:
+            if not labels or not set(labels) <= set(self.labels):
+                return False
+        return True
+
+    # ----- Loading -----
+
+    def load(self):
+        """Load the projection from scratch."""
+        with self._refresh_lock:
+            started = datetime.utcnow()
+            # The previous state keeps serving until the new one is complete
+            self._apply(self._read_relationships(None), base=None)
+            self.loaded_at = datetime.utcnow()
+            state = self._state
+            logger.info(
+                f"Graph projection loaded: {state.num_nodes} nodes, {state.num_edges} edges, "
+                f"{state.memory_usage()['total_bytes'] / 1e6:.1f} MB in "
+                f"{(self.loaded_at - started).total_seconds():.1f}s"
+            )
+
+    def refresh(self) -> int:
+        """
+        Pull relationships ingested since the last load/refresh.
+
+        Relationships already in the projection are updated in place; new ones
+        are appended and the CSR is rebuilt in memory. Deleted relationships are
+        only dropped by a full load().
+
+        Returns:
+            Number of relationships read
+        """
+        if not self.is_loaded:
+            self.load()
+            return self._state.num_edges
+        with self._refresh_lock:
+            return self._apply(self._read_relationships(self.watermark), base=self._state)
+
+    def _relationship_types_to_load(self) -> List[str]:
+        if self.relationship_types is not None:
+            return list(self.relationship_types)
+        return [r["type"] for r in neo4j_client.execute_query(
+            "CALL db.relationshipTypes() YIELD relationshipType RETURN relationshipType AS type"
+        )]
+
+    def _read_relationships(self, watermark: Optional[str]):
+        """
+        Stream relationship rows from Neo4j in column chunks, each with the
+        newest _ingested_at it holds.
+        """
+        label_filter = ""
+        if self.labels is not None:
+            label_filter = "AND labels(a)[0] IN $labels AND labels(b)[0] IN $labels"
+        watermark_filter = "AND r._ingested_at >= $watermark" if watermark else ""
+
+        for rel_type in self._relationship_types_to_load():
+            query = f"""
+            MATCH (a)-[r:{rel_type}]->(b)
+            WHERE true {watermark_filter} {label_filter}
+            RETURN id(r) AS rel_id, id(a) AS src, id(b) AS dst,
+                   labels(a)[0] AS src_label, labels(b)[0] AS dst_label,
+                   CASE
+                       WHEN r.timestamp IS NOT NULL THEN datetime(r.timestamp).epochSeconds
+                       WHEN r.start_date IS NOT NULL THEN datetime(r.start_date).epochSeconds
+                   END AS time_lo,
+                   CASE
+                       WHEN r.timestamp IS NOT NULL THEN datetime(r.timestamp).epochSeconds
+                       WHEN r.end_date IS NOT NULL THEN datetime(r.end_date).epochSeconds
+                   END AS time_hi,
+                   coalesce(toFloat(r.amount_usd), toFloat(r.duration_sec)) AS weight,
+                   r._ingested_at AS ingested_at
+            """
+            columns = {k: [] for k in (
+                "rel_id", "src", "dst", "src_label", "dst_label", "time_lo", "time_hi", "weight"
+            )}
+            rows = 0
+            latest = None
+            for record in neo4j_client.stream_query(query, {"labels": self.labels, "watermark": watermark}):
+                for key in columns:
+                    columns[key].append(record[key])
+                ingested_at = record["ingested_at"]
+                if ingested_at and (latest is None or ingested_at > latest):
+                    latest = ingested_at
+                rows += 1
+                if rows % _CHUNK_ROWS == 0:
+                    yield rel_type, columns, latest
+                    columns = {k: [] for k in columns}
+                    latest = None
+            if columns["rel_id"]:
+                yield rel_type, columns, latest
+
+    def _apply(self, chunks, base: Optional[ProjectionState]) -> int:
+        """
+        Merge all streamed relationship chunks into base in one step, then
+        swap the new state in and only then advance the watermark, so
+        readers never see a partial load and a failed read loses nothing.
+        """
+        batches = []
+        latest = self.watermark if base is not None else None
+        for rel_type, columns, chunk_latest in chunks:
+            batches.append({
+                "rel_ids": np.array(columns["rel_id"], dtype=np.int64),
+                "src_ids": np.array(columns["src"], dtype=np.int64),
+                "dst_ids": np.array(columns["dst"], dtype=np.int64),
+                "src_labels": columns["src_label"],
+                "dst_labels": columns["dst_label"],
+                "rel_type": rel_type,
+                "time_lo": np.array([NO_TIME_LO if t is None else t for t in columns["time_lo"]], dtype=np.int64),
+                "time_hi": np.array([NO_TIME_HI if t is None else t for t in columns["time_hi"]], dtype=np.int64),
+                "weight": np.array([np.nan if w is None else w for w in columns["weight"]], dtype=np.float32),
+            })
+            if chunk_latest and (latest is None or chunk_latest > latest):
+                latest = chunk_latest
+        if batches or base is None:
+            self._state = merge_edges(base, batches)
+        self.watermark = latest
+        return sum(len(batch["rel_ids"]) for batch in batches)
+
+    def add_edges(
+        self,
+        rel_ids: np.ndarray,
+        src_ids: np.ndarray,
+        dst_ids: np.ndarray,
+        src_labels: Sequence[str],
+        dst_labels: Sequence[str],
+        rel_type: Optional[str],
+        time_lo: np.ndarray,
+        time_hi: np.ndarray,
+        weight: np.ndarray
+    ):
+        """
+        Add or update a batch of relationships of one type (Neo4j ids).
+
+        Builds projections without a database, for benchmarks and tests;
+        loads from Neo4j merge all their batches at once through merge_edges.
+        """
+        self._state = merge_edges(self._state, [{
+            "rel_ids": rel_ids, "src_ids": src_ids, "dst_ids": dst_ids,
+            "src_labels": src_labels, "dst_labels": dst_labels, "rel_type": rel_type,
+            "time_lo": time_lo, "time_hi": time_hi, "weight": weight,
+        }])
+
+    # ----- Traversals -----
+
+    def expand(
+        self,
+        sources: Sequence[int],
+        depth: int,
+        relationship_types: Optional[Sequence[str]] = None,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        direction: str = "both",
+        max_neighbors: Optional[int] = None,
+        rank_by: NeighborRanking = NeighborRanking.RECENT
+    ) -> ExpansionResult:
+        """
+        Frontier BFS from projection indexes, deduplicating edges.
+
+        With max_neighbors, each node keeps at most that many edges per
+        relationship type, ranked like EntityService expansion (most recent or
+        highest volume first, ties by relationship id); the remainder is
+        reported in ExpansionResult.truncated. Edges seen at earlier hops are
+        ranked too, so the cut matches EntityService.page_neighbors offsets.
+        """
+        state = self.snapshot()
+        type_codes = state.type_codes(relationship_types)
+        visited = np.zeros(state.num_nodes, dtype=bool)
+        frontier = unique_sorted(np.asarray(sources, dtype=np.int64))
+        visited[frontier] = True
+        collected: List[np.ndarray] = []
+        seen_edges = np.empty(0, dtype=np.int64)
+        truncated: List[Tuple[int, int, int, int]] = []
+
+        for _ in range(depth):
+            if len(frontier) == 0:
+                break
+            pos, owner, nbr = state.neighbors(frontier, direction, type_codes, start, end)
+            if max_neighbors is not None and len(pos):
+                keep, dropped = self._cap(state, pos, owner, max_neighbors, rank_by)
+                truncated.extend(dropped)
+                pos, owner, nbr = pos[keep], owner[keep], nbr[keep]
+
+            fresh = ~np.isin(pos, seen_edges)
+            pos, owner, nbr = pos[fresh], owner[fresh], nbr[fresh]
+
+            seen_edges = np.union1d(seen_edges, pos)
+            collected.append(pos)
+            nbr = unique_sorted(nbr)
+            frontier = nbr[~visited[nbr]]
+            visited[frontier] = True
+
+        edges = unique_sorted(np.concatenate(collected)) if collected else np.empty(0, dtype=np.int64)
+        return ExpansionResult(np.flatnonzero(visited), edges, truncated)
+
+    def _cap(
+        self,
+        state: ProjectionState,
+        pos: np.ndarray,
+        owner: np.ndarray,
+        max_neighbors: int,
+        rank_by: NeighborRanking
+    ) -> Tuple[np.ndarray, List[Tuple[int, int, int, int]]]:
+        """Keep the top-ranked edges per (owner, relationship type) group."""
+        types = state.edge_type[pos].astype(np.int64)
+        _, inverse, counts = np.unique(
+            owner * (len(state.type_names) + 1) + types, return_inverse=True, return_counts=True
+        )
+        keep = counts[inverse] <= max_neighbors
+        over = np.flatnonzero(~keep)
+        if len(over) == 0:
+            return keep, []
+
+        if rank_by == NeighborRanking.VOLUME:
+            rank = np.nan_to_num(state.weight[pos].astype(np.float64), nan=0.0)
+        else:
+            rank = state.time_lo[pos]
+        # Only oversized groups are ranked; a selection per group avoids a full sort
+        over = over[np.argsort(inverse[over], kind="stable")]
+        splits = np.flatnonzero(np.diff(inverse[over])) + 1
+        dropped = []
+        for members in np.split(over, splits):
+            member_rank = rank[members]
+            threshold = np.partition(member_rank, len(members) - max_neighbors)[len(members) - max_neighbors]
+            above = members[member_rank > threshold]
+            ties = members[member_rank == threshold]
+            ties = ties[np.argsort(state.rel_ids[pos[ties]])][:max_neighbors - len(above)]
+            keep[above] = True
+            keep[ties] = True
+            first = members[0]
+            dropped.append((int(owner[first]), int(types[first]), len(members) - max_neighbors, max_neighbors))
+        return keep, dropped
+
+    def paths(
+        self,
+        source: int,
+        depth: int,
+        relationship_types: Optional[Sequence[str]] = None,
+        max_paths: Optional[int] = None
+    ) -> List[np.ndarray]:
+        """
+        Every directed path of 1..depth hops from a projection index.
+
+        Mirrors Cypher variable-length matching: a relationship appears at most
+        once per path, nodes may repeat. Paths are returned as arrays of edge
+        positions, shortest first.
+        """
+        state = self.snapshot()
+        type_codes = state.type_codes(relationship_types)
+        found: List[np.ndarray] = []
+        # One row per open path: its edge positions so far and its last node
+        paths = np.empty((1, 0), dtype=np.int64)
+        last = np.array([source], dtype=np.int64)
+
+        for hop in range(depth):
+            pos, row = _gather(last, state.out_indptr, state.out_edges)
+            if type_codes is not None:
+                keep = np.isin(state.edge_type[pos], type_codes)
+                pos, row = pos[keep], row[keep]
+            if hop:
+                keep = ~(paths[row] == pos[:, None]).any(axis=1)
+                pos, row = pos[keep], row[keep]
+            if len(pos) == 0:
+                break
+            paths = np.column_stack([paths[row], pos])
+            last = state.dst[pos].astype(np.int64)
+            found.extend(paths)
+            if max_paths is not None and len(found) >= max_paths:
+                return found[:max_paths]
+        return found
+
+    def shortest_path(
+        self,
+        source: int,
+        target: int,
+        max_hops: int,
+        relationship_types: Optional[Sequence[str]] = None,
+        directed: bool = False,
+        deadline: Optional[float] = None
+    ) -> Optional[Tuple[List[int], List[int]]]:
+        """
+        Fewest-hop path between two projection indexes by bidirectional BFS.
+
+        Each step expands the smaller of the two frontiers by a full level, so
+        the search touches roughly the square root of what a one-sided BFS
+        would on the same graph.
+
+        Returns:
+            (node indexes, edge positions) from source to target, or None
+        """
+        state = self.snapshot()
+        if source == target:
+            return [source], []
+        type_codes = state.type_codes(relationship_types)
+        # Which search reached a node (1 = source side, 2 = target side), through
+        # which edge (position + 1, 0 for the roots) and after how many hops
+        side = np.zeros(state.num_nodes, dtype=np.int8)
+        pred = np.zeros(state.num_nodes, dtype=np.int64)
+        hops = np.zeros(state.num_nodes, dtype=np.int16)
+        side[source], side[target] = 1, 2
+        frontiers = {1: np.array([source], dtype=np.int64), 2: np.array([target], dtype=np.int64)}
+        levels = {1: 0, 2: 0}
+        directions = {1: "out" if directed else "both", 2: "in" if directed else "both"}
+
+        while levels[1] + levels[2] < max_hops:
+            _check_deadline(deadline)
+            if len(frontiers[1]) == 0 or len(frontiers[2]) == 0:
+                return None
+            this = 1 if len(frontiers[1]) <= len(frontiers[2]) else 2
+            other = 3 - this
+            pos, owner, nbr = state.neighbors(frontiers[this], directions[this], type_codes)
+            levels[this] += 1
+
+            meets = np.flatnonzero(side[nbr] == other)
+            if len(meets):
+                best = meets[np.argmin(hops[nbr[meets]])]
+                # Chains back to each root; the source-side chain is reversed
+                head = self._walk_back(state, pred, int(owner[best] if this == 1 else nbr[best]))
+                tail = self._walk_back(state, pred, int(nbr[best] if this == 1 else owner[best]))
+                return head[0][::-1] + tail[0], head[1][::-1] + [int(pos[best])] + tail[1]
+
+            fresh = side[nbr] == 0
+            reached = unique_sorted(nbr[fresh])
+            side[reached] = this
+            pred[nbr[fresh]] = pos[fresh] + 1
+            hops[reached] = levels[this]
+            frontiers[this] = reached
+        return None
+
+    @staticmethod
+    def _walk_back(state: ProjectionState, pred: np.ndarray, node: int) -> Tuple[List[int], List[int]]:
+        """Follow BFS predecessor edges from a node back to its search root."""
+        nodes, edges = [node], []
+        while pred[node]:
+            edge = int(pred[node]) - 1
+            node = int(state.src[edge]) if state.dst[edge] == node else int(state.dst[edge])
+            edges.append(edge)
+            nodes.append(node)
+        return nodes, edges
+
+    def cheapest_paths(
+        self,
+        source: int,
+        target: int,
+        k: int,
+        max_hops: int,
+        relationship_types: Optional[Sequence[str]] = None,
+        directed: bool = False,
+        weighted: bool = True,
+        deadline: Optional[float] = None
+    ) -> List[Tuple[float, List[int], List[int]]]:
+        """
+        Up to k cheapest loopless paths of at most max_hops (Yen's algorithm).
+
+        Weighted edge cost is 1 / (1 + weight), so heavy call volume or large
+        transfers make short links; unweighted cost is 1 per hop.
+
+        Returns:
+            (cost, node indexes, edge positions) per path, cheapest first
+        """
+        state = self.snapshot()
+        search = _CheapestPathSearch(state, state.type_codes(relationship_types), directed, weighted, deadline)
+        first = search.run(source, target, max_hops)
+        if first is None:
+            return []
+        found = [first]
+        candidates: List[Tuple[float, int, List[int], List[int]]] = []
+        queued = {tuple(first[2])}
+
+        while len(found) < k:
+            _, prev_nodes, prev_edges = found[-1]
+            for j in range(len(prev_edges)):
+                root_edges = prev_edges[:j]
+                banned_edges = [p[2][j] for p in found if len(p[2]) > j and p[2][:j] == root_edges]
+                spur_path = search.run(
+                    prev_nodes[j], target, max_hops - j,
+                    np.array(prev_nodes[:j], dtype=np.int64), np.array(banned_edges, dtype=np.int64)
+                )
+                if spur_path is None:
+                    continue
+                spur_cost, spur_nodes, spur_edges = spur_path
+                edges = root_edges + spur_edges
+                if tuple(edges) in queued:
+                    continue
+                queued.add(tuple(edges))
+                root_cost = float(_edge_costs(state, np.array(root_edges, dtype=np.int64), weighted).sum())
+                heapq.heappush(candidates, (root_cost + spur_cost, len(edges), edges, prev_nodes[:j] + spur_nodes))
+            if not candidates:
+                break
+            cost, _, edges, nodes = heapq.heappop(candidates)
+            found.append((cost, nodes, edges))
+        return found
+
+    # ----- Hydration -----
+
+    def node_ids(self, indexes: np.ndarray) -> List[int]:
+        """Neo4j node ids for projection indexes."""
+        return self.snapshot().node_ids[indexes].tolist()
+
+    def relationship_ids(self, positions: np.ndarray) -> List[int]:
+        """Neo4j relationship ids for edge positions."""
+        return self.snapshot().rel_ids[positions].tolist()
+
+    @staticmethod
+    def fetch_nodes(ids: List[int]) -> Dict[int, Any]:
+        """Load Neo4j nodes by internal id."""
+        if not ids:
+            return {}
+        records = neo4j_client.execute_query("MATCH (n) WHERE id(n) IN $ids RETURN n", {"ids": ids})
+        return {r["n"].id: r["n"] for r in records}
+
+    @staticmethod
+    def fetch_relationships(ids: List[int]) -> Dict[int, Any]:
+        """Load Neo4j relationships by internal id."""
+        if not ids:
+            return {}
+        records = neo4j_client.execute_query(
+            "MATCH ()-[r]->() WHERE id(r) IN $ids RETURN r", {"ids": ids}
+        )
+        return {r["r"].id: r["r"] for r in records}
+
+    def stats(self) -> Dict[str, object]:
+        """Summary of the loaded projection for monitoring endpoints."""
+        if not self.is_loaded:
+            return {"loaded": False}
+        state = self._state
+        memory = state.memory_usage()
+        return {
+            "loaded": True,
+            "nodes": state.num_nodes,
+            "edges": state.num_edges,
+            "labels": state.label_names,
+            "relationship_types": state.type_names,
+            "watermark": self.watermark,
+            "loaded_at": self.loaded_at,
+            "bytes_per_edge": memory["edge_bytes"] / max(state.num_edges, 1),
+            "bytes_per_node": memory["node_bytes"] / max(state.num_nodes, 1),
+            **memory,
+        }
+
+
+async def run_projection_refresh(projection: "GraphProjection", interval_seconds: int):
+    """Load the projection, then keep pulling newly ingested relationships."""
+    try:
+        await asyncio.to_thread(projection.load)
+    except Exception as e:
+        logger.error(f"Graph projection load failed: {e}")
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            count = await asyncio.to_thread(projection.refresh)
+            if count:
+                logger.info(f"Graph projection refreshed with {count} relationships")
+        except Exception as e:
+            logger.error(f"Graph projection refresh failed: {e}")
+
+
+# Global instance
+graph_projection = GraphProjection(
+    labels=settings.graph_projection_labels,
+    relationship_types=settings.graph_projection_relationship_types
+)
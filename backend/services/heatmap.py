@@ -0,0 +1,215 @@
+"""
+Heatmap Service - Activity density over a region and time range.
+
+Observations are the located events the co-location engine also uses:
+sightings at their own coordinates (or their location's), calls at their
+cell location and event attendances at the event's location, one layer
+per relationship type. Each layer is read from Neo4j already counted per
+place for the time window, so a window costs one aggregate query per
+layer however many events it holds, and is cached; binning those places
+into a grid over a bounding box is one vectorized bincount. Grids are
+cached by (bbox, resolution, window, layers), so only counts ever reach
+the browser.
+"""
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from core.config import settings
+from db.neo4j_client import neo4j_client
+from models.schemas import Heatmap
+from services.graph_projection import to_epoch
+
+logger = logging.getLogger(__name__)
+
+# Per layer: query counting observations per place (with a {where} slot for
+# its conditions), the time expression the window applies to, and
+# conditions that always apply
+_LAYER_QUERIES: Dict[str, Tuple[str, str, List[str]]] = {
+    "SIGHTED_AT": ("""
+    MATCH ()-[r:SIGHTED_AT]->(l:Location)
+    {where}
+    WITH coalesce(toFloat(r.lat), l._location.latitude) AS lat,
+         coalesce(toFloat(r.lon), l._location.longitude) AS lon, count(*) AS n
+    """, "r._ts", []),
+    "CALL": ("""
+    MATCH (:Phone)-[r:CALL]->(:Phone)
+    {where}
+    WITH r.cell_location_id AS location_id, count(*) AS n
+    MATCH (l:Location {{location_id: location_id}})
+    WITH l._location.latitude AS lat, l._location.longitude AS lon, n
+    """, "r._ts", ["r.cell_location_id IS NOT NULL"]),
+    "PERSON_ATTENDED_EVENT": ("""
+    MATCH (:Person)-[:PERSON_ATTENDED_EVENT]->(e:Event)
+    {where}
+    WITH e.location_id AS location_id, count(*) AS n
+    MATCH (l:Location {{location_id: location_id}})
+    WITH l._location.latitude AS lat, l._location.longitude AS lon, n
+    """, "e._ts", ["e.location_id IS NOT NULL"]),
+}
+
+HEATMAP_LAYERS = list(_LAYER_QUERIES)
+
+Places = Tuple[np.ndarray, np.ndarray, np.ndarray]  # lat, lon, count
+
+
+def grid_shape(min_lat: float, max_lat: float, min_lon: float, max_lon: float, resolution: int) -> Tuple[int, int, float, float]:
+    """
+    (rows, cols, cell_lat, cell_lon) of a grid with `resolution` cells
+    across the longer side of the box and cells square on the ground.
+    """
+    lat_span = max_lat - min_lat
+    lon_span = (max_lon - min_lon) % 360 or 360.0
+    scale = max(math.cos(math.radians((min_lat + max_lat) / 2)), 1e-6)
+    if lon_span * scale >= lat_span:
+        cell_lon = lon_span / resolution
+        cell_lat = cell_lon * scale
+    else:
+        cell_lat = lat_span / resolution
+        cell_lon = cell_lat / scale
+    rows = max(1, min(resolution, math.ceil(lat_span / cell_lat - 1e-9)))
+    cols = max(1, min(resolution, math.ceil(lon_span / cell_lon - 1e-9)))
+    return rows, cols, cell_lat, cell_lon
+
+
+def bin_counts(
+    lat: np.ndarray, lon: np.ndarray, weight: np.ndarray,
+    min_lat: float, max_lat: float, min_lon: float, max_lon: float,
+    rows: int, cols: int, cell_lat: float, cell_lon: float
+) -> np.ndarray:
+    """
+    Weighted counts of the points in the box on a rows x cols grid, row 0
+    along the northern edge. A box with min_lon > max_lon crosses the
+    antimeridian.
+    """
+    east = (lon - min_lon) % 360
+    lon_span = (max_lon - min_lon) % 360 or 360.0
+    inside = (lat >= min_lat) & (lat <= max_lat) & (east <= lon_span)
+    row = np.minimum(((max_lat - lat[inside]) / cell_lat).astype(np.int64), rows - 1)
+    col = np.minimum((east[inside] / cell_lon).astype(np.int64), cols - 1)
+    counts = np.bincount(row * cols + col, weights=weight[inside], minlength=rows * cols)
+    return counts.astype(np.int64).reshape(rows, cols)
+
+
+class HeatmapService:
+    """Service for gridded activity density."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Observations counted per place, by (layer, start, end)
+        self._places: "OrderedDict[tuple, Tuple[float, Places]]" = OrderedDict()
+        # Finished grids, by (bbox, resolution, window, layers, by_layer)
+        self._grids: "OrderedDict[tuple, Tuple[float, Heatmap]]" = OrderedDict()
+
+    def heatmap(
+        self,
+        min_lat: float,
+        max_lat: float,
+        min_lon: float,
+        max_lon: float,
+        resolution: int,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        layers: Optional[List[str]] = None,
+        by_layer: bool = False
+    ) -> Heatmap:
+        """
+        Observation counts over the box on a grid `resolution` cells across
+        its longer side, within [start_time, end_time), summed over the
+        requested layers (all by default) and optionally per layer.
+
+        Raises:
+            ValueError: If a layer is unknown or the box is empty
+        """
+        layers = sorted(set(layers or HEATMAP_LAYERS))
+        unknown = [layer for layer in layers if layer not in _LAYER_QUERIES]
+        if unknown:
+            raise ValueError(f"Unknown heatmap layers {unknown}; expected some of {HEATMAP_LAYERS}")
+        if min_lat >= max_lat:
+            raise ValueError("min_lat must be below max_lat")
+        resolution = min(resolution, settings.heatmap_max_resolution)
+        start, end = to_epoch(start_time), to_epoch(end_time)
+
+        key = (min_lat, max_lat, min_lon, max_lon, resolution, start, end, tuple(layers), by_layer)
+        cached = self._cached(self._grids, key)
+        if cached is not None:
+            return cached
+
+        rows, cols, cell_lat, cell_lon = grid_shape(min_lat, max_lat, min_lon, max_lon, resolution)
+        grids = {}
+        for layer in layers:
+            lat, lon, count = self._layer_places(layer, start, end)
+            grids[layer] = bin_counts(
+                lat, lon, count, min_lat, max_lat, min_lon, max_lon, rows, cols, cell_lat, cell_lon
+            )
+        total = sum(grids.values(), np.zeros((rows, cols), dtype=np.int64))
+        heatmap = Heatmap(
+            min_lat=min_lat,
+            max_lat=max_lat,
+            min_lon=min_lon,
+            max_lon=max_lon,
+            rows=rows,
+            cols=cols,
+            cell_lat=cell_lat,
+            cell_lon=cell_lon,
+            start_time=start_time,
+            end_time=end_time,
+            total=int(total.sum()),
+            max_count=int(total.max()),
+            counts=total.tolist(),
+            layers={layer: grid.tolist() for layer, grid in grids.items()} if by_layer else {},
+        )
+        self._store(self._grids, key, heatmap)
+        return heatmap
+
+    def _layer_places(self, layer: str, start: Optional[int], end: Optional[int]) -> Places:
+        """One layer's observations in the window, counted per place."""
+        key = (layer, start, end)
+        cached = self._cached(self._places, key)
+        if cached is not None:
+            return cached
+        template, ts, conditions = _LAYER_QUERIES[layer]
+        conditions = list(conditions)
+        if start is not None:
+            conditions.append(f"{ts} >= datetime({{epochSeconds: $start}})")
+        if end is not None:
+            conditions.append(f"{ts} < datetime({{epochSeconds: $end}})")
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        query = template.format(where=where) + """
+        WHERE lat IS NOT NULL AND lon IS NOT NULL
+        RETURN lat, lon, n
+        """
+        records = neo4j_client.execute_query(query, {"start": start, "end": end})
+        logger.debug(f"Heatmap layer {layer}: {len(records)} places in window {start}..{end}")
+        places = (
+            np.array([r["lat"] for r in records], dtype=np.float64),
+            np.array([r["lon"] for r in records], dtype=np.float64),
+            np.array([r["n"] for r in records], dtype=np.float64),
+        )
+        self._store(self._places, key, places)
+        return places
+
+    def _cached(self, cache: OrderedDict, key: tuple):
+        with self._lock:
+            entry = cache.get(key)
+            if entry is None or time.monotonic() - entry[0] >= settings.heatmap_cache_seconds:
+                return None
+            cache.move_to_end(key)
+            return entry[1]
+
+    def _store(self, cache: OrderedDict, key: tuple, value):
+        with self._lock:
+            cache[key] = (time.monotonic(), value)
+            cache.move_to_end(key)
+            while len(cache) > settings.heatmap_cache_entries:
+                cache.popitem(last=False)
+
+
+# Global instance
+heatmaps = HeatmapService()
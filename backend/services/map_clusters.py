@@ -0,0 +1,469 @@
+"""
+Map Clusters - Hierarchical grid clustering of located entities and sightings.
+
+Points (located entities at their own coordinates, sightings at their
+location's) are projected to the Web Mercator unit square. At zoom z the
+world is 2^z tiles of 256 px; a cluster is every point in one 64 px cell of
+that zoom, so the grid has 2^(z + 2) cells per axis and each cell splits
+into 4 cells at the next zoom. Cells are addressed by Morton (Z-order)
+keys: a cell's key at zoom z - 1 is its key at zoom z shifted right by two
+bits, so the points of any cluster are one contiguous run of the points
+sorted by their finest key, and its children are one contiguous run of the
+next level.
+
+Every level keeps its occupied cells sorted by key with point counts and
+coordinate sums (for centroids). A viewport query at zoom z looks up the
+viewport's cells in that level (or scans the level when the viewport has
+more cells than the level has clusters); expanding a cluster reads its
+children. New points are merged into the sorted arrays without rebuilding,
+so refreshes after ingestion only cost the new points plus array copies.
+Moved or deleted points are only dropped by a full load().
+"""
+import asyncio
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from core.config import settings
+from core.ontology_manager import ontology_manager
+from db.neo4j_client import neo4j_client
+from models.schemas import MapCluster, MapClusterExpansion
+from services.geospatial_service import located_labels
+from services.graph_projection import graph_projection
+
+logger = logging.getLogger(__name__)
+
+_CELL_BITS = 2  # 4 x 4 cells per 256 px tile, i.e. 64 px clusters
+_ZOOM_BITS = 5  # Cluster ids are key << _ZOOM_BITS | zoom
+_MAX_LAT = 85.05112878
+_FETCH_BATCH_SIZE = 10_000
+
+ENTITY, SIGHTING = 0, 1
+
+_M1 = np.uint64(0x5555555555555555)
+_M2 = np.uint64(0x3333333333333333)
+_M4 = np.uint64(0x0F0F0F0F0F0F0F0F)
+_M8 = np.uint64(0x00FF00FF00FF00FF)
+_M16 = np.uint64(0x0000FFFF0000FFFF)
+_M32 = np.uint64(0x00000000FFFFFFFF)
+
+
+def _spread(v: np.ndarray) -> np.ndarray:
+    """Insert a zero bit after each of the low 32 bits."""
+    v = v.astype(np.uint64) & _M32
+    v = (v | (v << np.uint64(16))) & _M16
+    v = (v | (v << np.uint64(8))) & _M8
+    v = (v | (v << np.uint64(4))) & _M4
+    v = (v | (v << np.uint64(2))) & _M2
+    return (v | (v << np.uint64(1))) & _M1
+
+
+def _squeeze(v: np.ndarray) -> np.ndarray:
+    """Inverse of _spread: keep every other bit."""
+    v = v & _M1
+    v = (v | (v >> np.uint64(1))) & _M2
+    v = (v | (v >> np.uint64(2))) & _M4
+    v = (v | (v >> np.uint64(4))) & _M8
+    v = (v | (v >> np.uint64(8))) & _M16
+    return (v | (v >> np.uint64(16))) & _M32
+
+
+def morton(cx: np.ndarray, cy: np.ndarray) -> np.ndarray:
+    return _spread(cx) | (_spread(cy) << np.uint64(1))
+
+
+def unmorton(keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    return _squeeze(keys).astype(np.int64), _squeeze(keys >> np.uint64(1)).astype(np.int64)
+
+
+def project(lat: np.ndarray, lon: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Web Mercator coordinates in [0, 1]; y grows southwards."""
+    lat = np.radians(np.clip(lat, -_MAX_LAT, _MAX_LAT))
+    x = (np.asarray(lon, dtype=np.float64) + 180.0) / 360.0
+    y = 0.5 - np.log(np.tan(np.pi / 4 + lat / 2)) / (2 * np.pi)
+    return np.clip(x, 0.0, 1.0), np.clip(y, 0.0, 1.0)
+
+
+def unproject(x: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    lat = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * y))))
+    return lat, x * 360.0 - 180.0
+
+
+class ClusterLevel:
+    """Occupied cells of one zoom level, sorted by Morton key."""
+
+    def __init__(self, keys: np.ndarray, count: np.ndarray, sum_x: np.ndarray, sum_y: np.ndarray, entities: np.ndarray):
+        self.keys = keys
+        self.count = count
+        self.sum_x = sum_x
+        self.sum_y = sum_y
+        self.entities = entities  # Points that are located entities; the rest are sightings
+
+    @classmethod
+    def aggregate(cls, keys: np.ndarray, x: np.ndarray, y: np.ndarray, kind: np.ndarray) -> "ClusterLevel":
+        """Cells of points whose keys are already sorted."""
+        if len(keys) == 0:
+            empty = np.empty(0)
+            return cls(keys, empty.astype(np.int64), empty, empty, empty.astype(np.int64))
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        return cls(
+            keys[starts],
+            np.diff(np.r_[starts, len(keys)]),
+            np.add.reduceat(x, starts),
+            np.add.reduceat(y, starts),
+            np.add.reduceat((kind == ENTITY).astype(np.int64), starts),
+        )
+
+    def merge(self, other: "ClusterLevel") -> "ClusterLevel":
+        """A new level holding the points of both; cells present in both are summed."""
+        pos = np.searchsorted(self.keys, other.keys)
+        hit = pos < len(self.keys)
+        hit[hit] = self.keys[pos[hit]] == other.keys[hit]
+        count, sum_x, sum_y, entities = self.count.copy(), self.sum_x.copy(), self.sum_y.copy(), self.entities.copy()
+        count[pos[hit]] += other.count[hit]
+        sum_x[pos[hit]] += other.sum_x[hit]
+        sum_y[pos[hit]] += other.sum_y[hit]
+        entities[pos[hit]] += other.entities[hit]
+        new, at = ~hit, pos[~hit]
+        return ClusterLevel(
+            np.insert(self.keys, at, other.keys[new]),
+            np.insert(count, at, other.count[new]),
+            np.insert(sum_x, at, other.sum_x[new]),
+            np.insert(sum_y, at, other.sum_y[new]),
+            np.insert(entities, at, other.entities[new]),
+        )
+
+
+class ClusterIndex:
+    """
+    Immutable snapshot of the cluster hierarchy.
+
+    points are sorted by their cell key at max_zoom; levels[z] holds the
+    clusters of zoom z. add() returns a new index, so readers holding a
+    snapshot never see half-merged arrays.
+    """
+
+    def __init__(self, max_zoom: int, keys: np.ndarray, x: np.ndarray, y: np.ndarray, kind: np.ndarray,
+                 node: np.ndarray, item: np.ndarray, levels: List[ClusterLevel],
+                 known: Optional[Dict[int, np.ndarray]] = None):
+        self.max_zoom = max_zoom
+        self.keys = keys
+        self.x = x
+        self.y = y
+        self.kind = kind
+        self.node = node  # The located entity, or the entity sighted
+        self.item = item  # The located entity, or the SIGHTED_AT relationship
+        self.levels = levels
+        # Sorted items per kind, to skip points read again
+        self.known = known if known is not None else {k: np.sort(item[kind == k]) for k in (ENTITY, SIGHTING)}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @classmethod
+    def build(cls, max_zoom: int, lat: np.ndarray, lon: np.ndarray, kind: np.ndarray,
+              node: np.ndarray, item: np.ndarray) -> "ClusterIndex":
+        keys, x, y = cls._keys(max_zoom, lat, lon)
+        order = np.argsort(keys, kind="stable")
+        keys, x, y, kind, node, item = keys[order], x[order], y[order], kind[order], node[order], item[order]
+        return cls(max_zoom, keys, x, y, kind, node, item, cls._levels(max_zoom, keys, x, y, kind))
+
+    def add(self, lat: np.ndarray, lon: np.ndarray, kind: np.ndarray, node: np.ndarray, item: np.ndarray) -> "ClusterIndex":
+        """A new index with the given points added; items already indexed are skipped."""
+        fresh = np.ones(len(item), dtype=bool)
+        for k, known in self.known.items():
+            of_kind = kind == k
+            if len(known):
+                pos = np.minimum(np.searchsorted(known, item[of_kind]), len(known) - 1)
+                fresh[of_kind] = known[pos] != item[of_kind]
+        if not fresh.any():
+            return self
+        new = ClusterIndex.build(self.max_zoom, lat[fresh], lon[fresh], kind[fresh], node[fresh], item[fresh])
+        at = np.searchsorted(self.keys, new.keys, side="right")
+        return ClusterIndex(
+            self.max_zoom,
+            *(np.insert(getattr(self, name), at, getattr(new, name)) for name in ("keys", "x", "y", "kind", "node", "item")),
+            levels=[level.merge(added) for level, added in zip(self.levels, new.levels)],
+            known={
+                k: np.insert(known, np.searchsorted(known, new.known[k]), new.known[k])
+                for k, known in self.known.items()
+            }
+        )
+
+    @staticmethod
+    def _keys(max_zoom: int, lat: np.ndarray, lon: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        x, y = project(np.asarray(lat, dtype=np.float64), np.asarray(lon, dtype=np.float64))
+        cells = 1 << (max_zoom + _CELL_BITS)
+        cx = np.minimum((x * cells).astype(np.int64), cells - 1)
+        cy = np.minimum((y * cells).astype(np.int64), cells - 1)
+        return morton(cx, cy), x, y
+
+    @staticmethod
+    def _levels(max_zoom: int, keys: np.ndarray, x: np.ndarray, y: np.ndarray, kind: np.ndarray) -> List[ClusterLevel]:
+        return [
+            ClusterLevel.aggregate(keys >> np.uint64(2 * (max_zoom - z)), x, y, kind)
+            for z in range(max_zoom + 1)
+        ]
+
+    def point_range(self, zoom: int, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """[start, end) positions of the points of the given cells of a zoom level."""
+        shift = np.uint64(2 * (self.max_zoom - zoom))
+        return (np.searchsorted(self.keys, keys << shift),
+                np.searchsorted(self.keys, (keys + np.uint64(1)) << shift))
+
+    def cells_in_view(self, zoom: int, min_lat: float, max_lat: float, min_lon: float, max_lon: float) -> np.ndarray:
+        """Positions in levels[zoom] of the clusters whose cell meets the viewport."""
+        level = self.levels[zoom]
+        if min_lon > max_lon:
+            # Viewport crossing the antimeridian
+            return np.concatenate([
+                self.cells_in_view(zoom, min_lat, max_lat, min_lon, 180.0),
+                self.cells_in_view(zoom, min_lat, max_lat, -180.0, max_lon),
+            ])
+        cells = 1 << (zoom + _CELL_BITS)
+        # North edge first: y grows southwards
+        x, y = project(np.array([max_lat, min_lat]), np.array([min_lon, max_lon]))
+        cx0, cx1 = (min(int(v * cells), cells - 1) for v in x)
+        cy0, cy1 = (min(int(v * cells), cells - 1) for v in y)
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) <= len(level.keys):
+            gx, gy = np.meshgrid(np.arange(cx0, cx1 + 1), np.arange(cy0, cy1 + 1))
+            wanted = np.sort(morton(gx.ravel(), gy.ravel()))
+            pos = np.searchsorted(level.keys, wanted)
+            pos = pos[pos < len(level.keys)]
+            return np.unique(pos[np.isin(level.keys[pos], wanted)])
+        cx, cy = unmorton(level.keys)
+        return np.flatnonzero((cx >= cx0) & (cx <= cx1) & (cy >= cy0) & (cy <= cy1))
+
+
+def cluster_id(zoom: int, key: int) -> int:
+    return (int(key) << _ZOOM_BITS) | zoom
+
+
+def parse_cluster_id(cluster: int) -> Tuple[int, int]:
+    """(zoom, key) of a cluster id."""
+    return cluster & ((1 << _ZOOM_BITS) - 1), cluster >> _ZOOM_BITS
+
+
+class MapClusterService:
+    """In-memory cluster hierarchy of located entities and sightings, refreshed incrementally."""
+
+    def __init__(self, max_zoom: int):
+        self.max_zoom = max_zoom
+        self.watermark: Optional[str] = None
+        self.loaded_at: Optional[datetime] = None
+        self._index: Optional[ClusterIndex] = None
+        self._refresh_lock = threading.Lock()
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._index is not None
+
+    def _require(self) -> ClusterIndex:
+        if self._index is None:
+            raise RuntimeError("Map clusters not loaded yet")
+        return self._index
+
+    def load(self):
+        """Build the hierarchy from scratch."""
+        with self._refresh_lock:
+            started = datetime.utcnow()
+            self.watermark = None
+            columns = self._read_points(None)
+            self._index = ClusterIndex.build(self.max_zoom, *columns)
+            self.loaded_at = datetime.utcnow()
+            logger.info(f"Map clusters built: {len(self._index)} points in "
+                        f"{(self.loaded_at - started).total_seconds():.1f}s")
+
+    def refresh(self) -> int:
+        """
+        Merge points ingested since the last load/refresh.
+
+        Returns:
+            Number of points read
+        """
+        if not self.is_loaded:
+            self.load()
+            return len(self._index)
+        with self._refresh_lock:
+            columns = self._read_points(self.watermark)
+            if len(columns[0]):
+                self._index = self._index.add(*columns)
+            return len(columns[0])
+
+    def _read_points(self, watermark: Optional[str]) -> Tuple[np.ndarray, ...]:
+        """(lat, lon, kind, node, item) of located entities and sightings ingested since the watermark."""
+        watermark_filter = "AND {var}._ingested_at >= $watermark" if watermark else ""
+        queries = [
+            (ENTITY, f"""
+            MATCH (n:{label})
+            WHERE n._location IS NOT NULL {watermark_filter.format(var="n")}
+            RETURN id(n) AS node, id(n) AS item, n._location.latitude AS lat, n._location.longitude AS lon,
+                   n._ingested_at AS ingested_at
+            """)
+            for label in located_labels()
+        ]
+        queries.append((SIGHTING, f"""
+        MATCH (e)-[r:SIGHTED_AT]->(l:Location)
+        WHERE l._location IS NOT NULL {watermark_filter.format(var="r")}
+        RETURN id(e) AS node, id(r) AS item, l._location.latitude AS lat, l._location.longitude AS lon,
+               r._ingested_at AS ingested_at
+        """))
+        columns: Dict[str, list] = {k: [] for k in ("lat", "lon", "kind", "node", "item")}
+        latest = watermark
+        for kind, query in queries:
+            for record in neo4j_client.stream_query(query, {"watermark": watermark}):
+                columns["lat"].append(record["lat"])
+                columns["lon"].append(record["lon"])
+                columns["kind"].append(kind)
+                columns["node"].append(record["node"])
+                columns["item"].append(record["item"])
+                if record["ingested_at"] and (latest is None or record["ingested_at"] > latest):
+                    latest = record["ingested_at"]
+        self.watermark = latest
+        return (np.array(columns["lat"], dtype=np.float64), np.array(columns["lon"], dtype=np.float64),
+                np.array(columns["kind"], dtype=np.uint8), np.array(columns["node"], dtype=np.int64),
+                np.array(columns["item"], dtype=np.int64))
+
+    def clusters(
+        self, min_lat: float, max_lat: float, min_lon: float, max_lon: float, zoom: int, limit: Optional[int] = None
+    ) -> List[MapCluster]:
+        """
+        Clusters meeting the viewport at a map zoom, largest first. Beyond
+        max_zoom the individual points are returned.
+        """
+        index = self._require()
+        limit = limit or settings.map_cluster_max_results
+        level_zoom = max(0, min(zoom, index.max_zoom))
+        pos = index.cells_in_view(level_zoom, min_lat, max_lat, min_lon, max_lon)
+        if zoom > index.max_zoom:
+            start, end = index.point_range(level_zoom, index.levels[level_zoom].keys[pos])
+            return self._points(index, start, end, limit)
+        level = index.levels[level_zoom]
+        pos = pos[np.argsort(-level.count[pos], kind="stable")][:limit]
+        return self._clusters(index, level_zoom, pos)
+
+    def expand(self, cluster: int, limit: Optional[int] = None) -> MapClusterExpansion:
+        """
+        The children of a cluster at the first zoom where it splits, or its
+        points once it cannot split further.
+
+        Raises:
+            ValueError: If the id is not a cluster of the index
+        """
+        index = self._require()
+        limit = limit or settings.map_cluster_max_results
+        zoom, key = parse_cluster_id(cluster)
+        if zoom > index.max_zoom or not np.isin(np.uint64(key), index.levels[zoom].keys):
+            raise ValueError(f"Unknown cluster {cluster}")
+        keys = np.array([key], dtype=np.uint64)
+        while zoom < index.max_zoom:
+            level = index.levels[zoom + 1]
+            lo = np.searchsorted(level.keys, keys[0] << np.uint64(2))
+            hi = np.searchsorted(level.keys, (keys[-1] + np.uint64(1)) << np.uint64(2))
+            zoom += 1
+            if hi - lo > 1:
+                pos = np.arange(lo, hi)
+                return MapClusterExpansion(zoom=zoom, clusters=self._clusters(index, zoom, pos))
+            keys = level.keys[lo:hi]
+        start, end = index.point_range(zoom, keys)
+        return MapClusterExpansion(zoom=zoom + 1, clusters=self._points(index, start, end, limit))
+
+    def _clusters(self, index: ClusterIndex, zoom: int, pos: np.ndarray) -> List[MapCluster]:
+        """Clusters at the given level positions; single points carry their entity."""
+        level = index.levels[zoom]
+        count = level.count[pos]
+        lat, lon = unproject(level.sum_x[pos] / count, level.sum_y[pos] / count)
+        # A single point's only point is the first of its run
+        first, _ = index.point_range(zoom, level.keys[pos])
+        entities = self._entities(index.node[first[count == 1]])
+        clusters = []
+        for i, p in enumerate(pos.tolist()):
+            single = int(count[i]) == 1
+            clusters.append(MapCluster(
+                id=cluster_id(zoom, level.keys[p]),
+                lat=float(lat[i]),
+                lon=float(lon[i]),
+                count=int(count[i]),
+                entities=int(level.entities[p]),
+                sightings=int(count[i] - level.entities[p]),
+                **(self._point_fields(index, int(first[i]), entities) if single else {}),
+            ))
+        return clusters
+
+    def _points(self, index: ClusterIndex, start: np.ndarray, end: np.ndarray, limit: int) -> List[MapCluster]:
+        """Individual points of the given runs, up to limit."""
+        positions = np.concatenate([np.arange(s, e) for s, e in zip(start.tolist(), end.tolist())] or [np.empty(0, int)])
+        positions = positions[:limit].astype(np.int64)
+        lat, lon = unproject(index.x[positions], index.y[positions])
+        entities = self._entities(index.node[positions])
+        return [
+            MapCluster(
+                id=None, lat=float(lat[i]), lon=float(lon[i]), count=1,
+                entities=int(index.kind[p] == ENTITY), sightings=int(index.kind[p] == SIGHTING),
+                **self._point_fields(index, int(p), entities)
+            )
+            for i, p in enumerate(positions.tolist())
+        ]
+
+    @staticmethod
+    def _point_fields(index: ClusterIndex, position: int, entities: Dict[int, Tuple[str, str]]) -> Dict[str, object]:
+        entity_type, entity_id = entities.get(int(index.node[position]), (None, None))
+        return {
+            "kind": "entity" if index.kind[position] == ENTITY else "sighting",
+            "entity_type": entity_type,
+            "entity_id": entity_id,
+            "rel_id": str(int(index.item[position])) if index.kind[position] == SIGHTING else None,
+        }
+
+    @staticmethod
+    def _entities(node_ids: np.ndarray) -> Dict[int, Tuple[str, str]]:
+        """(label, key) of the given nodes."""
+        ids = sorted(set(node_ids.tolist()))
+        entities: Dict[int, Tuple[str, str]] = {}
+        for i in range(0, len(ids), _FETCH_BATCH_SIZE):
+            for node_id, node in graph_projection.fetch_nodes(ids[i:i + _FETCH_BATCH_SIZE]).items():
+                label = next(iter(node.labels), None)
+                if label is None or ontology_manager.schema.get_object_type(label) is None:
+                    continue
+                key = node.get(ontology_manager.get_key_field(label))
+                if key is not None:
+                    entities[node_id] = (label, str(key))
+        return entities
+
+    def stats(self) -> Dict[str, object]:
+        """Summary of the loaded hierarchy for monitoring endpoints."""
+        if not self.is_loaded:
+            return {"loaded": False}
+        index = self._index
+        return {
+            "loaded": True,
+            "points": len(index),
+            "entities": int((index.kind == ENTITY).sum()),
+            "sightings": int((index.kind == SIGHTING).sum()),
+            "clusters_per_zoom": [len(level.keys) for level in index.levels],
+            "watermark": self.watermark,
+            "loaded_at": self.loaded_at,
+        }
+
+
+async def run_map_cluster_refresh(service: "MapClusterService", interval_seconds: int):
+    """Build the cluster hierarchy, then keep merging newly ingested points."""
+    try:
+        await asyncio.to_thread(service.load)
+    except Exception as e:
+        logger.error(f"Map cluster build failed: {e}")
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            count = await asyncio.to_thread(service.refresh)
+            if count:
+                logger.info(f"Map clusters refreshed with {count} points")
+        except Exception as e:
+            logger.error(f"Map cluster refresh failed: {e}")
+
+
+# Global instance
+map_clusters = MapClusterService(max_zoom=settings.map_cluster_max_zoom)
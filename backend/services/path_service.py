@@ -0,0 +1,161 @@
+"""
+Path Service - Shortest and k-shortest paths between entities.
+"""
+import logging
+import re
+import time
+from typing import Any, List, Optional, Tuple
+
+from core.config import settings
+from db.neo4j_client import neo4j_client
+from models.schemas import GraphPath, PathGraphData, PathRequest, PathWeighting
+from services.entity_service import entity_service
+from services.graph_projection import graph_projection
+
+logger = logging.getLogger(__name__)
+
+_REL_TYPE_PATTERN = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+# Cost of one relationship when weighting by volume; mirrors the projection's 1 / (1 + weight)
+_CYPHER_VOLUME_COST = "1.0 / (1.0 + coalesce(toFloat(r.amount_usd), toFloat(r.duration_sec), 0.0))"
+
+
+class PathService:
+    """Service for connecting two entities through the graph."""
+
+    async def find_paths(self, request: PathRequest) -> PathGraphData:
+        """
+        Find up to k shortest paths between two entities.
+
+        Searches run on the in-memory graph projection when it covers the
+        requested relationship types: bidirectional BFS for a single fewest-hop
+        path, Yen's algorithm over hop-bounded cheapest paths otherwise. Without
+        the projection, Cypher shortestPath / bounded path matching is used
+        under a server-side transaction timeout.
+
+        Raises:
+            ValueError: For invalid relationship types
+            TimeoutError: If the search exceeded its time budget
+        """
+        invalid = [t for t in request.relationship_types or [] if not _REL_TYPE_PATTERN.match(t)]
+        if invalid:
+            raise ValueError(f"Invalid relationship types: {invalid}")
+
+        max_hops = request.max_hops or settings.path_max_hops
+        timeout = (request.timeout_ms or settings.path_timeout_ms) / 1000
+        source = entity_service.find_node(request.source.entity_id, request.source.entity_type)
+        target = entity_service.find_node(request.target.entity_id, request.target.entity_type)
+        if source is None or target is None:
+            return PathGraphData(nodes=[], edges=[])
+        if source.id == target.id:
+            graph = entity_service.to_graph([source], [])
+            return PathGraphData(
+                nodes=graph.nodes, edges=[],
+                paths=[GraphPath(node_ids=[str(source.id)], edge_ids=[], cost=0.0, hops=0)]
+            )
+
+        if graph_projection.covers(request.relationship_types):
+            found = self._paths_from_projection(source.id, target.id, request, max_hops, timeout)
+            if found is not None:
+                return found
+        return self._paths_from_cypher(source.id, target.id, request, max_hops, timeout)
+
+    def _paths_from_projection(
+        self,
+        source_id: int,
+        target_id: int,
+        request: PathRequest,
+        max_hops: int,
+        timeout: float
+    ) -> Optional[PathGraphData]:
+        """Run the search in memory; None if either endpoint is not projected."""
+        deadline = time.monotonic() + timeout
+        state = graph_projection.snapshot()
+        source, target = (int(i) for i in state.lookup([source_id, target_id]))
+        if source < 0 or target < 0:
+            return None
+
+        paths: List[Tuple[float, List[int], List[int]]] = []
+        if request.k == 1 and request.weight_by == PathWeighting.HOPS:
+            found = graph_projection.shortest_path(
+                source, target, max_hops, request.relationship_types, request.directed, deadline
+            )
+            if found is not None:
+                paths.append((float(len(found[1])), *found))
+        else:
+            paths = graph_projection.cheapest_paths(
+                source, target, request.k, max_hops, request.relationship_types,
+                request.directed, request.weight_by == PathWeighting.VOLUME, deadline
+            )
+
+        node_ids = sorted({int(state.node_ids[n]) for _, nodes, _ in paths for n in nodes})
+        rel_ids = sorted({int(state.rel_ids[e]) for _, _, edges in paths for e in edges})
+        graph = entity_service.to_graph(
+            list(graph_projection.fetch_nodes(node_ids).values()),
+            list(graph_projection.fetch_relationships(rel_ids).values())
+        )
+        return PathGraphData(
+            nodes=graph.nodes,
+            edges=graph.edges,
+            paths=[
+                GraphPath(
+                    node_ids=[str(state.node_ids[n]) for n in nodes],
+                    edge_ids=[str(state.rel_ids[e]) for e in edges],
+                    cost=cost,
+                    hops=len(edges)
+                )
+                for cost, nodes, edges in paths
+            ]
+        )
+
+    def _paths_from_cypher(
+        self,
+        source_id: int,
+        target_id: int,
+        request: PathRequest,
+        max_hops: int,
+        timeout: float
+    ) -> PathGraphData:
+        """Run the search in Neo4j under a transaction timeout."""
+        rel_types = ":" + "|".join(request.relationship_types) if request.relationship_types else ""
+        arrow = "->" if request.directed else "-"
+        params = {"source": source_id, "target": target_id, "k": request.k}
+
+        if request.k == 1 and request.weight_by == PathWeighting.HOPS:
+            query = f"""
+            MATCH (a), (b) WHERE id(a) = $source AND id(b) = $target
+            MATCH p = shortestPath((a)-[{rel_types}*..{max_hops}]{arrow}(b))
+            RETURN p, toFloat(length(p)) AS cost
+            """
+        else:
+            cost = _CYPHER_VOLUME_COST if request.weight_by == PathWeighting.VOLUME else "1.0"
+            query = f"""
+            MATCH (a), (b) WHERE id(a) = $source AND id(b) = $target
+            MATCH p = (a)-[{rel_types}*1..{max_hops}]{arrow}(b)
+            WHERE all(n IN nodes(p) WHERE single(m IN nodes(p) WHERE m = n))
+            WITH p, reduce(c = 0.0, r IN relationships(p) | c + {cost}) AS cost
+            RETURN p, cost
+            ORDER BY cost ASC, length(p) ASC
+            LIMIT $k
+            """
+        records = neo4j_client.execute_query(query, params, timeout=timeout)
+
+        nodes: List[Any] = []
+        relationships: List[Any] = []
+        paths: List[GraphPath] = []
+        for record in records:
+            path = record["p"]
+            nodes.extend(path.nodes)
+            relationships.extend(path.relationships)
+            paths.append(GraphPath(
+                node_ids=[str(n.id) for n in path.nodes],
+                edge_ids=[str(r.id) for r in path.relationships],
+                cost=record["cost"],
+                hops=len(path.relationships)
+            ))
+        graph = entity_service.to_graph(nodes, relationships)
+        return PathGraphData(nodes=graph.nodes, edges=graph.edges, paths=paths)
+
+
+# Global instance
+path_service = PathService()
@@ -0,0 +1,393 @@
+"""
+Pattern Detection - Batch detectors for suspicious transfer patterns.
+
+One pass over TRANSFER relationships in timestamp order finds:
+- CYCLE: money returning to the account it left (round-tripping), through
+  time-ordered transfers of similar amounts within a window. Cycles are
+  found when their closing transfer arrives, by a bounded backward DFS
+  over each account's recent incoming transfers.
+- LAYERING: long chains of similar amounts hopping through accounts, each
+  hop soon after the previous one. Chain lengths are extended per transfer
+  from the best recent incoming transfer (dynamic programming), and
+  maximal chains of at least pattern_layering_min_hops are reported.
+- FAN_OUT / FAN_IN: an account paying (or being paid by) many distinct
+  counterparties within a window (smurfing). Candidate windows come from
+  vectorized sliding-window counts; only those are checked exactly.
+
+The windowed adjacency is a bounded deque of recent incoming transfers per
+account, so memory and per-transfer work stay flat however many
+transactions are scanned. Findings go to the Supabase `pattern_findings`
+table, deduplicated by a fingerprint of their transfers, where alerts and
+cases query them by account.
+"""
+import hashlib
+import logging
+import time
+from collections import Counter, deque
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from core.config import settings
+from db.neo4j_client import neo4j_client
+from db.supabase_client import in_list, supabase_client
+from services.graph_projection import graph_projection, to_epoch
+
+logger = logging.getLogger(__name__)
+
+_LOAD_CHUNK_SIZE = 1_000_000
+_FETCH_BATCH_SIZE = 10_000
+_UPSERT_BATCH_SIZE = 1_000
+_MAX_LISTED_TRANSFERS = 200  # Per finding; longer fan bursts are summarized
+
+
+class TransferLog:
+    """Columnar transfers in timestamp order, with accounts coded as ints."""
+
+    def __init__(
+        self,
+        rel_ids: np.ndarray,
+        times: np.ndarray,
+        src: np.ndarray,
+        dst: np.ndarray,
+        amounts: np.ndarray,
+        accounts: List[str]
+    ):
+        order = np.argsort(times, kind="stable")
+        self.rel_ids = rel_ids[order]
+        self.times = times[order]
+        self.src = src[order]
+        self.dst = dst[order]
+        self.amounts = amounts[order]
+        self.accounts = accounts
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    @classmethod
+    def load(cls, since: Optional[datetime] = None) -> "TransferLog":
+        """Stream TRANSFER relationships from Neo4j into column arrays."""
+        since_filter = "AND datetime(r.timestamp) >= datetime($since)" if since else ""
+        query = f"""
+        MATCH (a:Account)-[r:TRANSFER]->(b:Account)
+        WHERE r.timestamp IS NOT NULL AND r.amount_usd IS NOT NULL {since_filter}
+        RETURN id(r) AS rel_id, datetime(r.timestamp).epochSeconds AS t,
+               a.account_id AS src, b.account_id AS dst, toFloat(r.amount_usd) AS amount
+        """
+        codes: Dict[str, int] = {}
+        columns: Dict[str, List[np.ndarray]] = {k: [] for k in ("rel_id", "t", "src", "dst", "amount")}
+        chunk: Dict[str, list] = {k: [] for k in columns}
+
+        def flush():
+            for key, dtype in (("rel_id", np.int64), ("t", np.int64), ("src", np.int64),
+                               ("dst", np.int64), ("amount", np.float64)):
+                columns[key].append(np.array(chunk[key], dtype=dtype))
+                chunk[key].clear()
+
+        params = {"since": since.isoformat()} if since else {}
+        for record in neo4j_client.stream_query(query, params):
+            chunk["rel_id"].append(record["rel_id"])
+            chunk["t"].append(record["t"])
+            chunk["src"].append(codes.setdefault(record["src"], len(codes)))
+            chunk["dst"].append(codes.setdefault(record["dst"], len(codes)))
+            chunk["amount"].append(record["amount"])
+            if len(chunk["t"]) >= _LOAD_CHUNK_SIZE:
+                flush()
+        flush()
+        return cls(
+            *(np.concatenate(columns[k]) for k in ("rel_id", "t", "src", "dst", "amount")),
+            accounts=list(codes)
+        )
+
+
+def fan_bursts(
+    times: np.ndarray,
+    account: np.ndarray,
+    counterparty: np.ndarray,
+    amounts: np.ndarray,
+    window: int,
+    min_counterparties: int,
+    min_total: float
+) -> List[Tuple[int, np.ndarray, int]]:
+    """
+    Windows in which an account dealt with many distinct counterparties.
+
+    Sorting by (account, time) turns every window (t - window, t] into a
+    contiguous run found with one searchsorted; windows holding at least
+    `min_counterparties` transfers are candidates. Overlapping candidates
+    of an account merge into a burst, and each burst is slid over once
+    with a counter of distinct counterparties to find its busiest window.
+
+    Returns (account, transfer indexes of that window, distinct
+    counterparties) per burst that meets both thresholds.
+    """
+    if len(times) == 0:
+        return []
+    t_min = int(times.min())
+    span = int(times.max()) - t_min + window + 1
+    keys = account * span + (times - t_min + window)
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    first = np.searchsorted(keys, keys - window, side="right")
+    candidates = np.flatnonzero(np.arange(len(keys)) - first + 1 >= min_counterparties)
+    if len(candidates) == 0:
+        return []
+
+    owner = account[order[candidates]]
+    starts = first[candidates]
+    new_burst = np.r_[True, (owner[1:] != owner[:-1]) | (starts[1:] > candidates[:-1])]
+    burst_starts = np.flatnonzero(new_burst)
+    burst_ends = np.r_[burst_starts[1:], len(candidates)] - 1
+
+    found = []
+    for b_start, b_end in zip(burst_starts.tolist(), burst_ends.tolist()):
+        lo, hi = int(starts[b_start]), int(candidates[b_end]) + 1
+        idx = order[lo:hi]
+        t = times[idx].tolist()
+        cp = counterparty[idx].tolist()
+        amt = amounts[idx].tolist()
+        seen: Counter = Counter()
+        total = 0.0
+        left = 0
+        best = (0, 0.0, 0, 0)  # distinct, total, left, right
+        for right in range(len(t)):
+            seen[cp[right]] += 1
+            total += amt[right]
+            while t[left] <= t[right] - window:
+                seen[cp[left]] -= 1
+                if not seen[cp[left]]:
+                    del seen[cp[left]]
+                total -= amt[left]
+                left += 1
+            if (len(seen), total) > best[:2]:
+                best = (len(seen), total, left, right)
+        distinct, total, left, right = best
+        if distinct >= min_counterparties and total >= min_total:
+            found.append((int(owner[b_start]), idx[left:right + 1], distinct))
+    return found
+
+
+def scan_sequences(
+    times: np.ndarray,
+    src: np.ndarray,
+    dst: np.ndarray,
+    amounts: np.ndarray,
+    cycle_window: int,
+    max_cycle_length: int,
+    layering_dwell: int,
+    tolerance: float,
+    max_recent: int,
+    max_expansions: int
+) -> Tuple[List[List[int]], List[int], List[int]]:
+    """
+    Single pass over time-ordered transfers for cycles and layering chains.
+
+    Consecutive hops are compatible when the later amount is within
+    `tolerance` (relative) of the earlier one. Each account keeps its
+    `max_recent` newest incoming transfers; entries older than both
+    windows are dropped as the scan moves forward.
+
+    Returns (cycles as transfer index lists in time order, chain length
+    per transfer, chain predecessor per transfer or -1).
+    """
+    n = len(times)
+    t_list, s_list, d_list, a_list = times.tolist(), src.tolist(), dst.tolist(), amounts.tolist()
+    horizon = max(cycle_window, layering_dwell)
+    low, high = 1.0 - tolerance, 1.0 + tolerance
+    recent: Dict[int, deque] = {}
+    chain = [1] * n
+    pred = [-1] * n
+    cycles: List[List[int]] = []
+
+    for i in range(n):
+        t, u, v, a = t_list[i], s_list[i], d_list[i], a_list[i]
+        incoming = recent.get(u)
+        if incoming:
+            while incoming and incoming[0][0] <= t - horizon:
+                incoming.popleft()
+
+            # Layering: extend the longest compatible chain that ended at u shortly before
+            floor = t - layering_dwell
+            best, best_j = 0, -1
+            for tf, y, af, j in incoming:
+                if floor <= tf < t and y != v and low * af <= a <= high * af and chain[j] > best:
+                    best, best_j = chain[j], j
+            if best_j >= 0:
+                chain[i] = best + 1
+                pred[i] = best_j
+
+            # Cycles closed by this transfer: time-respecting paths v -> ... -> u
+            if u != v:
+                cycle_floor = t - cycle_window
+                stack = [(u, t, a, (u,), [i])]
+                expansions = 0
+                while stack and expansions < max_expansions:
+                    x, bound, next_amount, visited, path = stack.pop()
+                    for tf, y, af, j in recent.get(x, ()):
+                        if not (cycle_floor < tf < bound and low * af <= next_amount <= high * af):
+                            continue
+                        expansions += 1
+                        if y == v:
+                            cycles.append([j] + path)
+                        elif len(path) + 1 < max_cycle_length and y not in visited:
+                            stack.append((y, tf, af, visited + (y,), [j] + path))
+
+        queue = recent.get(v)
+        if queue is None:
+            queue = recent[v] = deque(maxlen=max_recent)
+        queue.append((t, u, a, i))
+
+    return cycles, chain, pred
+
+
+def _fingerprint(pattern: str, rel_ids: List[int]) -> str:
+    """Stable id of a finding: its pattern and the set of transfers in it."""
+    payload = pattern + ":" + ",".join(str(r) for r in sorted(rel_ids))
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+def _iso(epoch: int) -> str:
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).isoformat()
+
+
+class PatternDetectionService:
+    """Service for running financial pattern detectors and querying their findings."""
+
+    def detect(self, log: TransferLog) -> List[Dict[str, Any]]:
+        """Run every detector over a transfer log; returns finding rows (rel ids, not txn ids)."""
+        findings: List[Dict[str, Any]] = []
+        if len(log) == 0:
+            return findings
+        hour = 3600
+
+        for pattern, account, counterparty in (("FAN_OUT", log.src, log.dst), ("FAN_IN", log.dst, log.src)):
+            bursts = fan_bursts(
+                log.times, account, counterparty, log.amounts,
+                settings.pattern_fan_window_hours * hour,
+                settings.pattern_fan_min_counterparties,
+                settings.pattern_fan_min_total
+            )
+            for owner, idx, distinct in bursts:
+                findings.append(self._finding(log, pattern, idx, [owner], {"counterparties": distinct}))
+
+        # Cycles and layering only follow transfers large enough to matter
+        keep = np.flatnonzero(log.amounts >= settings.pattern_min_amount)
+        cycles, chain, pred = scan_sequences(
+            log.times[keep], log.src[keep], log.dst[keep], log.amounts[keep],
+            settings.pattern_cycle_window_hours * hour,
+            settings.pattern_cycle_max_length,
+            settings.pattern_layering_max_dwell_hours * hour,
+            settings.pattern_amount_tolerance,
+            settings.pattern_max_recent_transfers,
+            settings.pattern_max_expansions
+        )
+        for path in cycles:
+            idx = keep[path]
+            findings.append(self._finding(log, "CYCLE", idx, log.src[idx].tolist(), {"hops": len(path)}))
+
+        extended = set(pred)
+        for end in range(len(chain)):
+            if chain[end] < settings.pattern_layering_min_hops or end in extended:
+                continue
+            path = [end]
+            while pred[path[-1]] >= 0:
+                path.append(pred[path[-1]])
+            idx = keep[path[::-1]]
+            accounts = log.src[idx].tolist() + [int(log.dst[idx[-1]])]
+            findings.append(self._finding(log, "LAYERING", idx, accounts, {"hops": len(path)}))
+        return findings
+
+    def _finding(
+        self, log: TransferLog, pattern: str, idx: np.ndarray, accounts: List[int], details: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Finding row for the transfers at the given log indexes."""
+        amounts = log.amounts[idx]
+        rel_ids = log.rel_ids[idx].tolist()
+        if pattern in ("CYCLE", "LAYERING"):
+            details["retained_ratio"] = round(float(amounts[-1] / amounts[0]), 4)
+        return {
+            "pattern": pattern,
+            "fingerprint": _fingerprint(pattern, rel_ids),
+            "account_ids": list(dict.fromkeys(log.accounts[a] for a in accounts)),
+            "transaction_ids": rel_ids[:_MAX_LISTED_TRANSFERS],
+            "start_at": _iso(int(log.times[idx].min())),
+            "end_at": _iso(int(log.times[idx].max())),
+            "transfer_count": len(idx),
+            "total_usd": round(float(amounts.sum()), 2),
+            "details": details,
+        }
+
+    async def run(self, since: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Load transfers, run the detectors and store new findings.
+
+        With `since`, the scan starts one detection window earlier so
+        patterns straddling the boundary are still seen; findings already
+        stored are skipped by fingerprint. A naive `since` is UTC.
+        """
+        started = time.monotonic()
+        if since is not None:
+            since = datetime.fromtimestamp(to_epoch(since) - self._lookback_seconds(), tz=timezone.utc)
+        log = TransferLog.load(since)
+        loaded = time.monotonic()
+        findings = self.detect(log)
+        self._attach_transaction_ids(findings)
+        for i in range(0, len(findings), _UPSERT_BATCH_SIZE):
+            await supabase_client.upsert(
+                "pattern_findings", findings[i:i + _UPSERT_BATCH_SIZE],
+                on_conflict="fingerprint", ignore_duplicates=True
+            )
+        summary = {
+            "transfers": len(log),
+            "accounts": len(log.accounts),
+            "findings": dict(Counter(f["pattern"] for f in findings)),
+            "load_seconds": round(loaded - started, 2),
+            "detect_seconds": round(time.monotonic() - loaded, 2),
+        }
+        logger.info(f"Pattern detection: {summary}")
+        return summary
+
+    @staticmethod
+    def _lookback_seconds() -> int:
+        return 3600 * max(
+            settings.pattern_fan_window_hours,
+            settings.pattern_cycle_window_hours,
+            settings.pattern_layering_max_dwell_hours * settings.pattern_layering_min_hops
+        )
+
+    @staticmethod
+    def _attach_transaction_ids(findings: List[Dict[str, Any]]):
+        """Replace relationship ids with the transfers' own txn_id."""
+        rel_ids = sorted({r for f in findings for r in f["transaction_ids"]})
+        txn_ids: Dict[int, str] = {}
+        for i in range(0, len(rel_ids), _FETCH_BATCH_SIZE):
+            rels = graph_projection.fetch_relationships(rel_ids[i:i + _FETCH_BATCH_SIZE])
+            txn_ids.update({rel_id: rel.get("txn_id") or str(rel_id) for rel_id, rel in rels.items()})
+        for finding in findings:
+            finding["transaction_ids"] = [txn_ids.get(r, str(r)) for r in finding["transaction_ids"]]
+
+    async def list_findings(
+        self,
+        pattern: Optional[str] = None,
+        account_ids: Optional[List[str]] = None,
+        status: Optional[str] = None,
+        limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """Stored findings, largest first, optionally for a pattern or touching given accounts."""
+        filters = {"order": "total_usd.desc", "limit": str(limit)}
+        if pattern:
+            filters["pattern"] = f"eq.{pattern}"
+        if status:
+            filters["status"] = f"eq.{status}"
+        if account_ids:
+            filters["account_ids"] = "ov.{" + in_list(account_ids)[1:-1] + "}"
+        return await supabase_client.query("pattern_findings", filters=filters)
+
+    async def update_status(self, finding_id: str, status: str) -> List[Dict[str, Any]]:
+        """Mark a finding as reviewed (CONFIRMED / DISMISSED) or reopen it."""
+        return await supabase_client.update("pattern_findings", {"id": f"eq.{finding_id}"}, {"status": status})
+
+
+# Global instance
+pattern_detection = PatternDetectionService()
@@ -4,6 +4,7 @@ Search Service - Provides elastic-like search capabilities over the knowledge gr
 import logging
 from typing import List, Dict, Any, Optional
 from db.neo4j_client import neo4j_client
+from services.entity_service import plain_properties
 
 logger = logging.getLogger(__name__)
 
@@ -53,7 +54,10 @@ class SearchService:
                 "id": str(node.id),
                 "type": node_type,
                 "display_name": self._get_label_for_node(node, node_type),
-                "properties": dict(node)
+                "risk_level": node.get("_risk_level"),
+                "pagerank": node.get("_pagerank"),
+                "community": node.get("_community"),
+                "properties": plain_properties(node)
             })
         return formatted
 
@@ -0,0 +1,592 @@
+"""
+Sequence Detection - Ordered multi-event patterns over time-sorted event streams.
+
+An analyst declares a sequence of steps, for example
+
+    1. CALL between A and B
+    2. SIGHTED_AT of a Vehicle of A near L, within 30 minutes
+    3. TRANSFER from A, within 2 hours
+
+Variables (A, B, L) bind to parties: the Person owning a phone, account,
+vehicle or device when the graph knows one, otherwise the entity itself, so
+"A's phone" and "A's account" unify. Locations bind to themselves.
+
+Events of each type are held in an EventStream: columns sorted by time,
+plus indexes sorted by (source party, time) and (target party, time) built
+on first use. Partial matches are arrays of variable bindings and the time
+of their last event. Each step is a windowed join: for every partial match
+one searchsorted on the index of an already bound variable (or on time
+alone) finds the run of candidate events inside the step's window, runs are
+expanded with vectorized gathers and filtered on the step's constraints.
+No nested Cypher matches are issued; Neo4j is only read to load the streams.
+
+The first step's events are joined in time slices of sequence_chunk_events,
+so memory follows the slice, not the whole dataset.
+"""
+import asyncio
+import hashlib
+import logging
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from core.config import settings
+from core.ontology_manager import ontology_manager
+from db.neo4j_client import neo4j_client
+from db.supabase_client import supabase_client
+from models.schemas import SequenceEntity, SequenceMatch, SequenceMatchEvent, SequenceQuery, SequenceResult, SequenceStep
+from services.graph_projection import graph_projection, to_epoch, unique_sorted
+
+logger = logging.getLogger(__name__)
+
+_LABEL_PATTERN = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+_FETCH_BATCH_SIZE = 10_000
+_UPSERT_BATCH_SIZE = 1_000
+
+_EVENT_QUERY = """
+MATCH (a)-[r:{rel_type}]->(b)
+WHERE r._ts IS NOT NULL
+RETURN id(r) AS rel_id, r._ts.epochSeconds AS t, id(a) AS src, id(b) AS dst,
+       labels(a)[0] AS src_label, labels(b)[0] AS dst_label, toFloat(r.amount_usd) AS amount
+"""
+
+# Relationships making a Person the party behind an entity
+_OWNERSHIP_QUERY = """
+MATCH (p:Person)-[:PERSON_OWNS_PHONE|PERSON_HOLDS_ACCOUNT|PERSON_OWNS_VEHICLE|PERSON_USES_DEVICE]->(x)
+RETURN id(x) AS item, min(id(p)) AS owner
+"""
+
+_LOCATION_QUERY = """
+MATCH (l:Location)
+WHERE l.lat IS NOT NULL AND l.lon IS NOT NULL
+RETURN id(l) AS node, toFloat(l.lat) AS lat, toFloat(l.lon) AS lon
+"""
+
+
+def _haversine_km(lat1: np.ndarray, lon1: np.ndarray, lat2: np.ndarray, lon2: np.ndarray) -> np.ndarray:
+    lat1, lon1, lat2, lon2 = (np.radians(a) for a in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371.0 * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class EventStream:
+    """Events of one relationship type in time order, with parties coded as ints."""
+
+    def __init__(
+        self,
+        rel_ids: np.ndarray,
+        times: np.ndarray,
+        src: np.ndarray,
+        dst: np.ndarray,
+        src_label: np.ndarray,
+        dst_label: np.ndarray,
+        amounts: np.ndarray
+    ):
+        order = np.argsort(times, kind="stable")
+        self.rel_ids = rel_ids[order]
+        self.times = times[order]
+        self.src = src[order]  # Neo4j node ids of the event's own endpoints
+        self.dst = dst[order]
+        self.src_label = src_label[order]
+        self.dst_label = dst_label[order]
+        self.amounts = amounts[order]
+        self.src_party = np.empty(0, dtype=np.int64)  # Set by the EventStore
+        self.dst_party = np.empty(0, dtype=np.int64)
+        self.t0 = 0
+        self.span = 1
+        self._indexes: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def index(self, side: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (event positions, keys) sorted by (party, time) for the "src" or
+        "dst" side, keys being party * span + (time - t0); "time" gives
+        every event with keys time - t0.
+        """
+        if side not in self._indexes:
+            if side == "time":
+                self._indexes[side] = (np.arange(len(self.times)), self.times - self.t0)
+            else:
+                party = self.src_party if side == "src" else self.dst_party
+                # Events are already in time order, so a stable sort by party keeps it
+                order = np.argsort(party, kind="stable")
+                self._indexes[side] = (order, party[order] * self.span + (self.times[order] - self.t0))
+        return self._indexes[side]
+
+
+class EventStore:
+    """The event streams a sequence can use, sharing one party coding and time origin."""
+
+    def __init__(self, streams: Dict[str, EventStream], nodes: np.ndarray, lat: np.ndarray, lon: np.ndarray,
+                 owners: Tuple[np.ndarray, np.ndarray], labels: List[str]):
+        self.streams = streams
+        self.nodes = nodes  # Party code -> Neo4j node id
+        self.lat = lat  # Per party code; NaN unless a located Location
+        self.lon = lon
+        self.owner_items, self.owner_nodes = owners
+        self.labels = labels
+        self.label_codes = {label: i for i, label in enumerate(labels)}
+        self.loaded_at = time.monotonic()
+
+    @classmethod
+    def load(cls, event_types: List[str]) -> "EventStore":
+        """Stream the events, ownerships and locations from Neo4j."""
+        label_codes: Dict[str, int] = {}
+        raw: Dict[str, Dict[str, list]] = {}
+        for rel_type in event_types:
+            columns: Dict[str, list] = {k: [] for k in ("rel_id", "t", "src", "dst", "src_label", "dst_label", "amount")}
+            for record in neo4j_client.stream_query(_EVENT_QUERY.format(rel_type=rel_type)):
+                columns["rel_id"].append(record["rel_id"])
+                columns["t"].append(record["t"])
+                columns["src"].append(record["src"])
+                columns["dst"].append(record["dst"])
+                columns["src_label"].append(label_codes.setdefault(record["src_label"], len(label_codes)))
+                columns["dst_label"].append(label_codes.setdefault(record["dst_label"], len(label_codes)))
+                columns["amount"].append(record["amount"] if record["amount"] is not None else np.nan)
+            raw[rel_type] = columns
+
+        ownership = neo4j_client.execute_query(_OWNERSHIP_QUERY)
+        items = np.array([r["item"] for r in ownership], dtype=np.int64)
+        owners = np.array([r["owner"] for r in ownership], dtype=np.int64)
+        order = np.argsort(items)
+        items, owners = items[order], owners[order]
+
+        locations = neo4j_client.execute_query(_LOCATION_QUERY)
+        loc_nodes = np.array([r["node"] for r in locations], dtype=np.int64)
+
+        streams = {
+            rel_type: EventStream(
+                np.array(c["rel_id"], dtype=np.int64), np.array(c["t"], dtype=np.int64),
+                np.array(c["src"], dtype=np.int64), np.array(c["dst"], dtype=np.int64),
+                np.array(c["src_label"], dtype=np.uint8), np.array(c["dst_label"], dtype=np.uint8),
+                np.array(c["amount"], dtype=np.float64)
+            )
+            for rel_type, c in raw.items()
+        }
+        return cls.build(streams, (items, owners), loc_nodes,
+                         np.array([r["lat"] for r in locations], dtype=np.float64),
+                         np.array([r["lon"] for r in locations], dtype=np.float64),
+                         list(label_codes))
+
+    @classmethod
+    def build(cls, streams: Dict[str, EventStream], owners: Tuple[np.ndarray, np.ndarray],
+              loc_nodes: np.ndarray, loc_lat: np.ndarray, loc_lon: np.ndarray, labels: List[str]) -> "EventStore":
+        """Code every endpoint's party and index the streams; owners must be sorted by item."""
+        items, owner_nodes = owners
+
+        def party_nodes(nodes: np.ndarray) -> np.ndarray:
+            if len(items) == 0:
+                return nodes
+            pos = np.minimum(np.searchsorted(items, nodes), len(items) - 1)
+            return np.where(items[pos] == nodes, owner_nodes[pos], nodes)
+
+        ends = {name: (party_nodes(s.src), party_nodes(s.dst)) for name, s in streams.items()}
+        nodes = unique_sorted(np.concatenate([loc_nodes] + [np.concatenate(e) for e in ends.values()]))
+        lat = np.full(len(nodes), np.nan)
+        lon = np.full(len(nodes), np.nan)
+        lat[np.searchsorted(nodes, loc_nodes)] = loc_lat
+        lon[np.searchsorted(nodes, loc_nodes)] = loc_lon
+
+        times = [s.times for s in streams.values() if len(s)]
+        t0 = int(min(t.min() for t in times)) if times else 0
+        t_max = int(max(t.max() for t in times)) if times else 0
+        for name, stream in streams.items():
+            stream.src_party = np.searchsorted(nodes, ends[name][0]).astype(np.int64)
+            stream.dst_party = np.searchsorted(nodes, ends[name][1]).astype(np.int64)
+            stream.t0 = t0
+            stream.span = t_max - t0 + 2
+        return cls(streams, nodes, lat, lon, (items, owner_nodes), labels)
+
+    @property
+    def t0(self) -> int:
+        return next(iter(self.streams.values())).t0 if self.streams else 0
+
+    @property
+    def t_max(self) -> int:
+        return self.t0 + next(iter(self.streams.values())).span - 2 if self.streams else 0
+
+    def party_code(self, node_id: int) -> int:
+        """Party code of a node (its owner's, when it has one), or -1 if it has no events."""
+        if len(self.owner_items):
+            pos = min(int(np.searchsorted(self.owner_items, node_id)), len(self.owner_items) - 1)
+            if self.owner_items[pos] == node_id:
+                node_id = int(self.owner_nodes[pos])
+        pos = int(np.searchsorted(self.nodes, node_id))
+        return pos if pos < len(self.nodes) and self.nodes[pos] == node_id else -1
+
+
+class CompiledStep:
+    """A SequenceStep resolved against an EventStore and the variables bound before it."""
+
+    def __init__(self, step: SequenceStep, store: EventStore, variables: List[str], bound: set):
+        self.event = step.event
+        self.stream = store.streams[step.event]
+        self.source = variables.index(step.source) if step.source else -1
+        self.target = variables.index(step.target) if step.target else -1
+        self.undirected = step.undirected
+        self.label = store.label_codes.get(step.source_type, -2) if step.source_type else -1
+        self.within = 60 * (step.within_minutes or settings.sequence_default_within_minutes)
+        self.near_km = step.near_km
+        self.min_amount = step.min_amount
+        self.bound = [i in bound for i in range(len(variables))]
+        self.new_vars = sorted({v for v in (self.source, self.target) if v >= 0 and not self.bound[v]})
+
+
+def join_step(
+    store: EventStore,
+    step: CompiledStep,
+    bind: np.ndarray,
+    last: np.ndarray,
+    events: np.ndarray,
+    until: np.ndarray,
+    budget: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, bool]:
+    """
+    Extend partial matches by one step.
+
+    bind holds each partial match's party per variable (-1 while unbound),
+    last the time of its latest event, events its event position per
+    earlier step and until the latest time the next event may have.
+    Candidates beyond `budget` are dropped and reported as truncated.
+
+    Returns the extended (bind, last, events, truncated).
+    """
+    stream = step.stream
+    orientations = [(step.source, step.target, False)]
+    if step.undirected:
+        orientations.append((step.target, step.source, True))
+    lo_off = np.clip(last + 1 - stream.t0, 0, stream.span - 1)
+    hi_off = np.clip(until - stream.t0, -1, stream.span - 1)
+
+    parts = []
+    truncated = False
+    for src_var, dst_var, swapped in orientations:
+        # The index of a bound variable narrows candidates to that party's events
+        spatial_target = step.near_km is not None and step.target >= 0
+        if src_var >= 0 and step.bound[src_var] and not (spatial_target and src_var == step.target):
+            order, keys = stream.index("src")
+            base = bind[:, src_var] * stream.span
+        elif dst_var >= 0 and step.bound[dst_var] and not (spatial_target and dst_var == step.target):
+            order, keys = stream.index("dst")
+            base = bind[:, dst_var] * stream.span
+        else:
+            order, keys = stream.index("time")
+            base = np.zeros(len(bind), dtype=np.int64)
+        lo = np.searchsorted(keys, base + lo_off, side="left")
+        hi = np.searchsorted(keys, base + hi_off, side="right")
+        counts = np.maximum(hi - lo, 0)
+        offsets = np.cumsum(counts) - counts
+        if int(counts.sum()) > budget:
+            counts = np.clip(budget - offsets, 0, counts)
+            truncated = True
+        total = int(counts.sum())
+        budget -= total
+
+        match = np.repeat(np.arange(len(bind)), counts)
+        pos = np.repeat(lo, counts) + np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        ev = order[pos]
+        src_party, dst_party = stream.src_party[ev], stream.dst_party[ev]
+
+        keep = np.ones(total, dtype=bool)
+        if step.label != -1:
+            keep &= (stream.dst_label if swapped else stream.src_label)[ev] == step.label
+        if step.min_amount is not None:
+            keep &= stream.amounts[ev] >= step.min_amount
+        new_bind = bind[match]
+        for var, party in ((src_var, src_party), (dst_var, dst_party)):
+            if var < 0:
+                continue
+            if step.near_km is not None and var == step.target and step.bound[var]:
+                anchor = new_bind[:, var]
+                keep &= _haversine_km(store.lat[party], store.lon[party], store.lat[anchor], store.lon[anchor]) <= step.near_km
+            elif step.bound[var]:
+                keep &= new_bind[:, var] == party
+            else:
+                # A variable on both sides of one step must get the same party twice
+                keep &= (new_bind[:, var] < 0) | (new_bind[:, var] == party)
+                new_bind[:, var] = party
+        # Different variables stand for different parties
+        for var in step.new_vars:
+            for other in range(bind.shape[1]):
+                if other != var and (step.bound[other] or other in step.new_vars):
+                    keep &= new_bind[:, var] != new_bind[:, other]
+
+        parts.append((new_bind[keep], stream.times[ev[keep]],
+                      np.column_stack([events[match[keep]], ev[keep]])))
+
+    return (np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts]),
+            np.concatenate([p[2] for p in parts]), truncated)
+
+
+def evaluate(
+    store: EventStore,
+    steps: List[CompiledStep],
+    initial: np.ndarray,
+    start: int,
+    end: int,
+    budget: int,
+    chunk_events: int
+) -> Iterator[Tuple[np.ndarray, np.ndarray, bool]]:
+    """
+    Complete matches whose first event falls in [start, end] and all of
+    whose events do, slice by slice of the first step's events.
+
+    Yields (bindings, event positions per step, truncated) per slice, with
+    matches in order of their first event.
+    """
+    first = steps[0].stream.times
+    lo, hi = np.searchsorted(first, start, side="left"), np.searchsorted(first, end, side="right")
+    if lo >= hi:
+        return
+    bounds = np.unique(first[lo:hi:chunk_events])
+    for i, slice_start in enumerate(bounds.tolist()):
+        slice_end = int(bounds[i + 1]) - 1 if i + 1 < len(bounds) else end
+        bind = initial[None, :].copy()
+        last = np.array([slice_start - 1], dtype=np.int64)
+        events = np.empty((1, 0), dtype=np.int64)
+        bind, last, events, truncated = join_step(
+            store, steps[0], bind, last, events, np.array([slice_end], dtype=np.int64), budget
+        )
+        for step in steps[1:]:
+            if len(bind) == 0:
+                break
+            bind, last, events, cut = join_step(
+                store, step, bind, last, events, np.minimum(last + step.within, end), budget
+            )
+            truncated |= cut
+        if len(bind) == 0:
+            if truncated:
+                yield bind, events, truncated
+            continue
+        order = np.argsort(steps[0].stream.times[events[:, 0]], kind="stable")
+        yield bind[order], events[order], truncated
+
+
+def _iso(epoch: int) -> str:
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).isoformat()
+
+
+class SequenceDetectionService:
+    """Service for evaluating sequence patterns ad hoc and in batch scans."""
+
+    def __init__(self):
+        self._store: Optional[EventStore] = None
+        self._lock = threading.Lock()
+
+    def store(self) -> EventStore:
+        """The loaded event streams, reloaded once older than sequence_cache_seconds."""
+        with self._lock:
+            if self._store is None or time.monotonic() - self._store.loaded_at > settings.sequence_cache_seconds:
+                started = time.monotonic()
+                self._store = EventStore.load(settings.sequence_event_types)
+                logger.info(f"Sequence detection: loaded "
+                            f"{ {name: len(s) for name, s in self._store.streams.items()} } events "
+                            f"in {time.monotonic() - started:.1f}s")
+            return self._store
+
+    def compile(self, query: SequenceQuery, store: EventStore) -> Tuple[List[str], List[CompiledStep], np.ndarray]:
+        """
+        Validate a query and resolve it against the store.
+
+        Returns (variables, compiled steps, initial party per variable);
+        a bound entity without any event gets party -1.
+
+        Raises:
+            ValueError: If a step or binding is invalid
+        """
+        variables = list(query.bindings)
+        for i, step in enumerate(query.steps):
+            if step.event not in store.streams:
+                raise ValueError(f"Step {i + 1}: unknown event '{step.event}', "
+                                 f"expected one of {settings.sequence_event_types}")
+            if step.near_km is not None and (step.target is None or step.undirected):
+                raise ValueError(f"Step {i + 1}: near_km needs a target and a directed step")
+            for var in (step.source, step.target):
+                if var and var not in variables:
+                    variables.append(var)
+        used = {v for s in query.steps for v in (s.source, s.target) if v}
+        unused = [v for v in query.bindings if v not in used]
+        if unused:
+            raise ValueError(f"Bindings for variables no step uses: {unused}")
+
+        initial = np.full(len(variables), -1, dtype=np.int64)
+        for var, entity in query.bindings.items():
+            if not _LABEL_PATTERN.match(entity.entity_type):
+                raise ValueError(f"Invalid entity type '{entity.entity_type}'")
+            key_field = ontology_manager.get_key_field(entity.entity_type)
+            found = neo4j_client.execute_query(
+                f"MATCH (n:{entity.entity_type} {{{key_field}: $id}}) RETURN id(n) AS node",
+                {"id": entity.entity_id}
+            )
+            if not found:
+                raise ValueError(f"{entity.entity_type} {entity.entity_id} not found")
+            initial[variables.index(var)] = store.party_code(found[0]["node"])
+
+        steps = []
+        bound = set(variables.index(v) for v in query.bindings)
+        for step in query.steps:
+            steps.append(CompiledStep(step, store, variables, bound))
+            bound |= {v for v in (steps[-1].source, steps[-1].target) if v >= 0}
+        return variables, steps, initial
+
+    def matches(self, query: SequenceQuery, limit: Optional[int]) -> Iterator[Tuple[List[SequenceMatch], bool]]:
+        """Resolved matches slice by slice, stopping after `limit` of them if given."""
+        store = self.store()
+        variables, steps, initial = self.compile(query, store)
+        if any(initial[variables.index(v)] < 0 for v in query.bindings):
+            return  # A bound entity took part in no event
+        start = to_epoch(query.start_time) if query.start_time is not None else store.t0
+        end = to_epoch(query.end_time) if query.end_time is not None else store.t_max
+        found = 0
+        for bind, events, truncated in evaluate(
+            store, steps, initial, start, end, settings.sequence_max_partials, settings.sequence_chunk_events
+        ):
+            if limit is not None:
+                bind, events = bind[:limit - found], events[:limit - found]
+            found += len(bind)
+            yield self._resolve(store, variables, steps, bind, events), truncated
+            if limit is not None and found >= limit:
+                return
+
+    async def query(self, query: SequenceQuery) -> SequenceResult:
+        """
+        Evaluate a sequence ad hoc; the first query.limit matches in order of first event.
+
+        Raises:
+            ValueError: If the query is invalid
+        """
+        result = SequenceResult()
+        for matches, truncated in await asyncio.to_thread(list, self.matches(query, query.limit + 1)):
+            result.matches.extend(matches)
+            result.truncated |= truncated
+        if len(result.matches) > query.limit:
+            result.matches = result.matches[:query.limit]
+            result.truncated = True
+        return result
+
+    async def scan(self, query: SequenceQuery) -> Dict[str, Any]:
+        """
+        Evaluate a named sequence over the whole dataset (or its time window)
+        and store the matches, up to sequence_max_results. Matches already
+        stored are skipped by fingerprint.
+
+        Raises:
+            ValueError: If the query is invalid or unnamed
+        """
+        if not query.name:
+            raise ValueError("A scanned sequence needs a name")
+        started = time.monotonic()
+        stored = 0
+        truncated = False
+        for matches, cut in self.matches(query, settings.sequence_max_results):
+            truncated |= cut
+            rows = [self._row(query.name, m) for m in matches]
+            for i in range(0, len(rows), _UPSERT_BATCH_SIZE):
+                await supabase_client.upsert(
+                    "sequence_matches", rows[i:i + _UPSERT_BATCH_SIZE],
+                    on_conflict="fingerprint", ignore_duplicates=True
+                )
+            stored += len(rows)
+        summary = {
+            "name": query.name,
+            "matches": stored,
+            "truncated": truncated or stored >= settings.sequence_max_results,
+            "seconds": round(time.monotonic() - started, 2),
+        }
+        logger.info(f"Sequence scan: {summary}")
+        return summary
+
+    async def list_matches(
+        self,
+        name: Optional[str] = None,
+        entity_id: Optional[str] = None,
+        limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """Stored matches, newest first, optionally of one sequence or involving one entity."""
+        filters = {"order": "start_at.desc", "limit": str(limit)}
+        if name:
+            filters["name"] = f"eq.{name}"
+        if entity_id:
+            filters["entity_ids"] = f"cs.{{{entity_id}}}"
+        return await supabase_client.query("sequence_matches", filters=filters)
+
+    @staticmethod
+    def _row(name: str, match: SequenceMatch) -> Dict[str, Any]:
+        rel_ids = ",".join(e.rel_id for e in match.events)
+        entity_ids = {e.entity_id for e in match.bindings.values()}
+        entity_ids |= {i for e in match.events for i in (e.source_id, e.target_id) if i}
+        return {
+            "name": name,
+            "fingerprint": hashlib.blake2b(f"{name}:{rel_ids}".encode(), digest_size=16).hexdigest(),
+            "entity_ids": sorted(entity_ids),
+            "bindings": {var: e.model_dump() for var, e in match.bindings.items()},
+            "events": [e.model_dump(mode="json") for e in match.events],
+            "start_at": match.start_at.isoformat(),
+            "end_at": match.end_at.isoformat(),
+        }
+
+    @staticmethod
+    def _resolve(
+        store: EventStore,
+        variables: List[str],
+        steps: List[CompiledStep],
+        bind: np.ndarray,
+        events: np.ndarray
+    ) -> List[SequenceMatch]:
+        """Turn party codes and event positions into entity keys and event details."""
+        if len(bind) == 0:
+            return []
+        node_ids = set(store.nodes[bind[bind >= 0]].tolist())
+        for k, step in enumerate(steps):
+            node_ids |= set(step.stream.src[events[:, k]].tolist()) | set(step.stream.dst[events[:, k]].tolist())
+        ids = sorted(node_ids)
+        entities: Dict[int, SequenceEntity] = {}
+        for i in range(0, len(ids), _FETCH_BATCH_SIZE):
+            for node_id, node in graph_projection.fetch_nodes(ids[i:i + _FETCH_BATCH_SIZE]).items():
+                label = next(iter(node.labels), None)
+                if label is None or ontology_manager.schema.get_object_type(label) is None:
+                    continue
+                key = node.get(ontology_manager.get_key_field(label))
+                if key is not None:
+                    entities[node_id] = SequenceEntity(entity_type=label, entity_id=str(key))
+
+        matches = []
+        for row, positions in zip(bind.tolist(), events.tolist()):
+            match_events = []
+            for k, (step, ev) in enumerate(zip(steps, positions)):
+                stream = step.stream
+                source, target = entities.get(int(stream.src[ev])), entities.get(int(stream.dst[ev]))
+                amount = float(stream.amounts[ev])
+                match_events.append(SequenceMatchEvent(
+                    step=k + 1,
+                    type=step.event,
+                    rel_id=str(int(stream.rel_ids[ev])),
+                    timestamp=_iso(int(stream.times[ev])),
+                    source_type=source.entity_type if source else None,
+                    source_id=source.entity_id if source else None,
+                    target_type=target.entity_type if target else None,
+                    target_id=target.entity_id if target else None,
+                    amount=None if np.isnan(amount) else amount,
+                ))
+            bindings = {
+                var: entities[int(store.nodes[code])]
+                for var, code in zip(variables, row)
+                if code >= 0 and int(store.nodes[code]) in entities
+            }
+            matches.append(SequenceMatch(
+                bindings=bindings,
+                events=match_events,
+                start_at=match_events[0].timestamp,
+                end_at=match_events[-1].timestamp,
+            ))
+        return matches
+
+
+# Global instance
+sequence_detection = SequenceDetectionService()
@@ -1,40 +1,326 @@
 """
 Temporal Analysis Service - Chronological event reconstruction.
+
+Events are an entity's relationships with a native timestamp (r._ts: calls,
+messages, transfers, sightings) and its dated neighbors (e._ts: events,
+transactions), in time order. Windows and cursors compare native DateTime
+values, so they run on the _ts range indexes created at ingestion.
 """
+import asyncio
+import base64
+import binascii
+import heapq
+import itertools
 import logging
-from typing import List, Dict, Any
+import re
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from core.config import settings
+from core.ontology_manager import ontology_manager
 from db.neo4j_client import neo4j_client
+from models.schemas import TimelineBucket, TimelineEvent, TimelineHistogram, TimelinePage
+from services.graph_projection import to_epoch
 
 logger = logging.getLogger(__name__)
 
+_REL_TYPE_PATTERN = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+# Histogram bucket sizes, finest first
+TIMELINE_INTERVALS = [("minute", 60), ("hour", 3600), ("day", 86400)]
+
+
+def choose_interval(start: datetime, end: datetime, max_buckets: int) -> Tuple[str, int]:
+    """The finest bucket size that splits [start, end] into at most `max_buckets` buckets."""
+    seconds = max((end - start).total_seconds(), 1)
+    for name, size in TIMELINE_INTERVALS:
+        if seconds / size <= max_buckets:
+            return name, size
+    return TIMELINE_INTERVALS[-1]
+
+
+def merge_timelines(streams: Iterable[List[Dict[str, Any]]]) -> Iterator[Dict[str, Any]]:
+    """
+    Lazily merge timeline records sorted by (epoch_ms, rel_id), keeping the
+    first copy of a relationship read from several entities.
+    """
+    seen = set()
+    for record in heapq.merge(*streams, key=lambda r: (r["epoch_ms"], r["rel_id"])):
+        if record["rel_id"] not in seen:
+            seen.add(record["rel_id"])
+            yield record
+
+
+def _from_millis(millis: int) -> datetime:
+    return datetime.fromtimestamp(millis / 1000, tz=timezone.utc)
+
 
 class TemporalService:
     """Service for time-based investigation."""
-    
-    async def get_entity_timeline(self, entity_id: str, entity_type: str) -> List[Dict[str, Any]]:
-        """Get chronologically sorted events connected to an entity."""
-        id_field = f"{entity_type.lower()}_id"
-        
-        # This query looks for any connected nodes that have a timestamp-like property
-        # and also relationships that have timestamps (like CALL, TRANSFER)
-        query = f"""
-        MATCH (n:{entity_type} {{{id_field}: $id}})
-        OPTIONAL MATCH (n)-[r]-(e)
-        WITH n, r, e
-        WHERE e.timestamp IS NOT NULL OR r.timestamp IS NOT NULL OR e.start_time IS NOT NULL
-        RETURN 
-            CASE 
-                WHEN e.timestamp IS NOT NULL THEN e.timestamp
-                WHEN e.start_time IS NOT NULL THEN e.start_time
-                WHEN r.timestamp IS NOT NULL THEN r.timestamp
-            END as time,
-            labels(e)[0] as type,
-            type(r) as relationship,
-            properties(e) as entity_props,
-            properties(r) as rel_props
-        ORDER BY time ASC
+
+    async def get_entity_timeline(
+        self,
+        entity_id: str,
+        entity_type: str,
+        collapse_clusters: bool = False,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        relationship_types: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None
+    ) -> TimelinePage:
         """
-        return neo4j_client.execute_query(query, {"id": entity_id})
+        One page of the chronologically sorted events connected to an entity.
+
+        Events in [start_time, end_time) are returned oldest first, ordered by
+        (time, relationship id); pass `next_cursor` back to continue after the
+        last event of a page.
+
+        With collapse_clusters, events of every record resolved into the
+        entity's cluster (same _canonical_id) are merged into one timeline;
+        record_id tells which record each event came from.
+
+        Raises:
+            ValueError: If the entity type is unknown, or the cursor or a relationship type is malformed
+        """
+        limit = limit or settings.timeline_page_size
+        after = self._decode_cursor(cursor) if cursor else None
+        records = self._timeline_records(
+            entity_id, entity_type, collapse_clusters, start_time, end_time, relationship_types, limit + 1, after
+        )
+        return self._page(iter(records), limit)
+
+    async def get_case_timeline(
+        self,
+        entities: List[Tuple[str, str]],
+        collapse_clusters: bool = False,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        relationship_types: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None
+    ) -> TimelinePage:
+        """
+        One page of the merged timeline of several (entity_type, entity_id) entities.
+
+        Each entity's next page is read concurrently and the sorted pages are
+        merged; an event shared by two of the entities (a call between two of
+        the phones) appears once. Cursors work as in get_entity_timeline.
+
+        Raises:
+            ValueError: If the entity type is unknown, or the cursor or a relationship type is malformed
+        """
+        limit = limit or settings.timeline_page_size
+        after = self._decode_cursor(cursor) if cursor else None
+        self._rel_pattern(relationship_types)
+        semaphore = asyncio.Semaphore(settings.case_timeline_concurrency)
+
+        async def read(entity_type: str, entity_id: str) -> List[Dict[str, Any]]:
+            async with semaphore:
+                return await asyncio.to_thread(
+                    self._timeline_records, entity_id, entity_type, collapse_clusters,
+                    start_time, end_time, relationship_types, limit + 1, after
+                )
+
+        # The first limit + 1 events of each entity cover the first limit + 1 of the merge
+        streams = await asyncio.gather(*(read(entity_type, entity_id) for entity_type, entity_id in set(entities)))
+        return self._page(merge_timelines(streams), limit)
+
+    def _timeline_records(
+        self,
+        entity_id: str,
+        entity_type: str,
+        collapse_clusters: bool,
+        start_time: Optional[datetime],
+        end_time: Optional[datetime],
+        relationship_types: Optional[List[str]],
+        limit: int,
+        after: Optional[Tuple[int, int]]
+    ) -> List[Dict[str, Any]]:
+        """The first `limit` events of an entity after the `after` key, ordered by (epoch_ms, rel_id)."""
+        conditions = self._window_conditions(start_time, end_time)
+        if after is not None:
+            conditions.append("(t > datetime({epochMillis: $after_ms}) OR "
+                              "(t = datetime({epochMillis: $after_ms}) AND id(r) > $after_id))")
+        where = " AND ".join(conditions) or "true"
+        rel = self._rel_pattern(relationship_types)
+        key_field = ontology_manager.get_key_field(entity_type)
+
+        # Relationship-dated and node-dated events are read separately so each
+        # side filters and orders on an indexed _ts; only `limit` of each per record.
+        # A relationship between two records of a cluster is read from both
+        # and kept once
+        query = f"""{self._match(entity_type, collapse_clusters)}
+        CALL {{
+            WITH n
+            MATCH (n)-[{rel}]-(e)
+            WITH r, e, r._ts AS t
+            WHERE t IS NOT NULL AND {where}
+            RETURN r, e, t ORDER BY t, id(r) LIMIT $limit
+            UNION
+            WITH n
+            MATCH (n)-[{rel}]-(e)
+            WITH r, e, e._ts AS t
+            WHERE r._ts IS NULL AND t IS NOT NULL AND {where}
+            RETURN r, e, t ORDER BY t, id(r) LIMIT $limit
+        }}
+        WITH r, t, head(collect({{n: n, e: e}})) AS side
+        ORDER BY t, id(r)
+        LIMIT $limit
+        WITH side.n AS n, r, side.e AS e, t
+        RETURN t.epochMillis AS epoch_ms, id(r) AS rel_id, type(r) AS relationship,
+               n.{key_field} AS record_id, id(e) AS other_id, labels(e)[0] AS other_type,
+               properties(e) AS entity_props, properties(r) AS rel_props
+        """
+        return neo4j_client.execute_query(query, {
+            "id": entity_id,
+            "limit": limit,
+            **self._window_params(start_time, end_time),
+            **({"after_ms": after[0], "after_id": after[1]} if after is not None else {}),
+        })
+
+    def _page(self, records: Iterator[Dict[str, Any]], limit: int) -> TimelinePage:
+        """The first `limit` records as events, with a cursor if another one follows."""
+        page = list(itertools.islice(records, limit + 1))
+        events = [self._to_event(r) for r in page[:limit]]
+        next_cursor = None
+        if len(page) > limit:
+            last = page[limit - 1]
+            next_cursor = self._encode_cursor(last["epoch_ms"], last["rel_id"])
+        return TimelinePage(events=events, next_cursor=next_cursor)
+
+    async def get_timeline_histogram(
+        self,
+        entity_id: str,
+        entity_type: str,
+        collapse_clusters: bool = False,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        interval: Optional[str] = None
+    ) -> TimelineHistogram:
+        """
+        Event counts per relationship type in minute, hour or day buckets (UTC).
+
+        Without an explicit interval, the finest one giving at most
+        timeline_max_buckets buckets over the window is used; an open
+        window is first narrowed to the entity's first and last event.
+        """
+        match = self._match(entity_type, collapse_clusters)
+        window = self._window_params(start_time, end_time)
+        where = " AND ".join(self._window_conditions(start_time, end_time)) or "true"
+        events = f"""{match}
+        MATCH (n)-[r]-(e)
+        WITH DISTINCT r, coalesce(r._ts, e._ts) AS t
+        WHERE t IS NOT NULL AND {where}"""
+
+        if start_time is None or end_time is None:
+            bounds = neo4j_client.execute_query(
+                f"{events} RETURN min(t).epochMillis AS first_ms, max(t).epochMillis AS last_ms",
+                {"id": entity_id, **window}
+            )
+            if not bounds or bounds[0]["first_ms"] is None:
+                return TimelineHistogram(interval=interval or "day", start_time=start_time, end_time=end_time)
+            start_time = start_time or _from_millis(bounds[0]["first_ms"])
+            end_time = end_time or _from_millis(bounds[0]["last_ms"])
+
+        if interval is None:
+            interval, size = choose_interval(start_time, end_time, settings.timeline_max_buckets)
+        else:
+            size = dict(TIMELINE_INTERVALS).get(interval)
+            if size is None:
+                raise ValueError(f"Unknown interval '{interval}', expected one of {[i for i, _ in TIMELINE_INTERVALS]}")
+
+        records = neo4j_client.execute_query(f"""{events}
+        WITH (t.epochSeconds / $size) * $size AS bucket, type(r) AS relationship, count(*) AS events
+        RETURN bucket, relationship, events
+        ORDER BY bucket
+        """, {"id": entity_id, "size": size, **window})
+
+        buckets: Dict[int, TimelineBucket] = {}
+        for record in records:
+            bucket = buckets.get(record["bucket"])
+            if bucket is None:
+                bucket = buckets[record["bucket"]] = TimelineBucket(
+                    start=datetime.fromtimestamp(record["bucket"], tz=timezone.utc)
+                )
+            bucket.counts[record["relationship"]] = record["events"]
+            bucket.total += record["events"]
+        return TimelineHistogram(
+            interval=interval,
+            bucket_seconds=size,
+            start_time=start_time,
+            end_time=end_time,
+            buckets=list(buckets.values()),
+            total=sum(b.total for b in buckets.values())
+        )
+
+    def _match(self, entity_type: str, collapse_clusters: bool) -> str:
+        """MATCH binding `n` to the entity, or to every record of its cluster."""
+        id_field = ontology_manager.get_key_field(entity_type)
+        if collapse_clusters:
+            return f"""
+        MATCH (s:{entity_type} {{{id_field}: $id}})
+        OPTIONAL MATCH (m:{entity_type} {{_canonical_id: s._canonical_id}})
+        WITH s, collect(m) AS members
+        UNWIND CASE WHEN size(members) = 0 THEN [s] ELSE members END AS n"""
+        return f"""
+        MATCH (n:{entity_type} {{{id_field}: $id}})"""
+
+    @staticmethod
+    def _rel_pattern(relationship_types: Optional[List[str]]) -> str:
+        if not relationship_types:
+            return "r"
+        invalid = [t for t in relationship_types if not _REL_TYPE_PATTERN.match(t)]
+        if invalid:
+            raise ValueError(f"Invalid relationship types: {invalid}")
+        return "r:" + "|".join(relationship_types)
+
+    @staticmethod
+    def _window_conditions(start_time: Optional[datetime], end_time: Optional[datetime]) -> List[str]:
+        conditions = []
+        if start_time is not None:
+            conditions.append("t >= datetime({epochMillis: $start_ms})")
+        if end_time is not None:
+            conditions.append("t < datetime({epochMillis: $end_ms})")
+        return conditions
+
+    @staticmethod
+    def _window_params(start_time: Optional[datetime], end_time: Optional[datetime]) -> Dict[str, Any]:
+        return {
+            "start_ms": to_epoch(start_time) * 1000 if start_time is not None else None,
+            "end_ms": to_epoch(end_time) * 1000 if end_time is not None else None,
+        }
+
+    @staticmethod
+    def _to_event(record: Dict[str, Any]) -> TimelineEvent:
+        entity_props = record["entity_props"] or {}
+        rel_props = record["rel_props"] or {}
+        other_type = record["other_type"]
+        other_key = None
+        if other_type and ontology_manager.schema.get_object_type(other_type) is not None:
+            other_key = entity_props.get(ontology_manager.get_key_field(other_type))
+        return TimelineEvent(
+            timestamp=_from_millis(record["epoch_ms"]),
+            type=record["relationship"],
+            rel_id=str(record["rel_id"]),
+            record_id=record["record_id"],
+            other_id=str(record["other_id"]),
+            other_type=other_type,
+            description=f"{record['relationship']} - {other_type} {other_key or ''}".strip(),
+            details={k: v for k, v in {**entity_props, **rel_props}.items() if not k.startswith("_")},
+        )
+
+    @staticmethod
+    def _encode_cursor(epoch_ms: int, rel_id: int) -> str:
+        return base64.urlsafe_b64encode(f"{epoch_ms}:{rel_id}".encode()).decode()
+
+    @staticmethod
+    def _decode_cursor(cursor: str) -> Tuple[int, int]:
+        try:
+            epoch_ms, rel_id = base64.urlsafe_b64decode(cursor.encode()).decode().split(":")
+            return int(epoch_ms), int(rel_id)
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise ValueError("Malformed cursor")
 
 
 # Global instance
@@ -0,0 +1,217 @@
+"""
+Trajectories - Per-entity movement paths built from sightings.
+
+Every SIGHTED_AT relationship (one per ANPR / CCTV / border record, keyed
+by sighting_id at ingestion) becomes a point of its entity's trajectory in
+the Supabase `trajectory_segments` table: one row per entity and UTC day
+holding parallel arrays (epoch seconds, lat, lon, sighting / location ids,
+source) sorted by time. A year-long vehicle track is a few hundred rows
+instead of one relationship hop per point, and a time window reads only
+the days it covers.
+
+Ingestion collects the sightings it writes in a TrackDeltas and applies
+them with the `apply_trajectory_points` function, which merges them into
+existing segments (re-ingested sightings replace their old point), so
+trajectories are maintained incrementally. Paths are served with optional
+Douglas-Peucker simplification to keep long tracks small.
+"""
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from core.ontology_manager import ontology_manager
+from db.neo4j_client import neo4j_client
+from db.supabase_client import supabase_client
+from models.schemas import Trajectory, TrajectoryPoint
+from services.graph_projection import to_epoch
+
+logger = logging.getLogger(__name__)
+
+_APPLY_BATCH_SIZE = 2_000
+
+_METERS_PER_DEGREE = 111_320.0
+
+SegmentKey = Tuple[str, str, str]  # entity_type, entity_id, day
+
+
+def simplify(lat: np.ndarray, lon: np.ndarray, tolerance_m: float) -> np.ndarray:
+    """
+    Douglas-Peucker simplification of a path; indices of the points kept.
+
+    Coordinates are projected to local meters (equirectangular around the
+    path's mean latitude), and each point is measured against the segment
+    between its kept neighbours, so paths returning to their start
+    simplify correctly.
+    """
+    n = len(lat)
+    if n <= 2 or tolerance_m <= 0:
+        return np.arange(n)
+    scale = np.cos(np.radians(np.mean(lat)))
+    x = np.asarray(lon, dtype=np.float64) * _METERS_PER_DEGREE * scale
+    y = np.asarray(lat, dtype=np.float64) * _METERS_PER_DEGREE
+    keep = np.zeros(n, dtype=bool)
+    keep[[0, n - 1]] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        px, py = x[first + 1:last], y[first + 1:last]
+        dx, dy = x[last] - x[first], y[last] - y[first]
+        length2 = dx * dx + dy * dy
+        if length2 > 0:
+            along = np.clip(((px - x[first]) * dx + (py - y[first]) * dy) / length2, 0.0, 1.0)
+        else:
+            along = np.zeros(len(px))
+        distance2 = (px - x[first] - along * dx) ** 2 + (py - y[first] - along * dy) ** 2
+        farthest = int(np.argmax(distance2))
+        if distance2[farthest] > tolerance_m * tolerance_m:
+            split = first + 1 + farthest
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return np.flatnonzero(keep)
+
+
+class TrackDeltas:
+    """In-memory trajectory points, combined per (entity, day) segment before they are applied."""
+
+    def __init__(self):
+        self.segments: Dict[SegmentKey, Dict[str, Tuple[int, float, float, str, str]]] = {}
+
+    def __len__(self) -> int:
+        return sum(len(points) for points in self.segments.values())
+
+    def add(self, entity_type: str, entity_id: str, sighting_id: str, epoch_seconds: int,
+            lat: float, lon: float, location_id: Optional[str] = None, source: Optional[str] = None):
+        """Add one sighting to its entity's segment for the UTC day; a repeated sighting_id replaces the point."""
+        day = datetime.fromtimestamp(epoch_seconds, tz=timezone.utc).date().isoformat()
+        points = self.segments.setdefault((entity_type, entity_id, day), {})
+        points[sighting_id] = (int(epoch_seconds), float(lat), float(lon), location_id or "", source or "")
+
+    def to_rows(self) -> List[Dict[str, Any]]:
+        """JSON-ready segment rows, points sorted by time."""
+        rows = []
+        for (entity_type, entity_id, day), points in self.segments.items():
+            ordered = sorted(points.items(), key=lambda item: (item[1][0], item[0]))
+            rows.append({
+                "entity_type": entity_type,
+                "entity_id": entity_id,
+                "day": day,
+                "point_count": len(ordered),
+                "t": [p[0] for _, p in ordered],
+                "lat": [p[1] for _, p in ordered],
+                "lon": [p[2] for _, p in ordered],
+                "sighting_ids": [sighting_id for sighting_id, _ in ordered],
+                "location_ids": [p[3] for _, p in ordered],
+                "sources": [p[4] for _, p in ordered],
+            })
+        return rows
+
+
+class TrajectoryService:
+    """Service for maintaining and serving entity trajectories."""
+
+    async def apply(self, deltas: TrackDeltas):
+        """Merge collected points into the trajectory segments."""
+        rows = deltas.to_rows()
+        for i in range(0, len(rows), _APPLY_BATCH_SIZE):
+            await supabase_client.rpc("apply_trajectory_points", {"segments": rows[i:i + _APPLY_BATCH_SIZE]})
+        if rows:
+            logger.info(f"Applied {len(deltas)} trajectory points in {len(rows)} segments")
+
+    async def rebuild(self) -> int:
+        """
+        Recompute every trajectory from the SIGHTED_AT relationships in Neo4j.
+
+        Run this after correcting sighting timestamps, which would otherwise
+        leave the old point in its previous day's segment.
+
+        Returns:
+            Number of points
+        """
+        deltas = TrackDeltas()
+        for label, obj in ontology_manager.schema.objects.items():
+            query = f"""
+            MATCH (a:{label})-[r:SIGHTED_AT]->(l:Location)
+            WHERE r._ts IS NOT NULL
+            RETURN a.{obj.key} AS entity_id, r.sighting_id AS sighting_id, r._ts.epochSeconds AS t,
+                   coalesce(toFloat(r.lat), l._location.latitude) AS lat,
+                   coalesce(toFloat(r.lon), l._location.longitude) AS lon,
+                   l.location_id AS location_id, r.source AS source
+            """
+            for record in neo4j_client.stream_query(query):
+                if record["lat"] is None or record["lon"] is None:
+                    continue
+                deltas.add(
+                    label, record["entity_id"], record["sighting_id"] or str(record["t"]), record["t"],
+                    record["lat"], record["lon"], record["location_id"], record["source"]
+                )
+        await supabase_client.delete("trajectory_segments", {"point_count": "gte.0"})
+        await self.apply(deltas)
+        return len(deltas)
+
+    async def get_trajectory(
+        self,
+        entity_type: str,
+        entity_id: str,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        tolerance_m: Optional[float] = None
+    ) -> Trajectory:
+        """
+        An entity's sightings in time order within [start_time, end_time],
+        simplified so no dropped point lies further than tolerance_m from
+        the path.
+        """
+        filters = {"entity_type": f"eq.{entity_type}", "entity_id": f"eq.{entity_id}", "order": "day.asc"}
+        start, end = to_epoch(start_time), to_epoch(end_time)
+        days = []
+        if start is not None:
+            days.append(f"day.gte.{datetime.fromtimestamp(start, tz=timezone.utc).date().isoformat()}")
+        if end is not None:
+            days.append(f"day.lte.{datetime.fromtimestamp(end, tz=timezone.utc).date().isoformat()}")
+        if days:
+            filters["and"] = f"({','.join(days)})"
+        segments = await supabase_client.query("trajectory_segments", filters=filters)
+
+        columns = {k: [] for k in ("t", "lat", "lon", "sighting_ids", "location_ids", "sources")}
+        for segment in segments:
+            for k, values in columns.items():
+                values.extend(segment[k])
+        t = np.array(columns["t"], dtype=np.int64)
+        window = np.ones(len(t), dtype=bool)
+        if start is not None:
+            window &= t >= start
+        if end is not None:
+            window &= t <= end
+        selected = np.flatnonzero(window)
+        lat = np.array(columns["lat"], dtype=np.float64)[selected]
+        lon = np.array(columns["lon"], dtype=np.float64)[selected]
+        kept = selected[simplify(lat, lon, tolerance_m)] if tolerance_m else selected
+
+        return Trajectory(
+            entity_type=entity_type,
+            entity_id=entity_id,
+            start_time=start_time,
+            end_time=end_time,
+            tolerance_m=tolerance_m,
+            total_points=len(selected),
+            points=[
+                TrajectoryPoint(
+                    timestamp=datetime.fromtimestamp(int(t[i]), tz=timezone.utc),
+                    lat=columns["lat"][i],
+                    lon=columns["lon"][i],
+                    sighting_id=columns["sighting_ids"][i],
+                    location_id=columns["location_ids"][i] or None,
+                    source=columns["sources"][i] or None,
+                )
+                for i in kept.tolist()
+            ],
+        )
+
+
+# Global instance
+trajectories = TrajectoryService()
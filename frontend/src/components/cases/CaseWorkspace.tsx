@@ -42,10 +42,13 @@ const CaseWorkspace: React.FC = () => {
         setLoading(true);
         try {
             const response = await api.getCaseEntities(caseId);
-            const entities = await Promise.all(response.data.map(async (ce: any) => {
-                const entityRes = await api.getEntity(ce.entity_type, ce.entity_id);
-                return entityRes.data;
-            }));
+            const batchRes = await api.getEntities(response.data.map((ce: any) => ({
+                entity_type: ce.entity_type,
+                entity_id: ce.entity_id,
+            })));
+            const entities = response.data
+                .filter((ce: any) => batchRes.data.entities[ce.entity_id])
+                .map((ce: any) => batchRes.data.entities[ce.entity_id]);
             addGraphData({ nodes: entities, edges: [] });
             addToast(`Loaded ${entities.length} entities from case`, 'success');
         } catch (error) {
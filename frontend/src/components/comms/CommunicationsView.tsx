@@ -13,8 +13,7 @@ const CommunicationsView: React.FC = () => {
             if (!selectedEntity || selectedEntity.type !== 'Phone') return;
             setLoading(true);
             try {
-                // We use properties.msisdn as the phone ID
-                const phoneId = selectedEntity.properties.msisdn || selectedEntity.id;
+                const phoneId = selectedEntity.properties.phone_id || selectedEntity.id;
                 const response = await api.getTopContacts(phoneId);
                 setTopContacts(response.data);
             } catch (error) {
@@ -63,8 +62,8 @@ const CommunicationsView: React.FC = () => {
                                         <Users size={20} className="text-primary" />
                                     </div>
                                     <div>
-                                        <div className="font-bold text-sm">{maskPII(contact.phone, 'phone')}</div>
-                                        <div className="text-xs text-muted">Frequency: {contact.count} contacts</div>
+                                        <div className="font-bold text-sm">{maskPII(contact.msisdn || contact.contact_id, 'phone')}</div>
+                                        <div className="text-xs text-muted">Frequency: {contact.total} contacts</div>
                                     </div>
                                 </div>
                                 <div className="rank-badge text-xs mono text-muted"># {idx + 1}</div>
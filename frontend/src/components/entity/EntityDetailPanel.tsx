@@ -6,7 +6,7 @@ import EntityResolutionUI from './EntityResolutionUI';
 import DocumentViewer from './DocumentViewer';
 
 const EntityDetailPanel: React.FC = () => {
-    const { selectedEntity, addGraphData, addToast, maskPII } = useInvestigationStore();
+    const { selectedEntity, nodes, edges, addGraphData, addToast, maskPII } = useInvestigationStore();
 
     if (!selectedEntity) {
         return (
@@ -18,7 +18,13 @@ const EntityDetailPanel: React.FC = () => {
 
     const handleExpand = async () => {
         try {
-            const response = await api.expandEntity(selectedEntity.type, selectedEntity.id);
+            // Only ask for elements that are not already on the canvas
+            const response = await api.expandGraph({
+                entity_type: selectedEntity.type,
+                entity_id: selectedEntity.id,
+                known_node_ids: nodes.map(n => n.id),
+                known_edge_ids: edges.map(e => e.id),
+            });
             addGraphData(response.data);
             addToast(`Expanded network for ${selectedEntity.id}`, 'success');
         } catch (error) {
@@ -1,26 +1,50 @@
 import React, { useEffect, useState } from 'react';
 import { useInvestigationStore } from '../../store/useInvestigationStore';
+import { api } from '../../services/api';
 import { AlertTriangle, ArrowRight } from 'lucide-react';
 
+const RESOLVABLE_TYPES: Record<string, string> = {
+    Person: 'person_id',
+    Phone: 'phone_id',
+    Vehicle: 'vehicle_id',
+    Account: 'account_id',
+};
+
 const EntityResolutionUI: React.FC = () => {
     const { selectedEntity } = useInvestigationStore();
     const [suggestions, setSuggestions] = useState<any[]>([]);
 
+    const keyProperty = selectedEntity ? RESOLVABLE_TYPES[selectedEntity.type] : undefined;
+    const entityKey = keyProperty ? selectedEntity?.properties[keyProperty] : undefined;
+
     useEffect(() => {
-        if (selectedEntity?.type === 'Person' && selectedEntity.properties.full_name?.includes('Ayaan')) {
-            setSuggestions([
-                {
-                    source_id: selectedEntity.id,
-                    target_id: 'P002',
-                    target_name: 'Ayaan M. Maxamed',
-                    confidence: 0.95,
-                    reason: 'Same Date of Birth (1994-02-11) and High Name Similarity'
-                }
-            ]);
-        } else {
+        if (!selectedEntity || !entityKey) {
             setSuggestions([]);
+            return;
         }
-    }, [selectedEntity]);
+        let cancelled = false;
+        api.getMergeSuggestions(selectedEntity.type, entityKey)
+            .then((response) => {
+                if (cancelled) return;
+                setSuggestions(response.data.map((s: any) => {
+                    const targetIndex = s.entities[0] === entityKey ? 1 : 0;
+                    return {
+                        target_id: s.entities[targetIndex],
+                        target_name: s.preview.split(' / ')[targetIndex],
+                        confidence: s.confidence,
+                        reason: s.reason,
+                    };
+                }));
+            })
+            .catch(() => !cancelled && setSuggestions([]));
+        return () => { cancelled = true; };
+    }, [selectedEntity, entityKey]);
+
+    const resolve = async (targetId: string) => {
+        if (!selectedEntity || !entityKey) return;
+        await api.resolveEntities(selectedEntity.type, entityKey, [targetId]);
+        setSuggestions((current) => current.filter((s) => s.target_id !== targetId));
+    };
 
     if (suggestions.length === 0) return null;
 
@@ -35,10 +59,10 @@ const EntityResolutionUI: React.FC = () => {
                 <div key={idx} className="suggestion-card glass p-3 rounded-lg">
                     <div className="flex items-center justify-between mb-2">
                         <span className="text-xs text-muted">Confidence: {(s.confidence * 100).toFixed(0)}%</span>
-                        <button className="btn btn-primary text-xs py-1">Resolve</button>
+                        <button className="btn btn-primary text-xs py-1" onClick={() => resolve(s.target_id)}>Resolve</button>
                     </div>
                     <div className="match-comparison flex items-center gap-3">
-                        <div className="entity-label text-xs font-bold">{selectedEntity?.properties.full_name}</div>
+                        <div className="entity-label text-xs font-bold">{entityKey}</div>
                         <ArrowRight size={14} className="text-muted" />
                         <div className="entity-label text-xs font-bold">{s.target_name}</div>
                     </div>
@@ -36,6 +36,12 @@ const FinancialFlowView: React.FC = () => {
         );
     }
 
+    // Accounts grouped by the hop at which traced money first reached them
+    const hops: any[][] = [];
+    for (const account of trace?.accounts ?? []) {
+        (hops[account.hop] ??= []).push(account);
+    }
+
     if (loading) return <div className="flex-center h-full text-muted mono">Tracing mult-hop transactions...</div>;
 
     return (
@@ -48,32 +54,43 @@ const FinancialFlowView: React.FC = () => {
                 <p className="text-muted text-sm mt-1">Multi-hop money laundering detection and flow analysis</p>
             </div>
 
-            {!trace || trace.length === 0 ? (
+            {!trace || trace.transfers.length === 0 ? (
                 <div className="panel glass p-12 text-center text-muted">
                     No significant outgoing transfers detected for this account.
                 </div>
             ) : (
                 <div className="trace-timeline flex flex-col gap-6 relative">
-                    {trace.map((step: any, idx: number) => (
-                        <div key={idx} className="trace-step flex items-center gap-8 group">
+                    {hops.map((accounts: any[], hop: number) => (
+                        <div key={hop} className="trace-step flex items-center gap-8 group">
                             <div className="step-badge glass flex-center w-12 h-12 rounded-full font-bold mono">
-                                {idx + 1}
+                                {hop}
                             </div>
 
-                            <div className="step-card panel glass p-5 flex-1 hover:border-primary transition-colors">
-                                <div className="flex justify-between items-center mb-3">
-                                    <div className="flex items-center gap-2">
-                                        <Landmark size={14} className="text-muted" />
-                                        <span className="text-xs text-muted mono">Account</span>
-                                        <span className="font-bold">{maskPII(step.accountId, 'account_id')}</span>
+                            <div className="step-card panel glass p-5 flex-1 hover:border-primary transition-colors flex flex-col gap-3">
+                                {accounts.map((account: any) => (
+                                    <div key={account.id} className="flex justify-between items-center">
+                                        <div className="flex items-center gap-2">
+                                            <Landmark size={14} className="text-muted" />
+                                            <span className="text-xs text-muted mono">Account</span>
+                                            <span className="font-bold">{maskPII(account.account_id, 'account_id')}</span>
+                                        </div>
+                                        <div className="flex items-center gap-4">
+                                            {account.forwarded > 0 && (
+                                                <span className="text-xs text-muted flex items-center gap-1">
+                                                    <ArrowRight size={12} /> $ {account.forwarded.toLocaleString()}
+                                                </span>
+                                            )}
+                                            <div className="amount font-bold text-primary">
+                                                $ {account.retained.toLocaleString()}
+                                            </div>
+                                        </div>
                                     </div>
-                                    <div className="amount font-bold text-primary">$ {step.amount.toLocaleString()}</div>
-                                </div>
+                                ))}
 
-                                {idx < trace.length - 1 && (
-                                    <div className="transfer-info flex items-center gap-3 mt-4 text-muted">
+                                {hop < hops.length - 1 && (
+                                    <div className="transfer-info flex items-center gap-3 mt-1 text-muted">
                                         <ArrowRight size={16} />
-                                        <span className="text-xs italic">Transferred to next hop</span>
+                                        <span className="text-xs italic">Forwarded within the dwell window</span>
                                         <TrendingDown size={14} className="text-danger" />
                                     </div>
                                 )}
@@ -88,8 +105,10 @@ const FinancialFlowView: React.FC = () => {
                     <div className="view-summary mt-10 p-5 panel glass bg-primary/5">
                         <div className="font-bold mono text-xs uppercase mb-2 text-primary">Flow Insights</div>
                         <p className="text-sm">
-                            Money traversed <strong>{trace.length} hops</strong> across different entities.
-                            Loss of value between hops suggests potential transaction fees or fragmentation patterns.
+                            <strong>$ {trace.traced_total.toLocaleString()}</strong> traced across{' '}
+                            <strong>{hops.length - 1} hops</strong> and {trace.accounts.length - 1} accounts.
+                            Amounts show what each account kept; only transfers made after the money arrived are followed.
+                            {trace.truncated > 0 && ` ${trace.truncated} smaller branches were not followed.`}
                         </p>
                     </div>
                 </div>
@@ -1,5 +1,5 @@
-import React, { useEffect, useState } from 'react';
-import { MapContainer, TileLayer, Marker, Popup, Polyline } from 'react-leaflet';
+import React, { useCallback, useEffect, useState } from 'react';
+import { MapContainer, TileLayer, Marker, Popup, Polyline, CircleMarker, Tooltip, ImageOverlay, LayersControl, useMap, useMapEvents } from 'react-leaflet';
 import 'leaflet/dist/leaflet.css';
 import { useInvestigationStore } from '../../store/useInvestigationStore';
 import { api } from '../../services/api';
@@ -18,29 +18,178 @@ let DefaultIcon = L.icon({
 
 L.Marker.prototype.options.icon = DefaultIcon;
 
+interface MapCluster {
+    id: number | null;
+    lat: number;
+    lon: number;
+    count: number;
+    entities: number;
+    sightings: number;
+    kind?: 'entity' | 'sighting';
+    entity_type?: string;
+    entity_id?: string;
+}
+
+// Clustered markers for the viewport, reloaded from the server as the map moves
+const ClusterLayer: React.FC = () => {
+    const map = useMap();
+    const [clusters, setClusters] = useState<MapCluster[]>([]);
+
+    const load = useCallback(async () => {
+        const bounds = map.getBounds();
+        // Leaflet longitudes run past ±180 when the world wraps; the API wants a box with min > max across it
+        const wrap = (lon: number) => ((((lon + 180) % 360) + 360) % 360) - 180;
+        const wide = bounds.getEast() - bounds.getWest() >= 360;
+        try {
+            const response = await api.getMapClusters({
+                minLat: Math.max(bounds.getSouth(), -90),
+                maxLat: Math.min(bounds.getNorth(), 90),
+                minLon: wide ? -180 : wrap(bounds.getWest()),
+                maxLon: wide ? 180 : wrap(bounds.getEast()),
+            }, map.getZoom());
+            setClusters(response.data);
+        } catch (error) {
+            // 503 while the hierarchy is still building
+            setClusters([]);
+        }
+    }, [map]);
+
+    useMapEvents({ moveend: load });
+    useEffect(() => { load(); }, [load]);
+
+    const expand = async (cluster: MapCluster) => {
+        if (cluster.id === null) return;
+        try {
+            const response = await api.expandMapCluster(cluster.id);
+            const children: MapCluster[] = response.data.clusters;
+            // Zoom to where the cluster splits, framing its children
+            if (children.length > 1) {
+                map.flyToBounds(L.latLngBounds(children.map(c => [c.lat, c.lon] as L.LatLngTuple)).pad(0.2),
+                    { maxZoom: response.data.zoom });
+            } else {
+                map.flyTo([cluster.lat, cluster.lon], response.data.zoom);
+            }
+        } catch (error) {
+            console.error('Failed to expand cluster:', error);
+        }
+    };
+
+    return (
+        <>
+            {clusters.map((c, idx) => c.count > 1 ? (
+                <CircleMarker
+                    key={c.id ?? `p${idx}`}
+                    center={[c.lat, c.lon]}
+                    radius={Math.min(10 + 8 * Math.log10(c.count), 30)}
+                    pathOptions={{ color: '#3b82f6', fillColor: '#3b82f6', fillOpacity: 0.5, weight: 1 }}
+                    eventHandlers={{ click: () => expand(c) }}
+                >
+                    <Tooltip direction="center" permanent className="mono text-xs">{c.count.toLocaleString()}</Tooltip>
+                </CircleMarker>
+            ) : (
+                <CircleMarker
+                    key={c.id ?? `p${idx}`}
+                    center={[c.lat, c.lon]}
+                    radius={5}
+                    pathOptions={{ color: c.kind === 'sighting' ? '#f59e0b' : '#10b981', fillOpacity: 0.8, weight: 1 }}
+                >
+                    <Popup>
+                        <div className="popup-content mono text-xs">
+                            <strong>{c.entity_type} {c.entity_id}</strong><br />
+                            {c.kind}
+                        </div>
+                    </Popup>
+                </CircleMarker>
+            ))}
+        </>
+    );
+};
+
+interface Heatmap {
+    min_lat: number;
+    max_lat: number;
+    min_lon: number;
+    max_lon: number;
+    rows: number;
+    cols: number;
+    max_count: number;
+    counts: number[][];
+}
+
+// Renders a server-side count grid to an image, one pixel per cell
+const heatmapImage = (heatmap: Heatmap): string => {
+    const canvas = document.createElement('canvas');
+    canvas.width = heatmap.cols;
+    canvas.height = heatmap.rows;
+    const context = canvas.getContext('2d')!;
+    const image = context.createImageData(heatmap.cols, heatmap.rows);
+    const scale = Math.log1p(heatmap.max_count) || 1;
+    heatmap.counts.forEach((row, r) => row.forEach((count, c) => {
+        const i = (r * heatmap.cols + c) * 4;
+        const level = Math.log1p(count) / scale;
+        image.data[i] = 239;
+        image.data[i + 1] = Math.round(68 + 130 * (1 - level));
+        image.data[i + 2] = 68;
+        image.data[i + 3] = count > 0 ? Math.round(60 + 170 * level) : 0;
+    }));
+    context.putImageData(image, 0, 0);
+    return canvas.toDataURL();
+};
+
+// Activity density for the viewport, binned server-side
+const HeatmapLayer: React.FC = () => {
+    const map = useMap();
+    const [overlay, setOverlay] = useState<{ url: string; bounds: L.LatLngBoundsExpression } | null>(null);
+
+    const load = useCallback(async () => {
+        const bounds = map.getBounds();
+        const clamp = (lon: number) => Math.max(-180, Math.min(180, lon));
+        try {
+            const response = await api.getHeatmap({
+                minLat: Math.max(bounds.getSouth(), -90),
+                maxLat: Math.min(bounds.getNorth(), 90),
+                minLon: clamp(bounds.getWest()),
+                maxLon: clamp(bounds.getEast()),
+            }, { resolution: 128 });
+            const heatmap: Heatmap = response.data;
+            setOverlay({
+                url: heatmapImage(heatmap),
+                bounds: [[heatmap.min_lat, heatmap.min_lon], [heatmap.max_lat, heatmap.max_lon]],
+            });
+        } catch (error) {
+            console.error('Failed to fetch heatmap:', error);
+        }
+    }, [map]);
+
+    useMapEvents({ moveend: load });
+    useEffect(() => { load(); }, [load]);
+
+    return overlay ? <ImageOverlay url={overlay.url} bounds={overlay.bounds} opacity={0.7} /> : null;
+};
+
 const MapView: React.FC = () => {
     const { selectedEntity } = useInvestigationStore();
     const [sightings, setSightings] = useState<any[]>([]);
 
     useEffect(() => {
         const fetchSightings = async () => {
-            if (!selectedEntity) return;
+            if (!selectedEntity) {
+                setSightings([]);
+                return;
+            }
             try {
-                const response = await api.getSightings(selectedEntity.type, selectedEntity.id);
-                setSightings(response.data);
+                // Simplified to ~25 m so long tracks stay light to draw
+                const response = await api.getTrajectory(selectedEntity.type, selectedEntity.id, { tolerance_m: 25 });
+                setSightings(response.data.points);
             } catch (error) {
-                console.error('Failed to fetch sightings:', error);
+                console.error('Failed to fetch trajectory:', error);
             }
         };
 
         fetchSightings();
     }, [selectedEntity]);
 
-    if (!selectedEntity) {
-        return <div className="flex-center h-full text-muted">Select an entity to view geographic history</div>;
-    }
-
-    const positions = sightings.map(s => [s.latitude, s.longitude] as L.LatLngTuple);
+    const positions = sightings.map(s => [s.lat, s.lon] as L.LatLngTuple);
     const center: L.LatLngTuple = positions.length > 0 ? positions[0] : [2.0469, 45.3182]; // Mogadishu default
 
     return (
@@ -50,13 +199,21 @@ const MapView: React.FC = () => {
                     url="https://{s}.basemaps.cartocdn.com/dark_all/{z}/{x}/{y}{r}.png"
                     attribution='&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors &copy; <a href="https://carto.com/attributions">CARTO</a>'
                 />
+                <LayersControl position="topright">
+                    <LayersControl.Overlay checked name="Markers">
+                        <ClusterLayer />
+                    </LayersControl.Overlay>
+                    <LayersControl.Overlay name="Activity heatmap">
+                        <HeatmapLayer />
+                    </LayersControl.Overlay>
+                </LayersControl>
                 {sightings.map((s, idx) => (
-                    <Marker key={idx} position={[s.latitude, s.longitude] as L.LatLngTuple}>
+                    <Marker key={s.sighting_id ?? idx} position={[s.lat, s.lon] as L.LatLngTuple}>
                         <Popup>
                             <div className="popup-content mono text-xs">
-                                <strong>{s.location_name}</strong><br />
+                                <strong>{s.location_id}</strong><br />
                                 {new Date(s.timestamp).toLocaleString()}<br />
-                                {s.details && <span>{s.details}</span>}
+                                {s.source && <span>{s.source}</span>}
                             </div>
                         </Popup>
                     </Marker>
@@ -1,20 +1,37 @@
-import React, { useEffect, useState } from 'react';
-import { useInvestigationStore } from '../../store/useInvestigationStore';
-import { api } from '../../services/api';
-import { Clock, Phone, ArrowRight, DollarSign, MapPin } from 'lucide-react';
+interface Bucket {
+    start: string;
+    counts: Record<string, number>;
+    total: number;
+}
+
+interface Histogram {
+    interval: string;
+    bucket_seconds: number;
+    buckets: Bucket[];
+    total: number;
+}
 
 const TimelineView: React.FC = () => {
     const { selectedEntity } = useInvestigationStore();
+    const [histogram, setHistogram] = useState<Histogram | null>(null);
+    const [selectedBucket, setSelectedBucket] = useState<Bucket | null>(null);
     const [events, setEvents] = useState<any[]>([]);
+    const [cursor, setCursor] = useState<string | null>(null);
     const [loading, setLoading] = useState(false);
+    const [loadingEvents, setLoadingEvents] = useState(false);
 
+    // The histogram comes first; events are only loaded for the bucket the user picks
     useEffect(() => {
-        const fetchTimeline = async () => {
+        const fetchHistogram = async () => {
             if (!selectedEntity) return;
             setLoading(true);
+            setHistogram(null);
+            setSelectedBucket(null);
+            setEvents([]);
+            setCursor(null);
             try {
-                const response = await api.getTimeline(selectedEntity.type, selectedEntity.id);
-                setEvents(response.data);
+                const response = await api.getTimelineHistogram(selectedEntity.type, selectedEntity.id);
+                setHistogram(response.data);
             } catch (error) {
                 console.error('Failed to fetch timeline:', error);
             } finally {
@@ -22,9 +39,38 @@ const TimelineView: React.FC = () => {
             }
         };
 
-        fetchTimeline();
+        fetchHistogram();
     }, [selectedEntity]);
 
+    const fetchEvents = async (bucket: Bucket, after: string | null) => {
+        if (!selectedEntity || !histogram) return;
+        setLoadingEvents(true);
+        try {
+            const start = new Date(bucket.start);
+            const end = new Date(start.getTime() + histogram.bucket_seconds * 1000);
+            const response = await api.getTimeline(selectedEntity.type, selectedEntity.id, {
+                start_time: start.toISOString(),
+                end_time: end.toISOString(),
+                cursor: after ?? undefined,
+            });
+            setEvents(prev => after ? [...prev, ...response.data.events] : response.data.events);
+            setCursor(response.data.next_cursor);
+        } catch (error) {
+            console.error('Failed to fetch timeline events:', error);
+        } finally {
+            setLoadingEvents(false);
+        }
+    };
+
+    const selectBucket = (bucket: Bucket) => {
+        setSelectedBucket(bucket);
+        setEvents([]);
+        setCursor(null);
+        fetchEvents(bucket, null);
+    };
+
+    const peak = histogram ? Math.max(1, ...histogram.buckets.map(b => b.total)) : 1;
+
     if (!selectedEntity) {
         return (
             <div className="flex-center h-full text-muted">
@@ -41,12 +87,30 @@ const TimelineView: React.FC = () => {
                 <Clock size={16} /> Chronological Events for {selectedEntity.properties.full_name || selectedEntity.id}
             </div>
 
+            {histogram && histogram.buckets.length > 0 && (
+                <div className="timeline-histogram">
+                    {histogram.buckets.map(bucket => (
+                        <div
+                            key={bucket.start}
+                            className={`histogram-bar ${selectedBucket?.start === bucket.start ? 'selected' : ''}`}
+                            style={{ height: `${Math.max(4, (bucket.total / peak) * 100)}%` }}
+                            title={`${new Date(bucket.start).toLocaleString()}: ${Object.entries(bucket.counts).map(([k, v]) => `${k} ${v}`).join(', ')}`}
+                            onClick={() => selectBucket(bucket)}
+                        />
+                    ))}
+                </div>
+            )}
+
             <div className="timeline-list">
-                {events.length === 0 ? (
+                {!histogram || histogram.total === 0 ? (
                     <div className="text-center p-8 text-muted">No temporal events found for this entity.</div>
+                ) : !selectedBucket ? (
+                    <div className="text-center p-8 text-muted">
+                        {histogram.total} events, grouped by {histogram.interval}; select a bar to list its events.
+                    </div>
                 ) : (
-                    events.map((event, idx) => (
-                        <div key={idx} className="timeline-item">
+                    events.map((event) => (
+                        <div key={event.rel_id} className="timeline-item">
                             <div className="timeline-marker"></div>
                             <div className="timeline-content panel glass">
                                 <div className="event-time text-xs mono text-primary">
@@ -67,6 +131,10 @@ const TimelineView: React.FC = () => {
                         </div>
                     ))
                 )}
+                {loadingEvents && <div className="text-center p-4 text-muted mono">Loading events...</div>}
+                {selectedBucket && cursor && !loadingEvents && (
+                    <button className="load-more" onClick={() => fetchEvents(selectedBucket, cursor)}>Load more</button>
+                )}
             </div>
 
             <style>{`
@@ -83,6 +151,11 @@ const TimelineView: React.FC = () => {
         .event-main { display: flex; align-items: center; gap: 8px; font-weight: 500; font-size: 0.875rem; }
         .event-type-icon { color: var(--primary); }
         .mr-3 { margin-right: 12px; }
+
+        .timeline-histogram { height: 80px; display: flex; align-items: flex-end; gap: 1px; padding: 8px 16px; border-bottom: 1px solid var(--border); }
+        .histogram-bar { flex: 1; min-width: 2px; background: var(--primary); opacity: 0.6; cursor: pointer; }
+        .histogram-bar:hover, .histogram-bar.selected { opacity: 1; }
+        .load-more { display: block; margin: 0 auto; padding: 6px 16px; font-size: 0.75rem; }
       `}</style>
         </div>
     );
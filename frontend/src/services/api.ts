@@ -12,8 +12,43 @@ const apiClient = axios.create({
 export const api = {
     // Entities
     getEntity: (type: string, id: string) => apiClient.get(`/entities/${type}/${id}`),
+    getEntities: (refs: { entity_type: string; entity_id: string }[]) =>
+        apiClient.post('/entities/batch', { entities: refs }),
     expandEntity: (type: string, id: string, depth: number = 1) =>
         apiClient.get(`/entities/${type}/${id}/expand`, { params: { depth } }),
+    expandGraph: (request: {
+        entity_type: string;
+        entity_id: string;
+        depth?: number;
+        relationship_types?: string[];
+        start_date?: string;
+        end_date?: string;
+        max_neighbors?: number;
+        rank_by?: 'recent' | 'volume';
+        collapse_clusters?: boolean;
+        known_node_ids?: string[];
+        known_edge_ids?: string[];
+    }) => apiClient.post('/entities/expand', request),
+    pageNeighbors: (nodeId: string, relationshipType: string, offset: number, limit: number = 50, options: {
+        rank_by?: 'recent' | 'volume';
+        start_date?: string;
+        end_date?: string;
+        known_edge_ids?: string[];
+    } = {}) =>
+        apiClient.get(`/entities/nodes/${nodeId}/neighbors`, {
+            params: { relationship_type: relationshipType, offset, limit, ...options },
+            paramsSerializer: { indexes: null },
+        }),
+    findPaths: (request: {
+        source: { entity_type: string; entity_id: string };
+        target: { entity_type: string; entity_id: string };
+        relationship_types?: string[];
+        max_hops?: number;
+        k?: number;
+        weight_by?: 'hops' | 'volume';
+        directed?: boolean;
+        timeout_ms?: number;
+    }) => apiClient.post('/paths', request),
 
     // Search
     search: (query: string) => apiClient.get('/search/', { params: { q: query } }),
@@ -21,16 +56,137 @@ export const api = {
         apiClient.get(`/search/type/${type}`, { params: { q: query } }),
 
     // Analytics
-    getTimeline: (type: string, id: string) => apiClient.get(`/analytics/timeline/${type}/${id}`),
+    getTimeline: (type: string, id: string, params: {
+        start_time?: string;
+        end_time?: string;
+        relationship_types?: string[];
+        limit?: number;
+        cursor?: string;
+    } = {}) => apiClient.get(`/analytics/timeline/${type}/${id}`, { params, paramsSerializer: { indexes: null } }),
+    getTimelineHistogram: (type: string, id: string, params: {
+        start_time?: string;
+        end_time?: string;
+        interval?: 'minute' | 'hour' | 'day';
+    } = {}) => apiClient.get(`/analytics/timeline/${type}/${id}/histogram`, { params }),
+    getEntitiesInArea: (minLat: number, maxLat: number, minLon: number, maxLon: number, limit?: number) =>
+        apiClient.get('/analytics/geo/area', {
+            params: { min_lat: minLat, max_lat: maxLat, min_lon: minLon, max_lon: maxLon, limit },
+        }),
+    getEntitiesWithin: (lat: number, lon: number, radiusM: number, limit?: number) =>
+        apiClient.get('/analytics/geo/radius', { params: { lat, lon, radius_m: radiusM, limit } }),
+    getEntitiesInPolygon: (polygon: [number, number][], limit?: number) =>
+        apiClient.post('/analytics/geo/polygon', { polygon, limit }),
+    getMapClusters: (bounds: { minLat: number; maxLat: number; minLon: number; maxLon: number }, zoom: number, limit?: number) =>
+        apiClient.get('/analytics/geo/clusters', {
+            params: {
+                min_lat: bounds.minLat, max_lat: bounds.maxLat, min_lon: bounds.minLon, max_lon: bounds.maxLon, zoom, limit,
+            },
+        }),
+    expandMapCluster: (clusterId: number, limit?: number) =>
+        apiClient.get(`/analytics/geo/clusters/${clusterId}/expand`, { params: { limit } }),
+    getHeatmap: (bounds: { minLat: number; maxLat: number; minLon: number; maxLon: number }, params: {
+        resolution?: number;
+        start_time?: string;
+        end_time?: string;
+        layers?: string[];
+        by_layer?: boolean;
+    } = {}) =>
+        apiClient.get('/analytics/geo/heatmap', {
+            params: { min_lat: bounds.minLat, max_lat: bounds.maxLat, min_lon: bounds.minLon, max_lon: bounds.maxLon, ...params },
+            paramsSerializer: { indexes: null },
+        }),
+    getTrajectory: (type: string, id: string, params: {
+        start_time?: string;
+        end_time?: string;
+        tolerance_m?: number;
+    } = {}) => apiClient.get(`/analytics/geo/trajectory/${type}/${id}`, { params }),
     getSightings: (type: string, id: string) => apiClient.get(`/analytics/geo/sightings/${type}/${id}`),
-    getTopContacts: (phoneId: string) => apiClient.get(`/analytics/comms/frequent/${phoneId}`),
-    traceMoney: (accountId: string, depth: number = 3) =>
-        apiClient.get(`/analytics/finance/trace/${accountId}`, { params: { depth } }),
+    getColocations: (params: { entity_type?: string; entity_id?: string; limit?: number } = {}) =>
+        apiClient.get('/analytics/geo/colocation', { params }),
+    querySequence: (query: {
+        steps: {
+            event: string;
+            source?: string;
+            target?: string;
+            undirected?: boolean;
+            source_type?: string;
+            within_minutes?: number;
+            near_km?: number;
+            min_amount?: number;
+        }[];
+        bindings?: Record<string, { entity_type: string; entity_id: string }>;
+        start_time?: string;
+        end_time?: string;
+        limit?: number;
+    }) => apiClient.post('/analytics/sequences/query', query),
+    getSequenceMatches: (params: { name?: string; entity_id?: string; limit?: number } = {}) =>
+        apiClient.get('/analytics/sequences/matches', { params }),
+    getCommNetwork: (
+        phoneId: string,
+        hops: { min_volume?: number; start_time?: string; end_time?: string }[] = [{}],
+        pageSize: number = 200,
+        cursor?: string
+    ) => apiClient.post('/analytics/comms/network', { phone_id: phoneId, hops, page_size: pageSize, cursor }),
+    getTopContacts: (phoneId: string, limit: number = 5, rankBy: 'total' | 'calls' | 'messages' | 'duration' = 'total') =>
+        apiClient.get(`/analytics/comms/frequent/${phoneId}`, { params: { limit, rank_by: rankBy } }),
+    getPairContacts: (phoneId: string, contactId: string, startDate?: string, endDate?: string) =>
+        apiClient.get(`/analytics/comms/contacts/${phoneId}/${contactId}`, {
+            params: { start_date: startDate, end_date: endDate },
+        }),
+    traceMoney: (accountId: string, options: {
+        depth?: number;
+        dwell_hours?: number;
+        start_time?: string;
+        end_time?: string;
+        amount?: number;
+        min_amount?: number;
+        max_branches?: number;
+    } = {}) =>
+        apiClient.get(`/analytics/finance/trace/${accountId}`, { params: { depth: 3, ...options } }),
+    getFlowBetween: (accountA: string, accountB: string, startDate?: string, endDate?: string) =>
+        apiClient.get(`/analytics/finance/flow/${accountA}/${accountB}`, {
+            params: { start_date: startDate, end_date: endDate },
+        }),
+    getFlowGraph: (accountIds: string[], startDate?: string, endDate?: string, minTotal?: number) =>
+        apiClient.get('/analytics/finance/flow-graph', {
+            params: { account_ids: accountIds, start_date: startDate, end_date: endDate, min_total: minTotal },
+            paramsSerializer: { indexes: null },
+        }),
+    getPatternFindings: (params: { pattern?: string; account_id?: string[]; status?: string; limit?: number } = {}) =>
+        apiClient.get('/analytics/finance/findings', { params, paramsSerializer: { indexes: null } }),
+    setFindingStatus: (findingId: string, status: 'OPEN' | 'CONFIRMED' | 'DISMISSED') =>
+        apiClient.post(`/analytics/finance/findings/${findingId}/status`, null, { params: { status } }),
+
+    // Entity resolution
+    getMergeSuggestions: (entityType: string, entityId?: string, minConfidence?: number) =>
+        apiClient.get('/resolution/suggestions', {
+            params: { entity_type: entityType, entity_id: entityId, min_confidence: minConfidence },
+        }),
+    resolveEntities: (entityType: string, primaryId: string, duplicateIds: string[]) =>
+        apiClient.post('/resolution/resolve', {
+            entity_type: entityType,
+            primary_id: primaryId,
+            duplicate_ids: duplicateIds,
+        }),
+    unmergeEntity: (entityType: string, entityId: string, otherIds?: string[]) =>
+        apiClient.post('/resolution/unmerge', {
+            entity_type: entityType,
+            entity_id: entityId,
+            other_ids: otherIds,
+        }),
 
     // Cases
     listCases: () => apiClient.get('/cases/'),
     getCase: (id: string) => apiClient.get(`/cases/${id}`),
     getCaseEntities: (id: string) => apiClient.get(`/cases/${id}/entities`),
+    getCaseFindings: (id: string) => apiClient.get(`/cases/${id}/findings`),
+    getCaseTimeline: (id: string, params: {
+        start_time?: string;
+        end_time?: string;
+        relationship_types?: string[];
+        limit?: number;
+        cursor?: string;
+    } = {}) => apiClient.get(`/cases/${id}/timeline`, { params, paramsSerializer: { indexes: null } }),
     createCase: (data: any) => apiClient.post('/cases/', data),
     addEntityToCase: (caseId: string, data: any) => apiClient.post(`/cases/${caseId}/entities`, data),
 